@@ -2,6 +2,7 @@ from .managers import EmailUserManager
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
+from monitoring.timing import timed
 
 class EmailUser(AbstractBaseUser, PermissionsMixin):
     username = models.CharField(max_length=100, blank=True, null=True)
@@ -17,4 +18,12 @@ class EmailUser(AbstractBaseUser, PermissionsMixin):
     objects = EmailUserManager()
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+    @timed("password")
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+
+    @timed("password")
+    def check_password(self, raw_password):
+        return super().check_password(raw_password)
@@ -1,5 +1,82 @@
-from .models import BlogPost, Tag
+import os
+import uuid
+from .blog_export import EXPORT_CONTENT_TYPES, EXPORT_FORMATS, stream_export
+from .jobs import IMPORT_BLOGS, enqueue
+from .models import BlogImport, BlogPost, Job, Tag
+from django.conf import settings
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+
+# Imports listed on the import page, waiting and done
+RECENT_IMPORTS = 10
 
 admin.site.register(Tag)
-admin.site.register(BlogPost)
+
+@admin.register(BlogPost)
+class BlogPostAdmin(admin.ModelAdmin):
+    """
+    Blog posts, with an import of uploaded NDJSON or CSV files and an export
+    of all posts linked from the list.
+    """
+    change_list_template = "admin/blogs/blogpost/change_list.html"
+    readonly_fields = ["views"]
+
+    def get_urls(self):
+        urls = [
+            path("import/", self.admin_site.admin_view(self.import_view), name="blogs_blogpost_import"),
+            path("export/", self.admin_site.admin_view(self.export_view), name="blogs_blogpost_export"),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """
+        Imports an uploaded file like the `import_blogs` command. The file is
+        stored and imported by the `import_blogs` job, the page shows the
+        progress of the recent imports. Uploading an interrupted file again
+        resumes it.
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        upload = request.FILES.get("file")
+        if request.method == "POST":
+            if upload:
+                os.makedirs(settings.IMPORT_FOLDER, exist_ok=True)
+                file_path = os.path.join(settings.IMPORT_FOLDER, f"{uuid.uuid4()}{os.path.splitext(upload.name)[1]}")
+                with open(file_path, "wb") as file:
+                    for chunk in upload.chunks():
+                        file.write(chunk)
+
+                enqueue(IMPORT_BLOGS, {"path": file_path, "file_name": upload.name})
+                self.message_user(request, f"{upload.name} is imported in the background.")
+
+            return HttpResponseRedirect(request.path)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Import blog posts",
+            "jobs": Job.objects.filter(name=IMPORT_BLOGS).order_by("-id")[:RECENT_IMPORTS],
+            "imports": BlogImport.objects.order_by("-started_at")[:RECENT_IMPORTS],
+        }
+        return TemplateResponse(request, "admin/blogs/blogpost/import.html", context)
+
+    def export_view(self, request):
+        """
+        Streams all blog posts as NDJSON or CSV (`?format=csv`).
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        format = request.GET.get("format", "ndjson")
+        if format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest("Unknown export format")
+
+        response = StreamingHttpResponse(
+            stream_export(format, settings.EXPORT_CHUNK_SIZE), content_type=EXPORT_CONTENT_TYPES[format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="blog_posts.{format}"'
+        return response
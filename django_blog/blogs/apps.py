@@ -5,4 +5,8 @@ class BlogsConfig(AppConfig):
     name = 'blogs'
 
     def ready(self):
-        import blogs.seeders
\ No newline at end of file
+        import blogs.media
+        import blogs.seeders
+        import blogs.rss
+        import blogs.sitemap
+        import blogs.suggest
\ No newline at end of file
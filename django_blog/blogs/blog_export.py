@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from typing import Dict, Iterator, List
+from blogs.models import BlogPost
+
+EXPORT_FORMATS = ["ndjson", "csv"]
+EXPORT_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# The fields of an exported post, the same records the import reads
+EXPORT_FIELDS = ["id", "title", "content", "author", "tags", "image", "created_at"]
+
+def export_chunks(chunk_size: int = 1000) -> Iterator[List[Dict]]:
+    """
+    Yields every blog post with its author email and tag names, in chunks
+    ordered by id. Each chunk is two short keyset queries outside of a
+    transaction, so the memory stays constant and a slow download doesn't keep
+    a cursor or transaction open between the chunks.
+    """
+    BlogPostTag = BlogPost.tags.through
+    last_id = 0
+    while True:
+        posts = list(
+            BlogPost.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "title", "content", "author__email", "image", "created_at")[:chunk_size]
+        )
+        if not posts:
+            return
+
+        tags = defaultdict(list)
+        for blog_id, name in (
+            BlogPostTag.objects.filter(blogpost_id__in=[post[0] for post in posts])
+            .order_by("tag__name")
+            .values_list("blogpost_id", "tag__name")
+        ):
+            tags[blog_id].append(name)
+
+        yield [
+            {
+                "id": id,
+                "title": title,
+                "content": content,
+                "author": author,
+                "tags": tags[id],
+                "image": image or None,
+                "created_at": created_at.isoformat(),
+            }
+            for id, title, content, author, image, created_at in posts
+        ]
+        last_id = posts[-1][0]
+
+def format_chunk(rows: List[Dict], format: str, header: bool = False) -> str:
+    """
+    Formats exported rows as NDJSON lines or CSV rows, the CSV tags comma separated.
+    """
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS)
+        if header:
+            writer.writeheader()
+        writer.writerows({**row, "tags": ", ".join(row["tags"])} for row in rows)
+        return buffer.getvalue()
+
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+def stream_export(format: str, chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Yields the export of all blog posts as NDJSON or CSV text, one piece per chunk.
+    """
+    if format == "csv":
+        yield format_chunk([], format, header=True)
+
+    for rows in export_chunks(chunk_size):
+        yield format_chunk(rows, format)
@@ -0,0 +1,325 @@
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from accounts.models import EmailUser
+from blogs.bulk import bulk_insert
+from blogs.forms import sanitize_content
+from blogs.models import BlogImport, BlogPost, Tag
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+IMPORT_FORMATS = ["ndjson", "csv"]
+
+# Errors listed in the import result, later ones are only counted as skipped
+MAX_REPORTED_ERRORS = 100
+
+# Reserves ids for posts written with COPY, which cannot return them
+RESERVE_POST_IDS_SQL = "SELECT nextval(pg_get_serial_sequence('blogs_blogpost', 'id')) FROM generate_series(1, %s)"
+
+def detect_format(file_name: str) -> str:
+    return "csv" if Path(file_name).suffix.lower() == ".csv" else "ndjson"
+
+def file_checksum(path: Path) -> str:
+    """
+    Returns the SHA-256 of a file, which identifies an import when it is resumed.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def read_records(file: TextIO, format: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yields the line number and the record of every record in an NDJSON or CSV
+    file, reading it line by line. Invalid JSON lines yield None as the record.
+    """
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None
+
+def _string(record: dict, key: str, max_length: Optional[int] = None) -> str:
+    value = record.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string")
+    if max_length and len(value.strip()) > max_length:
+        raise ValueError(f"{key} is longer than {max_length} characters")
+
+    return value.strip()
+
+def parse_record(record: Any) -> dict:
+    """
+    Validates an imported record and returns the fields of its blog post.
+
+    Records have a `title`, `content` and the `author` email, and optionally
+    `tags` (a list, or a comma separated string in CSV), an `image` and
+    `created_at` as an ISO date, dates without a timezone are in `TIME_ZONE`.
+    Raises ValueError with the reason if the record is not a valid blog post.
+    `tags` of the returned fields maps the tag slugs to their names.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+
+    title = _string(record, "title", 255)
+    content = _string(record, "content")
+    author = _string(record, "author")
+    if not (title and content and author):
+        raise ValueError("title, content and author are required")
+
+    names = record.get("tags") or []
+    if isinstance(names, str):
+        names = names.split(",")
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise ValueError("tags must be a list of names")
+
+    tags = {}
+    for name in filter(None, (name.strip() for name in names)):
+        slug = slugify(name)
+        if not slug or len(name) > 50 or len(slug) > 60:
+            raise ValueError(f"invalid tag {name!r}")
+        tags.setdefault(slug, name)
+
+    created_at = _string(record, "created_at")
+    if created_at:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except ValueError:
+            raise ValueError("created_at is not an ISO date")
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+
+    return {
+        "title": title,
+        "content": content,
+        "author": author,
+        "tags": tags,
+        "image": _string(record, "image", 255) or None,
+        "created_at": created_at or None,
+    }
+
+def sanitize_contents(contents: List[str]) -> List[str]:
+    return [sanitize_content(content) for content in contents]
+
+def _prepare_batch(executor: Executor, workers: int, batch: List[Tuple[int, Any]]):
+    """
+    Validates a batch of records and submits their content to the worker
+    processes for sanitizing, split in one chunk per worker. Returns the number
+    of records, the valid posts, the errors and the futures of the content.
+    """
+    posts, errors = [], []
+    for line_number, record in batch:
+        try:
+            posts.append({**parse_record(record), "line": line_number})
+        except ValueError as e:
+            errors.append(f"Line {line_number}: {e}")
+
+    contents = [post["content"] for post in posts]
+    size = max(1, -(-len(contents) // workers))
+    futures = [
+        executor.submit(sanitize_contents, contents[start:start + size])
+        for start in range(0, len(contents), size)
+    ]
+
+    return len(batch), posts, errors, futures
+
+def _resolve_authors(emails: Iterable[str], authors: Dict[str, Optional[int]]):
+    """
+    Adds the ids of the authors not looked up yet to `authors`, None for unknown emails.
+    """
+    missing = set(emails) - authors.keys()
+    if not missing:
+        return
+
+    authors.update(dict.fromkeys(missing))
+    authors.update(EmailUser.objects.filter(email__in=missing).values_list("email", "id"))
+
+def _resolve_tags(names: Dict[str, str], tags: Dict[str, int], batch_size: int):
+    """
+    Adds the ids of the tags not looked up yet to `tags`, by slug, creating the
+    tags that don't exist.
+    """
+    missing = {slug: name for slug, name in names.items() if slug not in tags}
+    if not missing:
+        return
+
+    existing = Tag.objects.filter(Q(slug__in=missing) | Q(name__in=missing.values())).values_list("id", "name", "slug")
+    by_slug = {slug: tag_id for tag_id, _, slug in existing}
+    by_name = {name: tag_id for tag_id, name, _ in existing}
+    for slug, name in missing.items():
+        if slug in by_slug or name in by_name:
+            tags[slug] = by_slug.get(slug) or by_name[name]
+
+    new_tags = [Tag(name=name, slug=slug) for slug, name in missing.items() if slug not in tags]
+    tags.update((tag.slug, tag.id) for tag in Tag.objects.bulk_create(new_tags, batch_size=batch_size))
+
+def _insert_posts(rows: List[dict], batch_size: int, use_copy: bool) -> List[int]:
+    """
+    Inserts blog post rows and returns their ids in order. COPY can't return
+    the ids, so they are reserved from the sequence first, otherwise
+    `bulk_create` sets them from its multi-row INSERT ... RETURNING.
+    """
+    if use_copy and connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(RESERVE_POST_IDS_SQL, [len(rows)])
+            ids = [row[0] for row in cursor.fetchall()]
+        bulk_insert(BlogPost, [{"id": id, **row} for id, row in zip(ids, rows)], batch_size, use_copy)
+        return ids
+
+    return [post.id for post in BlogPost.objects.bulk_create([BlogPost(**row) for row in rows], batch_size=batch_size)]
+
+def _write_batch(
+    posts: List[dict],
+    authors: Dict[str, Optional[int]],
+    tags: Dict[str, int],
+    batch_size: int,
+    use_copy: bool,
+    errors: List[str],
+) -> int:
+    """
+    Writes the posts of a batch with their tag links, skipping the posts of
+    unknown authors. Returns the number of imported posts.
+    """
+    _resolve_authors((post["author"] for post in posts), authors)
+
+    known = []
+    for post in posts:
+        if authors[post["author"]] is None:
+            errors.append(f"Line {post['line']}: unknown author {post['author']}")
+        else:
+            known.append(post)
+    if not known:
+        return 0
+
+    _resolve_tags({slug: name for post in known for slug, name in post["tags"].items()}, tags, batch_size)
+
+    now = timezone.now()
+    post_ids = _insert_posts([
+        {
+            "title": post["title"],
+            "content": post["content"],
+            "image": post["image"],
+            "created_at": post["created_at"] or now,
+            "author_id": authors[post["author"]],
+        }
+        for post in known
+    ], batch_size, use_copy)
+
+    bulk_insert(BlogPost.tags.through, [
+        {"blogpost_id": post_id, "tag_id": tags[slug]}
+        for post_id, post in zip(post_ids, known)
+        for slug in post["tags"]
+    ], batch_size, use_copy)
+
+    return len(post_ids)
+
+def import_blog_posts(
+    path: Path,
+    file_name: Optional[str] = None,
+    format: Optional[str] = None,
+    batch_size: int = 1000,
+    workers: Optional[int] = None,
+    use_copy: bool = True,
+    report: Callable[[str], None] = print,
+):
+    """
+    Imports the blog posts of an NDJSON or CSV file in batches, committing
+    every batch together with the progress of the import.
+
+    The file is streamed, authors and tags are resolved once per batch, and
+    the content of the next batch is sanitized in worker processes while the
+    current one is written. Importing a file that was interrupted continues
+    after its last committed batch, importing a finished file does nothing.
+
+    `format` is detected from the file name by default and `workers` defaults
+    to the CPU count. `report` receives a progress message after every batch.
+    Returns the records read, posts imported and records skipped over all runs
+    of the import, the errors of this run and its posts per second.
+    """
+    path = Path(path)
+    file_name = file_name or path.name
+    format = format or detect_format(file_name)
+    workers = workers or os.cpu_count() or 1
+
+    blog_import, created = BlogImport.objects.get_or_create(
+        checksum=file_checksum(path), defaults={"file_name": file_name[:255]}
+    )
+    if blog_import.finished_at:
+        report(f"{file_name} was already imported at {blog_import.finished_at:%Y-%m-%d %H:%M}.")
+    elif not created and blog_import.records:
+        report(f"Resuming the import of {file_name} after {blog_import.records} records.")
+
+    errors: List[str] = []
+    imported = 0
+    started = time.perf_counter()
+
+    if not blog_import.finished_at:
+        authors: Dict[str, Optional[int]] = {}
+        tags: Dict[str, int] = {}
+
+        with open(path, newline="", encoding="utf-8") as file, ProcessPoolExecutor(workers) as executor:
+            records = islice(read_records(file, format), blog_import.records, None)
+            batches = iter(lambda: list(islice(records, batch_size)), [])
+
+            def prepare_next():
+                batch = next(batches, None)
+                return _prepare_batch(executor, workers, batch) if batch else None
+
+            prepared = prepare_next()
+            try:
+                while prepared is not None:
+                    read, posts, batch_errors, futures = prepared
+                    for post, content in zip(posts, chain.from_iterable(future.result() for future in futures)):
+                        post["content"] = content
+                    prepared = prepare_next()
+
+                    with transaction.atomic():
+                        written = _write_batch(posts, authors, tags, batch_size, use_copy, batch_errors)
+                        blog_import.records += read
+                        blog_import.imported += written
+                        blog_import.skipped += read - written
+                        blog_import.save(update_fields=["records", "imported", "skipped"])
+
+                    imported += written
+                    errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+                    elapsed = time.perf_counter() - started
+                    report(
+                        f"Imported {blog_import.imported} blog posts, skipped {blog_import.skipped} records "
+                        f"({imported / elapsed:.0f} posts/s)."
+                    )
+            except Exception:
+                for future in prepared[3] if prepared else []:
+                    future.cancel()
+                raise
+
+        blog_import.finished_at = timezone.now()
+        blog_import.save(update_fields=["finished_at"])
+
+    return {
+        "records": blog_import.records,
+        "imported": blog_import.imported,
+        "skipped": blog_import.skipped,
+        "errors": errors,
+        "posts_per_second": imported / max(time.perf_counter() - started, 1e-9),
+    }
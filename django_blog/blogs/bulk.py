@@ -0,0 +1,46 @@
+import csv
+import io
+from typing import Any, Dict, List, Sequence
+from django.core.management.color import no_style
+from django.db import connection, models
+
+def bulk_insert(model: type[models.Model], rows: Sequence[Dict[str, Any]], batch_size: int = 5000, use_copy: bool = True):
+    """
+    Inserts many rows of a model with as few round trips as possible.
+
+    On PostgreSQL the rows are streamed with COPY, on other databases
+    they are written with multi-row INSERTs through `bulk_create`.
+    The row keys are the model's field attribute names (e.g. `author_id`).
+    """
+    if not rows:
+        return 0
+
+    if use_copy and connection.vendor == "postgresql":
+        columns: List[str] = list(rows[0].keys())
+        db_columns = [model._meta.get_field(column).column for column in columns]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {model._meta.db_table} ({', '.join(db_columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+    else:
+        model.objects.bulk_create([model(**row) for row in rows], batch_size=batch_size)
+
+    return len(rows)
+
+def reset_sequences(*model_classes: type[models.Model]):
+    """
+    Moves the id sequences past rows inserted with explicit ids.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), model_classes)
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
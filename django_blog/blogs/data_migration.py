@@ -0,0 +1,312 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+from accounts.models import EmailUser
+from blogs.bulk import bulk_insert, reset_sequences
+from blogs.models import BlogPost, Tag
+from django.db import connection, transaction
+from django.db.utils import load_backend
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import make_aware
+
+APPS = ["fastapi", "flask", "django"]
+
+# Physical tables of every app and the column its users' password hashes are stored in
+SCHEMAS = {
+    "fastapi": {
+        "users": "email_user", "tags": "tag", "posts": "blog_post", "links": "blogpost_tag", "password": "password_hash",
+    },
+    "flask": {
+        "users": "email_user", "tags": "tag", "posts": "blog_post", "links": "blogpost_tags", "password": "password_hash",
+    },
+    "django": {
+        "users": "accounts_emailuser", "tags": "blogs_tag", "posts": "blogs_blogpost", "links": "blogs_blogpost_tags",
+        "password": "password",
+    },
+}
+
+# Columns all apps share, the password hash column is read as `password` whatever it is called
+COLUMNS = {
+    "users": ["id", "email", "username", "password", "is_active", "is_staff", "created_at"],
+    "tags": ["id", "name", "slug"],
+    "posts": ["id", "title", "content", "image", "created_at", "author_id"],
+    "links": ["blogpost_id", "tag_id"],
+}
+
+# Copied in this order, so the rows a foreign key points to are always there
+KINDS = ["users", "tags", "posts", "links"]
+
+# Columns the rows of each table are ordered and paginated by
+KEYS = {"users": ["id"], "tags": ["id"], "posts": ["id"], "links": ["blogpost_id", "tag_id"]}
+
+# Cloudinary images are stored as their full URL, and in Django as the path after the cloud name
+CLOUDINARY_URL = re.compile(r"^https?://res\.cloudinary\.com/[^/]+/(?P<path>.+)$")
+CLOUDINARY_PATH = re.compile(r"^(image|video|raw)/(upload|private|authenticated)/")
+
+TARGET_MODELS = {
+    "users": EmailUser,
+    "tags": Tag,
+    "posts": BlogPost,
+    "links": BlogPost.tags.through,
+}
+
+def database_settings(url: str) -> dict:
+    """
+    Returns the Django database settings of a `postgresql://` or `sqlite:///` URL.
+    """
+    parts = urlsplit(url)
+    if parts.scheme.startswith("sqlite"):
+        return {"ENGINE": "django.db.backends.sqlite3", "NAME": unquote(parts.path[1:]), "OPTIONS": {}}
+    if parts.scheme.startswith("postgres"):
+        return {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": unquote(parts.path[1:]),
+            "USER": unquote(parts.username or ""),
+            "PASSWORD": unquote(parts.password or ""),
+            "HOST": parts.hostname or "",
+            "PORT": str(parts.port or ""),
+            "OPTIONS": {},
+        }
+
+    raise ValueError(f"Unsupported database URL {url!r}, use postgresql:// or sqlite:///")
+
+def source_connection(url: str):
+    """
+    Opens a connection to the source database next to the default one.
+    """
+    settings_dict = {**connection.settings_dict, **database_settings(url)}
+    return load_backend(settings_dict["ENGINE"]).DatabaseWrapper(settings_dict, "migration_source")
+
+def convert_password_hash(password_hash: str, target: str) -> str:
+    """
+    Converts a password hash to the format of the target app where that is
+    lossless. Django verifies bcrypt hashes with the `bcrypt$` prefix, the
+    other apps verify Django's PBKDF2 hashes and rehash them on login.
+    """
+    if target == "django":
+        return f"bcrypt${password_hash}" if password_hash.startswith("$2") else password_hash
+
+    return password_hash.removeprefix("bcrypt$")
+
+def remap_image(
+    image: Optional[str],
+    source: str,
+    target: str,
+    media_url: str = "/media/",
+    cloud_name: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Maps an image to the way the target app stores it. Django stores local
+    images relative to its media root and Cloudinary images without the host
+    and cloud name, the other apps store the URL the image is served from.
+    """
+    if not image or (source == "django") == (target == "django"):
+        return image
+
+    if target == "django":
+        if image.startswith(media_url):
+            return image[len(media_url):]
+        match = CLOUDINARY_URL.match(image)
+        return match["path"] if match else image
+
+    if CLOUDINARY_PATH.match(image) and cloud_name:
+        return f"https://res.cloudinary.com/{cloud_name}/{image}"
+    if image.startswith(("/", "http://", "https://")):
+        return image
+
+    return media_url + image
+
+def _utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def convert_row(
+    kind: str,
+    row: dict,
+    source: str,
+    target: str,
+    media_url: str = "/media/",
+    cloud_name: Optional[str] = None,
+) -> dict:
+    """
+    Converts a row read from the source app to the values the target app
+    stores, with the shared column names and dates as naive UTC.
+    """
+    row = dict(row)
+    if isinstance(row.get("created_at"), str):
+        row["created_at"] = parse_datetime(row["created_at"])
+    if isinstance(row.get("created_at"), datetime):
+        row["created_at"] = _utc(row["created_at"])
+
+    if kind == "users":
+        row["password"] = convert_password_hash(row["password"], target)
+        row["is_active"] = bool(row["is_active"])
+        row["is_staff"] = bool(row["is_staff"])
+    elif kind == "posts":
+        row["image"] = remap_image(row["image"], source, target, media_url, cloud_name)
+
+    return row
+
+def _target_row(kind: str, row: dict) -> dict:
+    if "created_at" in row:
+        row = {**row, "created_at": make_aware(row["created_at"], timezone.utc)}
+    if kind == "users":
+        # Staff users manage everything in the admin of the other apps
+        row = {**row, "is_superuser": row["is_staff"]}
+
+    return row
+
+def _batch_sql(db, app: str, kind: str, after: Optional[Tuple], batch_size: int) -> Tuple[str, list]:
+    quote = db.ops.quote_name
+    schema, keys = SCHEMAS[app], KEYS[kind]
+
+    columns = ", ".join(
+        f"{quote(schema['password'])} AS {quote(column)}" if column == "password" else quote(column)
+        for column in COLUMNS[kind]
+    )
+    sql, params = f"SELECT {columns} FROM {quote(schema[kind])}", []
+
+    if after is not None and len(keys) == 1:
+        sql += f" WHERE {quote(keys[0])} > %s"
+        params = [after[0]]
+    elif after is not None:
+        first, second = map(quote, keys)
+        sql += f" WHERE {first} > %s OR ({first} = %s AND {second} > %s)"
+        params = [after[0], after[0], after[1]]
+
+    sql += f" ORDER BY {', '.join(map(quote, keys))} LIMIT %s"
+    return sql, params + [batch_size]
+
+def _batches(db, app: str, kind: str, batch_size: int, after: Optional[Tuple] = None) -> Iterator[List[dict]]:
+    """
+    Yields the rows of a table in batches by key, every batch read with a
+    query of its own, so no transaction stays open on the source.
+    """
+    while True:
+        with db.cursor() as cursor:
+            cursor.execute(*_batch_sql(db, app, kind, after, batch_size))
+            rows = [dict(zip(COLUMNS[kind], row)) for row in cursor.fetchall()]
+        if not rows:
+            return
+
+        yield rows
+        after = tuple(rows[-1][key] for key in KEYS[kind])
+
+def _last_key(kind: str) -> Optional[Tuple]:
+    quote, keys = connection.ops.quote_name, KEYS[kind]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(map(quote, keys))} FROM {quote(SCHEMAS['django'][kind])} "
+            f"ORDER BY {', '.join(f'{quote(key)} DESC' for key in keys)} LIMIT 1"
+        )
+        row = cursor.fetchone()
+
+    return tuple(row) if row else None
+
+def copy_rows(
+    source_db,
+    source: str,
+    kind: str,
+    convert: Callable[[str, dict], dict],
+    batch_size: int = 1000,
+    use_copy: bool = True,
+    report: Callable[[str], None] = print,
+) -> int:
+    """
+    Copies the rows of one table from the source database in batches ordered
+    by their key, committing every batch. The rows keep their ids, and a copy
+    that was interrupted continues after the last row already in the target.
+    Returns the number of copied rows.
+    """
+    copied = 0
+    for rows in _batches(source_db, source, kind, batch_size, _last_key(kind)):
+        with transaction.atomic():
+            bulk_insert(TARGET_MODELS[kind], [_target_row(kind, convert(kind, row)) for row in rows], batch_size, use_copy)
+
+        copied += len(rows)
+        report(f"Copied {copied} {kind}.")
+
+    return copied
+
+def _checksum_update(digest, row: dict):
+    values = [_utc(value).isoformat() if isinstance(value, datetime) else value for value in row.values()]
+    digest.update(json.dumps(values).encode() + b"\n")
+
+def _table_checksum(db, app: str, kind: str, batch_size: int, convert=None) -> Tuple[int, str]:
+    count, digest = 0, hashlib.sha256()
+    for rows in _batches(db, app, kind, batch_size):
+        for row in rows:
+            _checksum_update(digest, convert(row) if convert else row)
+        count += len(rows)
+
+    return count, digest.hexdigest()
+
+def verify_migration(
+    source_db,
+    source: str,
+    convert: Callable[[str, dict], dict],
+    batch_size: int = 1000,
+) -> Dict[str, dict]:
+    """
+    Compares the row count and a checksum of every table in the source, with
+    its rows converted for the target, and the target database. Returns the
+    counts and checksums of every table and whether they match.
+    """
+    result = {}
+    for kind in KINDS:
+        source_count, source_checksum = _table_checksum(
+            source_db, source, kind, batch_size, lambda row: convert(kind, row)
+        )
+        target_count, target_checksum = _table_checksum(connection, "django", kind, batch_size)
+        result[kind] = {
+            "source": source_count,
+            "target": target_count,
+            "source_checksum": source_checksum,
+            "target_checksum": target_checksum,
+            "match": (source_count, source_checksum) == (target_count, target_checksum),
+        }
+
+    return result
+
+def migrate_data(
+    source_url: str,
+    source: str,
+    batch_size: int = 1000,
+    use_copy: bool = True,
+    media_url: str = "/media/",
+    cloud_name: Optional[str] = None,
+    verify_only: bool = False,
+    report: Callable[[str], None] = print,
+) -> dict:
+    """
+    Copies the users, tags, blog posts and their tag links from the database of
+    one of the three apps into this app's database, then verifies the copy.
+
+    The tables are streamed in batches by key and every batch is committed, so
+    running the migration again after a failure continues where it stopped.
+    Ids are preserved, password hashes and image paths are converted to this
+    app's format, and staff users become superusers.
+
+    `source` is one of `APPS`, `media_url` the URL prefix of local images in
+    the other apps and `cloud_name` the Cloudinary cloud of their images.
+    Returns the rows copied per table and the verification of every table.
+    """
+    def convert(kind, row):
+        return convert_row(kind, row, source, "django", media_url, cloud_name)
+
+    source_db = source_connection(source_url)
+    copied = dict.fromkeys(KINDS, 0)
+    try:
+        if not verify_only:
+            for kind in KINDS:
+                copied[kind] = copy_rows(source_db, source, kind, convert, batch_size, use_copy, report)
+
+            reset_sequences(EmailUser, Tag, BlogPost, BlogPost.tags.through)
+
+        verification = verify_migration(source_db, source, convert, batch_size)
+    finally:
+        source_db.close()
+
+    return {"copied": copied, "verification": verification}
@@ -1,55 +1,106 @@
+from functools import lru_cache
 from typing import Optional
 from accounts.models import EmailUser
 from django import forms
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from .direct_uploads import verify_upload
+from .jobs import UPLOAD_IMAGE, enqueue, stage_image
 from .models import BlogPost, Tag
 from html_sanitizer import Sanitizer
 
+SANITIZER_SETTINGS = {
+    "tags": ["h1", "h2", "h3", "p", "b", "i", "u", "a", "ul", "ol", "li", "br", "strong", "em", "span"],
+    "attributes": {
+        "a": ["href", "target", "rel"],
+        "span": ["class", "contenteditable"],
+        "li": ["data-list"]
+    },
+    "empty": ["br", "p"],
+    "separate": ["li", "p", "br"],
+}
+
+@lru_cache(maxsize=None)
+def get_sanitizer() -> Sanitizer:
+    return Sanitizer(SANITIZER_SETTINGS)
+
+def sanitize_content(content: str) -> str:
+    """
+    Removes the disallowed HTML tags and attributes from blog content. A module
+    level function, so it can also run in the worker processes of an import.
+    """
+    return get_sanitizer().sanitize(content)
+
 class BlogPostForm(forms.ModelForm):
     tags = forms.ModelMultipleChoiceField(
         queryset=Tag.objects.all(),
         widget=forms.CheckboxSelectMultiple,
         required=True
     )
+    # The key of an image the browser uploaded straight to the storage, see `blogs/direct_uploads.py`
+    image_key = forms.CharField(required=False, widget=forms.HiddenInput)
 
     class Meta:
         model = BlogPost
         fields = ['title', 'tags', 'image', 'content']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if settings.DIRECT_UPLOADS:
+            self.fields["image_key"].widget.attrs["data-upload-url"] = reverse("upload_policy")
+
+    def clean_image_key(self):
+        """
+        Checks the image the browser uploaded under the key, and returns the value of the image field for it.
+        """
+        key = self.cleaned_data.get("image_key")
+        if not key or not settings.DIRECT_UPLOADS:
+            return None
+
+        try:
+            return verify_upload(key)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+
     def clean_content(self):
         """
         XSS protection, cleans the content of unwanted tags.
         """
-        sanitizer = Sanitizer({
-            "tags": ["h1", "h2", "h3", "p", "b", "i", "u", "a", "ul", "ol", "li", "br", "strong", "em", "span"],
-            "attributes": {
-                "a": ["href", "target", "rel"],
-                "span": ["class", "contenteditable"],
-                "li": ["data-list"]
-            },
-            "empty": ["br", "p"],
-            "separate": ["li", "p", "br"],
-        })
-
         content = self.cleaned_data.get("content", "")
-        return sanitizer.sanitize(content)
+        return sanitize_content(content)
 
     def save(self, author: Optional[EmailUser] = None):
         """
-        On save of the form either updates or creates new blog.
+        On save of the form either updates or creates new blog. An image
+        uploaded to Cloudinary is set by a background job, added in the
+        transaction of the blog, and the blog keeps its current image until then.
+        An image the browser uploaded straight to the storage is set right away.
         """
-        if self.instance.pk:
-            return BlogPost.objects.update_blog_post(
-                blog_post=self.instance,
-                title=self.cleaned_data["title"],
-                content=self.clean_content(),
-                image=self.cleaned_data.get("image"),
-                tags=self.cleaned_data["tags"]
-            )
-
-        return BlogPost.objects.create_blog_post(
-            title=self.cleaned_data["title"],
-            content=self.clean_content(),
-            image=self.cleaned_data.get("image"),
-            author=author,
-            tags=self.cleaned_data["tags"]
-        )
\ No newline at end of file
+        image = self.cleaned_data.get("image_key") or self.cleaned_data.get("image")
+        staged = stage_image(image)
+        if staged:
+            image = self.initial.get("image")
+
+        with transaction.atomic():
+            if self.instance.pk:
+                blog_post = BlogPost.objects.update_blog_post(
+                    blog_post=self.instance,
+                    title=self.cleaned_data["title"],
+                    content=self.clean_content(),
+                    image=image,
+                    tags=self.cleaned_data["tags"]
+                )
+            else:
+                blog_post = BlogPost.objects.create_blog_post(
+                    title=self.cleaned_data["title"],
+                    content=self.clean_content(),
+                    image=image,
+                    author=author,
+                    tags=self.cleaned_data["tags"]
+                )
+
+            if staged:
+                enqueue(UPLOAD_IMAGE, {"blog_id": blog_post.pk, "path": staged})
+
+        return blog_post
\ No newline at end of file
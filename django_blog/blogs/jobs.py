@@ -0,0 +1,273 @@
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+import cloudinary.uploader
+from blogs.models import BlogPost, Job
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from monitoring.metrics import JOB_DURATION, JOB_QUEUE_DELAY, JOBS, JOBS_IN_PROGRESS, observe_upload
+
+logger = logging.getLogger(__name__)
+
+class JobHandler(NamedTuple):
+    func: Callable[[dict], None]
+    max_attempts: Optional[int]
+
+# The handlers of the jobs by name, registered by the `job` decorator
+handlers: Dict[str, JobHandler] = {}
+
+def job(name: str, max_attempts: Optional[int] = None):
+    """
+    Decorator registering a function as the handler of the named job. It is
+    called with the payload of the job in autocommit mode, so what it writes
+    is committed as it goes, and the job is removed once it returns. A job
+    may run again after a crash, so a handler must cope with finding its
+    work done.
+
+    Args:
+        name (str): The name jobs are enqueued with.
+        max_attempts (int, optional): Runs before the job fails, `JOB_MAX_ATTEMPTS` by default.
+    """
+    def decorator(func: Callable[[dict], None]):
+        handlers[name] = JobHandler(func, max_attempts)
+        return func
+
+    return decorator
+
+def enqueue(name: str, payload: dict, delay: float = 0) -> Job:
+    """
+    Adds a background job, run by `manage.py run_jobs` once it is committed.
+    Called in the transaction of a write, the job commits or rolls back with it.
+
+    Raises:
+        LookupError: If no handler is registered for the job.
+    """
+    if name not in handlers:
+        raise LookupError(f"No handler for job {name!r}")
+
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=handlers[name].max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+def retry_delay(attempts: int) -> float:
+    """
+    Seconds until a job that failed its `attempts`th run is run again.
+    """
+    return settings.JOB_RETRY_SECONDS * 2 ** (attempts - 1)
+
+def claim_jobs(limit: int, job_ids: Optional[Iterable[int]] = None) -> List[Job]:
+    """
+    Marks up to `limit` due jobs as running and leases them to the caller
+    for `JOB_LEASE_SECONDS`. The rows are selected with SKIP LOCKED, so
+    runners polling at once claim different jobs instead of waiting on
+    each other.
+
+    Args:
+        limit (int): The maximum number of jobs to claim.
+        job_ids (Iterable[int], optional): Claims only these jobs.
+
+    Returns:
+        list: The claimed jobs, oldest due first.
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    due = Job.objects.claimable(now)
+    if job_ids is not None:
+        due = due.filter(id__in=list(job_ids))
+
+    with transaction.atomic():
+        ids = list(due.select_for_update(skip_locked=True).order_by("run_after", "id").values_list("id", flat=True)[:limit])
+        if not ids:
+            return []
+
+        # Checks the jobs are still claimable, so of runners racing for a job only one gets it
+        Job.objects.claimable(now).filter(id__in=ids).update(
+            status=Job.RUNNING, attempts=F("attempts") + 1, locked_until=locked_until
+        )
+
+        return list(Job.objects.filter(id__in=ids, status=Job.RUNNING, locked_until=locked_until).order_by("run_after", "id"))
+
+class JobRunner:
+    """
+    Runs the background jobs in a pool of `concurrency` threads. It claims
+    as many due jobs as it has idle threads, and polls every `poll_interval`
+    seconds when none are due. Several runners share the table, each job is
+    claimed by one of them.
+    """
+    def __init__(self, concurrency: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.concurrency = concurrency or settings.JOB_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_POLL_SECONDS
+        self.stopped = threading.Event()
+        self._limits = {
+            name: threading.BoundedSemaphore(limit) for name, limit in settings.JOB_CONCURRENCY_LIMITS.items()
+        }
+
+    def run_forever(self):
+        """
+        Runs the jobs until `stopped` is set, then waits for the running ones.
+        """
+        running = set()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="job") as pool:
+            while not self.stopped.is_set():
+                running = {future for future in running if not future.done()}
+                idle = self.concurrency - len(running)
+                try:
+                    jobs = claim_jobs(idle) if idle else []
+                except Exception:
+                    logger.exception("Claiming jobs failed, retrying in %s s", self.poll_interval)
+                    jobs = []
+                running.update(pool.submit(self._run_in_thread, job) for job in jobs)
+
+                if not idle:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                elif len(jobs) < idle:
+                    self.stopped.wait(self.poll_interval)
+
+    def run_pending(self) -> int:
+        """
+        Runs the due jobs one by one until there are none left.
+
+        Returns:
+            int: The number of job runs.
+        """
+        ran = 0
+        while jobs := claim_jobs(self.concurrency):
+            for claimed in jobs:
+                self.run(claimed)
+            ran += len(jobs)
+
+        return ran
+
+    def run(self, job: Job) -> str:
+        """
+        Runs a claimed job. A job that failed is queued again after
+        `retry_delay`, or marked as failed after its last attempt.
+
+        Returns:
+            str: The outcome of the run, `succeeded`, `retried` or `failed`.
+        """
+        handler = handlers.get(job.name)
+
+        with self._limits.get(job.name) or nullcontext():
+            JOB_QUEUE_DELAY.labels(job.name).observe(max((timezone.now() - job.run_after).total_seconds(), 0))
+            JOBS_IN_PROGRESS.labels(job.name).inc()
+            start = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job {job.name!r}")
+
+                lease = settings.JOB_LEASES.get(job.name)
+                if lease:
+                    # Claimed with the default lease, which a long job would outlast
+                    Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() + timedelta(seconds=lease))
+
+                handler.func(job.payload)
+                Job.objects.filter(pk=job.pk).delete()
+                status = "succeeded"
+            except Exception as error:
+                status = self._fail(job, error, retry=handler is not None)
+            finally:
+                JOBS_IN_PROGRESS.labels(job.name).dec()
+
+        JOB_DURATION.labels(job.name).observe(time.perf_counter() - start)
+        JOBS.labels(job.name, status).inc()
+        return status
+
+    def _run_in_thread(self, job: Job):
+        try:
+            self.run(job)
+        finally:
+            # The connection of a pool thread would stay open until the thread ends
+            close_old_connections()
+
+    def _fail(self, job: Job, error: Exception, retry: bool) -> str:
+        values = {"status": Job.FAILED, "locked_until": None, "last_error": "".join(traceback.format_exception(error))}
+        if retry and job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            values.update(status=Job.QUEUED, run_after=timezone.now() + timedelta(seconds=delay))
+            logger.warning("Job %s %d failed on attempt %d of %d, retrying in %s s", job.name, job.pk, job.attempts, job.max_attempts, delay, exc_info=error)
+        else:
+            logger.error("Job %s %d failed on attempt %d of %d", job.name, job.pk, job.attempts, job.max_attempts, exc_info=error)
+
+        Job.objects.filter(pk=job.pk).update(**values)
+
+        return "retried" if values["status"] == Job.QUEUED else "failed"
+
+UPLOAD_IMAGE = "upload_image"
+IMPORT_BLOGS = "import_blogs"
+
+def stage_image(image_file) -> Optional[str]:
+    """
+    Writes an image to be uploaded to Cloudinary to the staging folder, for
+    the `upload_image` job, so the request doesn't wait for the upload.
+    Stored locally, images are saved to their place with the post.
+
+    Returns:
+        str or None: The path of the staged file, or None if no image was uploaded or images are stored locally.
+    """
+    if not settings.USE_CLOUDINARY or not isinstance(image_file, UploadedFile):
+        return None
+
+    os.makedirs(settings.UPLOAD_STAGING_FOLDER, exist_ok=True)
+    file_path = os.path.join(settings.UPLOAD_STAGING_FOLDER, f"{uuid.uuid4()}{os.path.splitext(image_file.name)[1]}")
+    with open(file_path, "wb") as staged:
+        for chunk in image_file.chunks():
+            staged.write(chunk)
+
+    return file_path
+
+@job(UPLOAD_IMAGE)
+def upload_image(payload: dict):
+    """
+    Uploads an image staged by `stage_image` to Cloudinary and sets it as
+    the image of its post. The staged file is removed once the post is
+    saved, a run that finds no file has nothing left to do.
+    """
+    path = Path(payload["path"])
+    if not path.exists():
+        return
+
+    blog = BlogPost.objects.filter(pk=payload["blog_id"]).first()
+    if blog is not None:
+        with observe_upload("cloudinary", path.stat().st_size):
+            blog.image = cloudinary.uploader.upload_resource(str(path))
+        blog.save(update_fields=["image"])
+
+    path.unlink()
+
+@job(IMPORT_BLOGS)
+def import_blogs(payload: dict):
+    """
+    Imports a file of blog posts uploaded in the admin, its progress is kept
+    in its `BlogImport` row. A run after a failure resumes the import after
+    its last committed batch. The file is removed once it is imported.
+    """
+    # Imported here, the import sanitizes with the blog forms, which enqueue the jobs of this module
+    from blogs.blog_import import import_blog_posts
+
+    path = Path(payload["path"])
+    if not path.exists():
+        return
+
+    import_blog_posts(
+        path,
+        file_name=payload["file_name"],
+        batch_size=settings.IMPORT_BATCH_SIZE,
+        workers=settings.IMPORT_WORKERS,
+        report=logger.info,
+    )
+    path.unlink()
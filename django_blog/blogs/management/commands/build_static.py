@@ -0,0 +1,26 @@
+import os
+from blogs.static_site import build_site
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = 'Renders the public pages to static HTML files, only the changed ones after the first build'
+
+    def add_arguments(self, parser):
+        parser.add_argument("output_dir", help="Directory of the site, served by nginx")
+        parser.add_argument("--base-url", default="http://localhost", help="URL the site is served at, its host must be allowed")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes rendering the pages")
+        parser.add_argument("--full", action="store_true", help="Render every page instead of only the changed ones")
+        parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE, help="Posts read per query")
+
+    def handle(self, *args, **options):
+        result = build_site(
+            options["output_dir"],
+            options["base_url"],
+            settings.STATICFILES_DIRS[0],
+            workers=options["workers"],
+            full=options["full"],
+            chunk_size=options["chunk_size"],
+        )
+
+        self.stdout.write(f"Rendered {result['rendered']} of {result['pages']} pages and removed {result['removed']}.")
@@ -0,0 +1,21 @@
+from contextlib import nullcontext
+from blogs.blog_export import EXPORT_FORMATS, stream_export
+from blogs.blog_import import detect_format
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = 'Exports all blog posts as NDJSON or CSV to a file, or to stdout with -'
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="File to write, - for stdout")
+        parser.add_argument("--format", choices=EXPORT_FORMATS, help="File format, detected from the extension by default")
+        parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE, help="Posts read per query")
+
+    def handle(self, *args, **options):
+        file = options["file"]
+        format = options["format"] or detect_format(file)
+
+        with nullcontext(self.stdout) if file == "-" else open(file, "w", newline="", encoding="utf-8") as output:
+            for piece in stream_export(format, options["chunk_size"]):
+                output.write(piece)
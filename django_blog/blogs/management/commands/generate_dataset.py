@@ -0,0 +1,80 @@
+import time
+from accounts.models import EmailUser
+from blogs.bulk import bulk_insert, reset_sequences
+from blogs.dataset import DatasetGenerator
+from blogs.models import BlogPost, Tag
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+class Command(BaseCommand):
+    help = 'Generates a high-volume synthetic dataset for load and scaling tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000, help="Number of users to create")
+        parser.add_argument("--tags", type=int, default=200, help="Total number of tags, existing tags included")
+        parser.add_argument("--posts", type=int, default=1_000_000, help="Number of blog posts to create")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows written per round trip")
+        parser.add_argument("--seed", type=int, default=42, help="Seed making the dataset reproducible")
+        parser.add_argument("--no-copy", action="store_true", help="Use multi-row INSERTs instead of COPY on PostgreSQL")
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(seed=options["seed"])
+        batch_size = options["batch_size"]
+        use_copy = not options["no_copy"]
+        started = time.perf_counter()
+        created = {"users": 0, "tags": 0, "posts": 0, "links": 0}
+
+        next_user_id = (EmailUser.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        next_tag_id = (Tag.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        next_post_id = (BlogPost.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+
+        # Hashing is deliberately slow, so every generated user shares one hash
+        user_rows = [
+            {
+                "id": row["id"],
+                "email": row["email"],
+                "username": row["username"],
+                "password": row["password_hash"],
+                "is_active": row["is_active"],
+                "is_staff": row["is_staff"],
+                "is_superuser": False,
+                "created_at": row["created_at"],
+            }
+            for row in generator.users(options["users"], next_user_id, make_password("Password123"))
+        ]
+        existing_tags = list(Tag.objects.values_list("id", "name"))
+        tag_rows = generator.tags(max(0, options["tags"] - len(existing_tags)), next_tag_id, [name for _, name in existing_tags])
+
+        with transaction.atomic():
+            for start in range(0, len(user_rows), batch_size):
+                created["users"] += bulk_insert(EmailUser, user_rows[start:start + batch_size], batch_size, use_copy)
+            created["tags"] = bulk_insert(Tag, tag_rows, batch_size, use_copy)
+
+        author_ids = [row["id"] for row in user_rows] or list(EmailUser.objects.values_list("id", flat=True))
+        tag_ids = [tag_id for tag_id, _ in existing_tags] + [row["id"] for row in tag_rows]
+
+        if not author_ids or not tag_ids:
+            self.stdout.write(self.style.ERROR("You need users and tags first."))
+            return
+
+        BlogPostTag = BlogPost.tags.through
+        for post_rows, links in generator.posts(options["posts"], next_post_id, author_ids, tag_ids, batch_size):
+            with transaction.atomic():
+                created["posts"] += bulk_insert(BlogPost, post_rows, batch_size, use_copy)
+                created["links"] += bulk_insert(
+                    BlogPostTag,
+                    [{"blogpost_id": post_id, "tag_id": tag_id} for post_id, tag_id in links],
+                    batch_size,
+                    use_copy
+                )
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Created {created['posts']}/{options['posts']} blog posts ({created['posts'] / elapsed:.0f} posts/s).")
+
+        reset_sequences(EmailUser, Tag, BlogPost, BlogPostTag)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['users']} users, {created['tags']} tags, {created['posts']} blog posts and {created['links']} tag links."
+        ))
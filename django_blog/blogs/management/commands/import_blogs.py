@@ -0,0 +1,29 @@
+from blogs.blog_import import IMPORT_FORMATS, import_blog_posts
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = 'Imports blog posts from an NDJSON or CSV file, resuming an interrupted import of the same file'
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="File with one blog post per line or CSV row")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="File format, detected from the extension by default")
+        parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE, help="Records written per batch and commit")
+        parser.add_argument("--workers", type=int, default=settings.IMPORT_WORKERS, help="Processes sanitizing the content, defaults to the CPU count")
+        parser.add_argument("--no-copy", action="store_true", help="Use multi-row INSERTs instead of COPY on PostgreSQL")
+
+    def handle(self, *args, **options):
+        result = import_blog_posts(
+            options["file"],
+            format=options["format"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            use_copy=not options["no_copy"],
+            report=self.stdout.write,
+        )
+
+        for error in result["errors"]:
+            self.stdout.write(self.style.WARNING(error))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} blog posts and skipped {result['skipped']} of {result['records']} records."
+        ))
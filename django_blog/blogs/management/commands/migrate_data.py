@@ -0,0 +1,37 @@
+import os
+from blogs.data_migration import APPS, migrate_data
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = "Copies the users, tags and blog posts of another app's database into this app's database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("source_app", choices=APPS, help="The app the source database belongs to")
+        parser.add_argument("source_url", help="Database URL of the source, postgresql://... or sqlite:///...")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows read and written per batch and commit")
+        parser.add_argument("--no-copy", action="store_true", help="Use multi-row INSERTs instead of COPY on PostgreSQL")
+        parser.add_argument("--media-url", default="/media/", help="URL prefix of the locally stored images of the other apps")
+        parser.add_argument("--cloud-name", default=os.getenv("CLOUDINARY_CLOUD_NAME"), help="Cloudinary cloud name of the other apps' images")
+        parser.add_argument("--verify-only", action="store_true", help="Only compare the row counts and checksums of the databases")
+
+    def handle(self, *args, **options):
+        result = migrate_data(
+            options["source_url"],
+            options["source_app"],
+            batch_size=options["batch_size"],
+            use_copy=not options["no_copy"],
+            media_url=options["media_url"],
+            cloud_name=options["cloud_name"],
+            verify_only=options["verify_only"],
+            report=self.stdout.write,
+        )
+
+        for kind, verification in result["verification"].items():
+            style = self.style.SUCCESS if verification["match"] else self.style.ERROR
+            status = "OK" if verification["match"] else "MISMATCH"
+            self.stdout.write(style(
+                f"{kind}: {verification['source']} in the source, {verification['target']} in the target, {status}"
+            ))
+
+        if not all(verification["match"] for verification in result["verification"].values()):
+            raise CommandError("The target database doesn't match the source.")
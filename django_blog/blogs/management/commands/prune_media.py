@@ -0,0 +1,12 @@
+from blogs.media import prune_media
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = 'Removes the locally stored images no blog post uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace", type=float, default=settings.MEDIA_PRUNE_SECONDS, help="Seconds an unused image is kept")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Removed {prune_media(options['grace'])} unused images.")
@@ -0,0 +1,23 @@
+import signal
+from blogs.jobs import JobRunner
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = 'Runs the background jobs until stopped, finishing the running ones on SIGTERM'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.JOB_CONCURRENCY, help="Jobs run at once")
+        parser.add_argument("--once", action="store_true", help="Run the due jobs and exit")
+
+    def handle(self, *args, **options):
+        runner = JobRunner(concurrency=options["concurrency"])
+        if options["once"]:
+            self.stdout.write(f"Ran {runner.run_pending()} jobs.")
+            return
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: runner.stopped.set())
+
+        self.stdout.write(f"Running jobs in {runner.concurrency} threads.")
+        runner.run_forever()
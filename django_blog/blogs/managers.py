@@ -1,6 +1,8 @@
+from datetime import datetime
 from typing import List, Optional
 from accounts.models import EmailUser
 from django.db import models
+from django.db.models import Q
 
 class BlogPostQuerySet(models.QuerySet):
     def recent(self, limit: Optional[int] = 3):
@@ -9,6 +11,12 @@ class BlogPostQuerySet(models.QuerySet):
         """
         return self.order_by("-created_at")[:limit]
 
+    def popular(self, limit: Optional[int] = 12):
+        """
+        Get most viewed blogs.
+        """
+        return self.filter(views__gt=0).order_by("-views", "-id")[:limit]
+
     def related_to(self, blog, limit: Optional[int] = 3):
         """
         Get random blogs related by tags.
@@ -30,6 +38,14 @@ class BlogPostQuerySet(models.QuerySet):
 
         return self
 
+    def older_than(self, created_at: datetime, blog_id: int):
+        """
+        Get blogs after the given one in the order of the blog lists, by its
+        position instead of an offset, so no rows are counted or skipped.
+        """
+        # The first condition alone bounds the scan of the (created_at, id) index
+        return self.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(id__lt=blog_id))
+
     def with_tags(self, tag_slugs: List[str]):
         """
         Filter blogs by tag slugs.
@@ -57,4 +73,11 @@ class BlogPostManager(models.Manager):
         blog_post.image = image
         blog_post.save()
         blog_post.tags.set(tags)
-        return blog_post
\ No newline at end of file
+        return blog_post
+
+class JobQuerySet(models.QuerySet):
+    def claimable(self, now: datetime):
+        """
+        Get queued jobs that are due, and running jobs whose runner didn't finish them in time.
+        """
+        return self.filter(Q(status="queued", run_after__lte=now) | Q(status="running", locked_until__lt=now))
@@ -0,0 +1,142 @@
+import os
+import re
+import time
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+from blogs.models import BlogPost, MediaFile
+from blogs.storage import TEMP_PREFIX
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+# The name of an image stored by `ContentAddressedStorage`, the SHA-256 of its content and its extension
+MEDIA_KEY_PATTERN = re.compile(r"^images/[0-9a-f]{64}(?:\.[a-z0-9]+)?$")
+
+def media_key(image) -> Optional[str]:
+    """
+    Returns the key of a content-addressed image from the value of the image
+    field, or None for no image, Cloudinary images and local ones stored
+    under other names.
+    """
+    name = getattr(image, "name", image)
+    return name if isinstance(name, str) and MEDIA_KEY_PATTERN.match(name) else None
+
+def count_media_references(deltas: Counter):
+    """
+    Adds the changes of the reference counts of images, creating the counts
+    of images not counted yet.
+
+    Args:
+        deltas (Counter): The change of the count by image key.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Sorted, so transactions counting the same images lock their rows in the same order
+        for key, delta in sorted((key, delta) for key, delta in deltas.items() if key is not None and delta):
+            MediaFile.objects.get_or_create(key=key, defaults={"updated_at": now})
+            MediaFile.objects.filter(key=key).update(ref_count=F("ref_count") + delta, updated_at=now)
+
+def stored_image(instance: BlogPost) -> Optional[str]:
+    """
+    Returns the key of the image the blog post has in the database, as it
+    was loaded, or read again when the field was deferred.
+    """
+    if "_stored_image" in instance.__dict__:
+        return instance._stored_image
+
+    return media_key(BlogPost.objects.filter(pk=instance.pk).values_list("image", flat=True).first())
+
+@receiver(post_init, sender=BlogPost)
+def remember_stored_image(sender, instance, **kwargs):
+    if "image" in instance.__dict__:
+        instance._stored_image = media_key(instance.__dict__["image"])
+
+@receiver(pre_save, sender=BlogPost)
+def read_replaced_image(sender, instance, update_fields=None, **kwargs):
+    """
+    The image field stores a new image while the post is saved, so the one
+    it replaces is read before, and the counts are changed after the save.
+    """
+    if not instance._state.adding and (update_fields is None or "image" in update_fields):
+        instance._replaced_image = stored_image(instance)
+
+@receiver(post_save, sender=BlogPost)
+def count_saved_image(sender, instance, created, **kwargs):
+    if not created and "_replaced_image" not in instance.__dict__:
+        return
+
+    image = media_key(instance.image)
+    replaced = instance.__dict__.pop("_replaced_image", None)
+    if image != replaced:
+        count_media_references(Counter({image: 1, replaced: -1}))
+
+    instance._stored_image = image
+
+@receiver(pre_delete, sender=BlogPost)
+def count_deleted_image(sender, instance, **kwargs):
+    count_media_references(Counter({stored_image(instance): -1}))
+
+def prune_media(grace: Optional[float] = None, batch_size: int = 1000) -> int:
+    """
+    Removes the stored images no post uses, once they are older than the
+    grace period, so an image being attached to a post isn't taken from it.
+    An image is kept while its reference count is positive, or when a post
+    written around the counts, e.g. by a bulk import, still links it. Also
+    removes the temporary files of uploads that never finished, and the
+    direct uploads never attached to a post.
+
+    Args:
+        grace (float, optional): Seconds an unused image is kept, `MEDIA_PRUNE_SECONDS` by default.
+        batch_size (int, optional): Images checked per query.
+
+    Returns:
+        int: The number of removed images.
+    """
+    grace = settings.MEDIA_PRUNE_SECONDS if grace is None else grace
+    cutoff = time.time() - grace
+    root = Path(settings.MEDIA_ROOT)
+    folder = root / "images"
+
+    unused = []
+    for entry in os.scandir(folder) if folder.is_dir() else []:
+        if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+            continue
+        if entry.name.startswith(TEMP_PREFIX):
+            os.unlink(entry.path)
+        elif MEDIA_KEY_PATTERN.match(f"images/{entry.name}"):
+            unused.append(f"images/{entry.name}")
+
+    # Attached direct uploads are moved to their content addressed key, older posts may still link one by its upload key
+    uploads = root / "uploads"
+    if uploads.is_dir():
+        unused.extend(
+            f"uploads/{entry.name}" for entry in os.scandir(uploads) if entry.is_file() and entry.stat().st_mtime < cutoff
+        )
+
+    counted_before = timezone.now() - timedelta(seconds=grace)
+    pruned = []
+    for start in range(0, len(unused), batch_size):
+        keys = unused[start:start + batch_size]
+        used = set(MediaFile.objects.filter(
+            Q(ref_count__gt=0) | Q(updated_at__gte=counted_before), key__in=keys
+        ).values_list("key", flat=True))
+        used.update(BlogPost.objects.filter(image__in=keys).values_list("image", flat=True))
+        pruned.extend(key for key in keys if key not in used)
+
+    # The counts of the pruned images are among these
+    MediaFile.objects.filter(ref_count__lte=0, updated_at__lt=counted_before).delete()
+
+    removed = 0
+    for key in pruned:
+        path = root / key
+        # An image stored again since it was checked is about to be used
+        if path.exists() and path.stat().st_mtime < cutoff:
+            path.unlink()
+            removed += 1
+
+    return removed
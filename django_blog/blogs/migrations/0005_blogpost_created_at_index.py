@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0004_blogimport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='blogpost',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['created_at', 'id'], name='blogs_blogpost_created_id'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0005_blogpost_created_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='views',
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['views', 'id'], name='blogs_blogpost_views_id'),
+        ),
+    ]
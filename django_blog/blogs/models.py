@@ -1,5 +1,6 @@
 from accounts.models import EmailUser
-from blogs.managers import BlogPostManager, BlogPostQuerySet
+from blogs.managers import BlogPostManager, BlogPostQuerySet, JobQuerySet
+from blogs.storage import ContentAddressedStorage
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -28,15 +29,93 @@ class BlogPost(models.Model):
     if settings.USE_CLOUDINARY:
         image = CloudinaryField("image", null=True, blank=True)
     else:
-        image = models.ImageField(upload_to="images/", null=True, blank=True)
+        # Named by the hash of their content, see `blogs/media.py`
+        image = models.ImageField(upload_to="images/", storage=ContentAddressedStorage(), null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     tags = models.ManyToManyField(Tag, related_name="blog_posts")
     author = models.ForeignKey(EmailUser, on_delete=models.CASCADE)
+    # Only ever increased by the flushes of `blogs/view_counts.py`
+    views = models.PositiveIntegerField(default=0, db_default=0)
 
     objects = BlogPostManager.from_queryset(BlogPostQuerySet)()
 
     class Meta:
-        ordering = ["-created_at"]
+        # The id breaks ties of the creation date, so pages and feed batches have one order
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="blogs_blogpost_created_id"),
+            # Order of the popular blogs, read from the end of the index
+            models.Index(fields=["views", "id"], name="blogs_blogpost_views_id"),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the blog post, an existing one without its views, so an edit
+        doesn't write back the count it read over the views flushed since.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != "views"
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+class BlogImport(models.Model):
+    """
+    Progress of a bulk import of blog posts. It is updated in the transaction
+    of every imported batch, so an interrupted import resumes after the last
+    committed batch.
+    """
+    checksum = models.CharField(max_length=64, unique=True)
+    file_name = models.CharField(max_length=255)
+    records = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.file_name
+
+class Job(models.Model):
+    """
+    Work run after a write by the job runner, see `blogs/jobs.py`. A job is
+    deleted once it succeeds, one that ran out of attempts stays `failed`
+    with its last error. A `running` job is leased until `locked_until`,
+    after which another runner takes it over.
+    """
+    QUEUED, RUNNING, FAILED = "queued", "running", "failed"
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The due jobs, in the order they are claimed
+            models.Index(fields=["status", "run_after"], name="blogs_job_status_run_after"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.pk}"
+
+class MediaFile(models.Model):
+    """
+    Reference count of a locally stored image, named by the hash of its
+    content, see `blogs/media.py`. The count is kept by the signals of the
+    blog posts, an image whose count dropped to zero is removed by
+    `manage.py prune_media` once it has been unused for a while.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    ref_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
@@ -0,0 +1,169 @@
+import hashlib
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+from blogs.models import BlogPost, Tag
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+ET.register_namespace("atom", ATOM_NAMESPACE)
+
+# Cache scope of the feed of all posts, the feed of a tag is cached under `tag_scope`
+ALL_SCOPE = "all"
+
+def tag_scope(slug: str) -> str:
+    return f"tag:{slug}"
+
+class FeedItem(NamedTuple):
+    title: str
+    link: str
+    summary: str
+    published: datetime
+    categories: List[str]
+
+class CachedFeed(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime
+    built_at: float
+
+def render_rss(title: str, link: str, self_link: str, description: str, items: Iterable[FeedItem]) -> bytes:
+    """
+    Serializes an RSS 2.0 feed. It holds nothing depending on when it is
+    built, so a feed built again without changes has the same bytes.
+    """
+    rss = ET.Element("rss", version="2.0")
+    channel = ET.SubElement(rss, "channel")
+    ET.SubElement(channel, "title").text = title
+    ET.SubElement(channel, "link").text = link
+    ET.SubElement(channel, "description").text = description
+    ET.SubElement(channel, f"{{{ATOM_NAMESPACE}}}link", href=self_link, rel="self", type="application/rss+xml")
+
+    for item in items:
+        element = ET.SubElement(channel, "item")
+        ET.SubElement(element, "title").text = item.title
+        ET.SubElement(element, "link").text = item.link
+        ET.SubElement(element, "guid", isPermaLink="true").text = item.link
+        ET.SubElement(element, "description").text = item.summary
+        published = item.published if item.published.tzinfo else item.published.replace(tzinfo=timezone.utc)
+        ET.SubElement(element, "pubDate").text = format_datetime(published)
+        for category in item.categories:
+            ET.SubElement(element, "category").text = category
+
+    return ET.tostring(rss, encoding="utf-8", xml_declaration=True)
+
+class FeedCache:
+    """
+    Serialized feeds of this process by scope. A feed is built again after a
+    post in its scope changed, and at the latest `max_age` seconds after it
+    was built, which picks up the writes of other processes. The ETag is a
+    hash of the bytes, so a feed built again without changes keeps its ETag
+    and Last-Modified and the readers polling it keep getting 304s.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.feeds: Dict[str, CachedFeed] = {}
+        self.stale: Set[str] = set()
+        # Counts the invalidations, a feed read before one of them stays stale
+        self.version = 0
+
+    def get(self, scope: str, max_age: float) -> Optional[CachedFeed]:
+        """
+        Returns the feed of a scope, or None when it has to be built.
+        """
+        with self.lock:
+            feed = self.feeds.get(scope)
+            if feed is None or scope in self.stale or time.monotonic() - feed.built_at >= max_age:
+                return None
+
+            return feed
+
+    def put(self, scope: str, body: bytes, version: int) -> CachedFeed:
+        """
+        Stores the feed of a scope built from the posts read at `version`.
+        """
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        with self.lock:
+            previous = self.feeds.get(scope)
+            if previous is not None and previous.etag == etag:
+                last_modified = previous.last_modified
+            else:
+                last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+            feed = self.feeds[scope] = CachedFeed(body, etag, last_modified, time.monotonic())
+            if version == self.version:
+                self.stale.discard(scope)
+
+            return feed
+
+    def invalidate(self, scopes: Optional[Iterable[str]] = None):
+        """
+        Marks the feeds of the scopes to be built again, all of them without scopes.
+        """
+        with self.lock:
+            self.version += 1
+            self.stale.update(self.feeds if scopes is None else scopes)
+
+def feed_response(request, feed: CachedFeed, content_type: str = "application/rss+xml") -> HttpResponse:
+    """
+    Responds with the feed, or with 304 when the reader's copy is current.
+    """
+    response = HttpResponse(feed.body, content_type=f"{content_type}; charset=utf-8")
+    response["ETag"] = f'"{feed.etag}"'
+    response["Last-Modified"] = http_date(feed.last_modified.timestamp())
+    patch_cache_control(response, public=True, no_cache=True)
+
+    return get_conditional_response(
+        request, etag=response["ETag"], last_modified=int(feed.last_modified.timestamp()), response=response
+    )
+
+# The feeds of this process, invalidated by the writes committed in it
+feed_cache = FeedCache()
+
+def _invalidate_on_commit(scopes: Optional[Set[str]]):
+    transaction.on_commit(lambda: feed_cache.invalidate(scopes))
+
+def _scopes(slugs: Iterable[str]) -> Set[str]:
+    return {ALL_SCOPE, *(tag_scope(slug) for slug in slugs)}
+
+@receiver(post_save, sender=BlogPost)
+def _post_saved(sender, instance, created, **kwargs):
+    # The tags of a new post are added after it is saved, which invalidates their feeds
+    slugs = [] if created else instance.tags.values_list("slug", flat=True)
+    _invalidate_on_commit(_scopes(slugs))
+
+@receiver(pre_delete, sender=BlogPost)
+def _post_deleted(sender, instance, **kwargs):
+    # The tags are read before the delete removes them from the post
+    _invalidate_on_commit(_scopes(instance.tags.values_list("slug", flat=True)))
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def _post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if reverse:
+        # The posts of a tag changed, it is the only tag feed they changed in
+        slugs = [instance.slug]
+    elif action == "pre_clear":
+        slugs = instance.tags.values_list("slug", flat=True)
+    else:
+        slugs = Tag.objects.filter(pk__in=pk_set).values_list("slug", flat=True)
+    _invalidate_on_commit(_scopes(slugs))
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def _tag_changed(sender, instance, **kwargs):
+    # A renamed or deleted tag shows in the categories of every feed
+    _invalidate_on_commit(None)
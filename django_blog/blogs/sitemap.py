@@ -0,0 +1,96 @@
+from typing import Iterable, Iterator
+from xml.sax.saxutils import escape
+from blogs.models import BlogPost
+from blogs.rss import FeedCache
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+SITEMAP_MEDIA_TYPE = "application/xml"
+
+# Cache scope of the sitemap index, a sitemap is cached under `sitemap_scope`
+INDEX_SCOPE = "index"
+
+def sitemap_scope(number: int) -> str:
+    return f"sitemap:{number}"
+
+def sitemap_number(blog_id: int, size: int) -> int:
+    """
+    The number of the sitemap listing a post. Sitemap `n` lists the ids
+    from `n * size + 1` to `(n + 1) * size`, so a write changes one sitemap.
+    """
+    return (blog_id - 1) // size
+
+def sitemap_count(size: int) -> int:
+    """
+    The number of sitemaps up to the highest post id, read from the primary key index.
+    """
+    max_id = BlogPost.objects.aggregate(Max("id"))["id__max"]
+
+    return sitemap_number(max_id, size) + 1 if max_id else 0
+
+def render_sitemap_index(locations: Iterable[str]) -> bytes:
+    entries = "".join(f"<sitemap><loc>{escape(location)}</loc></sitemap>" for location in locations)
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NAMESPACE}">{entries}</sitemapindex>'
+    ).encode()
+
+def stream_sitemap(number: int, detail_url: str, size: int, batch_size: int = 5000) -> Iterator[bytes]:
+    """
+    Yields the sitemap of the posts in the id range of `number`, one piece per
+    batch. Each batch is a short keyset query on the primary key outside of a
+    transaction, so only that range is scanned and a slow crawler doesn't keep
+    a cursor or transaction open between the batches.
+
+    Args:
+        number (int): The number of the sitemap.
+        detail_url (str): The URL of the detail page, the id is appended to it.
+        size (int): Number of ids in the range of a sitemap.
+        batch_size (int, optional): Number of posts read per batch.
+    """
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NAMESPACE}">'.encode()
+
+    last_id, end_id = number * size, (number + 1) * size
+    while True:
+        posts = list(
+            BlogPost.objects.filter(id__gt=last_id, id__lte=end_id)
+            .order_by("id")
+            .values_list("id", "created_at")[:batch_size]
+        )
+        if not posts:
+            break
+
+        yield "".join(
+            f"<url><loc>{escape(detail_url)}{blog_id}</loc><lastmod>{created_at.date().isoformat()}</lastmod></url>"
+            for blog_id, created_at in posts
+        ).encode()
+        last_id = posts[-1][0]
+
+    yield b"</urlset>"
+
+def cache_stream(cache: FeedCache, scope: str, version: int, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Yields the chunks and caches their bytes once all were sent, a response
+    cut off before the end is not cached.
+    """
+    body = bytearray()
+    for chunk in chunks:
+        body += chunk
+        yield chunk
+
+    cache.put(scope, bytes(body), version)
+
+# The sitemaps of this process, invalidated by the writes committed in it
+sitemap_cache = FeedCache()
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def _post_changed(sender, instance, signal, created=False, **kwargs):
+    scopes = {sitemap_scope(sitemap_number(instance.pk, settings.SITEMAP_SIZE))}
+    # Creates and deletes may change the number of sitemaps
+    if created or signal is post_delete:
+        scopes.add(INDEX_SCOPE)
+    transaction.on_commit(lambda: sitemap_cache.invalidate(scopes))
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+# Prefix of the files an image is written to before it is named by its hash
+TEMP_PREFIX = ".upload-"
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores the images of the posts under the SHA-256 of their content,
+    hashed while they are written, so they are read once. An image stored
+    before is kept instead of a second copy, and posts using the same image
+    share the file.
+    """
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        folder = self.path(directory)
+        os.makedirs(folder, exist_ok=True)
+
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=folder, prefix=TEMP_PREFIX, delete=False) as temp:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            except BaseException:
+                os.unlink(temp.name)
+                raise
+
+        name = os.path.join(directory, digest.hexdigest() + os.path.splitext(name)[1].lower())
+        path = self.path(name)
+
+        if os.path.exists(path):
+            os.unlink(temp.name)
+            # Touched, so a pending prune doesn't take an image that is being used again
+            os.utime(path)
+        else:
+            os.replace(temp.name, path)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+
+        return name.replace("\\", "/")
+
+    def get_available_name(self, name, max_length=None):
+        # The name is replaced by the hash of the content, an existing file with it is the same image
+        return name
@@ -1,7 +1,40 @@
+import bcrypt
+import hashlib
+import cloudinary.utils
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from PIL import Image
 from accounts.models import EmailUser
-from blogs.models import BlogPost, Tag
-from django.test import TestCase
+from blogs import blog_import, data_migration
+from blogs.blog_export import export_chunks
+from blogs.direct_uploads import upload_policy, verify_upload
+from blogs.dataset import DatasetGenerator
+from blogs.jobs import JobRunner, claim_jobs, enqueue, job
+from blogs.models import BlogImport, BlogPost, Job, MediaFile, Tag
+from blogs.rss import feed_cache
+from blogs.sitemap import sitemap_cache
+from blogs.static_site import MANIFEST_FILE, build_site
+from blogs.suggest import title_index
+from blogs.view_counts import ViewCounter, view_counter
+from blogs.views import serve_media
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 def create_blog(title: str, content: str, author: EmailUser):
@@ -118,6 +151,236 @@ class BlogListViewTests(TestCase):
             ordered=False
         )
 
+    def test_blogs_fragment(self):
+        """
+        The fragment holds only the filtered blog list and its pagination,
+        whose links keep the filters.
+        """
+        page = self.client.get(reverse("blogs") + "?search=search")
+        response = self.client.get(reverse("blogs_fragment") + "?search=search")
+
+        self.assertQuerySetEqual(response.context["blogs"], [self.blog1, self.blog4], ordered=False)
+        self.assertNotContains(response, "<html")
+        self.assertLess(len(response.content) * 2, len(page.content))
+
+        response = self.client.get(reverse("blogs_fragment") + "?search=title&page=2")
+        self.assertContains(response, 'href="?search=title&page=1"')
+
+    def test_blogs_feed(self):
+        """
+        The feed is read batch by batch from cursors keeping the filters,
+        without offsets or counts.
+        """
+        titles, url = [], reverse("blogs_feed") + "?search=title&per_page=3"
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("max-age", response["Cache-Control"])
+
+                data = response.json()
+                titles += re.findall(r">(Blog\d[^<]*)</h3>", data["html"])
+                url = data["cursor"] and reverse("blogs_feed") + f"?cursor={data['cursor']}&per_page=3"
+
+        self.assertEqual(titles, [f"Blog{i} title{' search' if i in (1, 4) else ''}" for i in range(7, 0, -1)])
+        self.assertFalse(any("OFFSET" in query["sql"] or "COUNT(" in query["sql"] for query in queries))
+
+        response = self.client.get(reverse("blogs_fragment") + "?search=title")
+        cursor = re.search(r'data-cursor="([^"]+)"', response.content.decode())[1]
+        response = self.client.get(reverse("blogs_feed") + f"?cursor={cursor}")
+        self.assertEqual(re.findall(r">(Blog\d[^<]*)</h3>", response.json()["html"]), ["Blog1 title search"])
+        self.assertIsNone(response.json()["cursor"])
+
+        response = self.client.get(reverse("blogs_feed") + "?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+class BlogSuggestViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+
+        self.blog1 = create_blog("Blog1 title search", "Content 1", self.user)
+        self.blog2 = create_blog("Blog2 title", "Content 2", self.user)
+        self.blog3 = create_blog("Blog3 title search", "Content 3", self.user)
+
+        # Every test has its own rows, whose titles are read again
+        title_index.clear()
+
+    def suggest(self, query: str):
+        response = self.client.get(reverse("suggest"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["suggestions"]
+
+    def test_suggest(self):
+        """
+        Suggestions return the blogs with a title word starting with each
+        query word, newest first, with the URL of their detail page.
+        """
+        suggestions = self.suggest("sea")
+        self.assertEqual([suggestion["title"] for suggestion in suggestions], ["Blog3 title search", "Blog1 title search"])
+        self.assertEqual(suggestions[0]["url"], reverse("detail", args=[self.blog3.pk]))
+
+        self.assertEqual([suggestion["id"] for suggestion in self.suggest("blog1 ti")], [self.blog1.pk])
+        self.assertEqual(self.suggest(""), [])
+
+    def test_suggest_follows_writes(self):
+        """
+        Suggestions reflect the blogs created, renamed and deleted after the
+        index was loaded, once their transaction commits.
+        """
+        self.suggest("blog")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blog2.title = "Searchable renamed"
+            self.blog2.save()
+            self.blog3.delete()
+            create_blog("Search engines", "Content", self.user)
+
+        self.assertEqual(
+            [suggestion["title"] for suggestion in self.suggest("search")],
+            ["Search engines", "Blog1 title search", "Searchable renamed"]
+        )
+
+class BlogRssFeedTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.food = create_tag("Food")
+        self.tech = create_tag("Tech")
+
+        self.blog1 = create_blog("Blog1 title", "<p>Content 1</p>", self.user)
+        self.blog1.tags.add(self.food)
+        self.blog2 = create_blog("Blog2 title", "<p>Content 2</p>", self.user)
+        self.blog2.tags.add(self.food, self.tech)
+
+        # Every test has its own rows, whose feeds are built again
+        feed_cache.clear()
+
+    def feed_titles(self, response):
+        return [item.findtext("title") for item in ET.fromstring(response.content).iter("item")]
+
+    def test_rss_feeds(self):
+        """
+        The feeds list the latest blogs of all or one tag, and polls with the validators get 304.
+        """
+        response = self.client.get(reverse("rss_feed"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/rss+xml; charset=utf-8")
+        self.assertEqual(self.feed_titles(response), ["Blog2 title", "Blog1 title"])
+        item = ET.fromstring(response.content).find("channel/item")
+        self.assertEqual(item.findtext("link"), f"http://testserver{reverse('detail', args=[self.blog2.pk])}")
+        self.assertEqual(item.findtext("description"), "Content 2")
+        self.assertEqual(sorted(category.text for category in item.iter("category")), ["Food", "Tech"])
+
+        response_304 = self.client.get(reverse("rss_feed"), headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response_304.status_code, 304)
+        self.assertEqual(response_304.content, b"")
+        response_304 = self.client.get(reverse("rss_feed"), headers={"If-Modified-Since": response["Last-Modified"]})
+        self.assertEqual(response_304.status_code, 304)
+
+        response = self.client.get(reverse("tag_rss_feed", args=["tech"]))
+        self.assertEqual(self.feed_titles(response), ["Blog2 title"])
+
+        response = self.client.get(reverse("tag_rss_feed", args=["unknown"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_rss_feeds_follow_writes(self):
+        """
+        A new blog rebuilds the feeds it is in once its transaction commits,
+        the other feeds are served from the cache.
+        """
+        feed = self.client.get(reverse("rss_feed"))
+        tech_feed = self.client.get(reverse("tag_rss_feed", args=["tech"]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            blog = BlogPost.objects.create(
+                title="Fresh food", content="Fresh", author=self.user, created_at=timezone.now() + timedelta(minutes=1)
+            )
+            blog.tags.add(self.food)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("tag_rss_feed", args=["tech"]), headers={"If-None-Match": tech_feed["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(reverse("rss_feed"), headers={"If-None-Match": feed["ETag"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.feed_titles(response)[0], "Fresh food")
+        self.assertNotEqual(response["ETag"], feed["ETag"])
+
+        response = self.client.get(reverse("tag_rss_feed", args=["food"]))
+        self.assertEqual(self.feed_titles(response)[0], "Fresh food")
+
+@override_settings(SITEMAP_SIZE=3, SITEMAP_BATCH_SIZE=2)
+class BlogSitemapTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.blogs = [create_blog(f"Blog{i} title", "Content", self.user) for i in range(1, 8)]
+
+        # Every test has its own rows, whose sitemaps are built again
+        sitemap_cache.clear()
+
+    def sitemap_locations(self, content: bytes):
+        return [location.text for location in ET.fromstring(content).iter("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")]
+
+    def sitemap_ids(self, number: int):
+        response = self.client.get(reverse("sitemap", args=[number]))
+        self.assertEqual(response.status_code, 200)
+        return [location.rsplit("/", 1)[1] for location in self.sitemap_locations(response.getvalue())]
+
+    def expected_ids(self, number: int):
+        return [str(blog.pk) for blog in self.blogs if (blog.pk - 1) // 3 == number]
+
+    def test_sitemaps(self):
+        """
+        The index lists a sitemap per range of ids, each streaming the detail
+        URLs of its range and then served from the cache.
+        """
+        count = (self.blogs[-1].pk - 1) // 3 + 1
+        response = self.client.get(reverse("sitemap_index"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/xml; charset=utf-8")
+        self.assertEqual(
+            self.sitemap_locations(response.content),
+            [f"http://testserver{reverse('sitemap', args=[number])}" for number in range(count)],
+        )
+
+        response = self.client.get(reverse("sitemap", args=[count - 1]))
+        self.assertTrue(response.streaming)
+        content = response.getvalue()
+        self.assertEqual(
+            self.sitemap_locations(content),
+            [f"http://testserver{reverse('detail', args=[blog_id])}" for blog_id in self.expected_ids(count - 1)],
+        )
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse("sitemap", args=[count - 1]))
+        self.assertEqual(cached.content, content)
+        response = self.client.get(reverse("sitemap", args=[count - 1]), headers={"If-None-Match": cached["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(reverse("sitemap", args=[count]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_sitemaps_follow_writes(self):
+        """
+        A write rebuilds the sitemap of the post's id range once its
+        transaction commits, the other sitemaps are served from the cache.
+        """
+        deleted = self.blogs.pop(0)
+        numbers = range((deleted.pk - 1) // 3, (self.blogs[-1].pk - 1) // 3 + 1)
+        for number in numbers:
+            self.sitemap_ids(number)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+
+        with self.assertNumQueries(0):
+            for number in numbers[1:]:
+                self.assertEqual(self.sitemap_ids(number), self.expected_ids(number))
+
+        self.assertEqual(self.sitemap_ids(numbers[0]), self.expected_ids(numbers[0]))
+        self.assertNotIn(str(deleted.pk), self.sitemap_ids(numbers[0]))
+
 class BlogDetailViewTests(TestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
@@ -152,6 +415,106 @@ class BlogDetailViewTests(TestCase):
             [self.blog2],
         )
 
+class BlogViewCountTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.blog1 = create_blog("Blog1 title", "Content", self.user)
+        self.blog2 = create_blog("Blog2 title", "Content", self.user)
+        self.blog3 = create_blog("Blog3 title", "Content", self.user)
+        view_counter.counts.clear()
+        self.addCleanup(view_counter.counts.clear)
+
+    def views(self, blog: BlogPost):
+        blog.refresh_from_db(fields=["views"])
+        return blog.views
+
+    def test_detail_views_are_flushed_in_one_batch(self):
+        """
+        Detail page counts its views in memory, and a flush adds them to the blogs.
+        """
+        for blog_id in [self.blog2.id, self.blog2.id, self.blog3.id, self.blog2.id, 999]:
+            self.client.get(reverse("detail", args=[blog_id]))
+
+        self.assertEqual(view_counter.counts, {self.blog2.id: 3, self.blog3.id: 1})
+        self.assertEqual(self.views(self.blog2), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(view_counter.flush(), 4)
+
+        self.assertEqual(len([query for query in queries if "UPDATE" in query["sql"]]), 1)
+        self.assertEqual([self.views(blog) for blog in [self.blog1, self.blog2, self.blog3]], [0, 3, 1])
+        self.assertFalse(view_counter.counts)
+
+        self.client.get(reverse("detail", args=[self.blog2.id]))
+        view_counter.flush()
+
+        self.assertEqual(self.views(self.blog2), 4)
+
+    def test_failed_flush_keeps_views(self):
+        """
+        The views of a failed flush are added by the next one.
+        """
+        counter = ViewCounter()
+        counter.increment(self.blog3.id)
+
+        with mock.patch("blogs.view_counts.transaction.atomic", side_effect=ConnectionError("Database unavailable")):
+            with self.assertRaises(ConnectionError):
+                counter.flush()
+        counter.increment(self.blog3.id)
+
+        self.assertEqual(counter.flush(), 2)
+        self.assertEqual(self.views(self.blog3), 2)
+
+    @override_settings(VIEW_FLUSH_SECONDS=60)
+    def test_stop_flushes_remaining_views(self):
+        """
+        Stopping the counter flushes the views counted since the last flush.
+        """
+        counter = ViewCounter()
+        counter.increment(self.blog1.id)
+
+        self.assertTrue(counter._flusher.is_alive())
+
+        counter.stop()
+
+        self.assertIsNone(counter._flusher)
+        self.assertEqual(self.views(self.blog1), 1)
+
+    def test_edit_keeps_flushed_views(self):
+        """
+        Saving a blog loaded before a flush keeps the flushed views.
+        """
+        blog = BlogPost.objects.get(pk=self.blog1.pk)
+        view_counter.increment(self.blog1.id)
+        view_counter.flush()
+
+        blog.title = "Blog1 renamed"
+        blog.save()
+
+        self.assertEqual(self.views(self.blog1), 1)
+
+    def test_paused_counter_ignores_views(self):
+        """
+        Views are not counted while the counter is paused.
+        """
+        with view_counter.pause():
+            self.client.get(reverse("detail", args=[self.blog2.id]))
+
+        self.assertFalse(view_counter.counts)
+
+    def test_popular_blogs_ordered_by_views(self):
+        """
+        Popular page lists the viewed blogs, most viewed first.
+        """
+        for blog in [self.blog1, self.blog3, self.blog3]:
+            self.client.get(reverse("detail", args=[blog.id]))
+        view_counter.flush()
+
+        response = self.client.get(reverse("popular_blogs"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertQuerySetEqual(response.context["blogs"], [self.blog3, self.blog1])
+
 class MyBlogsViewTests(TestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
@@ -278,4 +641,718 @@ class BlogDeleteViewTests(TestCase):
         self.client.login(email="user@example.com", password="password")
         response = self.client.post(reverse("delete", args=[self.blog.id]))
         self.assertEqual(BlogPost.objects.count(), 0)
-        self.assertRedirects(response, reverse("my_blogs"))
\ No newline at end of file
+        self.assertRedirects(response, reverse("my_blogs"))
+
+class GenerateDatasetCommandTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.tag = create_tag(name="Food")
+        self.blog = create_blog("Blog title", "Content", self.user)
+
+    def test_generate_dataset(self):
+        """
+        The command bulk loads users, tags and posts after the existing rows.
+        """
+        out = StringIO()
+        call_command("generate_dataset", users=4, tags=5, posts=90, batch_size=40, stdout=out)
+
+        self.assertIn("Created 4 users, 4 tags, 90 blog posts", out.getvalue())
+        self.assertEqual(EmailUser.objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 5)
+        self.assertEqual(BlogPost.objects.count(), 91)
+        self.assertTrue(all(post.tags.exists() for post in BlogPost.objects.exclude(id=self.blog.id)))
+
+    def test_dataset_generator_is_deterministic(self):
+        """
+        The same seed generates the same posts.
+        """
+        first = list(DatasetGenerator(seed=9).posts(30, 1, [1, 2], [1, 2, 3], batch_size=10))
+        second = list(DatasetGenerator(seed=9).posts(30, 1, [1, 2], [1, 2, 3], batch_size=10))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 3)
+
+class ImportBlogsCommandTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.tag = create_tag(name="Food")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def post(self, title: str, **fields):
+        return {"title": title, "content": f"<p>{title} content</p>", "author": "user@example.com", **fields}
+
+    def write_ndjson(self, records: list):
+        path = Path(self.directory.name) / "posts.ndjson"
+        path.write_text("\n".join(record if isinstance(record, str) else json.dumps(record) for record in records) + "\n")
+        return path
+
+    def test_import_blogs(self):
+        """
+        The command imports valid posts with their tags and reports the skipped records.
+        """
+        path = self.write_ndjson([
+            self.post("Imported 1", tags=["Food", "New Tag"], content="<p>Safe</p><script>alert(1)</script>"),
+            "{not json",
+            self.post("Imported 2", author="nobody@example.com"),
+            self.post("Imported 3", tags=["new tag"]),
+        ])
+        out = StringIO()
+
+        call_command("import_blogs", str(path), batch_size=2, workers=2, stdout=out)
+
+        self.assertIn("Line 2: not a JSON object", out.getvalue())
+        self.assertIn("Line 3: unknown author nobody@example.com", out.getvalue())
+        self.assertIn("Imported 2 blog posts and skipped 2 of 4 records.", out.getvalue())
+
+        first, third = BlogPost.objects.filter(title__startswith="Imported").order_by("title")
+        self.assertEqual(first.content, "<p>Safe</p>")
+        self.assertEqual(sorted(first.tags.values_list("slug", flat=True)), ["food", "new-tag"])
+        self.assertEqual(list(third.tags.values_list("slug", flat=True)), ["new-tag"])
+
+    def test_import_blogs_csv(self):
+        """
+        A CSV file with comma separated tags is imported.
+        """
+        path = Path(self.directory.name) / "posts.csv"
+        path.write_text('title,content,author,tags\nCSV post,<p>From CSV</p>,user@example.com,"Tech, Food"\n')
+
+        result = blog_import.import_blog_posts(path, workers=1, report=lambda message: None)
+
+        self.assertEqual(result["imported"], 1)
+        self.assertEqual(sorted(BlogPost.objects.get(title="CSV post").tags.values_list("slug", flat=True)), ["food", "tech"])
+
+    def test_import_blogs_resumes_after_last_batch(self):
+        """
+        A failed import continues after its last committed batch and runs once.
+        """
+        path = self.write_ndjson([self.post(f"Imported {i}") for i in range(5)])
+        write_batch = blog_import._write_batch
+
+        calls = []
+
+        def failing_write_batch(*args):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return write_batch(*args)
+
+        with mock.patch.object(blog_import, "_write_batch", failing_write_batch):
+            with self.assertRaises(RuntimeError):
+                blog_import.import_blog_posts(path, batch_size=2, workers=1, report=lambda message: None)
+
+        self.assertEqual(BlogPost.objects.count(), 2)
+
+        for _ in range(2):
+            result = blog_import.import_blog_posts(path, batch_size=2, workers=1, report=lambda message: None)
+
+        blog_import_ = BlogImport.objects.get()
+        self.assertEqual(result["imported"], 5)
+        self.assertEqual(BlogPost.objects.count(), 5)
+        self.assertEqual(blog_import_.records, 5)
+        self.assertIsNotNone(blog_import_.finished_at)
+
+    def test_admin_imports_uploaded_posts(self):
+        """
+        Staff users can upload a file from the blog post admin, imported by a job.
+        """
+        get_user_model().objects.create_superuser(email="admin@example.com", password="password")
+        self.client.login(email="admin@example.com", password="password")
+        upload = SimpleUploadedFile("posts.ndjson", json.dumps(self.post("Uploaded", tags=["Food"])).encode())
+        url = reverse("admin:blogs_blogpost_import")
+
+        with override_settings(IMPORT_FOLDER=Path(self.directory.name)):
+            response = self.client.post(url, {"file": upload})
+
+            self.assertRedirects(response, url)
+            self.assertFalse(BlogPost.objects.filter(title="Uploaded").exists())
+            self.assertContains(self.client.get(url), "posts.ndjson: queued")
+
+            self.assertEqual(JobRunner().run_pending(), 1)
+
+        blog_import_ = BlogImport.objects.get()
+        self.assertTrue(BlogPost.objects.filter(title="Uploaded", tags=self.tag).exists())
+        self.assertEqual((blog_import_.imported, blog_import_.skipped, blog_import_.records), (1, 0, 1))
+        self.assertIsNotNone(blog_import_.finished_at)
+        self.assertEqual(list(Path(self.directory.name).iterdir()), [])
+        self.assertContains(self.client.get(url), "<td>posts.ndjson</td>")
+
+class ExportBlogsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        food, tech = create_tag(name="Food"), create_tag(name="Tech")
+        for i in range(7):
+            create_blog(f"Blog{i}", f"<p>Content{i}</p>", self.user).tags.set([food, tech] if i == 6 else [food])
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_export_reads_fixed_size_chunks(self):
+        """
+        The posts are exported in chunks ordered by id with their author and tags.
+        """
+        chunks = list(export_chunks(chunk_size=3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual([row["title"] for chunk in chunks for row in chunk], [f"Blog{i}" for i in range(7)])
+        self.assertEqual(chunks[2][0]["tags"], ["Food", "Tech"])
+        self.assertEqual(chunks[0][0]["author"], "user@example.com")
+
+    def test_export_blogs_can_be_imported(self):
+        """
+        The command writes NDJSON and CSV records the import reads.
+        """
+        for format in ["ndjson", "csv"]:
+            path = Path(self.directory.name) / f"posts.{format}"
+            call_command("export_blogs", str(path), chunk_size=4)
+
+            with open(path, newline="", encoding="utf-8") as file:
+                records = [blog_import.parse_record(record) for _, record in blog_import.read_records(file, format)]
+
+            self.assertEqual(len(records), 7)
+            self.assertEqual(records[6]["tags"], {"food": "Food", "tech": "Tech"})
+
+    def test_admin_exports_posts(self):
+        """
+        Staff users can download all blog posts from the blog post admin.
+        """
+        get_user_model().objects.create_superuser(email="admin@example.com", password="password")
+        self.client.login(email="admin@example.com", password="password")
+
+        response = self.client.get(reverse("admin:blogs_blogpost_export"), {"format": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(lines[0], "id,title,content,author,tags,image,created_at")
+        self.assertEqual(len(lines), 1 + 7)
+
+    def test_admin_export_requires_staff(self):
+        """
+        Users who are not staff are sent to the admin login.
+        """
+        self.client.login(email="user@example.com", password="password")
+
+        response = self.client.get(reverse("admin:blogs_blogpost_export"))
+
+        self.assertEqual(response.status_code, 302)
+
+class BuildStaticCommandTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        food, tech = create_tag(name="Food"), create_tag(name="Tech")
+        self.blogs = {}
+        for i in range(1, 8):
+            self.blogs[i] = create_blog(f"Blog{i} title", f"<p>Content{i}</p>", self.user)
+            self.blogs[i].tags.set([tech] if i == 2 else [food, tech] if i == 7 else [food])
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.output = Path(self.directory.name)
+
+    def build(self):
+        return build_site(self.output, "http://localhost", settings.STATICFILES_DIRS[0])
+
+    def test_build_static_renders_public_pages(self):
+        """
+        The command renders the index, the list pages of all blogs and of
+        every tag, the detail pages and the assets.
+        """
+        stdout = StringIO()
+        call_command("build_static", str(self.output), workers=1, stdout=stdout)
+
+        # The index, two pages of all blogs, one per tag and seven detail pages
+        self.assertIn("Rendered 12 of 12 pages", stdout.getvalue())
+        self.assertIn("Blog7 title", (self.output / "index.html").read_text())
+        self.assertIn("Blog1 title", (self.output / "blogs/list/all/2.html").read_text())
+        tech = (self.output / "blogs/list/tag/tech/1.html").read_text()
+        self.assertIn("Blog2 title", tech)
+        self.assertNotIn("Blog3 title", tech)
+        self.assertIn("Content4", (self.output / f"blogs/{self.blogs[4].pk}.html").read_text())
+        self.assertTrue((self.output / "static/css/tailwind.css").exists())
+
+        manifest = json.loads((self.output / MANIFEST_FILE).read_text())
+        self.assertEqual(manifest["pages"]["/blogs/?page=2"]["deps"], [str(self.blogs[1].pk)])
+
+    def test_build_static_renders_only_affected_pages(self):
+        """
+        A build after the first renders only the pages showing changed posts,
+        and removes the pages gone.
+        """
+        self.build()
+        self.assertEqual(self.build()["rendered"], 0)
+        second_page = (self.output / "blogs/list/all/2.html").stat().st_mtime_ns
+
+        self.blogs[2].title = "Blog2 renamed"
+        self.blogs[2].save()
+
+        result = self.build()
+
+        # The detail page, the pages of all and of the tech blogs listing it, and the detail pages linking to it
+        self.assertTrue(3 <= result["rendered"] < 12)
+        for file in [f"blogs/{self.blogs[2].pk}.html", "blogs/list/all/1.html", "blogs/list/tag/tech/1.html"]:
+            self.assertIn("Blog2 renamed", (self.output / file).read_text())
+        self.assertEqual((self.output / "blogs/list/all/2.html").stat().st_mtime_ns, second_page)
+
+        deleted_id = self.blogs[1].pk
+        self.blogs[1].delete()
+
+        result = self.build()
+
+        self.assertEqual(result["removed"], 2)
+        self.assertFalse((self.output / f"blogs/{deleted_id}.html").exists())
+        self.assertFalse((self.output / "blogs/list/all/2.html").exists())
+
+job_calls = []
+
+@job("test_record")
+def record_job(payload):
+    job_calls.append(payload["value"])
+
+@job("test_fail", max_attempts=2)
+def failing_job(payload):
+    raise RuntimeError("Storage unavailable")
+
+job_leases = []
+
+@job("test_long")
+def long_running_job(payload):
+    job_leases.append(Job.objects.values_list("locked_until", flat=True).get())
+
+class BackgroundJobTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.tag = create_tag("Food")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        job_calls.clear()
+
+    def test_create_blog_uploads_image_in_job(self):
+        """
+        Creating a blog with a Cloudinary image returns before the upload,
+        which the job does, and removes the staged file.
+        """
+        png = BytesIO()
+        Image.new("RGB", (1, 1)).save(png, "PNG")
+        self.client.login(email="user@example.com", password="password")
+
+        with (
+            override_settings(USE_CLOUDINARY=True, UPLOAD_STAGING_FOLDER=Path(self.directory.name)),
+            mock.patch("cloudinary.uploader.upload_resource", return_value="images/uploaded.png") as upload,
+        ):
+            response = self.client.post(reverse("create"), {
+                "title": "Blog with image",
+                "content": "Content",
+                "tags": [self.tag.id],
+                "image": SimpleUploadedFile("image.png", png.getvalue(), content_type="image/png"),
+            })
+
+            blog = BlogPost.objects.get(title="Blog with image")
+            self.assertRedirects(response, reverse("detail", args=[blog.id]))
+            upload.assert_not_called()
+            self.assertFalse(blog.image)
+
+            queued = Job.objects.get()
+            self.assertEqual(queued.name, "upload_image")
+            self.assertEqual(queued.payload["blog_id"], blog.id)
+
+            self.assertEqual(JobRunner().run_pending(), 1)
+
+        upload.assert_called_once_with(queued.payload["path"])
+        blog.refresh_from_db()
+        self.assertEqual(blog.image.name, "images/uploaded.png")
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(list(Path(self.directory.name).iterdir()), [])
+
+    def test_failed_job_is_retried_until_it_fails(self):
+        """
+        A failing job is queued again with a delay, and marked failed after its last attempt.
+        """
+        queued = enqueue("test_fail", {})
+        runner = JobRunner()
+
+        with self.assertLogs("blogs.jobs", "WARNING"):
+            self.assertEqual(runner.run_pending(), 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.QUEUED, 1))
+        self.assertGreater(queued.run_after, timezone.now() + timedelta(seconds=settings.JOB_RETRY_SECONDS / 2))
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs("blogs.jobs", "ERROR"):
+            self.assertEqual(runner.run_pending(), 1)
+
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.FAILED, 2))
+        self.assertIn("Storage unavailable", queued.last_error)
+        self.assertEqual(runner.run_pending(), 0)
+
+    def test_expired_lease_is_claimed_again(self):
+        """
+        A running job is claimed once, and again after its lease expired.
+        """
+        queued = enqueue("test_record", {"value": 1})
+
+        [claimed] = claim_jobs(10)
+        self.assertEqual((claimed.pk, claimed.status), (queued.pk, Job.RUNNING))
+        self.assertEqual(claim_jobs(10), [])
+
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        [reclaimed] = claim_jobs(10)
+        self.assertEqual(reclaimed.attempts, 2)
+
+    @override_settings(JOB_LEASES={"test_long": 3600})
+    def test_long_job_runs_with_its_lease(self):
+        """
+        A job given a lease in JOB_LEASES holds it while it runs, instead of the default one.
+        """
+        enqueue("test_long", {})
+
+        self.assertEqual(JobRunner().run_pending(), 1)
+        self.assertGreater(job_leases[-1], timezone.now() + timedelta(seconds=3000))
+
+    def test_run_jobs_command(self):
+        """
+        The run_jobs command with --once runs the due jobs and removes them.
+        """
+        for value in range(3):
+            enqueue("test_record", {"value": value})
+        out = StringIO()
+
+        call_command("run_jobs", "--once", stdout=out)
+
+        self.assertIn("Ran 3 jobs.", out.getvalue())
+        self.assertEqual(job_calls, [0, 1, 2])
+        self.assertFalse(Job.objects.exists())
+
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.tag = create_tag("Food")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.media_root = Path(self.directory.name)
+
+        settings_override = override_settings(DIRECT_UPLOADS=True, MEDIA_ROOT=self.directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.login(email="user@example.com", password="password")
+
+    def upload(self, filename="image.png", data=b"image data"):
+        response = self.client.get(reverse("upload_policy"), {"filename": filename})
+        self.assertEqual(response.status_code, 200)
+        policy = response.json()
+
+        stored = self.client.post(policy["url"], {**policy["fields"], "file": SimpleUploadedFile(filename, data)})
+        return policy, stored
+
+    def test_create_blog_with_direct_upload(self):
+        """
+        An image uploaded to the storage with a signed policy is attached by its key.
+        """
+        response = self.client.get(reverse("create"))
+        self.assertContains(response, "data-upload-url")
+
+        policy, stored = self.upload()
+        self.assertEqual(stored.status_code, 204)
+        self.assertEqual((self.media_root / policy["key"]).read_bytes(), b"image data")
+
+        response = self.client.post(reverse("create"), {
+            "title": "Blog with image", "content": "Content", "tags": [self.tag.id], "image_key": policy["key"],
+        })
+
+        key = f"images/{hashlib.sha256(b'image data').hexdigest()}.png"
+        blog = BlogPost.objects.get(title="Blog with image")
+        self.assertRedirects(response, reverse("detail", args=[blog.id]))
+        self.assertEqual(blog.image.name, key)
+        self.assertEqual((self.media_root / key).read_bytes(), b"image data")
+        self.assertFalse((self.media_root / policy["key"]).exists())
+        self.assertEqual(MediaFile.objects.get(key=key).ref_count, 1)
+
+    def test_prune_media_removes_abandoned_uploads(self):
+        """
+        Direct uploads never attached to a post are pruned, and those an older post links are kept.
+        """
+        abandoned, _ = self.upload()
+        linked, _ = self.upload(data=b"linked image")
+        BlogPost.objects.create(title="Linked upload", content="Content", author=self.user, image=linked["key"])
+
+        for policy in [abandoned, linked]:
+            os.utime(self.media_root / policy["key"], (time.time() - 3600, time.time() - 3600))
+
+        out = StringIO()
+        call_command("prune_media", "--grace", "60", stdout=out)
+
+        self.assertIn("Removed 1 unused images.", out.getvalue())
+        self.assertFalse((self.media_root / abandoned["key"]).exists())
+        self.assertTrue((self.media_root / linked["key"]).exists())
+
+    def test_create_blog_rejects_forged_key(self):
+        """
+        A key the app didn't sign is not attached, even when a file is stored under it.
+        """
+        key = f"uploads/{'a' * 32}-{'0' * 16}.png"
+        (self.media_root / "uploads").mkdir()
+        (self.media_root / key).write_bytes(b"image data")
+
+        response = self.client.post(reverse("create"), {
+            "title": "Blog with forged image", "content": "Content", "tags": [self.tag.id], "image_key": key,
+        })
+
+        self.assertContains(response, "Invalid upload key.", status_code=400)
+        self.assertFalse(BlogPost.objects.filter(title="Blog with forged image").exists())
+
+    def test_create_blog_rejects_missing_upload(self):
+        """
+        A signed key whose upload never reached the storage is rejected.
+        """
+        key = self.client.get(reverse("upload_policy"), {"filename": "image.png"}).json()["key"]
+
+        response = self.client.post(reverse("create"), {
+            "title": "Blog without upload", "content": "Content", "tags": [self.tag.id], "image_key": key,
+        })
+
+        self.assertContains(response, "The uploaded image was not found.", status_code=400)
+
+    def test_upload_policy_rejects_file_type(self):
+        """
+        No policy is signed for a file that is not an allowed image, nor when direct uploads are disabled.
+        """
+        response = self.client.get(reverse("upload_policy"), {"filename": "script.js"})
+        self.assertEqual(response.status_code, 400)
+
+        with override_settings(DIRECT_UPLOADS=False):
+            response = self.client.get(reverse("upload_policy"), {"filename": "image.png"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_store_upload_checks_policy(self):
+        """
+        The local storage refuses tampered and expired policies, and files over the size limit.
+        """
+        policy = self.client.get(reverse("upload_policy"), {"filename": "image.png"}).json()
+        tampered = {**policy["fields"], "key": "uploads/other.png", "file": SimpleUploadedFile("image.png", b"data")}
+
+        response = self.client.post(policy["url"], tampered)
+        self.assertEqual(response.status_code, 403)
+
+        with override_settings(DIRECT_UPLOAD_EXPIRES=-1):
+            _, stored = self.upload()
+        self.assertEqual(stored.status_code, 403)
+
+        with override_settings(MAX_UPLOAD_SIZE=4):
+            _, stored = self.upload()
+        self.assertEqual(stored.status_code, 400)
+
+        self.assertFalse((self.media_root / "uploads").exists())
+
+    @override_settings(USE_CLOUDINARY=True)
+    def test_cloudinary_upload_is_signed_and_verified(self):
+        """
+        The Cloudinary policy is a signed upload, and an uploaded image over the limit is deleted.
+        """
+        config = SimpleNamespace(cloud_name="blog", api_key="key", api_secret="secret")
+        with mock.patch("cloudinary.config", return_value=config):
+            policy = upload_policy("image.png", "/uploads")
+
+        fields = dict(policy["fields"])
+        signature = fields.pop("signature")
+        fields.pop("api_key")
+        self.assertEqual(policy["url"], "https://api.cloudinary.com/v1_1/blog/image/upload")
+        self.assertEqual(fields["public_id"], policy["key"])
+        self.assertEqual(signature, cloudinary.utils.api_sign_request(fields, "secret"))
+
+        resource = {"bytes": 1000, "format": "png", "version": 1}
+        with mock.patch("cloudinary.api.resource", return_value=resource) as get_resource:
+            image = verify_upload(policy["key"])
+        get_resource.assert_called_once_with(policy["key"])
+        self.assertEqual((image.public_id, image.format, image.version), (policy["key"], "png", 1))
+
+        resource["bytes"] = settings.MAX_UPLOAD_SIZE + 1
+        with (
+            mock.patch("cloudinary.api.resource", return_value=resource),
+            mock.patch("cloudinary.uploader.destroy") as destroy,
+            self.assertRaises(ValueError),
+        ):
+            verify_upload(policy["key"])
+        destroy.assert_called_once_with(policy["key"])
+
+class MediaTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.tag = create_tag("Food")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.media_root = Path(self.directory.name)
+
+        settings_override = override_settings(MEDIA_ROOT=self.directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        png = BytesIO()
+        Image.new("RGB", (1, 1)).save(png, "PNG")
+        self.png = png.getvalue()
+        self.key = f"images/{hashlib.sha256(self.png).hexdigest()}.png"
+
+    def ref_counts(self):
+        return dict(MediaFile.objects.values_list("key", "ref_count"))
+
+    def age(self, path, seconds=3600):
+        os.utime(path, (time.time() - seconds, time.time() - seconds))
+
+    def test_create_blog_stores_image_by_content(self):
+        """
+        Posts uploading the same image share its file, named by its content, and count it.
+        """
+        self.client.login(email="user@example.com", password="password")
+        for title in ["First", "Second"]:
+            response = self.client.post(reverse("create"), {
+                "title": title,
+                "content": "Content",
+                "tags": [self.tag.id],
+                "image": SimpleUploadedFile("Photo.PNG", self.png, content_type="image/png"),
+            })
+            self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(list(BlogPost.objects.filter(title__in=["First", "Second"]).values_list("image", flat=True)), [self.key] * 2)
+        self.assertEqual([path.name for path in (self.media_root / "images").iterdir()], [Path(self.key).name])
+        self.assertEqual(self.ref_counts(), {self.key: 2})
+
+    def test_reference_counts_follow_posts(self):
+        """
+        The count of an image follows the posts using it as they are created, changed and deleted.
+        """
+        first, second = f"images/{'a' * 64}.png", f"images/{'b' * 64}.png"
+        blogs = [BlogPost.objects.create(title=f"Blog {i}", content="Content", author=self.user, image=first) for i in range(2)]
+        # Images stored under other names are not counted
+        BlogPost.objects.create(title="Other", content="Content", author=self.user, image="images/other.png")
+        self.assertEqual(self.ref_counts(), {first: 2})
+
+        blog = BlogPost.objects.get(pk=blogs[0].pk)
+        blog.image = second
+        blog.save()
+        self.assertEqual(self.ref_counts(), {first: 1, second: 1})
+
+        # Deleted without loading its image
+        BlogPost.objects.defer("image").get(pk=blogs[1].pk).delete()
+        BlogPost.objects.filter(pk=blogs[0].pk).delete()
+        self.assertEqual(self.ref_counts(), {first: 0, second: 0})
+
+    def test_prune_media_removes_unused_images(self):
+        """
+        Pruning removes images no post used for the grace period, and unfinished uploads.
+        """
+        folder = self.media_root / "images"
+        folder.mkdir()
+        used, unused, uncounted, recent = (f"images/{character * 64}.png" for character in "abcd")
+        for key in [used, unused, uncounted, recent, "images/legacy.png", "images/.upload-stale"]:
+            (self.media_root / key).write_bytes(b"image data")
+
+        BlogPost.objects.create(title="Used", content="Content", author=self.user, image=used)
+        BlogPost.objects.create(title="Unused", content="Content", author=self.user, image=unused).delete()
+
+        for path in folder.iterdir():
+            if path.name != Path(recent).name:
+                self.age(path)
+
+        out = StringIO()
+        # The count of the unused image dropped just now, so it is kept for the grace period
+        call_command("prune_media", "--grace", "60", stdout=out)
+        self.assertIn("Removed 1 unused images.", out.getvalue())
+        self.assertFalse((self.media_root / uncounted).exists())
+
+        out = StringIO()
+        call_command("prune_media", "--grace", "0", stdout=out)
+        self.assertIn("Removed 2 unused images.", out.getvalue())
+
+        self.assertEqual(sorted(path.name for path in folder.iterdir()), sorted([Path(used).name, "legacy.png"]))
+        self.assertEqual(self.ref_counts(), {used: 1})
+
+    def test_media_is_cached_as_immutable(self):
+        """
+        The served images may be cached for good.
+        """
+        (self.media_root / "image.png").write_bytes(b"image data")
+
+        response = serve_media(RequestFactory().get("/media/image.png"), "image.png", document_root=self.directory.name)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], f"public, max-age={settings.MEDIA_CACHE_SECONDS}, immutable")
+
+class MigrateDataCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        path = Path(self.directory.name) / "fastapi.db"
+        self.source_url = f"sqlite:///{path}"
+
+        # The tables of the FastAPI app as SQLAlchemy creates them on SQLite
+        with sqlite3.connect(path) as source:
+            source.executescript("""
+                CREATE TABLE email_user (id INTEGER PRIMARY KEY, username VARCHAR(100), email VARCHAR(100),
+                    password_hash VARCHAR, is_active BOOLEAN, is_staff BOOLEAN, created_at DATETIME);
+                CREATE TABLE tag (id INTEGER PRIMARY KEY, name VARCHAR(50), slug VARCHAR(60));
+                CREATE TABLE blog_post (id INTEGER PRIMARY KEY, title VARCHAR(255), content VARCHAR,
+                    image VARCHAR(255), created_at DATETIME, author_id INTEGER);
+                CREATE TABLE blogpost_tag (blogpost_id INTEGER, tag_id INTEGER, PRIMARY KEY (blogpost_id, tag_id));
+            """)
+            source.execute(
+                "INSERT INTO email_user VALUES (4, 'author', 'author@example.com', ?, 1, 1, '2024-05-01 10:00:00.000000')",
+                [bcrypt.hashpw(b"password", bcrypt.gensalt(4)).decode()],
+            )
+            source.execute("INSERT INTO tag VALUES (6, 'Food', 'food')")
+            source.executemany(
+                "INSERT INTO blog_post VALUES (?, ?, '<p>Content</p>', '/media/food.jpg', '2024-05-01 10:00:00.000000', 4)",
+                [(id, f"Post {id}") for id in range(20, 25)],
+            )
+            source.executemany("INSERT INTO blogpost_tag VALUES (?, 6)", [(21,), (23,)])
+        source.close()
+
+    def test_migrate_data(self):
+        """
+        The command copies a FastAPI database with its ids, converts it and verifies it.
+        """
+        out = StringIO()
+
+        call_command("migrate_data", "fastapi", self.source_url, batch_size=2, stdout=out)
+
+        self.assertIn("posts: 5 in the source, 5 in the target, OK", out.getvalue())
+        self.assertIn("links: 2 in the source, 2 in the target, OK", out.getvalue())
+
+        user = get_user_model().objects.get(id=4)
+        post = BlogPost.objects.get(id=21)
+        self.assertTrue(user.password.startswith("bcrypt$$2b$"))
+        self.assertTrue(user.check_password("password"))
+        self.assertTrue(user.is_superuser)
+        self.assertEqual(post.image.name, "food.jpg")
+        self.assertEqual(list(post.tags.values_list("id", flat=True)), [6])
+
+    def test_migrate_data_resumes_and_detects_mismatch(self):
+        """
+        A failed migration continues after its last committed batch, and changed rows fail the verification.
+        """
+        bulk_insert = data_migration.bulk_insert
+        calls = []
+
+        def failing_bulk_insert(model, rows, *args):
+            calls.append(model)
+            if calls.count(BlogPost) == 2:
+                raise RuntimeError("connection lost")
+            return bulk_insert(model, rows, *args)
+
+        with mock.patch.object(data_migration, "bulk_insert", failing_bulk_insert):
+            with self.assertRaises(RuntimeError):
+                data_migration.migrate_data(self.source_url, "fastapi", batch_size=2, report=lambda message: None)
+
+        result = data_migration.migrate_data(self.source_url, "fastapi", batch_size=2, report=lambda message: None)
+
+        self.assertEqual(result["copied"]["posts"], 3)
+        self.assertEqual(BlogPost.objects.count(), 5)
+
+        BlogPost.objects.filter(id=22).update(title="Changed")
+
+        with self.assertRaises(CommandError):
+            call_command("migrate_data", "fastapi", self.source_url, verify_only=True, stdout=StringIO())
+
+    def test_remap_image(self):
+        """
+        Image paths lose the /media prefix in Django and get it back in the other apps.
+        """
+        self.assertEqual(data_migration.remap_image("/media/food.jpg", "flask", "django"), "food.jpg")
+        self.assertEqual(data_migration.remap_image("images/food.jpg", "django", "fastapi"), "/media/images/food.jpg")
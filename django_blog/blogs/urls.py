@@ -4,8 +4,18 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("feed.xml", views.rss_feed, name="rss_feed"),
+    path("tags/<slug:slug>/feed.xml", views.tag_rss_feed, name="tag_rss_feed"),
+    path("sitemap.xml", views.sitemap_index, name="sitemap_index"),
+    path("sitemaps/<int:number>.xml", views.sitemap, name="sitemap"),
     path("blogs/", views.blogs, name="blogs"),
+    path("blogs/fragment", views.blogs_fragment, name="blogs_fragment"),
+    path("blogs/feed", views.blogs_feed, name="blogs_feed"),
+    path("blogs/suggest", views.suggest, name="suggest"),
+    path("blogs/popular", views.popular_blogs, name="popular_blogs"),
     path("blogs/<int:blog_id>", views.detail, name="detail"),
+    path("blogs/upload-policy", views.upload_policy, name="upload_policy"),
+    path("uploads", views.store_upload, name="store_upload"),
     path("blogs/create", views.create, name="create"),
     path("blogs/<int:blog_id>/edit", views.edit, name="edit"),
     path("blogs/<int:blog_id>/delete", views.delete, name="delete"),
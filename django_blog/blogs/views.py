@@ -1,40 +1,211 @@
+from blogs import direct_uploads
+from blogs.feed import FeedCursor
 from blogs.models import BlogPost, Tag
+from blogs.rss import ALL_SCOPE, FeedItem, feed_cache, feed_response, render_rss, tag_scope
+from blogs.sitemap import (
+    INDEX_SCOPE, SITEMAP_MEDIA_TYPE, cache_stream, render_sitemap_index, sitemap_cache, sitemap_count, sitemap_scope,
+    stream_sitemap,
+)
+from blogs.suggest import suggest_titles
+from blogs.view_counts import view_counter
+from monitoring.metrics import observe_upload
 from .forms import BlogPostForm
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.html import strip_tags
 from django.shortcuts import redirect, render, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.core.exceptions import PermissionDenied
 from django.contrib import messages
+from django.views.decorators.csrf import csrf_exempt
+from django.views import static
+from django.views.decorators.http import require_POST
+from pathlib import Path
 
 def index(request):
-    blogs = BlogPost.objects.recent()
+    blogs = BlogPost.objects.prefetch_related("tags").recent()
     tags = Tag.objects.all()
 
     return render(request, "blogs/index.html", {"blogs": blogs, "tags": tags})
 
-def blogs(request):
+def rss_feed(request):
+    feed = feed_cache.get(ALL_SCOPE, settings.RSS_MAX_AGE)
+    if feed is None:
+        version = feed_cache.version
+        blogs = BlogPost.objects.prefetch_related("tags").recent(settings.RSS_ITEMS)
+        body = render_rss(
+            "TriFrameBlog Django",
+            request.build_absolute_uri(reverse("blogs")),
+            request.build_absolute_uri(reverse("rss_feed")),
+            "The latest blogs",
+            [_feed_item(request, blog) for blog in blogs],
+        )
+        feed = feed_cache.put(ALL_SCOPE, body, version)
+
+    return feed_response(request, feed)
+
+def tag_rss_feed(request, slug: str):
+    feed = feed_cache.get(tag_scope(slug), settings.RSS_MAX_AGE)
+    if feed is None:
+        version = feed_cache.version
+        tag = get_object_or_404(Tag, slug=slug)
+        blogs = BlogPost.objects.with_tags([slug]).prefetch_related("tags").recent(settings.RSS_ITEMS)
+        body = render_rss(
+            f"TriFrameBlog Django: {tag.name}",
+            request.build_absolute_uri(f"{reverse('blogs')}?tag={slug}"),
+            request.build_absolute_uri(reverse("tag_rss_feed", args=[slug])),
+            f"The latest blogs tagged {tag.name}",
+            [_feed_item(request, blog) for blog in blogs],
+        )
+        feed = feed_cache.put(tag_scope(slug), body, version)
+
+    return feed_response(request, feed)
+
+def _feed_item(request, blog):
+    return FeedItem(
+        blog.title,
+        request.build_absolute_uri(reverse("detail", args=[blog.id])),
+        strip_tags(blog.content[:500]),
+        blog.created_at,
+        [tag.name for tag in blog.tags.all()],
+    )
+
+def sitemap_index(request):
+    index = sitemap_cache.get(INDEX_SCOPE, settings.SITEMAP_MAX_AGE)
+    if index is None:
+        version = sitemap_cache.version
+        count = sitemap_count(settings.SITEMAP_SIZE)
+        body = render_sitemap_index(
+            request.build_absolute_uri(reverse("sitemap", args=[number])) for number in range(count)
+        )
+        index = sitemap_cache.put(INDEX_SCOPE, body, version)
+
+    return feed_response(request, index, SITEMAP_MEDIA_TYPE)
+
+def sitemap(request, number: int):
+    cached = sitemap_cache.get(sitemap_scope(number), settings.SITEMAP_MAX_AGE)
+    if cached is not None:
+        return feed_response(request, cached, SITEMAP_MEDIA_TYPE)
+
+    version = sitemap_cache.version
+    if number >= sitemap_count(settings.SITEMAP_SIZE):
+        raise Http404
+
+    # The URL of every post is the detail URL of id 0 with its id instead
+    detail_url = request.build_absolute_uri(reverse("detail", args=[0])).removesuffix("0")
+    chunks = stream_sitemap(number, detail_url, settings.SITEMAP_SIZE, settings.SITEMAP_BATCH_SIZE)
+
+    return StreamingHttpResponse(
+        cache_stream(sitemap_cache, sitemap_scope(number), version, chunks), content_type=SITEMAP_MEDIA_TYPE
+    )
+
+def _blog_results(request):
+    """
+    The page of blogs matching the tags and search of the request, the query
+    string of those filters for the pagination links and the cursor of the
+    feed continuing after the page.
+    """
     tag_slugs = request.GET.get('tag', '')
     search = request.GET.get('search')
 
     tag_slugs_list = tag_slugs.split(',') if tag_slugs else []
-    blog_list = BlogPost.objects.with_tags(tag_slugs_list).search_by_title(search)
-    tags = Tag.objects.all()
+    blog_list = BlogPost.objects.with_tags(tag_slugs_list).search_by_title(search).prefetch_related("tags")
 
     paginator = Paginator(blog_list, 6)
     page = request.GET.get('page')
     blogs = paginator.get_page(page)
 
-    return render(request, "blogs/blogs.html", {"blogs": blogs, "tags": tags, "selected_tags": tag_slugs_list})
+    filters = request.GET.copy()
+    filters.pop('page', None)
+
+    feed_cursor = None
+    if blogs.has_next():
+        feed_cursor = FeedCursor(blogs[-1].created_at, blogs[-1].id, tag_slugs_list, search).encode()
+
+    return {
+        "blogs": blogs,
+        "selected_tags": tag_slugs_list,
+        "filter_query": filters.urlencode(),
+        "feed_cursor": feed_cursor,
+    }
+
+def blogs(request):
+    tags = Tag.objects.all()
+
+    return render(request, "blogs/blogs.html", {**_blog_results(request), "tags": tags})
+
+def blogs_fragment(request):
+    return render(request, "blogs/components/blog_results.html", _blog_results(request))
+
+def blogs_feed(request):
+    tag_slugs = request.GET.get('tag', '')
+    search = request.GET.get('search')
+    tag_slugs_list = tag_slugs.split(',') if tag_slugs else []
+    try:
+        per_page = max(int(request.GET.get("per_page", 6)), 1)
+    except ValueError:
+        per_page = 6
+
+    try:
+        cursor = FeedCursor.decode(request.GET["cursor"]) if request.GET.get("cursor") else None
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    blog_list = BlogPost.objects.all()
+    if cursor:
+        tag_slugs_list, search = cursor.tag_slugs, cursor.search
+        blog_list = blog_list.older_than(cursor.created_at, cursor.id)
+
+    # One more than the batch tells whether there is a next one
+    blogs = list(blog_list.with_tags(tag_slugs_list).search_by_title(search).prefetch_related("tags")[:per_page + 1])
+    blogs, more = blogs[:per_page], len(blogs) > per_page
+
+    next_cursor = None
+    if more:
+        next_cursor = FeedCursor(blogs[-1].created_at, blogs[-1].id, tag_slugs_list, search).encode()
+
+    response = JsonResponse({
+        "html": render_to_string("blogs/components/blog_feed.html", {"blogs": blogs}, request),
+        "cursor": next_cursor,
+    })
+    # A cursor always reads the same batch, so the response is cached by its URL
+    patch_cache_control(response, public=True, max_age=settings.FEED_CACHE_SECONDS)
+
+    return response
+
+def suggest(request):
+    query = request.GET.get("q", "")[:100]
+    try:
+        limit = min(max(int(request.GET.get("limit", 8)), 1), 20)
+    except ValueError:
+        limit = 8
+
+    suggestions = suggest_titles(query, limit)
+
+    return JsonResponse({"suggestions": [
+        {"id": blog_id, "title": title, "url": reverse("detail", args=[blog_id])}
+        for blog_id, title in suggestions
+    ]})
 
 def detail(request, blog_id: int):
-    blog = get_object_or_404(BlogPost, pk=blog_id)
-    related_blogs = BlogPost.objects.related_to(blog)
+    blog = get_object_or_404(BlogPost.objects.select_related("author").prefetch_related("tags"), pk=blog_id)
+    related_blogs = BlogPost.objects.prefetch_related("tags").related_to(blog)
+    view_counter.increment(blog.id)
 
     return render(request, "blogs/detail.html", {"blog": blog, "related_blogs": related_blogs})
 
+def popular_blogs(request):
+    blogs = BlogPost.objects.prefetch_related("tags").popular(settings.POPULAR_BLOGS)
+
+    return render(request, "blogs/popular.html", {"blogs": blogs})
+
 @login_required(login_url='/accounts/login/')
 def my_blogs(request):
-    blog_list = BlogPost.objects.by_author(request.user)
+    blog_list = BlogPost.objects.by_author(request.user).prefetch_related("tags")
 
     paginator = Paginator(blog_list, 6)
     page = request.GET.get('page')
@@ -42,6 +213,62 @@ def my_blogs(request):
 
     return render(request, "blogs/my_blogs.html", {"blogs": blogs})
 
+@login_required(login_url='/accounts/login/')
+def upload_policy(request):
+    if not settings.DIRECT_UPLOADS:
+        raise Http404("Direct uploads are disabled")
+
+    try:
+        policy = direct_uploads.upload_policy(request.GET.get("filename", "")[:255], reverse("store_upload"))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    response = JsonResponse(policy)
+    patch_cache_control(response, no_store=True)
+
+    return response
+
+@csrf_exempt
+@require_POST
+def store_upload(request):
+    """
+    Local stand-in of an S3 style storage for direct uploads, storing the file
+    of a form signed by `upload_policy` under its key. Only used when images
+    are stored locally, with Cloudinary the browser uploads to Cloudinary.
+    """
+    if not settings.DIRECT_UPLOADS or settings.USE_CLOUDINARY:
+        raise Http404("Direct uploads are disabled")
+
+    key, file = request.POST.get("key", ""), request.FILES.get("file")
+
+    try:
+        max_bytes = direct_uploads.check_policy(key, request.POST.get("policy", ""), request.POST.get("signature", ""))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=403)
+
+    if file is None:
+        return JsonResponse({"error": "No file uploaded"}, status=400)
+    if file.size > max_bytes:
+        return JsonResponse({"error": "The file is too large"}, status=400)
+
+    path = Path(settings.MEDIA_ROOT) / key
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with observe_upload("local", file.size), open(path, "wb") as stored:
+        for chunk in file.chunks():
+            stored.write(chunk)
+
+    return HttpResponse(status=204)
+
+def serve_media(request, path, document_root=None):
+    """
+    Serves the locally stored images. An image is never overwritten, and the
+    images of the posts are named by their content, so browsers and proxies
+    may cache them without revalidating.
+    """
+    response = static.serve(request, path, document_root=document_root)
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_SECONDS, immutable=True)
+    return response
+
 @login_required(login_url='/accounts/login/')
 def create(request):
     if request.method == "POST":
@@ -31,6 +31,7 @@ SECURE_HSTS_PRELOAD = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
 USE_CLOUDINARY = True
+DIRECT_UPLOADS = os.environ.get("DIRECT_UPLOADS", "True").lower() == "true"
 
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': os.environ.get('CLOUDINARY_CLOUD_NAME'),
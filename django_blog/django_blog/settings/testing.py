@@ -13,10 +13,14 @@ DATABASES = {
 
 USE_CLOUDINARY = False
 
+# The tests flush the views themselves
+VIEW_FLUSH_SECONDS = None
+
 DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.BCryptPasswordHasher',
 ]
\ No newline at end of file
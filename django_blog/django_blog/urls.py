@@ -18,13 +18,15 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
+from blogs.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('', include("monitoring.urls")),
     path("accounts/", include("accounts.urls")),
     path("accounts/", include("django.contrib.auth.urls")),
     path('', include("blogs.urls")),
 ]
 
 if not settings.USE_CLOUDINARY:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,53 @@
+from .models import RequestProfile
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """
+    Lists the request profiles, they are created by `?profile=1` or an `X-Profile: 1` header.
+    """
+    list_display = ("created_at", "method", "path", "duration", "user", "open_profile")
+    list_filter = ("method",)
+    search_fields = ("path",)
+    readonly_fields = ("created_at", "method", "path", "duration", "user", "open_profile")
+    fields = readonly_fields
+
+    def has_module_permission(self, request):
+        return request.user.is_active and request.user.is_staff
+
+    def has_view_permission(self, request, obj=None):
+        return self.has_module_permission(request)
+
+    def has_delete_permission(self, request, obj=None):
+        return self.has_module_permission(request)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path("<int:pk>/profile/", self.admin_site.admin_view(self.profile_view), name="monitoring_requestprofile_profile"),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(description="Profile")
+    def open_profile(self, obj):
+        url = reverse("admin:monitoring_requestprofile_profile", args=[obj.pk])
+        return format_html('<a href="{}" target="_blank">Open</a>', url)
+
+    def profile_view(self, request, pk):
+        """
+        Serves the HTML call tree and timeline of the profile.
+        """
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if not self.has_view_permission(request, profile) or not profile.file_path.is_file():
+            raise Http404("Profile not found")
+
+        return FileResponse(profile.file_path.open("rb"), content_type="text/html")
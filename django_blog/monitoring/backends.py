@@ -0,0 +1,29 @@
+from django.template.backends.django import DjangoTemplates
+from monitoring.metrics import TEMPLATE_RENDER_DURATION
+from monitoring.timing import phase
+
+class TimedTemplate:
+    """
+    Template wrapper reporting its rendering as the `render` phase and in the render time metric.
+    """
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        name = self.template.origin.template_name or "<string>"
+
+        with phase("render"), TEMPLATE_RENDER_DURATION.labels(name).time():
+            return self.template.render(context, request)
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Django template backend whose templates report their rendering time.
+    """
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
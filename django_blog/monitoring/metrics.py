@@ -0,0 +1,80 @@
+import os
+from contextlib import contextmanager
+from typing import Optional
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess
+)
+
+# The metric names are shared with the FastAPI and Flask apps, keep them in sync.
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Number of handled HTTP requests.", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests.", ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Number of HTTP requests being handled.", ["method"], multiprocess_mode="livesum"
+)
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Number of open database connections held by the workers.", multiprocess_mode="livesum"
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Number of cache lookups.", ["cache", "result"]
+)
+UPLOAD_SIZE = Histogram(
+    "upload_size_bytes", "Size of uploaded images.", ["storage"],
+    buckets=[10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000]
+)
+UPLOAD_DURATION = Histogram(
+    "upload_duration_seconds", "Time spent storing uploaded images.", ["storage"]
+)
+TEMPLATE_RENDER_DURATION = Histogram(
+    "template_render_duration_seconds", "Time spent rendering templates.", ["template"]
+)
+JOBS = Counter(
+    "jobs_total", "Number of background job runs by outcome.", ["job", "status"]
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Time spent running background jobs.", ["job"]
+)
+JOBS_IN_PROGRESS = Gauge(
+    "jobs_in_progress", "Number of background jobs being run.", ["job"], multiprocess_mode="livesum"
+)
+JOB_QUEUE_DELAY = Histogram(
+    "job_queue_delay_seconds", "Time background jobs waited between being due and starting.", ["job"],
+    buckets=[0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900]
+)
+
+def record_cache_lookup(cache: str, hit: bool):
+    """
+    Counts a lookup of the named cache as a hit or a miss.
+    """
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+@contextmanager
+def observe_upload(storage: str, size: Optional[int]):
+    """
+    Records the size of an uploaded file and the time spent storing it.
+    """
+    if size is not None:
+        UPLOAD_SIZE.labels(storage).observe(size)
+
+    with UPLOAD_DURATION.labels(storage).time():
+        yield
+
+def get_registry():
+    """
+    Get the registry to export. When gunicorn runs several workers,
+    `PROMETHEUS_MULTIPROC_DIR` is set and the values of all workers are aggregated.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+
+    return REGISTRY
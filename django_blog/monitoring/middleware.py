@@ -0,0 +1,129 @@
+import logging
+import time
+import uuid
+from contextlib import ExitStack
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware, get_user
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+from monitoring.metrics import DB_POOL_CONNECTIONS_IN_USE, HTTP_REQUEST_DURATION, HTTP_REQUESTS, HTTP_REQUESTS_IN_PROGRESS
+from monitoring.profiling import PROFILE_HEADER, profile_requested, save_profile
+from monitoring.queries import record_queries
+from monitoring.timing import phase, query_phase, request_timing
+from pyinstrument import Profiler
+
+logger = logging.getLogger(__name__)
+
+class MetricsMiddleware:
+    """
+    Counts and times every request by method, route and status code.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        method = request.method
+        status = 500
+        start = time.perf_counter()
+
+        HTTP_REQUESTS_IN_PROGRESS.labels(method).inc()
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.labels(method).dec()
+
+            # The route pattern, e.g. /blogs/<int:blog_id>, keeps the label values bounded
+            match = getattr(request, "resolver_match", None)
+            route = f"/{match.route}" if match else "<unmatched>"
+            HTTP_REQUESTS.labels(method, route, status).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
+
+            # Django keeps one connection per worker thread instead of a pool
+            DB_POOL_CONNECTIONS_IN_USE.set(sum(1 for connection in connections.all() if connection.connection is not None))
+
+        return response
+
+class QueryMonitorMiddleware:
+    """
+    Records the queries of each request and logs a warning when the same
+    statement shape repeats more than `QUERY_REPEAT_THRESHOLD` times, which
+    usually means a relation is loaded inside a loop.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as stats:
+            request.query_stats = stats
+            response = self.get_response(request)
+
+        request_line = f"{request.method} {request.path}"
+        logger.debug("%s: %d queries in %.1f ms", request_line, stats.count, stats.duration * 1000)
+
+        for shape, count in stats.repeated(settings.QUERY_REPEAT_THRESHOLD):
+            logger.warning("Possible N+1 in %s: statement executed %d times: %s", request_line, count, shape)
+
+        return response
+
+class ServerTimingMiddleware:
+    """
+    Collects the phases timed during a request and attaches them to the
+    response as a `Server-Timing` header, together with the DB time and total.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+
+        with request_timing() as timing, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_phase))
+
+            response = self.get_response(request)
+
+        total = time.perf_counter() - start
+        response.headers["Server-Timing"] = timing.header(total, getattr(request, "query_stats", None))
+
+        return response
+
+class TimedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware reporting the lazy user lookup as the `auth` phase.
+    """
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: self.get_timed_user(request))
+
+    def get_timed_user(self, request):
+        with phase("auth"):
+            return get_user(request)
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests of staff users that ask for it with `?profile=1` or
+    an `X-Profile: 1` header. The profile is listed in the admin and its file
+    name is returned in the `X-Profile` response header.
+
+    It reads `request.user`, so it has to come after the authentication middleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # The cheap check first, so other requests do not load the user
+        if not (profile_requested(request) and request.user.is_staff):
+            return self.get_response(request)
+
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL, async_mode="disabled")
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+
+        profile = save_profile(request, profiler, f"{uuid.uuid4().hex}.html")
+        response[PROFILE_HEADER] = profile.file_name
+
+        return response
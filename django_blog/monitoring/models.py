@@ -0,0 +1,25 @@
+from accounts.models import EmailUser
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+class RequestProfile(models.Model):
+    """
+    A request profiled on demand by a staff user, the HTML profile is stored in `PROFILES_DIR`.
+    """
+    created_at = models.DateTimeField(default=timezone.now)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    duration = models.FloatField(help_text="Profiled time in seconds")
+    user = models.ForeignKey(EmailUser, null=True, on_delete=models.SET_NULL)
+    file_name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    @property
+    def file_path(self):
+        return settings.PROFILES_DIR / self.file_name
+
+    def __str__(self):
+        return f"{self.method} {self.path}"
@@ -0,0 +1,33 @@
+from django.conf import settings
+from monitoring.models import RequestProfile
+from pyinstrument import Profiler
+
+PROFILE_HEADER = "X-Profile"
+
+def profile_requested(request):
+    """
+    Checks if the request asks for a profile with `?profile=1` or an `X-Profile: 1` header.
+    """
+    return request.GET.get("profile") == "1" or request.headers.get(PROFILE_HEADER) == "1"
+
+def save_profile(request, profiler: Profiler, file_name: str):
+    """
+    Writes the profile as an HTML call tree and timeline and lists it in the admin,
+    only the newest `PROFILES_KEEP` profiles are kept.
+    """
+    settings.PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    (settings.PROFILES_DIR / file_name).write_text(profiler.output_html(), encoding="utf-8")
+
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.path[:2048],
+        duration=profiler.last_session.duration,
+        user=request.user,
+        file_name=file_name
+    )
+
+    # The files are removed by the post_delete signal
+    stale = RequestProfile.objects.values_list("pk", flat=True)[settings.PROFILES_KEEP:]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+
+    return profile
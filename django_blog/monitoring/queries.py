@@ -0,0 +1,78 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import List, Optional, Tuple
+from django.db import connections
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(statement: str):
+    """
+    Reduces a SQL statement to its shape, so statements differing only in
+    literals, parameters or the length of an IN list compare equal.
+    """
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+
+    return _WHITESPACE.sub(" ", statement).strip()
+
+class QueryStats:
+    """
+    Execute wrapper collecting the count, time and shapes of the queries it sees.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints: Counter[str] = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Get the statement shapes executed more than `threshold` times.
+        """
+        return [(shape, count) for shape, count in self.fingerprints.most_common() if count > threshold]
+
+@contextmanager
+def record_queries():
+    """
+    Records every query executed inside the block on any database connection.
+    """
+    stats = QueryStats()
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+
+        yield stats
+
+@contextmanager
+def assert_max_queries(limit: int, repeat_threshold: Optional[int] = None):
+    """
+    Fails when the block executes more than `limit` queries, or when a statement
+    shape repeats more than `repeat_threshold` times.
+    """
+    with record_queries() as stats:
+        yield stats
+
+    shapes = "\n".join(f"{count}x {shape}" for shape, count in stats.fingerprints.most_common())
+    assert stats.count <= limit, f"Expected at most {limit} queries, got {stats.count}:\n{shapes}"
+
+    if repeat_threshold is not None:
+        repeated = stats.repeated(repeat_threshold)
+        assert not repeated, f"Statements repeated more than {repeat_threshold} times:\n{shapes}"
@@ -0,0 +1,43 @@
+import time
+from django.conf import settings
+from django.core.files import File
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from blogs.models import BlogPost
+from monitoring.metrics import UPLOAD_DURATION, UPLOAD_SIZE
+from monitoring.models import RequestProfile
+
+def get_pending_upload(image):
+    """
+    Get the file that will be uploaded when the blog post is saved, if any.
+    """
+    if isinstance(image, FieldFile):
+        return image if image and not image._committed else None
+
+    return image if isinstance(image, File) else None
+
+@receiver(pre_save, sender=BlogPost)
+def start_upload_metrics(sender, instance, **kwargs):
+    """
+    The image is stored by the field while the blog post is saved, so the
+    upload is timed from the pre_save to the post_save signal.
+    """
+    upload = get_pending_upload(instance.image)
+    if upload is not None:
+        instance._upload_started = (time.perf_counter(), upload.size)
+
+@receiver(post_save, sender=BlogPost)
+def finish_upload_metrics(sender, instance, **kwargs):
+    started = instance.__dict__.pop("_upload_started", None)
+    if started is None:
+        return
+
+    start, size = started
+    storage = "cloudinary" if settings.USE_CLOUDINARY else "local"
+    UPLOAD_SIZE.labels(storage).observe(size)
+    UPLOAD_DURATION.labels(storage).observe(time.perf_counter() - start)
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_file(sender, instance, **kwargs):
+    instance.file_path.unlink(missing_ok=True)
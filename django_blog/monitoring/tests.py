@@ -0,0 +1,301 @@
+import tempfile
+from pathlib import Path
+from blogs.models import BlogPost, Tag
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from monitoring.metrics import record_cache_lookup
+from monitoring.middleware import QueryMonitorMiddleware
+from monitoring.models import RequestProfile
+from monitoring.queries import QueryStats, assert_max_queries, fingerprint
+from monitoring.timing import ServerTiming
+from prometheus_client import REGISTRY
+
+class QueryMonitoringTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        food = Tag.objects.create(name="Food")
+        tech = Tag.objects.create(name="Tech")
+
+        for i in range(7):
+            blog = BlogPost.objects.create(title=f"Blog{i}", content="Content", author=self.user)
+            blog.tags.set([food, tech] if i % 2 else [food])
+
+    def test_fingerprint_ignores_literals_and_list_lengths(self):
+        """
+        Statements differing only in values share a fingerprint.
+        """
+        first = fingerprint('SELECT * FROM "blogs_blogpost" WHERE "id" IN (%s, %s, %s) AND "title" = \'a\'')
+        second = fingerprint('SELECT *  FROM "blogs_blogpost"\nWHERE "id" IN (%s) AND "title" = \'it\'\'s\'')
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, 'SELECT * FROM "blogs_blogpost" WHERE "id" IN (?) AND "title" = ?')
+
+    def test_blog_list_query_count(self):
+        """
+        The blog list runs a constant number of queries.
+        """
+        with assert_max_queries(4, repeat_threshold=1) as stats:
+            response = self.client.get(reverse("blogs"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(stats.count, 0)
+
+    def test_blog_detail_query_count(self):
+        """
+        The blog detail runs a constant number of queries, the session user included.
+        """
+        self.client.login(email="user@example.com", password="password")
+        blog = BlogPost.objects.first()
+
+        with assert_max_queries(6, repeat_threshold=2):
+            response = self.client.get(reverse("detail", args=[blog.id]))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_assert_max_queries_fails_when_exceeded(self):
+        """
+        The assertion fails when the limit is exceeded.
+        """
+        with self.assertRaisesMessage(AssertionError, "Expected at most 1 queries, got 2"):
+            with assert_max_queries(1):
+                list(BlogPost.objects.filter(pk=1))
+                list(BlogPost.objects.filter(pk=2))
+
+    def test_middleware_warns_about_repeated_statements(self):
+        """
+        A statement repeated above the threshold in one request logs a warning.
+        """
+        def n_plus_one(request):
+            for blog in BlogPost.objects.all():
+                list(blog.tags.all())
+            return HttpResponse("ok")
+
+        middleware = QueryMonitorMiddleware(n_plus_one)
+
+        with self.assertLogs("monitoring.middleware", level="WARNING") as logs:
+            middleware(RequestFactory().get("/blogs/"))
+
+        self.assertIn("Possible N+1 in GET /blogs/: statement executed 7 times", logs.output[0])
+
+def parse_server_timing(header: str):
+    """
+    Returns the metric names of a Server-Timing header.
+    """
+    return [metric.split(";")[0].strip() for metric in header.split(",")]
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        blog = BlogPost.objects.create(title="Blog title", content="Content", author=self.user)
+        blog.tags.set([Tag.objects.create(name="Food")])
+
+    def test_server_timing_header_format(self):
+        """
+        Repeated phases are summed and the db and total metrics are appended.
+        """
+        timing = ServerTiming()
+        timing.add("auth", 0.002)
+        timing.add("db.blogs_tag", 0.001)
+        timing.add("db.blogs_tag", 0.0015)
+        queries = QueryStats()
+        queries.count, queries.duration = 1, 0.003
+
+        self.assertEqual(
+            timing.header(0.0201, queries),
+            'auth;dur=2.0, db.blogs_tag;dur=2.5;desc="2 calls", db;dur=3.0;desc="1 queries", total;dur=20.1'
+        )
+
+    def test_blog_list_server_timing(self):
+        """
+        The blog list reports its queries per table, rendering and DB time.
+        """
+        response = self.client.get(reverse("blogs"))
+
+        metrics = parse_server_timing(response.headers["Server-Timing"])
+        self.assertIn("db.blogs_blogpost", metrics)
+        self.assertIn("db.blogs_tag", metrics)
+        self.assertIn("render", metrics)
+        self.assertEqual(metrics[-2:], ["db", "total"])
+
+    def test_authenticated_request_server_timing(self):
+        """
+        Requests of a logged in user report the user lookup.
+        """
+        self.client.login(email="user@example.com", password="password")
+
+        response = self.client.get(reverse("my_blogs"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("auth", parse_server_timing(response.headers["Server-Timing"]))
+
+    def test_login_server_timing(self):
+        """
+        The login reports the password check.
+        """
+        response = self.client.post(reverse("login"), {"email": "user@example.com", "password": "password"})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("password", parse_server_timing(response.headers["Server-Timing"]))
+
+def sample(name, **labels):
+    """
+    Get the current value of a metric sample, 0 when it was not recorded yet.
+    """
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.blog = BlogPost.objects.create(title="Blog title", content="Content", author=self.user)
+
+    def test_requests_are_counted_by_route_pattern(self):
+        """
+        Requests are labeled with the route pattern, not the concrete path.
+        """
+        labels = {"method": "GET", "route": "/blogs/<int:blog_id>"}
+        before = sample("http_requests_total", status="200", **labels)
+        duration_before = sample("http_request_duration_seconds_count", **labels)
+
+        self.client.get(reverse("detail", args=[self.blog.id]))
+        self.client.get(reverse("detail", args=[self.blog.id]))
+
+        self.assertEqual(sample("http_requests_total", status="200", **labels), before + 2)
+        self.assertEqual(sample("http_request_duration_seconds_count", **labels), duration_before + 2)
+        self.assertEqual(sample("http_requests_in_progress", method="GET"), 0)
+
+    def test_not_found_requests_are_counted(self):
+        """
+        Unknown paths share one label value.
+        """
+        before = sample("http_requests_total", method="GET", route="<unmatched>", status="404")
+
+        self.client.get("/does-not-exist")
+
+        self.assertEqual(sample("http_requests_total", method="GET", route="<unmatched>", status="404"), before + 1)
+
+    def test_metrics_endpoint(self):
+        """
+        The metrics endpoint exposes request, connection and template metrics.
+        """
+        self.client.get(reverse("blogs"))
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        content = response.content.decode()
+        self.assertIn('http_requests_total{method="GET",route="/blogs/",status="200"}', content)
+        self.assertIn('template_render_duration_seconds_count{template="blogs/blogs.html"}', content)
+        self.assertIn("db_pool_connections_in_use", content)
+
+    def test_cache_lookups_are_counted(self):
+        """
+        Cache hits and misses are counted separately.
+        """
+        hits = sample("cache_requests_total", cache="test", result="hit")
+        misses = sample("cache_requests_total", cache="test", result="miss")
+
+        record_cache_lookup("test", hit=True)
+        record_cache_lookup("test", hit=False)
+
+        self.assertEqual(sample("cache_requests_total", cache="test", result="hit"), hits + 1)
+        self.assertEqual(sample("cache_requests_total", cache="test", result="miss"), misses + 1)
+
+    def test_image_upload_is_measured(self):
+        """
+        Saving a blog post with a new image records the upload size and duration.
+        """
+        uploads = sample("upload_size_bytes_sum", storage="local")
+        durations = sample("upload_duration_seconds_count", storage="local")
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            self.blog.image = SimpleUploadedFile("image.jpg", b"x" * 2048, content_type="image/jpeg")
+            self.blog.save()
+            self.blog.save()
+
+        self.assertEqual(sample("upload_size_bytes_sum", storage="local"), uploads + 2048)
+        self.assertEqual(sample("upload_duration_seconds_count", storage="local"), durations + 1)
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(email="staff@example.com", password="password", is_staff=True)
+        self.user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        profiles_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profiles_dir.cleanup)
+        self.profiles_dir = Path(profiles_dir.name)
+        settings_override = override_settings(PROFILES_DIR=self.profiles_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_staff_request_is_profiled(self):
+        """
+        A staff user gets a profile of the request with the query parameter.
+        """
+        self.client.login(email="staff@example.com", password="password")
+
+        response = self.client.get(reverse("blogs"), {"profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response.headers["X-Profile"], profile.file_name)
+        self.assertEqual((profile.method, profile.path, profile.user), ("GET", "/blogs/", self.staff))
+        self.assertIn("pyinstrument", profile.file_path.read_text(encoding="utf-8"))
+
+    def test_staff_request_is_profiled_with_header(self):
+        """
+        The profile can be requested with a header.
+        """
+        self.client.login(email="staff@example.com", password="password")
+
+        response = self.client.get(reverse("blogs"), headers={"X-Profile": "1"})
+
+        self.assertIn("X-Profile", response.headers)
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    def test_non_staff_request_is_not_profiled(self):
+        """
+        Regular users can not profile requests.
+        """
+        self.client.login(email="user@example.com", password="password")
+
+        response = self.client.get(reverse("blogs"), {"profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile", response.headers)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_only_newest_profiles_are_kept(self):
+        """
+        Old profiles and their files are removed above the limit.
+        """
+        self.client.login(email="staff@example.com", password="password")
+
+        with override_settings(PROFILES_KEEP=2):
+            for _ in range(3):
+                response = self.client.get(reverse("blogs"), {"profile": "1"})
+
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        self.assertEqual(RequestProfile.objects.first().file_name, response.headers["X-Profile"])
+        self.assertEqual(len(list(self.profiles_dir.iterdir())), 2)
+
+    def test_admin_lists_and_opens_profiles(self):
+        """
+        The admin lists the profiles to staff users and serves them.
+        """
+        self.client.login(email="staff@example.com", password="password")
+        self.client.get(reverse("blogs"), {"profile": "1"})
+        profile = RequestProfile.objects.get()
+
+        response = self.client.get(reverse("admin:monitoring_requestprofile_changelist"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "/blogs/")
+
+        response = self.client.get(reverse("admin:monitoring_requestprofile_profile", args=[profile.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "text/html")
+        response.close()
@@ -0,0 +1,104 @@
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Union
+from monitoring.queries import QueryStats
+
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+"?(\w+)"?', re.IGNORECASE)
+
+class ServerTiming:
+    """
+    Named phases of one request, rendered as a `Server-Timing` header.
+    """
+    def __init__(self):
+        self.phases: Dict[str, List[float]] = {}
+
+    def add(self, name: str, duration: float):
+        """
+        Adds a duration to the phase, summing repeated calls of the same phase.
+        """
+        phase = self.phases.setdefault(name, [0.0, 0])
+        phase[0] += duration
+        phase[1] += 1
+
+    def header(self, total: float, queries: Optional[QueryStats] = None):
+        """
+        Builds the header value, durations are in milliseconds.
+        """
+        metrics = []
+
+        for name, (duration, calls) in self.phases.items():
+            metric = f"{name};dur={duration * 1000:.1f}"
+            if calls > 1:
+                metric += f';desc="{calls} calls"'
+            metrics.append(metric)
+
+        if queries is not None:
+            metrics.append(f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"')
+
+        metrics.append(f"total;dur={total * 1000:.1f}")
+
+        return ", ".join(metrics)
+
+_current_timing: ContextVar[Optional[ServerTiming]] = ContextVar("server_timing", default=None)
+
+@contextmanager
+def phase(name: str):
+    """
+    Times the block as the named phase of the current request, if there is one.
+    """
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+def timed(name: Union[str, Callable, None] = None):
+    """
+    Decorator timing every call of a function as a request phase.
+    The phase is named after the function's qualified name unless `name` is given.
+    """
+    if callable(name):
+        return timed()(name)
+
+    def decorator(func: Callable):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+def query_phase(execute, sql, params, many, context):
+    """
+    Execute wrapper timing each query as a phase named after its table,
+    as querysets are lazy and only hit the database once they are iterated.
+    """
+    match = _TABLE.search(sql)
+
+    with phase(f"db.{match.group(1)}" if match else "db.other"):
+        return execute(sql, params, many, context)
+
+@contextmanager
+def request_timing():
+    """
+    Makes a new ServerTiming the current one for the duration of the block.
+    """
+    timing = ServerTiming()
+    token = _current_timing.set(timing)
+
+    try:
+        yield timing
+    finally:
+        _current_timing.reset(token)
@@ -0,0 +1,6 @@
+from django.http import HttpResponse
+from monitoring.metrics import get_registry
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+def metrics(request):
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
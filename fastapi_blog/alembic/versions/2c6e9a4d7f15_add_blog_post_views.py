@@ -0,0 +1,30 @@
+"""Add blog post views
+
+Revision ID: 2c6e9a4d7f15
+Revises: 8d3e5b1f0c27
+Create Date: 2026-10-19 21:36:08.214537
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c6e9a4d7f15'
+down_revision: Union[str, None] = '8d3e5b1f0c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('blog_post', sa.Column('views', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_blog_post_views_id', 'blog_post', ['views', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_blog_post_views_id', table_name='blog_post')
+    op.drop_column('blog_post', 'views')
@@ -0,0 +1,47 @@
+"""Add blog post card
+
+Revision ID: 4f7c2d9e1a6b
+Revises: 11ac559f37f9
+Create Date: 2026-10-19 10:12:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from fastapi_blog.blogs.models import rebuild_cards
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f7c2d9e1a6b'
+down_revision: Union[str, None] = '11ac559f37f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('blog_post_card',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('excerpt', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('image', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('author_name', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+    sa.Column('tags', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['blog_post.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_blog_post_card_author_id'), 'blog_post_card', ['author_id'], unique=False)
+    op.create_index(op.f('ix_blog_post_card_created_at'), 'blog_post_card', ['created_at'], unique=False)
+
+    rebuild_cards(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_blog_post_card_created_at'), table_name='blog_post_card')
+    op.drop_index(op.f('ix_blog_post_card_author_id'), table_name='blog_post_card')
+    op.drop_table('blog_post_card')
@@ -0,0 +1,40 @@
+"""Add blog import
+
+Revision ID: 8d3e5b1f0c27
+Revises: 4f7c2d9e1a6b
+Create Date: 2026-10-19 14:03:27.904615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3e5b1f0c27'
+down_revision: Union[str, None] = '4f7c2d9e1a6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('blog_import',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('checksum', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('file_name', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('records', sa.Integer(), nullable=False),
+    sa.Column('imported', sa.Integer(), nullable=False),
+    sa.Column('skipped', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('checksum')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('blog_import')
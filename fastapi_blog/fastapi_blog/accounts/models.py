@@ -1,10 +1,12 @@
 from datetime import datetime, timezone
 from typing import List, Optional
 from fastapi import Request
+from fastapi_blog.monitoring.timing import timed
 from sqlmodel import Field, Relationship, SQLModel
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Django's PBKDF2 hashes of users migrated from the Django app are verified, and rehashed on login
+pwd_context = CryptContext(schemes=["bcrypt", "django_pbkdf2_sha256"], deprecated="auto")
 
 class EmailUser(SQLModel, table=True):
     __tablename__ = "email_user"
@@ -18,9 +20,16 @@ class EmailUser(SQLModel, table=True):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
     blog_posts: List["BlogPost"] = Relationship(back_populates="author")
 
+    @timed("password")
     def verify_password(self, password: str) -> bool:
+        if pwd_context.identify(self.password_hash) is None:
+            return False
         return pwd_context.verify(password, self.password_hash)
 
+    def password_needs_rehash(self) -> bool:
+        return pwd_context.identify(self.password_hash) is not None and pwd_context.needs_update(self.password_hash)
+
+    @timed("password")
     def set_password(self, password: str) -> None:
         self.password_hash = pwd_context.hash(password)
 
@@ -40,6 +40,9 @@ async def login(
             user = await user_service.get_user_by_email(form.email.data)
 
             if user and user.verify_password(form.password.data):
+                if user.password_needs_rehash():
+                    await user_service.rehash_password(user, form.password.data)
+
                 access_token = manager.create_access_token(data={"sub": user.email})
                 response = RedirectResponse(url=next or "/", status_code=HTTP_303_SEE_OTHER)
                 manager.set_cookie(response, access_token)
@@ -2,6 +2,7 @@ from datetime import timedelta
 from fastapi_blog.database import async_engine
 from fastapi_blog.config import settings
 from fastapi_blog.exceptions import NotAuthenticatedException
+from fastapi_blog.monitoring.timing import timed
 from fastapi_blog.repositories.email_user_repository import EmailUserRepository
 from fastapi_login import LoginManager
 from sqlalchemy.orm import sessionmaker
@@ -19,6 +20,7 @@ manager = LoginManager(
 )
 
 @manager.user_loader()
+@timed("auth")
 async def load_user(email: str):
     Session = sessionmaker(
         bind=async_engine, class_=AsyncSession, expire_on_commit=False
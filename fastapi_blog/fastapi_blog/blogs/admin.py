@@ -1,16 +1,38 @@
-from typing import Any, Dict
-from fastapi import Request
+import asyncio
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Dict
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi_blog.admin import AdminView
+from fastapi_blog.config import settings
+from fastapi_blog import database
 from fastapi_blog.database import async_engine
-from fastapi_blog.blogs.models import BlogPost
+from fastapi_blog.blogs.jobs import IMPORT_BLOGS
+from fastapi_blog.blogs.models import BlogImport, BlogPost, Job
 from fastapi_blog.repositories.blog_post_repository import get_blog_post_repository
 from fastapi_blog.repositories.email_user_repository import get_email_user_repository
+from fastapi_blog.repositories.job_repository import get_job_repository
 from fastapi_blog.repositories.tag_repository import get_tag_repository
 from fastapi_blog.services.blog_post_service import BlogPostService, get_blog_post_service
-from starlette_admin import FileField
+from fastapi_blog.utils.blog_export import EXPORT_FORMATS, EXPORT_MEDIA_TYPES, stream_export
+from starlette.status import HTTP_303_SEE_OTHER
+from starlette.templating import Jinja2Templates
+from starlette_admin import CustomView, FileField
 from sqlalchemy.orm import sessionmaker
+from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+# Imports listed on the import page, waiting and done
+RECENT_IMPORTS = 10
+
+def store_import_file(file: BinaryIO, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as stored:
+        shutil.copyfileobj(file, stored)
+
 class BlogPostView(AdminView):
     model = BlogPost
     identity = "blog-post"
@@ -32,7 +54,8 @@ class BlogPostView(AdminView):
             tag_repo = get_tag_repository(session)
             blog_repo = get_blog_post_repository(session)
             user_repo = get_email_user_repository(session)
-            blog_service = get_blog_post_service(blog_repo, tag_repo, user_repo)
+            job_repo = get_job_repository(session)
+            blog_service = get_blog_post_service(blog_repo, tag_repo, user_repo, job_repo)
             return blog_service
 
     async def create(self, request: Request, data: Dict) -> BlogPost:
@@ -86,4 +109,66 @@ class BlogPostView(AdminView):
 
             return blog
         except Exception as e:
-            raise e
\ No newline at end of file
+            raise e
+
+class ImportBlogPostsView(CustomView):
+    """
+    Imports an uploaded NDJSON or CSV file of blog posts like the
+    `import_blogs` command. The file is stored and imported by the
+    `import_blogs` job, the page shows the progress of the recent imports.
+    Uploading an interrupted file again resumes it.
+    """
+    def __init__(self):
+        super().__init__(
+            label="Import BlogPosts",
+            icon="fa fa-file-import",
+            path="/import-blogs",
+            template_path="import_blogs.html",
+            methods=["GET", "POST"],
+        )
+
+    def is_accessible(self, request: Request) -> bool:
+        return request.state.user and request.state.user.is_staff
+
+    async def render(self, request: Request, templates: Jinja2Templates) -> Response:
+        async with database.SessionLocal() as session:
+            if request.method == "POST":
+                upload = (await request.form()).get("file")
+                if upload and upload.filename:
+                    path = settings.IMPORT_FOLDER / f"{uuid.uuid4()}{os.path.splitext(upload.filename)[1]}"
+                    await asyncio.to_thread(store_import_file, upload.file, path)
+                    await get_job_repository(session).enqueue(IMPORT_BLOGS, {"path": str(path), "file_name": upload.filename})
+
+                return RedirectResponse(request.url, status_code=HTTP_303_SEE_OTHER)
+
+            jobs = (await session.exec(
+                select(Job).where(Job.name == IMPORT_BLOGS).order_by(Job.id.desc()).limit(RECENT_IMPORTS)
+            )).all()
+            imports = (await session.exec(
+                select(BlogImport).order_by(BlogImport.started_at.desc()).limit(RECENT_IMPORTS)
+            )).all()
+
+        return templates.TemplateResponse(
+            self.template_path, {"request": request, "title": self.title(request), "jobs": jobs, "imports": imports}
+        )
+
+class ExportBlogPostsView(CustomView):
+    """
+    Streams all blog posts as NDJSON or CSV (`?format=csv`), linked from the import page.
+    """
+    def __init__(self):
+        super().__init__(label="Export BlogPosts", path="/export-blogs", add_to_menu=False)
+
+    def is_accessible(self, request: Request) -> bool:
+        return request.state.user and request.state.user.is_staff
+
+    async def render(self, request: Request, templates: Jinja2Templates) -> Response:
+        format = request.query_params.get("format", "ndjson")
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail="Unknown export format")
+
+        return StreamingResponse(
+            stream_export(database.SessionLocal, format, settings.EXPORT_CHUNK_SIZE),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="blog_posts.{format}"'},
+        )
@@ -1,4 +1,14 @@
 class BlogPostNotFoundError(Exception):
     """Custom exception for blog not found"""
     def __init__(self):
-        super().__init__("Blog post not found")
\ No newline at end of file
+        super().__init__("Blog post not found")
+
+class InvalidFeedCursorError(Exception):
+    """Custom exception for a malformed feed cursor"""
+    def __init__(self):
+        super().__init__("Invalid feed cursor")
+
+class InvalidUploadError(Exception):
+    """Custom exception for a direct upload that failed its checks"""
+    def __init__(self, message: str = "Invalid upload"):
+        super().__init__(message)
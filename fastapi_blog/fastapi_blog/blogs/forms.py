@@ -1,7 +1,7 @@
 from typing import List
 from fastapi_blog.blogs.models import Tag
 from starlette_wtf import StarletteForm
-from wtforms import FileField, StringField, TextAreaField, SelectMultipleField, ValidationError
+from wtforms import FileField, HiddenField, StringField, TextAreaField, SelectMultipleField, ValidationError
 from wtforms.widgets import ListWidget, CheckboxInput
 from wtforms.validators import DataRequired, Length
 
@@ -23,6 +23,8 @@ class BlogPostForm(StarletteForm):
     title = StringField("Title", validators=[DataRequired(), Length(max=255)])
     tags = MultiCheckboxField("Tags", coerce=int)
     image = FileField("Image", validators=[file_extension_allowed])
+    # The key of an image the browser uploaded straight to the storage, see `blogs/direct_uploads.py`
+    image_key = HiddenField()
     content = TextAreaField("Content")
 
     def __init__(self, all_tags: List[Tag], *args, **kwargs):
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from pathlib import Path
+import cloudinary.uploader
+from fastapi_blog.blogs.models import BlogPost
+from fastapi_blog.config import settings
+from fastapi_blog.jobs import job
+from fastapi_blog.monitoring.metrics import observe_upload
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_IMAGE = "upload_image"
+IMPORT_BLOGS = "import_blogs"
+
+@job(UPLOAD_IMAGE, concurrency=settings.UPLOAD_JOB_CONCURRENCY)
+async def upload_image(session: AsyncSession, payload: dict):
+    """
+    Uploads an image staged by `BlogPostService.stage_image` to Cloudinary
+    and sets it as the image of its post. The staged file is removed once
+    the post is committed, a run that finds no file has nothing left to do.
+    """
+    path = Path(payload["path"])
+    if not path.exists():
+        return
+
+    blog = await session.get(BlogPost, payload["blog_id"])
+    if blog is not None:
+        with observe_upload("cloudinary", path.stat().st_size):
+            upload_result = await asyncio.to_thread(cloudinary.uploader.upload, str(path))
+        blog.image = upload_result["secure_url"]
+        await session.commit()
+
+    path.unlink()
+
+@job(IMPORT_BLOGS, concurrency=1, lease_seconds=settings.IMPORT_JOB_LEASE_SECONDS)
+async def import_blogs(session: AsyncSession, payload: dict):
+    """
+    Imports a file of blog posts uploaded in the admin, its progress is kept
+    in its `BlogImport` row. A run after a failure resumes the import after
+    its last committed batch. The file is removed once it is imported.
+    """
+    # Imported here, the import sanitizes with the blog post service, which enqueues the jobs of this module
+    from fastapi_blog.utils.blog_import import import_blog_posts
+
+    path = Path(payload["path"])
+    if not path.exists():
+        return
+
+    await import_blog_posts(
+        session,
+        path,
+        file_name=payload["file_name"],
+        batch_size=settings.IMPORT_BATCH_SIZE,
+        workers=settings.IMPORT_WORKERS,
+        report=logger.info,
+    )
+    path.unlink()
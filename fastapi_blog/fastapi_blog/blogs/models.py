@@ -1,9 +1,14 @@
+import re
+from collections import Counter, defaultdict
 from datetime import datetime, timezone
-from typing import List, Optional
+from itertools import chain
+from typing import Collection, List, Optional
 from fastapi import Request
 from fastapi_blog.accounts.models import EmailUser
 from sqlmodel import Field, Relationship, SQLModel
-from sqlalchemy import event
+from sqlalchemy import JSON, Column, Connection, Index, bindparam, delete, event, func, inspect, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 from slugify import slugify
 
 class BlogPostTag(SQLModel, table=True):
@@ -39,12 +44,16 @@ def generate_slug(mapper, connection, target):
 
 class BlogPost(SQLModel, table=True):
     __tablename__ = "blog_post"
+    # Order of the popular blogs, read from the end of the index
+    __table_args__ = (Index("ix_blog_post_views_id", "views", "id"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(max_length=255)
     content: str
     image: Optional[str] = Field(default=None, max_length=255)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    # Only ever increased by the flushes of `blogs/view_counts.py`
+    views: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
 
     author: Optional[EmailUser] = Relationship(back_populates="blog_posts")
     author_id: int = Field(foreign_key="email_user.id")
@@ -55,3 +64,292 @@ class BlogPost(SQLModel, table=True):
 
     def __str__(self):
         return self.title
+
+class BlogPostCard(SQLModel, table=True):
+    """
+    Read model holding everything the blog cards and lists show, one row per
+    blog post, so the list pages read a single table.
+    """
+    __tablename__ = "blog_post_card"
+
+    id: int = Field(foreign_key="blog_post.id", primary_key=True, ondelete="CASCADE")
+    title: str = Field(max_length=255)
+    excerpt: str
+    image: Optional[str] = Field(default=None, max_length=255)
+    created_at: datetime = Field(index=True)
+    author_id: int = Field(index=True)
+    author_name: str = Field(max_length=100)
+    tags: List[List] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+
+# Characters of the content stored as the excerpt of a blog card
+CARD_EXCERPT_LENGTH = 500
+
+# Session info key collecting the blog posts whose cards are refreshed after the flush
+STALE_CARDS_KEY = "stale_cards"
+
+# Attributes of a blog post its card is built from
+CARD_POST_ATTRIBUTES = {"title", "content", "image", "created_at", "author", "tags"}
+
+CARD_SOURCE_STMT = (
+    select(
+        BlogPost.id,
+        BlogPost.title,
+        func.substr(BlogPost.content, 1, CARD_EXCERPT_LENGTH).label("excerpt"),
+        BlogPost.image,
+        BlogPost.created_at,
+        BlogPost.author_id,
+        func.coalesce(func.nullif(EmailUser.username, ""), EmailUser.email).label("author_name"),
+    )
+    .join(EmailUser, EmailUser.id == BlogPost.author_id)
+    .where(BlogPost.id.in_(bindparam("blog_ids", expanding=True)))
+)
+CARD_SOURCE_TAGS_STMT = (
+    select(BlogPostTag.blogpost_id, Tag.id, Tag.name, Tag.slug)
+    .join(Tag, Tag.id == BlogPostTag.tag_id)
+    .where(BlogPostTag.blogpost_id.in_(bindparam("blog_ids", expanding=True)))
+    .order_by(Tag.name)
+)
+
+def refresh_cards(connection: Connection, blog_ids: Collection[int]):
+    """
+    Rewrites the cards of the given blog posts from the blog, tag and user
+    tables, and removes the cards of posts that no longer exist.
+
+    Args:
+        connection (Connection): The connection of the writing transaction.
+        blog_ids (Collection[int]): The IDs of the blog posts to refresh.
+    """
+    if not blog_ids:
+        return
+
+    params = {"blog_ids": list(blog_ids)}
+    connection.execute(delete(BlogPostCard).where(BlogPostCard.id.in_(params["blog_ids"])))
+
+    posts = connection.execute(CARD_SOURCE_STMT, params).all()
+    if not posts:
+        return
+
+    tags = defaultdict(list)
+    for blog_id, tag_id, name, slug in connection.execute(CARD_SOURCE_TAGS_STMT, params):
+        tags[blog_id].append([tag_id, name, slug])
+
+    connection.execute(insert(BlogPostCard), [{**post._mapping, "tags": tags[post.id]} for post in posts])
+
+def rebuild_cards(connection: Connection, batch_size: int = 1000):
+    """
+    Rebuilds the cards of all blog posts, e.g. after bulk loading posts.
+
+    Args:
+        connection (Connection): The connection to rebuild the cards in.
+        batch_size (int, optional): Number of posts refreshed per round trip.
+
+    Returns:
+        int: Number of rebuilt cards.
+    """
+    connection.execute(delete(BlogPostCard))
+
+    rebuilt, last_id = 0, 0
+    while blog_ids := connection.execute(
+        select(BlogPost.id).where(BlogPost.id > last_id).order_by(BlogPost.id).limit(batch_size)
+    ).scalars().all():
+        refresh_cards(connection, blog_ids)
+        rebuilt += len(blog_ids)
+        last_id = blog_ids[-1]
+
+    return rebuilt
+
+def _changed(obj, *attributes: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+@event.listens_for(Session, "before_flush")
+def _collect_stale_cards(session, flush_context, instances):
+    # Posts of renamed or deleted tags and users are looked up before the flush removes the links
+    tag_ids = [
+        tag.id for tag in chain(session.dirty, session.deleted)
+        if isinstance(tag, Tag) and tag.id is not None and (tag in session.deleted or _changed(tag, "name", "slug"))
+    ]
+    author_ids = [
+        user.id for user in session.dirty
+        if isinstance(user, EmailUser) and _changed(user, "username", "email")
+    ]
+    if not (tag_ids or author_ids):
+        return
+
+    stale = session.info.setdefault(STALE_CARDS_KEY, set())
+    connection = session.connection()
+    if tag_ids:
+        stale.update(connection.execute(
+            select(BlogPostTag.blogpost_id).where(BlogPostTag.tag_id.in_(tag_ids))
+        ).scalars())
+    if author_ids:
+        stale.update(connection.execute(
+            select(BlogPost.id).where(BlogPost.author_id.in_(author_ids))
+        ).scalars())
+
+def _card_values(post: BlogPost) -> Optional[dict]:
+    """
+    Returns the card row of a post from its loaded attributes, or None when
+    some of them are not loaded and the card has to be read from the tables.
+    """
+    if CARD_POST_ATTRIBUTES & inspect(post).unloaded or post.author is None:
+        return None
+
+    return {
+        "id": post.id,
+        "title": post.title,
+        "excerpt": post.content[:CARD_EXCERPT_LENGTH],
+        "image": post.image,
+        "created_at": post.created_at,
+        "author_id": post.author.id,
+        "author_name": post.author.username or post.author.email,
+        "tags": [[tag.id, tag.name, tag.slug] for tag in sorted(post.tags, key=lambda tag: tag.name)],
+    }
+
+@event.listens_for(Session, "after_flush")
+def _refresh_stale_cards(session, flush_context):
+    stale = session.info.pop(STALE_CARDS_KEY, set())
+    deleted = {post.id for post in session.deleted if isinstance(post, BlogPost)}
+
+    # Written posts usually have everything the card needs loaded, which saves reading it back
+    cards = []
+    for post in chain(session.new, session.dirty):
+        if isinstance(post, BlogPost):
+            values = _card_values(post)
+            if values is None:
+                stale.add(post.id)
+            else:
+                cards.append(values)
+
+    # The cards are written in the transaction of the change, so they commit or roll back with it
+    connection = session.connection()
+    replaced = deleted | {card["id"] for card in cards}
+    refresh_cards(connection, stale - replaced)
+
+    if replaced:
+        connection.execute(delete(BlogPostCard).where(BlogPostCard.id.in_(replaced)))
+    if cards:
+        connection.execute(insert(BlogPostCard), cards)
+
+class BlogImport(SQLModel, table=True):
+    """
+    Progress of a bulk import of blog posts. It is updated in the transaction
+    of every imported batch, so an interrupted import resumes after the last
+    committed batch.
+    """
+    __tablename__ = "blog_import"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    checksum: str = Field(unique=True, max_length=64)
+    file_name: str = Field(max_length=255)
+    records: int = 0
+    imported: int = 0
+    skipped: int = 0
+    started_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    finished_at: Optional[datetime] = None
+
+class Job(SQLModel, table=True):
+    """
+    Work run after a write by the job runner, see `jobs.py`. A job is deleted
+    once it succeeds, one that ran out of attempts stays `failed` with its
+    last error. A `running` job is leased until `locked_until`, after which
+    another runner takes it over.
+    """
+    __tablename__ = "job"
+    # The due jobs, in the order they are claimed
+    __table_args__ = (Index("ix_job_status_run_after", "status", "run_after"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(max_length=100)
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    status: str = Field(default="queued", max_length=20)
+    attempts: int = 0
+    max_attempts: int = 5
+    run_after: datetime = Field(default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    locked_until: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+class MediaFile(SQLModel, table=True):
+    """
+    Reference count of a locally stored image, named by the hash of its
+    content, see `blogs/media.py`. The count is kept by the session as posts
+    are written, an image whose count dropped to zero is removed by
+    `prune_media` once it has been unused for a while.
+    """
+    __tablename__ = "media_file"
+
+    key: str = Field(primary_key=True, max_length=80)
+    ref_count: int = 0
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+# The key of an image stored by `store_media`, the SHA-256 of its content and its extension
+MEDIA_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}(?:\.[a-z0-9]+)?$")
+
+def media_key(image: Optional[str]) -> Optional[str]:
+    """
+    Returns the key of a content-addressed image from its URL, or None for
+    no image, Cloudinary images and local ones stored under other names.
+    """
+    key = image.removeprefix("/media/") if image and image.startswith("/media/") else None
+    return key if key and MEDIA_KEY_PATTERN.match(key) else None
+
+def count_media_references(connection: Connection, deltas: Counter):
+    """
+    Adds the changes of the reference counts of images, creating the counts
+    of images not counted yet. An upsert, so concurrent writers of the same
+    image don't conflict.
+
+    Args:
+        connection (Connection): The connection of the writing transaction.
+        deltas (Counter): The change of the count by image key.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Sorted, so transactions counting the same images lock their rows in the same order
+    rows = [{"key": key, "ref_count": delta, "updated_at": now} for key, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+
+    table = MediaFile.__table__
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.key],
+        set_={"ref_count": table.c.ref_count + stmt.excluded.ref_count, "updated_at": stmt.excluded.updated_at},
+    )
+    connection.execute(stmt, rows)
+
+@event.listens_for(Session, "before_flush")
+def _count_media_references(session, flush_context, instances):
+    deltas = Counter()
+    # Posts whose stored image isn't loaded, it is read before the flush overwrites it
+    stored = []
+
+    for post in session.new:
+        if isinstance(post, BlogPost):
+            deltas[media_key(post.image)] += 1
+
+    for post in chain(session.dirty, session.deleted):
+        if not isinstance(post, BlogPost):
+            continue
+        history = inspect(post).attrs.image.history
+        if post in session.deleted:
+            if "image" in inspect(post).unloaded or history.added and not history.deleted:
+                stored.append(post.id)
+            else:
+                deltas[media_key((history.deleted or history.unchanged)[0])] -= 1
+        elif history.has_changes():
+            deltas[media_key(history.added[0])] += 1
+            if history.deleted:
+                deltas[media_key(history.deleted[0])] -= 1
+            else:
+                stored.append(post.id)
+
+    if stored:
+        for image in session.connection().execute(select(BlogPost.image).where(BlogPost.id.in_(stored))).scalars():
+            deltas[media_key(image)] -= 1
+
+    # The counts are written in the transaction of the change, so they commit or roll back with it
+    deltas.pop(None, None)
+    if deltas:
+        count_media_references(session.connection(), deltas)
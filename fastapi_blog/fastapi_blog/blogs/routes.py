@@ -1,16 +1,29 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+import asyncio
+import shutil
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
+from fastapi_blog import database
 from fastapi_blog.accounts.models import EmailUser
 from fastapi_blog.auth import manager
-from fastapi_blog.blogs.exceptions import BlogPostNotFoundError
+from fastapi_blog.blogs import direct_uploads
+from fastapi_blog.blogs.exceptions import BlogPostNotFoundError, InvalidFeedCursorError, InvalidUploadError
 from fastapi_blog.blogs.forms import BlogPostForm, DeleteBlogPostForm
-from fastapi_blog.blogs.schemas import BlogQueryParams
+from fastapi_blog.blogs.rss import ALL_SCOPE, FeedItem, feed_cache, feed_response, render_rss, tag_scope
+from fastapi_blog.blogs.view_counts import view_counter
+from fastapi_blog.monitoring.metrics import observe_upload
+from fastapi_blog.blogs.schemas import BlogCard, BlogQueryParams, FeedCursor
+from fastapi_blog.blogs.sitemap import (
+    INDEX_SCOPE, SITEMAP_MEDIA_TYPE, cache_stream, render_sitemap_index, sitemap_cache, sitemap_count, sitemap_scope,
+    stream_sitemap,
+)
 from fastapi_blog.services.blog_post_service import BlogPostService, get_blog_post_service
 from fastapi_blog.services.tag_service import TagService, get_tag_service
 from fastapi_blog.templating import templates, toast
+from markupsafe import Markup
+from starlette.datastructures import UploadFile
 from starlette_wtf import csrf_protect
-from starlette.status import HTTP_303_SEE_OTHER, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR
+from starlette.status import HTTP_204_NO_CONTENT, HTTP_303_SEE_OTHER, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR
 from fastapi_blog.config import settings
 blogs_router = APIRouter()
 
@@ -27,6 +40,90 @@ async def index(
         request, "index.html", {"blogs": blogs, "tags": tags}
     )
 
+@blogs_router.get("/feed.xml", response_class=Response)
+async def rss_feed(
+    request: Request,
+    blog_post_service: Annotated[BlogPostService, Depends(get_blog_post_service)],
+):
+    feed = feed_cache.get(ALL_SCOPE, settings.RSS_MAX_AGE)
+    if feed is None:
+        version = feed_cache.version
+        blogs = await blog_post_service.get_recent_blogs(settings.RSS_ITEMS)
+        body = render_rss(
+            "TriFrameBlog FastAPI",
+            str(request.url_for("blogs")),
+            str(request.url_for("rss_feed")),
+            "The latest blogs",
+            [_feed_item(request, blog) for blog in blogs],
+        )
+        feed = feed_cache.put(ALL_SCOPE, body, version)
+
+    return feed_response(request, feed)
+
+@blogs_router.get("/tags/{slug}/feed.xml", response_class=Response)
+async def tag_rss_feed(
+    request: Request,
+    slug: str,
+    blog_post_service: Annotated[BlogPostService, Depends(get_blog_post_service)],
+    tag_service: Annotated[TagService, Depends(get_tag_service)],
+):
+    feed = feed_cache.get(tag_scope(slug), settings.RSS_MAX_AGE)
+    if feed is None:
+        version = feed_cache.version
+        tag = await tag_service.get_by_slug(slug)
+        if tag is None:
+            return templates.TemplateResponse(request, "404.html", status_code=HTTP_404_NOT_FOUND)
+
+        blogs = await blog_post_service.get_recent_blogs_by_tags([slug], settings.RSS_ITEMS)
+        body = render_rss(
+            f"TriFrameBlog FastAPI: {tag.name}",
+            f"{request.url_for('blogs')}?tag={slug}",
+            str(request.url_for("tag_rss_feed", slug=slug)),
+            f"The latest blogs tagged {tag.name}",
+            [_feed_item(request, blog) for blog in blogs],
+        )
+        feed = feed_cache.put(tag_scope(slug), body, version)
+
+    return feed_response(request, feed)
+
+def _feed_item(request: Request, blog: BlogCard):
+    return FeedItem(
+        blog.title,
+        str(request.url_for("detail", blog_id=blog.id)),
+        Markup(blog.content).striptags(),
+        blog.created_at,
+        [tag.name for tag in blog.tags],
+    )
+
+@blogs_router.get("/sitemap.xml", response_class=Response)
+async def sitemap_index(request: Request):
+    index = sitemap_cache.get(INDEX_SCOPE, settings.SITEMAP_MAX_AGE)
+    if index is None:
+        version = sitemap_cache.version
+        count = await sitemap_count(database.SessionLocal, settings.SITEMAP_SIZE)
+        body = render_sitemap_index(str(request.url_for("sitemap", number=number)) for number in range(count))
+        index = sitemap_cache.put(INDEX_SCOPE, body, version)
+
+    return feed_response(request, index, SITEMAP_MEDIA_TYPE)
+
+@blogs_router.get("/sitemaps/{number}.xml", response_class=Response)
+async def sitemap(request: Request, number: int):
+    cached = sitemap_cache.get(sitemap_scope(number), settings.SITEMAP_MAX_AGE)
+    if cached is not None:
+        return feed_response(request, cached, SITEMAP_MEDIA_TYPE)
+
+    version = sitemap_cache.version
+    if not 0 <= number < await sitemap_count(database.SessionLocal, settings.SITEMAP_SIZE):
+        return templates.TemplateResponse(request, "404.html", status_code=HTTP_404_NOT_FOUND)
+
+    # The URL of every post is the detail URL of id 0 with its id instead
+    detail_url = str(request.url_for("detail", blog_id=0)).removesuffix("0")
+    chunks = stream_sitemap(database.SessionLocal, number, detail_url, settings.SITEMAP_SIZE, settings.SITEMAP_BATCH_SIZE)
+
+    return StreamingResponse(
+        cache_stream(sitemap_cache, sitemap_scope(number), version, chunks), media_type=SITEMAP_MEDIA_TYPE
+    )
+
 @blogs_router.get("/blogs", response_class=HTMLResponse)
 async def blogs(
     request: Request,
@@ -37,10 +134,74 @@ async def blogs(
     tag_slugs_list = query_params.tag.split(",") if query_params.tag else []
 
     result = await blog_post_service.get_paginated_blogs(tag_slugs_list, query_params.search, query_params.page, query_params.per_page)
+    feed_cursor = blog_post_service.feed_cursor(result.data[-1], tag_slugs_list, query_params.search) if result.next_page else None
     tags = await tag_service.get_all()
 
     return templates.TemplateResponse(
-        request, "blogs.html", {"result": result, "tags": tags, "selected_tags": tag_slugs_list}
+        request, "blogs.html", {"result": result, "feed_cursor": feed_cursor, "tags": tags, "selected_tags": tag_slugs_list}
+    )
+
+@blogs_router.get("/blogs/fragment", response_class=HTMLResponse)
+async def blogs_fragment(
+    request: Request,
+    query_params: Annotated[BlogQueryParams, Depends()],
+    blog_post_service: Annotated[BlogPostService, Depends(get_blog_post_service)],
+):
+    tag_slugs_list = query_params.tag.split(",") if query_params.tag else []
+
+    result = await blog_post_service.get_paginated_blogs(tag_slugs_list, query_params.search, query_params.page, query_params.per_page)
+    feed_cursor = blog_post_service.feed_cursor(result.data[-1], tag_slugs_list, query_params.search) if result.next_page else None
+
+    return templates.TemplateResponse(
+        request, "components/blog_results.html", {"result": result, "feed_cursor": feed_cursor}
+    )
+
+@blogs_router.get("/blogs/feed", response_class=JSONResponse)
+async def blogs_feed(
+    request: Request,
+    query_params: Annotated[BlogQueryParams, Depends()],
+    blog_post_service: Annotated[BlogPostService, Depends(get_blog_post_service)],
+    cursor: Annotated[Optional[str], Query(max_length=1000)] = None,
+):
+    tag_slugs_list = query_params.tag.split(",") if query_params.tag else []
+
+    try:
+        feed_cursor = FeedCursor.decode(cursor) if cursor else None
+    except InvalidFeedCursorError as e:
+        return JSONResponse({"error": str(e)}, status_code=HTTP_400_BAD_REQUEST)
+
+    result = await blog_post_service.get_blog_feed(tag_slugs_list, query_params.search, feed_cursor, query_params.per_page)
+    html = templates.get_template("components/blog_feed.html").render(request=request, blogs=result.data)
+
+    # A cursor always reads the same batch, so the response is cached by its URL
+    return JSONResponse(
+        {"html": html, "cursor": result.cursor},
+        headers={"Cache-Control": f"public, max-age={settings.FEED_CACHE_SECONDS}"},
+    )
+
+@blogs_router.get("/blogs/suggest", response_class=JSONResponse)
+async def suggest(
+    request: Request,
+    blog_post_service: Annotated[BlogPostService, Depends(get_blog_post_service)],
+    q: Annotated[str, Query(max_length=100)] = "",
+    limit: Annotated[int, Query(ge=1, le=20)] = 8,
+):
+    suggestions = await blog_post_service.suggest_titles(q, limit)
+
+    return JSONResponse({"suggestions": [
+        {"id": blog_id, "title": title, "url": str(request.url_for("detail", blog_id=blog_id))}
+        for blog_id, title in suggestions
+    ]})
+
+@blogs_router.get("/blogs/popular", response_class=HTMLResponse)
+async def popular_blogs(
+    request: Request,
+    blog_post_service: Annotated[BlogPostService, Depends(get_blog_post_service)],
+):
+    blogs = await blog_post_service.get_popular_blogs(settings.POPULAR_BLOGS)
+
+    return templates.TemplateResponse(
+        request, "popular.html", {"blogs": blogs}
     )
 
 @blogs_router.get("/blogs/my", response_class=HTMLResponse)
@@ -69,6 +230,52 @@ async def create_page(
         request, "create.html", {"form": form}
     )
 
+@blogs_router.get("/blogs/upload-policy", response_class=JSONResponse)
+async def upload_policy(
+    request: Request,
+    filename: Annotated[str, Query(max_length=255)],
+    user: Annotated[EmailUser, Depends(manager)]
+):
+    if not settings.DIRECT_UPLOADS:
+        return JSONResponse({"error": "Direct uploads are disabled"}, status_code=HTTP_404_NOT_FOUND)
+
+    try:
+        policy = direct_uploads.upload_policy(filename, str(request.url_for("store_upload")))
+    except InvalidUploadError as e:
+        return JSONResponse({"error": str(e)}, status_code=HTTP_400_BAD_REQUEST)
+
+    return JSONResponse(policy, headers={"Cache-Control": "no-store"})
+
+@blogs_router.post("/uploads")
+async def store_upload(request: Request):
+    """
+    Local stand-in of an S3 style storage for direct uploads, storing the file
+    of a form signed by `upload_policy` under its key. Only used when images
+    are stored locally, with Cloudinary the browser uploads to Cloudinary.
+    """
+    if not settings.DIRECT_UPLOADS or settings.USE_CLOUDINARY:
+        return Response(status_code=HTTP_404_NOT_FOUND)
+
+    formdata = await request.form()
+    key, file = formdata.get("key", ""), formdata.get("file")
+
+    try:
+        max_bytes = direct_uploads.check_policy(key, formdata.get("policy", ""), formdata.get("signature", ""))
+    except InvalidUploadError as e:
+        return JSONResponse({"error": str(e)}, status_code=HTTP_403_FORBIDDEN)
+
+    if not isinstance(file, UploadFile):
+        return JSONResponse({"error": "No file uploaded"}, status_code=HTTP_400_BAD_REQUEST)
+    if file.size > max_bytes:
+        return JSONResponse({"error": "The file is too large"}, status_code=HTTP_400_BAD_REQUEST)
+
+    path = settings.UPLOAD_FOLDER / key
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with observe_upload("local", file.size), open(path, "wb") as buffer:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, buffer)
+
+    return Response(status_code=HTTP_204_NO_CONTENT)
+
 @blogs_router.post("/blogs/create", response_class=HTMLResponse)
 @csrf_protect
 async def create(
@@ -97,11 +304,20 @@ async def create(
             content=form.content.data,
             image=uploaded_file,
             author_id=user.id,
-            tag_ids=form.tags.data
+            tag_ids=form.tags.data,
+            image_key=form.image_key.data if settings.DIRECT_UPLOADS else None
         )
 
         toast(request, "Blog created successfully!", "success")
         return RedirectResponse(url=request.url_for("detail", blog_id=blog.id), status_code=HTTP_303_SEE_OTHER)
+    except InvalidUploadError as e:
+        form.image.data = None
+        form.image.errors = [str(e)]
+        return templates.TemplateResponse(request,
+            "create.html",
+            {"form": form, "errors": form.errors},
+            status_code=HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         form.image.data = None
         toast(request, "Error occured, please try again later.", "error")
@@ -120,6 +336,7 @@ async def detail(
     try:
         blog = await blog_post_service.get_blog_by_id(blog_id)
         related_blogs = await blog_post_service.get_related_blogs(blog)
+        view_counter.increment(blog.id)
 
         return templates.TemplateResponse(
             request, "detail.html", {"blog": blog, "related_blogs": related_blogs}
@@ -168,7 +385,7 @@ async def edit(
     user: Annotated[EmailUser, Depends(manager)]
 ):
     try:
-        blog = await blog_post_service.get_blog_by_id(blog_id)
+        blog = await blog_post_service.get_blog_by_id(blog_id, for_update=True)
 
         if user != blog.author and not user.is_staff:
             return templates.TemplateResponse(
@@ -194,7 +411,9 @@ async def edit(
             title=form.title.data,
             content=form.content.data,
             image=uploaded_file,
-            tag_ids=form.tags.data
+            tag_ids=form.tags.data,
+            blog=blog,
+            image_key=form.image_key.data if settings.DIRECT_UPLOADS else None
         )
 
         toast(request, "Blog updated successfully!", "success")
@@ -203,6 +422,14 @@ async def edit(
         return templates.TemplateResponse(
             request, "404.html", status_code=HTTP_404_NOT_FOUND
         )
+    except InvalidUploadError as e:
+        form.image.data = blog.image
+        form.image.errors = [str(e)]
+        return templates.TemplateResponse(request,
+            "edit.html",
+            {"form": form, "errors": form.errors, "blog": blog},
+            status_code=HTTP_400_BAD_REQUEST
+        )
     except Exception:
         form.image.data = None
         toast(request, "Error occured, please try again later.", "error")
@@ -245,7 +472,7 @@ async def delete(
 ):
     try:
         form = await DeleteBlogPostForm.from_formdata(request)
-        blog = await blog_post_service.get_blog_by_id(blog_id)
+        blog = await blog_post_service.get_blog_by_id(blog_id, for_update=True)
 
         if user != blog.author and not user.is_staff:
             return templates.TemplateResponse(
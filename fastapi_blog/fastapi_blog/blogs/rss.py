@@ -0,0 +1,193 @@
+import hashlib
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+from fastapi import Request, Response
+from fastapi_blog.blogs.models import BlogPost, Tag
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+ET.register_namespace("atom", ATOM_NAMESPACE)
+
+# Cache scope of the feed of all posts, the feed of a tag is cached under `tag_scope`
+ALL_SCOPE = "all"
+
+# Session info key collecting the feed scopes written in a transaction until it commits
+FEED_SCOPES_KEY = "feed_scopes"
+
+def tag_scope(slug: str) -> str:
+    return f"tag:{slug}"
+
+class FeedItem(NamedTuple):
+    title: str
+    link: str
+    summary: str
+    published: datetime
+    categories: List[str]
+
+class CachedFeed(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime
+    built_at: float
+
+def render_rss(title: str, link: str, self_link: str, description: str, items: Iterable[FeedItem]) -> bytes:
+    """
+    Serializes an RSS 2.0 feed. It holds nothing depending on when it is
+    built, so a feed built again without changes has the same bytes.
+    """
+    rss = ET.Element("rss", version="2.0")
+    channel = ET.SubElement(rss, "channel")
+    ET.SubElement(channel, "title").text = title
+    ET.SubElement(channel, "link").text = link
+    ET.SubElement(channel, "description").text = description
+    ET.SubElement(channel, f"{{{ATOM_NAMESPACE}}}link", href=self_link, rel="self", type="application/rss+xml")
+
+    for item in items:
+        element = ET.SubElement(channel, "item")
+        ET.SubElement(element, "title").text = item.title
+        ET.SubElement(element, "link").text = item.link
+        ET.SubElement(element, "guid", isPermaLink="true").text = item.link
+        ET.SubElement(element, "description").text = item.summary
+        published = item.published if item.published.tzinfo else item.published.replace(tzinfo=timezone.utc)
+        ET.SubElement(element, "pubDate").text = format_datetime(published)
+        for category in item.categories:
+            ET.SubElement(element, "category").text = category
+
+    return ET.tostring(rss, encoding="utf-8", xml_declaration=True)
+
+class FeedCache:
+    """
+    Serialized feeds of this process by scope. A feed is built again after a
+    post in its scope changed, and at the latest `max_age` seconds after it
+    was built, which picks up the writes of other processes. The ETag is a
+    hash of the bytes, so a feed built again without changes keeps its ETag
+    and Last-Modified and the readers polling it keep getting 304s.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.feeds: Dict[str, CachedFeed] = {}
+        self.stale: Set[str] = set()
+        # Counts the invalidations, a feed read before one of them stays stale
+        self.version = 0
+
+    def get(self, scope: str, max_age: float) -> Optional[CachedFeed]:
+        """
+        Returns the feed of a scope, or None when it has to be built.
+        """
+        with self.lock:
+            feed = self.feeds.get(scope)
+            if feed is None or scope in self.stale or time.monotonic() - feed.built_at >= max_age:
+                return None
+
+            return feed
+
+    def put(self, scope: str, body: bytes, version: int) -> CachedFeed:
+        """
+        Stores the feed of a scope built from the posts read at `version`.
+        """
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        with self.lock:
+            previous = self.feeds.get(scope)
+            if previous is not None and previous.etag == etag:
+                last_modified = previous.last_modified
+            else:
+                last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+            feed = self.feeds[scope] = CachedFeed(body, etag, last_modified, time.monotonic())
+            if version == self.version:
+                self.stale.discard(scope)
+
+            return feed
+
+    def invalidate(self, scopes: Optional[Iterable[str]] = None):
+        """
+        Marks the feeds of the scopes to be built again, all of them without scopes.
+        """
+        with self.lock:
+            self.version += 1
+            self.stale.update(self.feeds if scopes is None else scopes)
+
+def feed_response(request: Request, feed: CachedFeed, media_type: str = "application/rss+xml") -> Response:
+    """
+    Responds with the feed, or with 304 when the reader's copy is current.
+    """
+    headers = {
+        "ETag": f'"{feed.etag}"',
+        "Last-Modified": format_datetime(feed.last_modified, usegmt=True),
+        "Cache-Control": "public, no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = any(
+            tag.strip().removeprefix("W/") in (headers["ETag"], "*") for tag in if_none_match.split(",")
+        )
+    elif if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            not_modified = feed.last_modified <= since.replace(tzinfo=since.tzinfo or timezone.utc)
+        except (TypeError, ValueError):
+            not_modified = False
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    return Response(feed.body, media_type=media_type, headers=headers)
+
+# The feeds of this process, invalidated by the writes of its sessions
+feed_cache = FeedCache()
+
+def _post_scopes(post: BlogPost) -> Optional[Set[str]]:
+    """
+    The scopes of the feeds a post is in before and after the flush, None
+    when its tags were not loaded.
+    """
+    state = inspect(post)
+    if "tags" in state.unloaded:
+        return None
+
+    history = state.attrs.tags.history
+    return {ALL_SCOPE, *(tag_scope(tag.slug) for tag in [*history.added, *history.unchanged, *history.deleted])}
+
+@event.listens_for(Session, "after_flush")
+def _collect_feed_scopes(session, flush_context):
+    if FEED_SCOPES_KEY in session.info and session.info[FEED_SCOPES_KEY] is None:
+        return
+
+    scopes = session.info.setdefault(FEED_SCOPES_KEY, set())
+    for instance in session.new | session.dirty | session.deleted:
+        if isinstance(instance, BlogPost):
+            post_scopes = _post_scopes(instance)
+        elif isinstance(instance, Tag) and (
+            instance in session.deleted or session.is_modified(instance, include_collections=False)
+        ):
+            # A renamed or deleted tag shows in the categories of every feed
+            post_scopes = None
+        else:
+            continue
+
+        if post_scopes is None:
+            session.info[FEED_SCOPES_KEY] = None
+            return
+        scopes |= post_scopes
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_feeds(session):
+    scopes = session.info.pop(FEED_SCOPES_KEY, set())
+    if scopes is None or scopes:
+        feed_cache.invalidate(scopes)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_feed_scopes(session, previous_transaction):
+    session.info.pop(FEED_SCOPES_KEY, None)
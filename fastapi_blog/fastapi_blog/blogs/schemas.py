@@ -1,7 +1,13 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+import base64
+import json
+from datetime import datetime
+from fastapi_blog.blogs.exceptions import InvalidFeedCursorError
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, NamedTuple, Optional
 
 class PaginatedResponse[T](BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     data: List[T]
     total: int
     page: int
@@ -10,8 +16,76 @@ class PaginatedResponse[T](BaseModel):
     next_page: Optional[int]
     prev_page: Optional[int]
 
+class FeedResponse[T](BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    data: List[T]
+    cursor: Optional[str]
+
 class BlogQueryParams(BaseModel):
     page: int = Field(default=1, ge=1, description="Page number for pagination")
     per_page: int = Field(default=6, ge=1, description="Number of items per page")
     search: Optional[str] = Field(None, description="Search query for blog posts")
     tag: Optional[str] = Field(None, description="Comma-separated list of tag slugs")
+
+class FeedCursor(NamedTuple):
+    """
+    Position in the infinite-scroll feed: the last card read and the filters
+    it was read with. It is handed out as an opaque token, so the URL of every
+    batch is fixed and can be cached.
+    """
+    created_at: datetime
+    id: int
+    tag_slugs: List[str]
+    search: Optional[str]
+
+    def encode(self) -> str:
+        data = json.dumps([self.created_at.isoformat(), self.id, self.tag_slugs, self.search], separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "FeedCursor":
+        try:
+            created_at, id, tag_slugs, search = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            return cls(datetime.fromisoformat(created_at), int(id), [str(slug) for slug in tag_slugs], search and str(search))
+        except (ValueError, TypeError) as e:
+            raise InvalidFeedCursorError() from e
+
+class TagCard(NamedTuple):
+    id: int
+    name: str
+    slug: Optional[str]
+
+class BlogCard:
+    """
+    Read-only blog post shown on the list pages, built from a row of the
+    blog_post_card read model and not tracked by the session.
+    """
+    __slots__ = ("id", "title", "content", "image", "created_at", "author_name", "tags")
+
+    def __init__(
+        self,
+        id: int,
+        title: str,
+        content: str,
+        image: Optional[str],
+        created_at: datetime,
+        author_name: str,
+        tags: List[TagCard]
+        ):
+        self.id = id
+        self.title = title
+        self.image = image
+        self.created_at = created_at
+        self.author_name = author_name
+        self.tags = tags
+
+        # The excerpt may end inside a tag, which striptags would leave in the text
+        tag_start = content.rfind("<")
+        self.content = content[:tag_start] if tag_start > content.rfind(">") else content
+
+    def __repr__(self):
+        return self.title
+
+    def __str__(self):
+        return self.title
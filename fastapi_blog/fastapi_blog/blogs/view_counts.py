@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+from fastapi_blog.blogs.models import BlogPost
+from fastapi_blog.config import settings
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+blog_post_table = BlogPost.__table__
+
+# Executed with the rows of all the posts viewed since the last flush
+ADD_VIEWS_STMT = (
+    update(blog_post_table)
+    .where(blog_post_table.c.id == bindparam("blog_id"))
+    .values(views=blog_post_table.c.views + bindparam("added"))
+)
+
+class ViewCounter:
+    """
+    Counts the views of the blog posts in memory, so showing a post doesn't
+    write to the database. Every `interval` seconds the counts are added to
+    the `views` column, one `views = views + n` row per viewed post, all sent
+    as one batch in one transaction. The rows only add to the column, so the
+    flushes of several workers never overwrite each other, and they are
+    ordered by id, so concurrent flushes lock the posts in the same order.
+    """
+    def __init__(self, interval: float = settings.VIEW_FLUSH_SECONDS):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.paused = False
+        self._flusher: Optional[asyncio.Task] = None
+
+    def increment(self, blog_id: int):
+        if not self.paused:
+            self.counts[blog_id] += 1
+
+    @contextmanager
+    def pause(self):
+        """
+        Doesn't count the views while the block runs, e.g. the pages rendered by a static build.
+        """
+        paused, self.paused = self.paused, True
+        try:
+            yield
+        finally:
+            self.paused = paused
+
+    async def flush(self, Session: sessionmaker) -> int:
+        """
+        Adds the counted views to the posts. The views of a failed flush are
+        counted again, so the next flush retries them.
+
+        Args:
+            Session (sessionmaker): Creates the session of the update.
+
+        Returns:
+            int: The number of views added.
+        """
+        counts, self.counts = self.counts, Counter()
+        if not counts:
+            return 0
+
+        rows = [{"blog_id": blog_id, "added": added} for blog_id, added in sorted(counts.items())]
+        try:
+            async with Session() as session:
+                await session.execute(ADD_VIEWS_STMT, rows)
+                await session.commit()
+        except BaseException:
+            self.counts.update(counts)
+            raise
+
+        return sum(counts.values())
+
+    def start(self, Session: sessionmaker):
+        """
+        Starts flushing the views every `interval` seconds on the running loop.
+        """
+        self._flusher = asyncio.get_running_loop().create_task(self._flush_periodically(Session))
+
+    async def stop(self, Session: sessionmaker):
+        """
+        Stops the periodic flushes and flushes the views counted since the last one.
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+        await self.flush(Session)
+
+    async def _flush_periodically(self, Session: sessionmaker):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush(Session)
+            except Exception:
+                logger.exception("Flushing %d blog post views failed, retrying in %s s", sum(self.counts.values()), self.interval)
+
+# The views counted by this process
+view_counter = ViewCounter()
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
@@ -14,6 +14,13 @@ class BaseConfig(BaseSettings):
     """Base configuration (shared by all environments)."""
 
     DATABASE_URL: str
+    # Optional read replica for the read-only repository methods
+    DATABASE_REPLICA_URL: Optional[str] = None
+    # Seconds a user's reads stay on the primary after they wrote
+    REPLICA_STICKY_SECONDS: int = 10
+    # Compiled statements kept by SQLAlchemy and prepared statements kept per asyncpg connection
+    DB_QUERY_CACHE_SIZE: int = 500
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
     SECRET_KEY: str = "default_secret"
     DEBUG: bool = False
     CSRF_SECRET: str
@@ -27,6 +34,72 @@ class BaseConfig(BaseSettings):
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10 MB
     ALLOWED_IMAGE_EXTENSIONS: List[str] = ['.jpg', '.jpeg', '.png']
 
+    # Warn when one request runs the same statement shape more often than this
+    QUERY_REPEAT_THRESHOLD: int = 5
+
+    # Request profiles of staff users, see `monitoring/profiling.py`
+    PROFILES_DIR: Path = BASE_DIR / "profiles"
+    PROFILES_KEEP: int = 100
+    PROFILE_INTERVAL: float = 0.001
+
+    # Event loop heartbeat, stalls longer than the threshold are logged with their stack
+    LOOP_LAG_INTERVAL: float = 0.05
+    LOOP_LAG_THRESHOLD: float = 0.1
+
+    # Blog post imports, see `utils/blog_import.py`. No worker count means one per CPU. Files
+    # uploaded in the admin wait in IMPORT_FOLDER for the `import_blogs` job, which keeps its
+    # lease for IMPORT_JOB_LEASE_SECONDS, as a large import runs far longer than other jobs
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_WORKERS: Optional[int] = None
+    IMPORT_FOLDER: Path = BASE_DIR / "media" / "imports"
+    IMPORT_JOB_LEASE_SECONDS: float = 6 * 3600
+    # Posts read per query of an export, see `utils/blog_export.py`
+    EXPORT_CHUNK_SIZE: int = 1000
+    # Title index of the search suggestions, see `blogs/suggest.py`. Posts added by
+    # other processes are read every few seconds, in batches of this many rows
+    SUGGEST_REFRESH_SECONDS: float = 5
+    SUGGEST_LOAD_BATCH_SIZE: int = 10000
+    # Seconds the batches of the infinite-scroll feed may be cached by browsers and proxies
+    FEED_CACHE_SECONDS: int = 60
+    # RSS feeds, see `blogs/rss.py`. A cached feed is built again when a post in it
+    # changes, and at the latest after this many seconds for the writes of other processes
+    RSS_ITEMS: int = 20
+    RSS_MAX_AGE: int = 300
+    # Sitemaps, see `blogs/sitemap.py`. Each lists the posts of a range of SITEMAP_SIZE ids
+    # and is cached like the RSS feeds, read in batches of SITEMAP_BATCH_SIZE posts
+    SITEMAP_SIZE: int = 50000
+    SITEMAP_BATCH_SIZE: int = 5000
+    SITEMAP_MAX_AGE: int = 3600
+    # Views of the blog posts, see `blogs/view_counts.py`. They are counted in memory and
+    # added to the posts every VIEW_FLUSH_SECONDS, and once more when the app stops
+    VIEW_FLUSH_SECONDS: float = 10
+    POPULAR_BLOGS: int = 12
+    # Background jobs, see `jobs.py`. The app runs them in JOB_CONCURRENCY tasks, unless
+    # JOB_RUNNER is off and `python -m fastapi_blog.utils.run_jobs` runs them. A failed job
+    # is retried after JOB_RETRY_SECONDS, doubled on every attempt, and a job still running
+    # after JOB_LEASE_SECONDS, e.g. of a killed worker, is taken over by another runner
+    JOB_RUNNER: bool = True
+    JOB_CONCURRENCY: int = 4
+    JOB_POLL_SECONDS: float = 5
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_SECONDS: float = 10
+    JOB_LEASE_SECONDS: float = 300
+    # Images waiting for the job uploading them to Cloudinary, at most that many uploads at once
+    UPLOAD_STAGING_FOLDER: Path = BASE_DIR / "media" / "pending"
+    UPLOAD_JOB_CONCURRENCY: int = 2
+    # Direct uploads, see `blogs/direct_uploads.py`. The browser uploads images straight to
+    # Cloudinary, or stored locally to the stand-in at /uploads, with a policy signed for
+    # DIRECT_UPLOAD_EXPIRES seconds, and the form posts only the key of the uploaded image
+    DIRECT_UPLOADS: bool = False
+    DIRECT_UPLOAD_EXPIRES: int = 600
+    # Locally stored images, see `blogs/media.py`. They are named by the hash of their content,
+    # so browsers and proxies cache them for MEDIA_CACHE_SECONDS without revalidating, and
+    # `python -m fastapi_blog.utils.prune_media` removes those no post used for MEDIA_PRUNE_SECONDS
+    MEDIA_CACHE_SECONDS: int = 365 * 24 * 60 * 60
+    MEDIA_PRUNE_SECONDS: int = 24 * 60 * 60
+
+    ADMIN_TEMPLATES_DIR: Path = BASE_DIR / "fastapi_blog" / "monitoring" / "templates"
+
     TEMPLATES_DIRS: List[Path] = [
         BASE_DIR / "fastapi_blog" / "templates",
         BASE_DIR / "fastapi_blog" / "blogs" / "templates",
@@ -62,6 +135,7 @@ class ProductionConfig(BaseConfig):
     CSRF_SECRET: str = os.getenv("CSRF_SECRET")
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     USE_CLOUDINARY: bool = os.getenv("USE_CLOUDINARY", "True").lower() == "true"
+    DIRECT_UPLOADS: bool = os.getenv("DIRECT_UPLOADS", "True").lower() == "true"
     CLOUDINARY_CLOUD_NAME: str = os.getenv("CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY: str = os.getenv("CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET: str = os.getenv("CLOUDINARY_API_SECRET")
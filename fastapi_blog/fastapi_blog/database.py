@@ -1,18 +1,137 @@
-from sqlmodel import SQLModel, create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from functools import wraps
+from typing import Callable, Optional
+from fastapi import Request
+from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy import Engine, Select, event, make_url
+from sqlalchemy.orm import Session as OrmSession, sessionmaker
 from fastapi_blog.config import settings
+from fastapi_blog.monitoring.metrics import record_cache_lookup
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-async_engine = AsyncEngine(create_engine(url=settings.DATABASE_URL))
+# Session key holding the time until which the user's reads go to the primary
+PRIMARY_UNTIL_KEY = "db_primary_until"
+
+# Session info key holding the results of the request-cached repository lookups
+LOOKUP_CACHE_KEY = "lookup_cache"
+
+def make_engine(url: str):
+    """
+    Creates an engine with the compiled statement cache, and on asyncpg the
+    prepared statement cache of each connection, sized from the settings.
+    """
+    connect_args = {}
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args["prepared_statement_cache_size"] = settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+
+    return AsyncEngine(create_engine(url=url, query_cache_size=settings.DB_QUERY_CACHE_SIZE, connect_args=connect_args))
+
+async_engine = make_engine(settings.DATABASE_URL)
+replica_engine = make_engine(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else None
+
+class RoutingSession(Session):
+    """
+    Session sending the SELECTs of read-only repository methods to the replica
+    and everything else to the primary. Once the session writes, or when
+    `use_primary` is set in its info, all its reads go to the primary as well.
+    """
+    def __init__(self, *args, replica: Optional[Engine] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.replica is not None
+            and self.info.get("read_only")
+            and not (self.info.get("use_primary") or self.info.get("wrote"))
+            and not self._flushing
+            and isinstance(clause, Select)
+        ):
+            return self.replica
+
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_statement(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+SessionLocal = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    replica=replica_engine.sync_engine if replica_engine else None,
+    expire_on_commit=False
+)
+
+def read_only(func: Callable):
+    """
+    Decorator letting the queries of a repository method go to the replica.
+    """
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        previous = self.db.info.get("read_only", False)
+        self.db.info["read_only"] = True
+        try:
+            return await func(self, *args, **kwargs)
+        finally:
+            self.db.info["read_only"] = previous
+
+    return wrapper
+
+def request_cached(name: str):
+    """
+    Decorator keeping the result of a repository lookup in the session, so
+    loading the same rows again while the session lives, which is a request
+    in the app, is served from memory. Any flush or rollback empties the
+    cache, lookups after a write go to the database again.
+
+    Lookups are counted as `cache_requests_total{cache="request_<name>"}`,
+    the hits are the loads that were avoided.
+
+    Args:
+        name (str): Name of the lookup, part of the cache key and the metric.
+    """
+    cache_name = f"request_{name}"
+
+    def decorator(func: Callable):
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            cache = self.db.info.setdefault(LOOKUP_CACHE_KEY, {})
+            values = [*args, *sorted(kwargs.items())]
+            key = (name, *(tuple(value) if isinstance(value, list) else value for value in values))
+
+            hit = key in cache
+            record_cache_lookup(cache_name, hit)
+            if not hit:
+                cache[key] = await func(self, *args, **kwargs)
+
+            return cache[key]
+
+        return wrapper
+
+    return decorator
+
+@event.listens_for(OrmSession, "after_flush")
+@event.listens_for(OrmSession, "after_soft_rollback")
+def _clear_lookup_cache(session, *args):
+    session.info.pop(LOOKUP_CACHE_KEY, None)
+
+async def get_session(request: Request):
+    async with SessionLocal() as session:
+        # The replica may lag behind, so the user reads their own writes from the primary for a while
+        session.info["use_primary"] = request.session.get(PRIMARY_UNTIL_KEY, 0) > time.time()
 
-async def get_session():
-    Session = sessionmaker(
-        bind=async_engine, class_=AsyncSession, expire_on_commit=False
-    )
-    async with Session() as session:
         yield session
 
+        if session.info.get("wrote"):
+            request.session[PRIMARY_UNTIL_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+
 async def init_db():
     async with async_engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(SQLModel.metadata.create_all)
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import time
+import traceback
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+from fastapi_blog.blogs.models import Job
+from fastapi_blog.config import settings
+from fastapi_blog.monitoring.metrics import JOB_DURATION, JOB_QUEUE_DELAY, JOBS, JOBS_IN_PROGRESS
+from sqlalchemy import and_, bindparam, delete, event, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, FAILED = "queued", "running", "failed"
+
+# Session info key collecting the jobs added by a transaction, handed to the runner once it commits
+NEW_JOBS_KEY = "new_jobs"
+
+class JobHandler(NamedTuple):
+    func: Callable[[AsyncSession, dict], Awaitable]
+    max_attempts: int
+    concurrency: Optional[int]
+    lease_seconds: Optional[float]
+
+# The handlers of the jobs by name, registered by the `job` decorator
+handlers: Dict[str, JobHandler] = {}
+
+def job(
+    name: str,
+    max_attempts: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    lease_seconds: Optional[float] = None,
+):
+    """
+    Decorator registering an async function as the handler of the named job.
+    It is called with a session and the payload of the job, and what it
+    writes is committed with the removal of the succeeded job, unless it
+    commits itself. A job may run again after a crash, so a handler must
+    cope with finding its work done.
+
+    Args:
+        name (str): The name jobs are enqueued with.
+        max_attempts (int, optional): Runs before the job fails, `JOB_MAX_ATTEMPTS` by default.
+        concurrency (int, optional): Runs of the job at once per runner, any number of its workers by default.
+        lease_seconds (float, optional): Seconds a run may take before another runner takes the job over, `JOB_LEASE_SECONDS` by default.
+    """
+    def decorator(func: Callable[[AsyncSession, dict], Awaitable]):
+        handlers[name] = JobHandler(func, max_attempts or settings.JOB_MAX_ATTEMPTS, concurrency, lease_seconds)
+        return func
+
+    return decorator
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def new_job(name: str, payload: dict, delay: float = 0) -> Job:
+    """
+    Builds the row of a job, to be added in the transaction of the write it follows.
+
+    Raises:
+        LookupError: If no handler is registered for the job.
+    """
+    if name not in handlers:
+        raise LookupError(f"No handler for job {name!r}")
+
+    return Job(name=name, payload=payload, max_attempts=handlers[name].max_attempts, run_after=utcnow() + timedelta(seconds=delay))
+
+def retry_delay(attempts: int) -> float:
+    """
+    Seconds until a job that failed its `attempts`th run is run again.
+    """
+    return settings.JOB_RETRY_SECONDS * 2 ** (attempts - 1)
+
+# Queued jobs that are due, and running jobs whose runner didn't finish them in time
+CLAIMABLE = or_(
+    and_(Job.status == QUEUED, Job.run_after <= bindparam("now")),
+    and_(Job.status == RUNNING, Job.locked_until < bindparam("now")),
+)
+DUE_JOBS_STMT = select(Job.id).where(CLAIMABLE).order_by(Job.run_after, Job.id).limit(bindparam("limit"))
+# Checks the jobs are still claimable, so of runners racing for a job only one gets it
+CLAIM_STMT = (
+    update(Job)
+    .where(Job.id.in_(bindparam("job_ids", expanding=True)), CLAIMABLE)
+    .values(status=RUNNING, attempts=Job.attempts + 1, locked_until=bindparam("locked_until"))
+    .returning(Job)
+    .execution_options(synchronize_session=False)
+)
+DELETE_JOB_STMT = delete(Job).where(Job.id == bindparam("job_id"))
+
+async def claim_jobs(Session: sessionmaker, limit: int, job_ids: Optional[Iterable[int]] = None) -> List[Job]:
+    """
+    Marks up to `limit` due jobs as running and leases them to the caller
+    for `JOB_LEASE_SECONDS`. The rows are selected with SKIP LOCKED, so
+    runners polling at once claim different jobs instead of waiting on
+    each other.
+
+    Args:
+        Session (sessionmaker): Creates the session of the claim.
+        limit (int): The maximum number of jobs to claim.
+        job_ids (Iterable[int], optional): Claims only these jobs.
+
+    Returns:
+        list: The claimed jobs, oldest due first.
+    """
+    now = utcnow()
+    stmt = DUE_JOBS_STMT if job_ids is None else DUE_JOBS_STMT.where(Job.id.in_(list(job_ids)))
+
+    async with Session() as session:
+        ids = (await session.execute(stmt.with_for_update(skip_locked=True), {"now": now, "limit": limit})).scalars().all()
+        if not ids:
+            return []
+
+        jobs = (await session.execute(CLAIM_STMT, {
+            "job_ids": ids, "now": now, "locked_until": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        })).scalars().all()
+        await session.commit()
+
+    return sorted(jobs, key=lambda job: (job.run_after, job.id))
+
+class JobRunner:
+    """
+    Runs the background jobs in `concurrency` tasks on the running loop.
+    The jobs enqueued by this process are handed to the tasks when their
+    transaction commits, so they start right after the request that added
+    them. The jobs of other processes, the retries and the jobs of runners
+    that died are found by polling the table every `poll_interval` seconds.
+    Several runners share the table, each job is claimed by one of them.
+    """
+    def __init__(self, concurrency: int = settings.JOB_CONCURRENCY, poll_interval: float = settings.JOB_POLL_SECONDS):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queued: Set[int] = set()
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self, job_ids: Iterable[int]):
+        """
+        Hands the given jobs to the tasks of the runner, if it is running. Can be called from any thread.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._put, list(job_ids))
+
+    def start(self, Session: sessionmaker):
+        """
+        Starts running the jobs on the running loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self._tasks = [self._loop.create_task(self._poll(Session))]
+        self._tasks += [self._loop.create_task(self._work(Session)) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """
+        Stops the runner. A job interrupted mid-run is run again once its lease expires.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        self._tasks, self._loop, self.queue = [], None, None
+        self._queued.clear()
+
+    async def run_pending(self, Session: sessionmaker) -> int:
+        """
+        Runs the due jobs, `concurrency` at a time, until there are none left.
+
+        Returns:
+            int: The number of job runs.
+        """
+        ran = 0
+        while jobs := await claim_jobs(Session, self.concurrency):
+            await asyncio.gather(*(self.run(Session, job) for job in jobs))
+            ran += len(jobs)
+
+        return ran
+
+    async def run(self, Session: sessionmaker, job: Job) -> str:
+        """
+        Runs a claimed job. A job that failed is queued again after
+        `retry_delay`, or marked as failed after its last attempt.
+
+        Returns:
+            str: The outcome of the run, `succeeded`, `retried` or `failed`.
+        """
+        handler = handlers.get(job.name)
+        limit = self._limits.setdefault(job.name, asyncio.Semaphore(handler.concurrency)) if handler and handler.concurrency else nullcontext()
+
+        async with limit:
+            JOB_QUEUE_DELAY.labels(job.name).observe(max((utcnow() - job.run_after).total_seconds(), 0))
+            JOBS_IN_PROGRESS.labels(job.name).inc()
+            start = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job {job.name!r}")
+
+                async with Session() as session:
+                    if handler.lease_seconds:
+                        # Claimed with the default lease, which a long job would outlast
+                        locked_until = utcnow() + timedelta(seconds=handler.lease_seconds)
+                        await session.execute(update(Job).where(Job.id == job.id).values(locked_until=locked_until))
+                        await session.commit()
+
+                    await handler.func(session, job.payload)
+                    await session.execute(DELETE_JOB_STMT, {"job_id": job.id})
+                    await session.commit()
+                status = "succeeded"
+            except Exception as error:
+                status = await self._fail(Session, job, error, retry=handler is not None)
+            finally:
+                JOBS_IN_PROGRESS.labels(job.name).dec()
+
+        JOB_DURATION.labels(job.name).observe(time.perf_counter() - start)
+        JOBS.labels(job.name, status).inc()
+        return status
+
+    async def _fail(self, Session: sessionmaker, job: Job, error: Exception, retry: bool) -> str:
+        values = {"status": FAILED, "locked_until": None, "last_error": "".join(traceback.format_exception(error))}
+        if retry and job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            values.update(status=QUEUED, run_after=utcnow() + timedelta(seconds=delay))
+            logger.warning("Job %s %d failed on attempt %d of %d, retrying in %s s", job.name, job.id, job.attempts, job.max_attempts, delay, exc_info=error)
+        else:
+            logger.error("Job %s %d failed on attempt %d of %d", job.name, job.id, job.attempts, job.max_attempts, exc_info=error)
+
+        async with Session() as session:
+            await session.execute(update(Job).where(Job.id == job.id).values(**values))
+            await session.commit()
+
+        return "retried" if values["status"] == QUEUED else "failed"
+
+    def _put(self, job_ids: List[int]):
+        if self.queue is None:
+            return
+
+        for job_id in job_ids:
+            if job_id not in self._queued:
+                self._queued.add(job_id)
+                self.queue.put_nowait(job_id)
+
+    async def _poll(self, Session: sessionmaker):
+        while True:
+            # Jobs still waiting in the queue are found again by the next poll
+            if self.queue.qsize() < self.concurrency:
+                try:
+                    async with Session() as session:
+                        ids = (await session.execute(DUE_JOBS_STMT, {"now": utcnow(), "limit": self.concurrency * 2})).scalars().all()
+                    self._put(ids)
+                except Exception:
+                    logger.exception("Polling the jobs failed, retrying in %s s", self.poll_interval)
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def _work(self, Session: sessionmaker):
+        while True:
+            job_id = await self.queue.get()
+            self._queued.discard(job_id)
+            try:
+                for claimed in await claim_jobs(Session, 1, [job_id]):
+                    await self.run(Session, claimed)
+            except Exception:
+                logger.exception("Running job %d failed", job_id)
+
+@event.listens_for(Session, "after_flush")
+def _collect_new_jobs(session, flush_context):
+    job_ids = [job.id for job in session.new if isinstance(job, Job)]
+    if job_ids:
+        session.info.setdefault(NEW_JOBS_KEY, []).extend(job_ids)
+
+@event.listens_for(Session, "after_commit")
+def _hand_over_new_jobs(session):
+    job_ids = session.info.pop(NEW_JOBS_KEY, None)
+    if job_ids:
+        job_runner.notify(job_ids)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_new_jobs(session, previous_transaction):
+    session.info.pop(NEW_JOBS_KEY, None)
+
+# The runner of this process, started with the app
+job_runner = JobRunner()
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
@@ -5,42 +6,80 @@ from fastapi_blog.accounts.admin import EmailUserView
 from fastapi_blog.accounts.models import EmailUser
 from fastapi_blog.accounts.routes import accounts_router
 from fastapi_blog.admin import AdminIndexView, AdminView
-from fastapi_blog.blogs.admin import BlogPostView
+from fastapi_blog.blogs.admin import BlogPostView, ExportBlogPostsView, ImportBlogPostsView
+from fastapi_blog.blogs.media import MediaFiles
 from fastapi_blog.blogs.models import BlogPost, Tag
 from fastapi_blog.blogs.routes import blogs_router
+from fastapi_blog.blogs.view_counts import view_counter
 from fastapi_blog.config import settings
+from fastapi_blog import database
 from fastapi_blog.database import async_engine
 from fastapi_blog.exceptions import NotAuthenticatedException
+from fastapi_blog.jobs import job_runner
+from fastapi_blog.monitoring.admin import ProfilesView
+from fastapi_blog.monitoring.loop_lag import LoopLagMonitor
+from fastapi_blog.monitoring.metrics import MetricsMiddleware, mark_process_dead, metrics
+from fastapi_blog.monitoring.profiling import ProfilingMiddleware
+from fastapi_blog.monitoring.queries import QueryMonitorMiddleware
+from fastapi_blog.monitoring.timing import ServerTimingMiddleware
 from fastapi_blog.auth import manager
 from starlette.middleware.sessions import SessionMiddleware
 from starlette_wtf import CSRFProtectMiddleware
 from starlette_admin.contrib.sqlmodel import Admin
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
-app = FastAPI(title="TriFrameBlog")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_lag_monitor = LoopLagMonitor()
+    loop_lag_monitor.start()
+    view_counter.start(database.SessionLocal)
+    if settings.JOB_RUNNER:
+        job_runner.start(database.SessionLocal)
+
+    yield
+
+    await job_runner.stop()
+    await view_counter.stop(database.SessionLocal)
+    await loop_lag_monitor.stop()
+    mark_process_dead()
+
+app = FastAPI(title="TriFrameBlog", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=settings.STATIC_DIR), name="static")
-app.mount("/media", StaticFiles(directory=settings.UPLOAD_FOLDER), name="media")
+app.mount("/media", MediaFiles(directory=settings.UPLOAD_FOLDER), name="media")
 
 # Middleware
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
 app.add_middleware(CSRFProtectMiddleware, csrf_secret=settings.CSRF_SECRET, enabled=not settings.TESTING)
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
 
+# Added before the user loader, so it runs inside it and sees the user
+app.add_middleware(ProfilingMiddleware)
+
 manager.attach_middleware(app)
 
+# Added last so they also see the user loader
+app.add_middleware(QueryMonitorMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Routes
 app.include_router(accounts_router, prefix="/accounts", tags=["accounts"], include_in_schema=False)
 app.include_router(blogs_router, prefix="", tags=["blogs"], include_in_schema=False)
+app.add_route("/metrics", metrics, include_in_schema=False)
 
 # Admin
 admin = Admin(
     async_engine,
     title="TriFrameBlog",
+    templates_dir=str(settings.ADMIN_TEMPLATES_DIR),
     index_view=AdminIndexView(label="Admin", path="/")
 )
 admin.add_view(BlogPostView(BlogPost))
 admin.add_view(AdminView(Tag))
+admin.add_view(ImportBlogPostsView())
+admin.add_view(ExportBlogPostsView())
 admin.add_view(EmailUserView(EmailUser))
+admin.add_view(ProfilesView())
 admin.mount_to(app)
 
 # Errors
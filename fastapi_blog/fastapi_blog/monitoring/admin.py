@@ -0,0 +1,28 @@
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from fastapi_blog.monitoring.profiling import get_profile_path, list_profiles
+from starlette.templating import Jinja2Templates
+from starlette_admin import CustomView
+
+class ProfilesView(CustomView):
+    """
+    Lists the saved request profiles, `?name=` opens one of them.
+    """
+    def __init__(self):
+        super().__init__(label="Profiles", icon="fa fa-stopwatch", path="/profiles", template_path="profiles.html")
+
+    def is_accessible(self, request: Request) -> bool:
+        return request.state.user and request.state.user.is_staff
+
+    async def render(self, request: Request, templates: Jinja2Templates) -> Response:
+        name = request.query_params.get("name")
+        if name is not None:
+            path = get_profile_path(name)
+            if path is None:
+                raise HTTPException(status_code=404, detail="Profile not found")
+
+            return FileResponse(path, media_type="text/html")
+
+        return templates.TemplateResponse(
+            self.template_path, {"request": request, "title": self.title(request), "profiles": list_profiles()}
+        )
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi_blog.config import settings
+from fastapi_blog.monitoring.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+# Innermost frames of the blocking stack that are logged
+STACK_LIMIT = 25
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a heartbeat scheduled every `interval`
+    seconds. Synchronous work in a coroutine delays the heartbeat of every
+    request on the worker, the delay is exported as the `event_loop_lag_seconds`
+    histogram.
+
+    A watchdog thread notices when the heartbeat is more than `threshold` seconds
+    late while the loop is still blocked, and logs the stack of the loop thread,
+    which shows the coroutine doing the blocking work.
+    """
+    def __init__(self, interval: float = settings.LOOP_LAG_INTERVAL, threshold: float = settings.LOOP_LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.blocked_stack: Optional[str] = None
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Starts the heartbeat on the running loop and the watchdog thread.
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        loop = asyncio.get_running_loop()
+        self._heartbeat = loop.create_task(self._beat(loop.time() + self.interval))
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        self._heartbeat.cancel()
+        try:
+            await self._heartbeat
+        except asyncio.CancelledError:
+            pass
+
+        self._watchdog.join()
+
+    async def _beat(self, expected: float):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await asyncio.sleep(max(expected - loop.time(), 0.0))
+            lag = max(loop.time() - expected, 0.0)
+
+            self._last_beat = time.monotonic()
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG.observe(lag)
+
+            expected = loop.time() + self.interval
+
+    def _watch(self):
+        reported_beat = None
+
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self.interval
+
+            # Report every stall once, while the blocking code is still on the stack
+            if blocked > self.threshold and beat != reported_beat:
+                reported_beat = beat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._report(blocked, frame)
+
+    def _report(self, blocked: float, frame):
+        self.blocked_stack = "".join(traceback.format_stack(frame)[-STACK_LIMIT:])
+        EVENT_LOOP_BLOCKS.inc()
+        logger.warning("Event loop blocked for over %.0f ms in:\n%s", blocked * 1000, self.blocked_stack)
+
+@asynccontextmanager
+async def assert_max_loop_block(budget: float):
+    """
+    Fails when the event loop is blocked for longer than `budget` seconds
+    while the block runs, e.g. by a route doing synchronous work.
+
+    Yields:
+        LoopLagMonitor: The monitor watching the block.
+    """
+    monitor = LoopLagMonitor(interval=0.005, threshold=budget)
+    monitor.start()
+    try:
+        yield monitor
+        # Let a heartbeat delayed by the end of the block report its lag
+        await asyncio.sleep(monitor.interval * 2)
+    finally:
+        await monitor.stop()
+
+    assert monitor.max_lag <= budget, (
+        f"Event loop blocked for {monitor.max_lag * 1000:.0f} ms, the budget is {budget * 1000:.0f} ms:\n"
+        f"{monitor.blocked_stack or ''}"
+    )
@@ -0,0 +1,179 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import Pool
+
+# The metric names are shared with the Flask and Django apps, keep them in sync.
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Number of handled HTTP requests.", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests.", ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Number of HTTP requests being handled.", ["method"], multiprocess_mode="livesum"
+)
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Number of database connections checked out of the pool.", multiprocess_mode="livesum"
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Number of cache lookups.", ["cache", "result"]
+)
+UPLOAD_SIZE = Histogram(
+    "upload_size_bytes", "Size of uploaded images.", ["storage"],
+    buckets=[10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000]
+)
+UPLOAD_DURATION = Histogram(
+    "upload_duration_seconds", "Time spent storing uploaded images.", ["storage"]
+)
+TEMPLATE_RENDER_DURATION = Histogram(
+    "template_render_duration_seconds", "Time spent rendering templates.", ["template"]
+)
+JOBS = Counter(
+    "jobs_total", "Number of background job runs by outcome.", ["job", "status"]
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Time spent running background jobs.", ["job"]
+)
+JOBS_IN_PROGRESS = Gauge(
+    "jobs_in_progress", "Number of background jobs being run.", ["job"], multiprocess_mode="livesum"
+)
+JOB_QUEUE_DELAY = Histogram(
+    "job_queue_delay_seconds", "Time background jobs waited between being due and starting.", ["job"],
+    buckets=[0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900]
+)
+
+# Only the async app has an event loop to block
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay of the event loop heartbeat.",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocks_total", "Number of times the event loop was blocked for longer than the threshold."
+)
+
+def record_cache_lookup(cache: str, hit: bool):
+    """
+    Counts a lookup of the named cache as a hit or a miss.
+    """
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+@contextmanager
+def observe_upload(storage: str, size: Optional[int]):
+    """
+    Records the size of an uploaded file and the time spent storing it.
+    """
+    if size is not None:
+        UPLOAD_SIZE.labels(storage).observe(size)
+
+    with UPLOAD_DURATION.labels(storage).time():
+        yield
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CONNECTIONS_IN_USE.inc()
+
+def _checkin(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS_IN_USE.dec()
+
+def install_pool_listeners():
+    """
+    Tracks the connections checked out of every SQLAlchemy connection pool.
+    """
+    if not event.contains(Pool, "checkout", _checkout):
+        event.listen(Pool, "checkout", _checkout)
+        event.listen(Pool, "checkin", _checkin)
+
+def _count_compiled_cache(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and context.cache_hit in (context.dialect.CACHE_HIT, context.dialect.CACHE_MISS):
+        record_cache_lookup("sql_compiled", context.cache_hit == context.dialect.CACHE_HIT)
+
+def install_compiled_cache_listeners():
+    """
+    Counts the statements found in SQLAlchemy's compiled cache as `sql_compiled` cache lookups.
+    """
+    if not event.contains(Engine, "after_cursor_execute", _count_compiled_cache):
+        event.listen(Engine, "after_cursor_execute", _count_compiled_cache)
+
+def get_registry():
+    """
+    Returns the registry to export. When the app runs in several worker processes,
+    `PROMETHEUS_MULTIPROC_DIR` is set and the values of all workers are aggregated.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+
+    return REGISTRY
+
+def mark_process_dead():
+    """
+    Drops the live gauges of the current worker when it shuts down.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+async def metrics(request: Request):
+    """
+    Exposes the metrics in the Prometheus text format.
+    """
+    return Response(generate_latest(get_registry()), media_type=CONTENT_TYPE_LATEST)
+
+def get_route(scope):
+    """
+    Returns the route template of a handled request, e.g. `/blogs/{blog_id}`, so the
+    label has a bounded number of values. Mounted apps are labeled by their prefix.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+
+    return scope.get("root_path") or "<unmatched>"
+
+class MetricsMiddleware:
+    """
+    Counts and times every request by method, route and status code.
+    """
+    def __init__(self, app):
+        self.app = app
+        install_pool_listeners()
+        install_compiled_cache_listeners()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.labels(method).dec()
+
+            route = get_route(scope)
+            HTTP_REQUESTS.labels(method, route, status).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
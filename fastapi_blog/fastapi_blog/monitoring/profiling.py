@@ -0,0 +1,111 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import quote, unquote
+from fastapi_blog.config import settings
+from pyinstrument import Profiler
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+
+PROFILE_HEADER = "X-Profile"
+
+@dataclass
+class ProfileFile:
+    """
+    A saved request profile. The request is encoded in the file name,
+    e.g. `20250101T120000000000_GET_%2Fblogs.html`.
+    """
+    name: str
+    created_at: datetime
+    method: str
+    path: str
+
+    @classmethod
+    def create(cls, method: str, path: str):
+        created_at = datetime.now()
+        name = f"{created_at:%Y%m%dT%H%M%S%f}_{method}_{quote(path, safe='')[:150]}.html"
+        return cls(name, created_at, method, path)
+
+    @classmethod
+    def from_name(cls, name: str):
+        try:
+            stamp, method, path = name.removesuffix(".html").split("_", 2)
+            return cls(name, datetime.strptime(stamp, "%Y%m%dT%H%M%S%f"), method, unquote(path))
+        except ValueError:
+            return None
+
+def profile_requested(query_params: QueryParams, headers: Headers):
+    """
+    Checks if the request asks for a profile with `?profile=1` or an `X-Profile: 1` header.
+    """
+    return query_params.get("profile") == "1" or headers.get(PROFILE_HEADER) == "1"
+
+def list_profiles() -> List[ProfileFile]:
+    """
+    Returns the saved profiles, newest first.
+    """
+    if not settings.PROFILES_DIR.is_dir():
+        return []
+
+    profiles = (ProfileFile.from_name(file.name) for file in settings.PROFILES_DIR.glob("*.html"))
+    return sorted((profile for profile in profiles if profile), key=lambda profile: profile.name, reverse=True)
+
+def get_profile_path(name: str) -> Optional[Path]:
+    """
+    Returns the file of a saved profile, None for unknown names.
+    """
+    if Path(name).name != name or ProfileFile.from_name(name) is None:
+        return None
+
+    path = settings.PROFILES_DIR / name
+    return path if path.is_file() else None
+
+def save_profile(profile: ProfileFile, profiler: Profiler):
+    """
+    Writes the profile as an HTML call tree and timeline, only the newest
+    `PROFILES_KEEP` profiles are kept.
+    """
+    settings.PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    (settings.PROFILES_DIR / profile.name).write_text(profiler.output_html(), encoding="utf-8")
+
+    for old in list_profiles()[settings.PROFILES_KEEP:]:
+        (settings.PROFILES_DIR / old.name).unlink(missing_ok=True)
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests of staff users that ask for it with `?profile=1` or
+    an `X-Profile: 1` header. The profile is saved for the admin and its name
+    is returned in the `X-Profile` response header.
+
+    It reads the user set by the login manager, so it has to be added before
+    `manager.attach_middleware`.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = ProfileFile.create(scope["method"], scope["path"])
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL, async_mode="enabled")
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_HEADER, profile.name)
+
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            profiler.stop()
+            # Rendering a large profile takes a while, which would stall the other requests
+            await asyncio.to_thread(save_profile, profile, profiler)
+
+    def should_profile(self, scope):
+        user = scope.get("state", {}).get("user")
+        return bool(user and user.is_staff) and profile_requested(QueryParams(scope["query_string"]), Headers(scope=scope))
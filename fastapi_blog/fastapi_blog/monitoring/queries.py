@@ -0,0 +1,144 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from fastapi_blog.config import settings
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|:\w+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(statement: str):
+    """
+    Reduces a SQL statement to its shape, so statements differing only in
+    literals, bound parameters or the length of an IN list compare equal.
+
+    Args:
+        statement (str): The SQL statement.
+
+    Returns:
+        str: The normalized statement.
+    """
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+
+    return _WHITESPACE.sub(" ", statement).strip()
+
+class QueryStats:
+    """
+    Collects the queries executed while it is active.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints: Counter[str] = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Returns the statement shapes executed more than `threshold` times.
+        """
+        return [(shape, count) for shape, count in self.fingerprints.most_common() if count > threshold]
+
+_active_stats: ContextVar[Tuple[QueryStats, ...]] = ContextVar("active_query_stats", default=())
+
+def current_query_stats() -> Optional[QueryStats]:
+    """
+    Returns the innermost active QueryStats, or None outside of a recording.
+    """
+    active = _active_stats.get()
+    return active[-1] if active else None
+
+@contextmanager
+def record_queries():
+    """
+    Records every query executed inside the block, including nested recordings.
+
+    Yields:
+        QueryStats: The statistics filled in while the block runs.
+    """
+    stats = QueryStats()
+    token = _active_stats.set(_active_stats.get() + (stats,))
+
+    try:
+        yield stats
+    finally:
+        _active_stats.reset(token)
+
+@contextmanager
+def assert_max_queries(limit: int, repeat_threshold: Optional[int] = None):
+    """
+    Fails when the block executes more than `limit` queries, or when a statement
+    shape repeats more than `repeat_threshold` times.
+
+    Yields:
+        QueryStats: The statistics filled in while the block runs.
+    """
+    with record_queries() as stats:
+        yield stats
+
+    shapes = "\n".join(f"{count}x {shape}" for shape, count in stats.fingerprints.most_common())
+    assert stats.count <= limit, f"Expected at most {limit} queries, got {stats.count}:\n{shapes}"
+
+    if repeat_threshold is not None:
+        repeated = stats.repeated(repeat_threshold)
+        assert not repeated, f"Statements repeated more than {repeat_threshold} times:\n{shapes}"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    for stats in _active_stats.get():
+        stats.record(statement, duration)
+
+def install_query_listeners():
+    """
+    Attaches the timing listeners to every SQLAlchemy engine, the async engines
+    included, since they run their statements through a sync engine.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+class QueryMonitorMiddleware:
+    """
+    Records the queries of each request and logs a warning when the same
+    statement shape repeats more than `repeat_threshold` times, which usually
+    means a relationship is loaded lazily inside a loop.
+    """
+    def __init__(self, app, repeat_threshold: int = settings.QUERY_REPEAT_THRESHOLD):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+        install_query_listeners()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with record_queries() as stats:
+            scope.setdefault("state", {})["query_stats"] = stats
+            await self.app(scope, receive, send)
+
+        request_line = f"{scope['method']} {scope['path']}"
+        logger.debug("%s: %d queries in %.1f ms", request_line, stats.count, stats.duration * 1000)
+
+        for shape, count in stats.repeated(self.repeat_threshold):
+            logger.warning("Possible N+1 in %s: statement executed %d times: %s", request_line, count, shape)
@@ -0,0 +1,125 @@
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Union
+from fastapi_blog.monitoring.queries import QueryStats
+from starlette.datastructures import MutableHeaders
+
+class ServerTiming:
+    """
+    Named phases of one request, rendered as a `Server-Timing` header.
+    """
+    def __init__(self):
+        self.phases: Dict[str, List[float]] = {}
+
+    def add(self, name: str, duration: float):
+        """
+        Adds a duration to the phase, summing repeated calls of the same phase.
+        """
+        phase = self.phases.setdefault(name, [0.0, 0])
+        phase[0] += duration
+        phase[1] += 1
+
+    def header(self, total: float, queries: Optional[QueryStats] = None):
+        """
+        Builds the header value, durations are in milliseconds.
+
+        Args:
+            total (float): Time spent on the whole request in seconds.
+            queries (QueryStats, optional): The request's query statistics, reported as `db`.
+
+        Returns:
+            str: The `Server-Timing` header value.
+        """
+        metrics = []
+
+        for name, (duration, calls) in self.phases.items():
+            metric = f"{name};dur={duration * 1000:.1f}"
+            if calls > 1:
+                metric += f';desc="{calls} calls"'
+            metrics.append(metric)
+
+        if queries is not None:
+            metrics.append(f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"')
+
+        metrics.append(f"total;dur={total * 1000:.1f}")
+
+        return ", ".join(metrics)
+
+_current_timing: ContextVar[Optional[ServerTiming]] = ContextVar("server_timing", default=None)
+
+@contextmanager
+def phase(name: str):
+    """
+    Times the block as the named phase of the current request, if there is one.
+    """
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+def timed(name: Union[str, Callable, None] = None):
+    """
+    Decorator timing every call of a function or coroutine as a request phase.
+    The phase is named after the function's qualified name unless `name` is given.
+    """
+    if callable(name):
+        return timed()(name)
+
+    def decorator(func: Callable):
+        label = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with phase(label):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+class ServerTimingMiddleware:
+    """
+    Collects the phases timed during a request and attaches them to the
+    response as a `Server-Timing` header, together with the DB time and total.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = ServerTiming()
+        token = _current_timing.set(timing)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                queries = scope.get("state", {}).get("query_stats")
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timing.header(time.perf_counter() - start, queries))
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timing.reset(token)
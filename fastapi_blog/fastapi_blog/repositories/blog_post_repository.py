@@ -1,32 +1,112 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import Depends
 from fastapi_blog.accounts.models import EmailUser
-from fastapi_blog.blogs.models import BlogPost, Tag
-from fastapi_blog.blogs.schemas import PaginatedResponse
-from fastapi_blog.database import get_session
-from sqlmodel import func, select, update
+from fastapi_blog.blogs.models import BlogPost, BlogPostCard, BlogPostTag, Tag
+from fastapi_blog.blogs.schemas import BlogCard, PaginatedResponse, TagCard
+from fastapi_blog.database import get_session, read_only, request_cached
+from fastapi_blog.monitoring.timing import timed
+from sqlmodel import func, select
+from sqlalchemy import bindparam, or_
 from sqlalchemy.orm import joinedload
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+# The hot statements are built once and their values bound on execution, so the
+# statement and its cache key are not rebuilt on every call.
+CARD_STMT = select(
+    BlogPostCard.id,
+    BlogPostCard.title,
+    BlogPostCard.excerpt,
+    BlogPostCard.image,
+    BlogPostCard.created_at,
+    BlogPostCard.author_name,
+    BlogPostCard.tags,
+)
+# The id breaks ties of the creation date, so pages and feed batches have one order
+LIST_STMT = CARD_STMT.order_by(BlogPostCard.created_at.desc(), BlogPostCard.id.desc())
+RECENT_STMT = LIST_STMT.limit(bindparam("limit"))
+# Walks the (views, id) index from its end and reads the card of each post
+POPULAR_STMT = (
+    CARD_STMT
+    .join(BlogPost, BlogPost.id == BlogPostCard.id)
+    .where(BlogPost.views > 0)
+    .order_by(BlogPost.views.desc(), BlogPost.id.desc())
+    .limit(bindparam("limit"))
+)
+BY_ID_STMT = (
+    select(BlogPost)
+    .options(joinedload(BlogPost.tags))
+    .options(joinedload(BlogPost.author))
+    .where(BlogPost.id == bindparam("blog_id"))
+)
+RELATED_STMT = (
+    CARD_STMT
+    .where(BlogPostCard.id.in_(
+        select(BlogPostTag.blogpost_id).where(BlogPostTag.tag_id.in_(bindparam("tag_ids", expanding=True)))
+    ))
+    .where(BlogPostCard.id != bindparam("blog_id"))
+    .order_by(BlogPostCard.id, func.random())
+    .limit(bindparam("limit"))
+)
+TITLES_STMT = (
+    select(BlogPost.id, BlogPost.title)
+    .where(BlogPost.id > bindparam("last_id"))
+    .order_by(BlogPost.id)
+    .limit(bindparam("limit"))
+)
+
 class BlogPostRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
+
+    def _to_cards(self, rows):
+        """
+        Builds blog cards from rows of the card columns.
+
+        Args:
+            rows: Rows selected with the card columns.
+
+        Returns:
+            list: A list of BlogCard objects in the order of the rows.
+        """
+        return [
+            BlogCard(id, title, excerpt, image, created_at, author_name, [TagCard(*tag) for tag in tags])
+            for id, title, excerpt, image, created_at, author_name, tags in rows
+        ]
     
-    async def get_recent(self, limit: int = 3):
+    @timed
+    @read_only
+    async def get_recent(self, limit: int = 3, tag_slugs: Optional[List[str]] = None):
         """
         Retrieves the most recent blog posts, ordered by creation date.
 
         Args:
             limit (int, optional): The maximum number of recent blog posts to return. Defaults to 3.
+            tag_slugs (list, optional): A list of tag slugs the blog posts must have. Defaults to None.
 
         Returns:
-            list: A list of the most recent BlogPost objects.
+            list: A list of BlogCard objects of the most recent blog posts.
         """
-        stmt = select(BlogPost).options(joinedload(BlogPost.tags)).order_by(BlogPost.created_at.desc()).limit(limit)
-        result = await self.db.exec(stmt)
+        stmt = self.get_all_query(tag_slugs).limit(bindparam("limit")) if tag_slugs else RECENT_STMT
+        result = await self.db.exec(stmt, params={"limit": limit})
 
-        return result.unique().all()
+        return self._to_cards(result.all())
+
+    @timed
+    @read_only
+    async def get_popular(self, limit: int = 12):
+        """
+        Retrieves the most viewed blog posts, ordered by their views.
+
+        Args:
+            limit (int, optional): The maximum number of blog posts to return. Defaults to 12.
+
+        Returns:
+            list: A list of BlogCard objects of the most viewed blog posts.
+        """
+        result = await self.db.exec(POPULAR_STMT, params={"limit": limit})
+
+        return self._to_cards(result.all())
 
     def get_all_query(self, tag_slugs: List[str], search: Optional[str] = None):
         """
@@ -39,18 +119,26 @@ class BlogPostRepository:
         Returns:
            The select statement to retrieve filtered blogs.
         """
-        stmt = select(BlogPost).options(joinedload(BlogPost.tags)).order_by(BlogPost.created_at.desc())
+        stmt = LIST_STMT
 
         if tag_slugs:
-            for tag_slug in tag_slugs:
-                stmt = stmt.filter(BlogPost.tags.any(Tag.slug == tag_slug))
+            # One statement shape for any number of tags: the posts having all of them
+            slugs = set(tag_slugs)
+            tagged = (
+                select(BlogPostTag.blogpost_id)
+                .join(Tag, Tag.id == BlogPostTag.tag_id)
+                .where(Tag.slug.in_(slugs))
+                .group_by(BlogPostTag.blogpost_id)
+                .having(func.count() == len(slugs))
+            )
+            stmt = stmt.where(BlogPostCard.id.in_(tagged))
 
         if search:
-            stmt = stmt.filter(BlogPost.title.ilike(f"%{search}%"))
+            stmt = stmt.where(BlogPostCard.title.ilike(f"%{search}%"))
 
-        stmt = stmt.order_by(BlogPost.created_at.desc()).distinct()
         return stmt
 
+    @timed
     async def get_all(self, tag_slugs: List[str], search: Optional[str] = None):
         """
         Executes the constructed query to retrieve all blog posts, optionally filtered by tags or search terms.
@@ -60,16 +148,35 @@ class BlogPostRepository:
             search (str, optional): A search string to filter blogs by title. Defaults to None.
 
         Returns:
-            list: A list of BlogPost objects matching the query criteria.
+            list: A list of BlogCard objects matching the query criteria.
         """
         stmt = self.get_all_query(tag_slugs, search)
         result = await self.db.exec(stmt)
         
-        return result.unique().all()
+        return self._to_cards(result.all())
+
+    @timed
+    @read_only
+    async def get_titles_after(self, last_id: int, limit: int = 10000):
+        """
+        Retrieves the IDs and titles of the blog posts after the given ID, ordered by ID.
+
+        Args:
+            last_id (int): The ID after which the blog posts are read.
+            limit (int, optional): The maximum number of blog posts to return. Defaults to 10000.
 
+        Returns:
+            list: A list of (id, title) tuples.
+        """
+        result = await self.db.exec(TITLES_STMT, params={"last_id": last_id, "limit": limit})
+
+        return [tuple(row) for row in result.all()]
+
+    @timed
+    @read_only
     async def get_paginated(self, stmt, page: int = 1, per_page: int = 6):
         """
-        Paginates a given query statement.
+        Paginates a given query statement of the card columns.
 
         Args:
             stmt: The SQLAlchemy select statement to paginate.
@@ -77,20 +184,20 @@ class BlogPostRepository:
             per_page (int): The number of items per page.
 
         Returns:
-            PaginatedResponse: A paginated result with blog posts.
+            PaginatedResponse: A paginated result with blog cards.
         """
         count_stmt = select(func.count()).select_from(stmt.subquery())
         total_count = (await self.db.exec(count_stmt)).one()
 
         paginated_stmt = stmt.offset((page - 1) * per_page).limit(per_page)
         results = await self.db.exec(paginated_stmt)
-        data = results.unique().all()
+        data = self._to_cards(results.all())
 
         total_pages = (total_count + per_page - 1) // per_page
         next_page = page + 1 if page * per_page < total_count else None
         prev_page = page - 1 if page > 1 else None
 
-        return PaginatedResponse[BlogPost](
+        return PaginatedResponse[BlogCard](
             data=data,
             total=total_count,
             page=page,
@@ -100,6 +207,39 @@ class BlogPostRepository:
             prev_page=prev_page,
         )
     
+    @timed
+    @read_only
+    async def get_feed(self, stmt, after: Optional[Tuple[datetime, int]] = None, limit: int = 6):
+        """
+        Reads the next batch of a query of the card columns by its position
+        instead of an offset: the cards older than the given one, newest first.
+        Nothing is counted or skipped, so every batch costs one index range
+        scan however deep the reader has scrolled.
+
+        Args:
+            stmt: The SQLAlchemy select statement ordered by `LIST_STMT`.
+            after (tuple, optional): The (created_at, id) of the last card read. Defaults to None for the first batch.
+            limit (int, optional): The maximum number of cards to return. Defaults to 6.
+
+        Returns:
+            list: A list of BlogCard objects.
+        """
+        if after:
+            created_at, blog_id = after
+            # The first condition alone bounds the scan of the created_at index
+            stmt = (
+                stmt
+                .where(BlogPostCard.created_at <= created_at)
+                .where(or_(BlogPostCard.created_at < created_at, BlogPostCard.id < blog_id))
+            )
+
+        result = await self.db.exec(stmt.limit(limit))
+
+        return self._to_cards(result.all())
+
+    @timed
+    @request_cached("blog_post")
+    @read_only
     async def get_by_id(self, blog_id: int):
         """
         Retrieves a blog post by its unique identifier (ID).
@@ -110,16 +250,30 @@ class BlogPostRepository:
         Returns:
             BlogPost or None: The BlogPost object if found, or None if no blog with the specified ID exists.
         """
-        stmt = (
-            select(BlogPost)
-            .options(joinedload(BlogPost.tags))
-            .options(joinedload(BlogPost.author))
-            .filter(BlogPost.id == blog_id)
-        )
-        result = await self.db.exec(stmt)
+        result = await self.db.exec(BY_ID_STMT, params={"blog_id": blog_id})
+
+        return result.unique().one_or_none()
+
+    @timed
+    @request_cached("blog_post_for_update")
+    async def get_by_id_for_update(self, blog_id: int):
+        """
+        Retrieves a blog post to be changed by its unique identifier (ID). It
+        is read from the primary, as the replica may not have its last write,
+        and cached apart from the posts `get_by_id` read.
+
+        Args:
+            blog_id (int): The ID of the blog post.
+
+        Returns:
+            BlogPost or None: The BlogPost object if found, or None if no blog with the specified ID exists.
+        """
+        result = await self.db.exec(BY_ID_STMT, params={"blog_id": blog_id})
 
         return result.unique().one_or_none()
 
+    @timed
+    @read_only
     async def get_related(self, blog: BlogPost, limit: int = 3):
         """
         Retrieves related blog posts based on shared tags, excluding the current blog post.
@@ -129,21 +283,12 @@ class BlogPostRepository:
             limit (int, optional): The maximum number of related blog posts to return. Defaults to 3.
 
         Returns:
-            list: A list of BlogPost objects related to the specified blog post.
-        """
-        stmt = (
-            select(BlogPost)
-            .join(BlogPost.tags)
-            .options(joinedload(BlogPost.tags))
-            .filter(Tag.id.in_([tag.id for tag in blog.tags]))
-            .filter(BlogPost.id != blog.id)
-            .group_by(BlogPost.id)
-            .order_by(BlogPost.id, func.random())
-            .limit(limit)
-        )
-        result = await self.db.exec(stmt)
+            list: A list of BlogCard objects of the posts related to the specified blog post.
+        """
+        params = {"tag_ids": [tag.id for tag in blog.tags], "blog_id": blog.id, "limit": limit}
+        result = await self.db.exec(RELATED_STMT, params=params)
 
-        return result.unique().all()
+        return self._to_cards(result.all())
     
     def get_by_author_query(self, user: EmailUser):
         """
@@ -155,14 +300,10 @@ class BlogPostRepository:
         Returns:
             The select statement to retrieve blogs by the specified author.
         """
-        return (
-            select(BlogPost)
-            .options(joinedload(BlogPost.tags))
-            .filter(BlogPost.author_id == user.id)
-            .order_by(BlogPost.created_at.desc())
-        )
+        return LIST_STMT.filter(BlogPostCard.author_id == user.id)
 
-    async def create(self, title: str, content: str, image: str, author: EmailUser, tags: List[Tag]):
+    @timed
+    async def create(self, title: str, content: str, image: str, author: EmailUser, tags: List[Tag], commit: bool = True):
         """
         Creates and persists a new blog post in the database.
 
@@ -172,6 +313,7 @@ class BlogPostRepository:
             image (str): The URL or file path to the image associated with the new blog post.
             author (EmailUser): The author of the new blog post.
             tags (list): A list of Tag objects to associate with the new blog post.
+            commit (bool, optional): Whether to commit, or leave the post in the session for the caller to commit.
 
         Returns:
             BlogPost: The created BlogPost object.
@@ -181,10 +323,14 @@ class BlogPostRepository:
             blog_post.tags = tags
         
         self.db.add(blog_post)
-        await self.db.commit()
+        if commit:
+            await self.db.commit()
+        else:
+            await self.db.flush()
 
         return blog_post
 
+    @timed
     async def update(
         self,
         blog: BlogPost,
@@ -193,35 +339,45 @@ class BlogPostRepository:
         image: str,
         tags: List[Tag],
         author: EmailUser,
-        created_at: datetime
+        created_at: datetime,
+        commit: bool = True
         ):
         """
-        Updates an existing blog post with new data.
+        Updates an existing blog post with new data. The changes are written
+        in one flush, which updates only the changed columns and inserts or
+        deletes only the tag links that differ.
 
         Args:
-            blog (BlogPost): The blog post to update.
+            blog (BlogPost): The blog post to update, with its tags loaded.
             title (str): The new title for the blog post.
             content (str): The new content for the blog post.
             image (str): The new image URL or file path for the blog post.
             tags (list): A list of new Tag objects to associate with the blog post.
             author (EmailUser): The author of the blog post.
             created_at (datetime): Time when the blog was created.
+            commit (bool, optional): Whether to commit, or leave the post in the session for the caller to commit.
 
         Returns:
             BlogPost: The updated BlogPost object.
         """
-        stmt = (
-            update(BlogPost)
-            .where(BlogPost.id == blog.id)
-            .values(title=title, content=content, image=image, created_at=created_at)
-        )
-        await self.db.exec(stmt)
-        blog.tags = tags
+        blog.title = title
+        blog.content = content
+        blog.image = image
+        blog.created_at = created_at
         blog.author = author
-        await self.db.commit()
+
+        tag_ids = {tag.id for tag in tags}
+        current_ids = {tag.id for tag in blog.tags}
+        for tag in [tag for tag in blog.tags if tag.id not in tag_ids]:
+            blog.tags.remove(tag)
+        blog.tags.extend(tag for tag in tags if tag.id not in current_ids)
+
+        if commit:
+            await self.db.commit()
 
         return blog
 
+    @timed
     async def delete(self, blog: BlogPost):
         """
         Deletes a blog post from the database.
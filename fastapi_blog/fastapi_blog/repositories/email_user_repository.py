@@ -2,7 +2,8 @@ from datetime import datetime, timezone
 from typing import Optional
 from fastapi import Depends
 from fastapi_blog.accounts.models import EmailUser
-from fastapi_blog.database import get_session
+from fastapi_blog.database import get_session, request_cached
+from fastapi_blog.monitoring.timing import timed
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
@@ -10,6 +11,8 @@ class EmailUserRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    @timed
+    @request_cached("email_user")
     async def get_by_id(self, id: int):
         """
         Retrieves an EmailUser by id.
@@ -25,6 +28,7 @@ class EmailUserRepository:
 
         return result.one_or_none()
 
+    @timed
     async def get_by_email(self, email: str):
         """
         Retrieves an EmailUser by email.
@@ -40,6 +44,7 @@ class EmailUserRepository:
 
         return result.one_or_none()
     
+    @timed
     async def create(
             self,
             email: str,
@@ -67,6 +72,7 @@ class EmailUserRepository:
 
         return user
 
+    @timed
     async def update(self, user: EmailUser):
         """
         Updated the EmailUser.
@@ -0,0 +1,34 @@
+from fastapi import Depends
+from fastapi_blog.blogs.models import Job
+from fastapi_blog.database import get_session
+from fastapi_blog.jobs import new_job
+from fastapi_blog.monitoring.timing import timed
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+class JobRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @timed
+    async def enqueue(self, name: str, payload: dict, delay: float = 0) -> Job:
+        """
+        Adds a background job, handed to the job runner once it is committed.
+        It is committed with the writes pending in the session, like the post it
+        follows.
+
+        Args:
+            name (str): The name of the job's handler.
+            payload (dict): The JSON arguments of the handler.
+            delay (float, optional): Seconds before the job is due.
+
+        Returns:
+            Job: The queued job.
+        """
+        job = new_job(name, payload, delay)
+        self.db.add(job)
+        await self.db.commit()
+
+        return job
+
+def get_job_repository(db: AsyncSession = Depends(get_session)):
+    return JobRepository(db)
@@ -1,14 +1,22 @@
 from typing import List
 from fastapi import Depends
 from fastapi_blog.blogs.models import Tag
-from fastapi_blog.database import get_session
+from fastapi_blog.database import get_session, read_only, request_cached
+from fastapi_blog.monitoring.timing import timed
+from sqlalchemy import bindparam
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+ALL_TAGS_STMT = select(Tag)
+BY_SLUG_STMT = select(Tag).where(Tag.slug == bindparam("slug"))
+
 class TagRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    @timed
+    @request_cached("tags")
+    @read_only
     async def get_all(self):
         """
         Retrieves all tag records from the database.
@@ -16,14 +24,33 @@ class TagRepository:
         Returns:
             list: A list of all Tag objects in the database.
         """
-        stmt = select(Tag)
-        result = await self.db.exec(stmt)
+        result = await self.db.exec(ALL_TAGS_STMT)
 
         return result.all()
 
+    @timed
+    @read_only
+    async def get_by_slug(self, slug: str):
+        """
+        Retrieves a tag by its slug.
+
+        Args:
+            slug (str): The slug of the tag.
+
+        Returns:
+            Tag or None: The Tag object if found, or None if no tag has the slug.
+        """
+        result = await self.db.exec(BY_SLUG_STMT, params={"slug": slug})
+
+        return result.one_or_none()
+
+    @timed
+    @request_cached("tags_by_ids")
     async def get_by_ids(self, tag_ids: List[int]):
         """
-        Retrieves multiple tags by their unique identifiers (IDs).
+        Retrieves multiple tags by their unique identifiers (IDs). Tags the
+        session already loaded, e.g. for the choices of a form, are taken from
+        its identity map without a query.
 
         Args:
             tag_ids (list): A list of tag IDs to retrieve.
@@ -31,10 +58,21 @@ class TagRepository:
         Returns:
             list: A list of Tag objects corresponding to the specified IDs.
         """
-        stmt = select(Tag).where(Tag.id.in_(tag_ids))
-        result = await self.db.exec(stmt)
+        tags = []
+        missing_ids = []
+        for tag_id in tag_ids:
+            tag = self.db.identity_map.get(self.db.identity_key(Tag, tag_id))
+            if tag is None:
+                missing_ids.append(tag_id)
+            else:
+                tags.append(tag)
 
-        return result.all()
+        if missing_ids:
+            stmt = select(Tag).where(Tag.id.in_(missing_ids))
+            result = await self.db.exec(stmt)
+            tags += result.all()
+
+        return tags
     
 def get_tag_repository(db: AsyncSession = Depends(get_session)):
     return TagRepository(db)
\ No newline at end of file
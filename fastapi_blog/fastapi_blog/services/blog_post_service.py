@@ -1,20 +1,58 @@
+import asyncio
 import os
+import shutil
 import uuid
 import cloudinary.uploader
 from datetime import datetime
 from fastapi import Depends
 from fastapi_blog.accounts.models import EmailUser
+from fastapi_blog.blogs.direct_uploads import verify_upload
 from fastapi_blog.blogs.exceptions import BlogPostNotFoundError
+from fastapi_blog.blogs.jobs import UPLOAD_IMAGE
+from fastapi_blog.blogs.media import store_media
 from fastapi_blog.blogs.models import BlogPost
+from fastapi_blog.blogs.schemas import BlogCard, FeedCursor, FeedResponse
+from fastapi_blog.blogs.suggest import title_index
 from fastapi_blog.config import settings
+from fastapi_blog.monitoring.metrics import observe_upload
 from fastapi_blog.repositories.blog_post_repository import BlogPostRepository, get_blog_post_repository
 from fastapi_blog.repositories.email_user_repository import EmailUserRepository, get_email_user_repository
+from fastapi_blog.repositories.job_repository import JobRepository, get_job_repository
 from fastapi_blog.repositories.tag_repository import TagRepository, get_tag_repository
 from html_sanitizer import Sanitizer
+from functools import lru_cache
 from typing import Annotated, List, Optional
 
+SANITIZER_SETTINGS = {
+    "tags": ["h1", "h2", "h3", "p", "b", "i", "u", "a", "ul", "ol", "li", "br", "strong", "em", "span"],
+    "attributes": {
+        "a": ["href", "target", "rel"],
+        "span": ["class", "contenteditable"],
+        "li": ["data-list"]
+    },
+    "empty": ["br", "p", "span"],
+    "separate": ["li", "p", "br"],
+}
+
+@lru_cache(maxsize=None)
+def get_sanitizer() -> Sanitizer:
+    return Sanitizer(SANITIZER_SETTINGS)
+
+def sanitize_content(content: str) -> str:
+    """
+    Removes the disallowed HTML tags and attributes from blog content. A module
+    level function, so it can also run in the worker processes of an import.
+    """
+    return get_sanitizer().sanitize(content)
+
 class BlogPostService:
-    def __init__(self, blog_repo: BlogPostRepository, tag_repo: TagRepository, user_repo: EmailUserRepository):
+    def __init__(
+        self,
+        blog_repo: BlogPostRepository,
+        tag_repo: TagRepository,
+        user_repo: EmailUserRepository,
+        job_repo: Optional[JobRepository] = None
+        ):
         """
         Initializes the BlogPostService with repositories for blog posts and tags.
 
@@ -22,10 +60,12 @@ class BlogPostService:
             blog_repo: An instance of the BlogPostRepository for blog operations.
             tag_repo: An instance of the TagRepository for tag-related operations.
             user_repo:  An instance of the EmailUserRepository for user-related operations.
+            job_repo: An instance of the JobRepository for the work done after a write.
         """
         self.blog_repo = blog_repo
         self.tag_repo = tag_repo
         self.user_repo = user_repo
+        self.job_repo = job_repo
 
     async def get_recent_blogs(self, limit: int = 3):
         """
@@ -35,9 +75,34 @@ class BlogPostService:
             limit (int, optional): The maximum number of recent blog posts to retrieve. Defaults to 3.
 
         Returns:
-            list: A list of BlogPost objects representing the most recent blogs.
+            list: A list of BlogCard objects representing the most recent blogs.
         """
         return await self.blog_repo.get_recent(limit)
+
+    async def get_recent_blogs_by_tags(self, tag_slugs: List[str], limit: int = 3):
+        """
+        Retrieves the most recent blog posts having all the given tags.
+
+        Args:
+            tag_slugs (list): A list of tag slugs the blogs must have.
+            limit (int, optional): The maximum number of recent blog posts to retrieve. Defaults to 3.
+
+        Returns:
+            list: A list of BlogCard objects representing the most recent blogs.
+        """
+        return await self.blog_repo.get_recent(limit, tag_slugs)
+
+    async def get_popular_blogs(self, limit: int = 12):
+        """
+        Retrieves the most viewed blog posts.
+
+        Args:
+            limit (int, optional): The maximum number of blog posts to retrieve. Defaults to 12.
+
+        Returns:
+            list: A list of BlogCard objects representing the most viewed blogs.
+        """
+        return await self.blog_repo.get_popular(limit)
     
     async def get_paginated_blogs(self, tag_slugs: List[str], search: Optional[str], page: int, per_page: int):
         """
@@ -50,17 +115,84 @@ class BlogPostService:
             per_page (int, optional): The number of blogs per page.
 
         Returns:
-            PaginatedResult: A paginated result set containing BlogPost objects.
+            PaginatedResult: A paginated result set containing BlogCard objects.
         """
         stmt = self.blog_repo.get_all_query(tag_slugs, search)
         return await self.blog_repo.get_paginated(stmt, page, per_page)
     
-    async def get_blog_by_id(self, blog_id: int):
+    async def get_blog_feed(self, tag_slugs: List[str], search: Optional[str], cursor: Optional[FeedCursor], per_page: int):
+        """
+        Retrieves the next batch of the infinite-scroll feed. A cursor continues
+        after its card with the filters it was read with, without one the feed
+        starts at the newest blog matching the given filters.
+
+        Args:
+            tag_slugs (list, optional): A list of tag slugs to filter blogs by tags.
+            search (str, optional): A search term to filter blogs by title.
+            cursor (FeedCursor, optional): The position of the last batch read.
+            per_page (int): The number of blogs per batch.
+
+        Returns:
+            FeedResponse: The BlogCard objects of the batch and the cursor of the next one, None after the last.
+        """
+        after = None
+        if cursor:
+            tag_slugs, search, after = cursor.tag_slugs, cursor.search, (cursor.created_at, cursor.id)
+
+        stmt = self.blog_repo.get_all_query(tag_slugs, search)
+        # One more than the batch tells whether there is a next one
+        blogs = await self.blog_repo.get_feed(stmt, after, per_page + 1)
+        blogs, more = blogs[:per_page], len(blogs) > per_page
+
+        return FeedResponse[BlogCard](data=blogs, cursor=self.feed_cursor(blogs[-1], tag_slugs, search) if more else None)
+
+    def feed_cursor(self, last: BlogCard, tag_slugs: List[str], search: Optional[str]):
+        """
+        Builds the token continuing the feed after a batch or page of blogs.
+
+        Args:
+            last (BlogCard): The last blog shown.
+            tag_slugs (list, optional): The tag slugs the blogs were filtered by.
+            search (str, optional): The search term the blogs were filtered by.
+
+        Returns:
+            str: The opaque token of the position after the blog.
+        """
+        return FeedCursor(last.created_at, last.id, tag_slugs, search).encode()
+
+    async def suggest_titles(self, query: str, limit: int = 8):
+        """
+        Retrieves the blog posts whose title has a word starting with each word
+        of the query, from the title index of this process. The index is read
+        from the database on first use, and the posts added since are read
+        every `SUGGEST_REFRESH_SECONDS`, the writes of this process update it
+        right away.
+
+        Args:
+            query (str): The words typed into the search box so far.
+            limit (int, optional): The maximum number of suggestions. Defaults to 8.
+
+        Returns:
+            list: A list of (id, title) tuples.
+        """
+        if title_index.needs_refresh(settings.SUGGEST_REFRESH_SECONDS):
+            rows, last_id = [], title_index.last_id
+            while batch := await self.blog_repo.get_titles_after(last_id, settings.SUGGEST_LOAD_BATCH_SIZE):
+                rows += batch
+                last_id = batch[-1][0]
+
+            # Splitting a million titles takes seconds, which would stall the event loop
+            await asyncio.to_thread(title_index.add_many, rows)
+
+        return title_index.search(query, limit)
+
+    async def get_blog_by_id(self, blog_id: int, for_update: bool = False):
         """
         Retrieves a single blog post by its unique identifier (ID).
 
         Args:
             blog_id (int): The ID of the blog post to retrieve.
+            for_update (bool, optional): Whether the post is about to be changed, so it is read from the primary.
 
         Raises:
             ValueError: If no blog post is found with the given ID.
@@ -68,7 +200,10 @@ class BlogPostService:
         Returns:
             BlogPost: The BlogPost object corresponding to the provided ID.
         """
-        blog = await self.blog_repo.get_by_id(blog_id)
+        if for_update:
+            blog = await self.blog_repo.get_by_id_for_update(blog_id)
+        else:
+            blog = await self.blog_repo.get_by_id(blog_id)
         if not blog:
             raise BlogPostNotFoundError()
 
@@ -83,7 +218,7 @@ class BlogPostService:
             limit (int, optional): The maximum number of related blog posts to return. Defaults to 3.
 
         Returns:
-            list: A list of related BlogPost objects.
+            list: A list of BlogCard objects of the related blogs.
         """
         return await self.blog_repo.get_related(blog, limit=limit)
 
@@ -97,14 +232,23 @@ class BlogPostService:
             per_page (int, optional): The number of blog posts per page. Defaults to 6.
 
         Returns:
-            Pagination: A paginated result set containing BlogPost objects authored by the specified user.
+            Pagination: A paginated result set containing BlogCard objects authored by the specified user.
         """
         stmt = self.blog_repo.get_by_author_query(user)
         return await self.blog_repo.get_paginated(stmt, page, per_page)
 
-    async def create_blog_post(self, title: str, content: str, image: Optional[str], author_id: int, tag_ids: List[int]):
+    async def create_blog_post(
+        self,
+        title: str,
+        content: str,
+        image: Optional[str],
+        author_id: int,
+        tag_ids: List[int],
+        image_key: Optional[str] = None
+        ):
         """
-        Creates a new blog post with the provided details.
+        Creates a new blog post with the provided details. An image uploaded
+        to Cloudinary is set by a background job after the post is created.
 
         Args:
             title (str): The title of the new blog post.
@@ -112,16 +256,30 @@ class BlogPostService:
             image (Optional[str]): The image associated with the new blog post.
             author_id (int): The author of the new blog post.
             tag_ids (list): A list of tag IDs to associate with the new blog post.
+            image_key (str, optional): The key of an image the browser uploaded straight to the storage, used instead of `image`.
+
+        Raises:
+            InvalidUploadError: If the image of `image_key` fails its checks.
 
         Returns:
             BlogPost: The newly created BlogPost object.
         """
         author = await self.user_repo.get_by_id(author_id)
-        content = self.clean_content(content)
-        image_url = self.upload_image(image)
+        content = await asyncio.to_thread(self.clean_content, content)
+        if image_key:
+            staged, image_url = None, await asyncio.to_thread(verify_upload, image_key)
+        else:
+            # Staging or storing the image writes it to disk, which would stall the event loop
+            staged = await asyncio.to_thread(self.stage_image, image)
+            image_url = None if staged else await asyncio.to_thread(self.upload_image, image)
         tags = await self.tag_repo.get_by_ids(tag_ids)
 
-        return await self.blog_repo.create(title, content, image_url, author, tags)
+        # The upload job is committed with the post, so neither is kept without the other
+        blog = await self.blog_repo.create(title, content, image_url, author, tags, commit=not staged)
+        if staged:
+            await self.job_repo.enqueue(UPLOAD_IMAGE, {"blog_id": blog.id, "path": staged})
+
+        return blog
 
     async def update_blog_post(
         self,
@@ -131,10 +289,13 @@ class BlogPostService:
         tag_ids: List[int],
         image: str = None,
         author_id: Optional[int] = None,
-        created_at: Optional[datetime] = None
+        created_at: Optional[datetime] = None,
+        blog: Optional[BlogPost] = None,
+        image_key: Optional[str] = None
         ):
         """
-        Updates an existing blog post with new data.
+        Updates an existing blog post with new data. A new image uploaded to
+        Cloudinary replaces the current one once a background job uploaded it.
 
         Args:
             blog_id (int): The ID of the blog post to update.
@@ -144,14 +305,18 @@ class BlogPostService:
             tag_ids (list): A list of tag IDs to associate with the updated blog post.
             author_id (int): The author of the blog post.
             created_at (datetime): Time when the blog was created.
+            blog (BlogPost, optional): The blog post when the caller already loaded it with get_blog_by_id for update.
+            image_key (str, optional): The key of an image the browser uploaded straight to the storage, used instead of `image`.
 
         Raises:
             abort(404): If the blog post with the provided ID does not exist.
+            InvalidUploadError: If the image of `image_key` fails its checks.
 
         Returns:
             BlogPost: The updated BlogPost object.
         """
-        blog = await self.blog_repo.get_by_id(blog_id)
+        if blog is None:
+            blog = await self.blog_repo.get_by_id_for_update(blog_id)
         if not blog:
             raise BlogPostNotFoundError()
 
@@ -161,11 +326,28 @@ class BlogPostService:
 
         created_at = created_at if created_at else blog.created_at
 
-        tags = await self.tag_repo.get_by_ids(tag_ids)
-        content = self.clean_content(content)
-        image_url = self.upload_image(image) if image and image.filename else blog.image
+        # Only the newly added tags have to be loaded, the others are already on the blog
+        current_tags = {tag.id: tag for tag in blog.tags}
+        tags = [current_tags[tag_id] for tag_id in tag_ids if tag_id in current_tags]
+        added_ids = [tag_id for tag_id in tag_ids if tag_id not in current_tags]
+        if added_ids:
+            tags += await self.tag_repo.get_by_ids(added_ids)
+
+        content = await asyncio.to_thread(self.clean_content, content)
+        if image_key:
+            staged, image_url = None, await asyncio.to_thread(verify_upload, image_key)
+        else:
+            staged = await asyncio.to_thread(self.stage_image, image)
+            if image and image.filename and not staged:
+                image_url = await asyncio.to_thread(self.upload_image, image)
+            else:
+                image_url = blog.image
+
+        blog = await self.blog_repo.update(blog, title, content, image_url, tags, author, created_at, commit=not staged)
+        if staged:
+            await self.job_repo.enqueue(UPLOAD_IMAGE, {"blog_id": blog.id, "path": staged})
 
-        return await self.blog_repo.update(blog, title, content, image_url, tags, author, created_at)
+        return blog
 
     async def delete_blog_post(self, blog_id: int):
         """
@@ -180,7 +362,7 @@ class BlogPostService:
         Returns:
             None
         """
-        blog = await self.blog_repo.get_by_id(blog_id)
+        blog = await self.blog_repo.get_by_id_for_update(blog_id)
         if not blog:
             raise BlogPostNotFoundError()
 
@@ -196,22 +378,12 @@ class BlogPostService:
         Returns:
             str: The cleaned content, safe for rendering in the application.
         """
-        sanitizer = Sanitizer({
-            "tags": ["h1", "h2", "h3", "p", "b", "i", "u", "a", "ul", "ol", "li", "br", "strong", "em", "span"],
-            "attributes": {
-                "a": ["href", "target", "rel"],
-                "span": ["class", "contenteditable"],
-                "li": ["data-list"]
-            },
-            "empty": ["br", "p", "span"],
-            "separate": ["li", "p", "br"],
-        })
-
-        return sanitizer.sanitize(content)
+        return sanitize_content(content)
 
     def upload_image(self, image_file):
         """
         Uploads an image file to Cloudinary and returns the secure URL of the uploaded image.
+        Stored locally, the image is named by the hash of its content, see `store_media`.
 
         Args:
             image_file (file): The image file to upload.
@@ -223,24 +395,45 @@ class BlogPostService:
             return None
 
         if settings.USE_CLOUDINARY:
-            upload_result = cloudinary.uploader.upload(image_file.file)
+            with observe_upload("cloudinary", image_file.size):
+                upload_result = cloudinary.uploader.upload(image_file.file)
             return upload_result["secure_url"]
 
-        upload_folder = settings.UPLOAD_FOLDER
-        os.makedirs(upload_folder, exist_ok=True)
+        with observe_upload("local", image_file.size):
+            image_file.file.seek(0)
+            key = store_media(image_file.file, os.path.splitext(image_file.filename)[1])
+
+        return f"/media/{key}"
+
+    def stage_image(self, image_file):
+        """
+        Writes an image to be uploaded to Cloudinary to the staging folder,
+        for the `upload_image` job, so the request doesn't wait for the upload.
+        Stored locally, images are written to their place right away.
+
+        Args:
+            image_file (file): The image file to stage.
+
+        Returns:
+            str or None: The path of the staged file, or None if no image is provided or images are stored locally.
+        """
+        if not settings.USE_CLOUDINARY or not image_file or not image_file.filename:
+            return None
+
+        staging_folder = settings.UPLOAD_STAGING_FOLDER
+        os.makedirs(staging_folder, exist_ok=True)
 
-        filename = f"{uuid.uuid4()}_{image_file.filename}"
-        file_path = os.path.join(upload_folder, filename)
-        
+        file_path = os.path.join(staging_folder, f"{uuid.uuid4()}{os.path.splitext(image_file.filename)[1]}")
         with open(file_path, 'wb') as buffer:
             image_file.file.seek(0)
-            buffer.write(image_file.file.read())
+            shutil.copyfileobj(image_file.file, buffer)
 
-        return f"/media/{filename}"
+        return file_path
 
 def get_blog_post_service(
     blog_post_repo: Annotated[BlogPostRepository, Depends(get_blog_post_repository)],
     tag_repo: Annotated[TagRepository, Depends(get_tag_repository)],
     user_repo: Annotated[EmailUserRepository, Depends(get_email_user_repository)],
+    job_repo: Annotated[JobRepository, Depends(get_job_repository)],
 ):
-    return BlogPostService(blog_post_repo, tag_repo, user_repo)
\ No newline at end of file
+    return BlogPostService(blog_post_repo, tag_repo, user_repo, job_repo)
\ No newline at end of file
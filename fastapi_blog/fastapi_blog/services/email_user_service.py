@@ -157,6 +157,21 @@ class EmailUserService:
 
         return updated_user
 
+    async def rehash_password(self, user: EmailUser, password: str):
+        """
+        Rehashes the password of a user whose hash is in a format the app only
+        verifies, e.g. of users migrated from the Django app.
+
+        Args:
+            user (EmailUser): The user who just logged in with the password.
+            password (str): The verified plain-text password.
+
+        Returns:
+            EmailUser: The updated EmailUser object.
+        """
+        user.set_password(password)
+        return await self.user_repo.update(user)
+
     async def update_username(self, user: EmailUser, new_username: str):
         """
         Updates the user's profile with a new username.
@@ -21,5 +21,17 @@ class TagService:
         """
         return await self.tag_repo.get_all()
 
+    async def get_by_slug(self, slug: str):
+        """
+        Retrieves a tag by its slug.
+
+        Args:
+            slug (str): The slug of the tag.
+
+        Returns:
+            Tag or None: The Tag object, or None if no tag has the slug.
+        """
+        return await self.tag_repo.get_by_slug(slug)
+
 def get_tag_service(tag_repo: TagRepository = Depends(get_tag_repository)):
     return TagService(tag_repo)
\ No newline at end of file
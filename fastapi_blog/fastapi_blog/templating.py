@@ -2,6 +2,8 @@ from typing import Any
 from fastapi import Request
 from fastapi.templating import Jinja2Templates
 from fastapi_blog.config import settings
+from fastapi_blog.monitoring.metrics import TEMPLATE_RENDER_DURATION
+from fastapi_blog.monitoring.timing import phase
 from jinja2 import Environment, FileSystemLoader
 
 def toast(request: Request, message: Any, type: str = "info"):
@@ -12,9 +14,19 @@ def toast(request: Request, message: Any, type: str = "info"):
 def get_toast_messages(request: Request):
    return request.session.pop("_messages") if "_messages" in request.session else []
 
+class TimedJinja2Templates(Jinja2Templates):
+   """
+   Jinja2Templates reporting the template rendering as the `render` request phase
+   and in the render time metric.
+   """
+   def TemplateResponse(self, request: Request, name: str, *args, **kwargs):
+      with phase("render"), TEMPLATE_RENDER_DURATION.labels(name).time():
+         return super().TemplateResponse(request, name, *args, **kwargs)
+
 jinja_env = Environment(
     loader=FileSystemLoader([str(path) for path in settings.TEMPLATES_DIRS]),
 )
 jinja_env.globals["get_toast_messages"] = get_toast_messages
+jinja_env.globals["settings"] = settings
 
-templates = Jinja2Templates(env=jinja_env)
\ No newline at end of file
+templates = TimedJinja2Templates(env=jinja_env)
\ No newline at end of file
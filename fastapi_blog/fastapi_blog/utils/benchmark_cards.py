@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import time
+import tracemalloc
+from fastapi_blog.accounts.models import EmailUser
+from fastapi_blog.blogs.models import BlogPost, Tag
+from fastapi_blog.repositories.blog_post_repository import BlogPostRepository
+from sqlalchemy.orm import joinedload, sessionmaker
+from sqlmodel import SQLModel, create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# The list page query as it was before the card projection
+ORM_LIST_STMT = select(BlogPost).options(joinedload(BlogPost.tags)).order_by(BlogPost.created_at.desc())
+
+async def orm_page(session: AsyncSession, page: int, per_page: int):
+    """
+    Loads a page of full BlogPost entities with their tags.
+    """
+    count_stmt = select(func.count()).select_from(ORM_LIST_STMT.subquery())
+    await session.exec(count_stmt)
+    result = await session.exec(ORM_LIST_STMT.offset((page - 1) * per_page).limit(per_page))
+
+    return result.unique().all()
+
+async def card_page(session: AsyncSession, page: int, per_page: int):
+    """
+    Loads a page of blog cards through the repository.
+    """
+    repo = BlogPostRepository(session)
+    result = await repo.get_paginated(repo.get_all_query([]), page, per_page)
+
+    return result.data
+
+async def seed(Session: sessionmaker, posts: int, content_size: int):
+    paragraph = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4 + "</p>"
+    content = (paragraph * (content_size // len(paragraph) + 1))[:content_size]
+
+    async with Session() as session:
+        author = EmailUser(email="author@example.com", password_hash="x")
+        tags = [Tag(name=f"Tag {i}") for i in range(10)]
+        session.add_all(
+            BlogPost(title=f"Blog {i}", content=content, author=author, tags=tags[i % 8:i % 8 + 3])
+            for i in range(posts)
+        )
+        await session.commit()
+
+async def measure(Session: sessionmaker, load_page, pages: int, per_page: int, requests: int):
+    """
+    Returns the time per card and the peak memory of a single request, each
+    request using a new session like the app does.
+    """
+    async def request(i: int):
+        async with Session() as session:
+            return len(await load_page(session, i % pages + 1, per_page))
+
+    for i in range(pages):
+        await request(i)
+
+    cards = 0
+    start = time.perf_counter()
+    for i in range(requests):
+        cards += await request(i)
+    per_card = (time.perf_counter() - start) / cards * 1_000_000
+
+    tracemalloc.start()
+    await request(0)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return per_card, peak
+
+async def benchmark(posts: int, content_size: int, per_page: int, requests: int):
+    """
+    Compares loading the blog list pages as full ORM entities and as cards.
+    """
+    engine = AsyncEngine(create_engine("sqlite+aiosqlite://"))
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await seed(Session, posts, content_size)
+    pages = (posts + per_page - 1) // per_page
+
+    print(f"{posts} posts of {content_size} characters, {per_page} per page, {requests} requests")
+    for name, load_page in [("ORM entities", orm_page), ("Cards", card_page)]:
+        per_card, peak = await measure(Session, load_page, pages, per_page, requests)
+        print(f"{name}: {per_card:.0f} µs per card, {peak / 1024:.0f} KiB peak per request")
+
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the CPU and memory cost of ORM entities and cards on the list pages.")
+    parser.add_argument("--posts", type=int, default=300, help="Number of blog posts")
+    parser.add_argument("--content-size", type=int, default=5000, help="Characters of content per post")
+    parser.add_argument("--per-page", type=int, default=6, help="Blog posts per page")
+    parser.add_argument("--requests", type=int, default=500, help="Number of measured requests")
+
+    asyncio.run(benchmark(**vars(parser.parse_args())))
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import time
+from fastapi_blog.blogs.models import BlogPost, Tag
+from fastapi_blog.repositories.blog_post_repository import BlogPostRepository
+from fastapi_blog.repositories.tag_repository import TagRepository
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+class CursorTimer:
+    """
+    Sums the time spent in the database driver and counts the compiled cache hits.
+    """
+    def __init__(self, engine: AsyncEngine):
+        self.cursor_time = 0.0
+        self.statements = 0
+        self.cache_hits = 0
+        self._start = 0.0
+        event.listen(engine.sync_engine, "before_cursor_execute", self.before)
+        event.listen(engine.sync_engine, "after_cursor_execute", self.after)
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        self._start = time.perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        self.cursor_time += time.perf_counter() - self._start
+        self.statements += 1
+        self.cache_hits += context.cache_hit == context.dialect.CACHE_HIT
+
+    def reset(self):
+        self.cursor_time = 0.0
+        self.statements = 0
+        self.cache_hits = 0
+
+async def simulate_requests(blog_repo: BlogPostRepository, tag_repo: TagRepository, blog: BlogPost, requests: int):
+    """
+    Runs the repository calls of the index, a filtered blog list and a blog detail page.
+    """
+    for i in range(requests):
+        await blog_repo.get_recent()
+        await tag_repo.get_all()
+
+        tag_slugs = ["food", "tech"][:i % 3]
+        stmt = blog_repo.get_all_query(tag_slugs, "search" if i % 2 else None)
+        await blog_repo.get_paginated(stmt, page=2)
+
+        await blog_repo.get_by_id(blog.id)
+        await blog_repo.get_related(blog)
+
+async def benchmark(requests: int, warmup: int):
+    """
+    Measures the Python time of the repository queries outside the database
+    driver, which is mostly spent building and compiling SQL. The tables are
+    empty, so there are no rows to process.
+    """
+    engine = AsyncEngine(create_engine("sqlite+aiosqlite://"))
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    timer = CursorTimer(engine)
+    blog = BlogPost(id=1, title="Blog", content="Content", author_id=1, tags=[Tag(id=1, name="Food"), Tag(id=2, name="Tech")])
+
+    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as session:
+        blog_repo, tag_repo = BlogPostRepository(session), TagRepository(session)
+
+        await simulate_requests(blog_repo, tag_repo, blog, warmup)
+        timer.reset()
+
+        start = time.perf_counter()
+        await simulate_requests(blog_repo, tag_repo, blog, requests)
+        total = time.perf_counter() - start
+
+    await engine.dispose()
+
+    per_request = (total - timer.cursor_time) / requests * 1_000_000
+    print(f"{requests} requests, {timer.statements // requests} statements each")
+    print(f"SQL generation: {per_request:.0f} µs per request")
+    print(f"Compiled cache hits: {timer.cache_hits / timer.statements:.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the CPU cost of building and compiling the hot repository queries.")
+    parser.add_argument("--requests", type=int, default=2000, help="Number of simulated requests")
+    parser.add_argument("--warmup", type=int, default=200, help="Requests run before measuring")
+
+    asyncio.run(benchmark(**vars(parser.parse_args())))
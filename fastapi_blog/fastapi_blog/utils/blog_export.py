@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List
+from fastapi_blog.accounts.models import EmailUser
+from fastapi_blog.blogs.models import BlogPost, BlogPostTag, Tag
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import sessionmaker
+
+EXPORT_FORMATS = ["ndjson", "csv"]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# The fields of an exported post, the same records the import reads
+EXPORT_FIELDS = ["id", "title", "content", "author", "tags", "image", "created_at"]
+
+EXPORT_POSTS_STMT = (
+    select(
+        BlogPost.id,
+        BlogPost.title,
+        BlogPost.content,
+        EmailUser.email.label("author"),
+        BlogPost.image,
+        BlogPost.created_at,
+    )
+    .join(EmailUser, EmailUser.id == BlogPost.author_id)
+    .where(BlogPost.id > bindparam("last_id"))
+    .order_by(BlogPost.id)
+    .limit(bindparam("chunk_size"))
+)
+EXPORT_TAGS_STMT = (
+    select(BlogPostTag.blogpost_id, Tag.name)
+    .join(Tag, Tag.id == BlogPostTag.tag_id)
+    .where(BlogPostTag.blogpost_id.in_(bindparam("blog_ids", expanding=True)))
+    .order_by(Tag.name)
+)
+
+async def export_chunks(Session: sessionmaker, chunk_size: int = 1000) -> AsyncIterator[List[Dict]]:
+    """
+    Yields every blog post with its author email and tag names, in chunks
+    ordered by id. Each chunk is read by keyset pagination in its own short
+    session, so the memory stays constant and a slow download doesn't keep a
+    database connection or transaction open. The reads may use the replica.
+
+    Args:
+        Session (sessionmaker): Creates the session of each chunk.
+        chunk_size (int, optional): Number of posts read per chunk.
+    """
+    last_id = 0
+    while True:
+        async with Session() as session:
+            session.info["read_only"] = True
+            posts = (await session.execute(EXPORT_POSTS_STMT, {"last_id": last_id, "chunk_size": chunk_size})).all()
+            if not posts:
+                return
+
+            tags = defaultdict(list)
+            for blog_id, name in await session.execute(EXPORT_TAGS_STMT, {"blog_ids": [post.id for post in posts]}):
+                tags[blog_id].append(name)
+
+        yield [{**post._mapping, "tags": tags[post.id], "created_at": post.created_at.isoformat()} for post in posts]
+        last_id = posts[-1].id
+
+def format_chunk(rows: List[Dict], format: str, header: bool = False) -> str:
+    """
+    Formats exported rows as NDJSON lines or CSV rows, the CSV tags comma separated.
+    """
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS)
+        if header:
+            writer.writeheader()
+        writer.writerows({**row, "tags": ", ".join(row["tags"])} for row in rows)
+        return buffer.getvalue()
+
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+async def stream_export(Session: sessionmaker, format: str, chunk_size: int = 1000) -> AsyncIterator[str]:
+    """
+    Yields the export of all blog posts as NDJSON or CSV text, one piece per chunk.
+    """
+    if format == "csv":
+        yield format_chunk([], format, header=True)
+
+    async for rows in export_chunks(Session, chunk_size):
+        yield format_chunk(rows, format)
@@ -0,0 +1,363 @@
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from fastapi_blog.accounts.models import EmailUser
+from fastapi_blog.blogs.models import BlogImport, BlogPost, BlogPostTag, Tag, refresh_cards
+from fastapi_blog.services.blog_post_service import sanitize_content
+from fastapi_blog.utils.bulk import bulk_insert
+from slugify import slugify
+from sqlalchemy import insert, or_, select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+IMPORT_FORMATS = ["ndjson", "csv"]
+
+# Errors listed in the import result, later ones are only counted as skipped
+MAX_REPORTED_ERRORS = 100
+
+# Reserves ids for posts written with COPY, which cannot return them
+RESERVE_POST_IDS_STMT = text(
+    "SELECT nextval(pg_get_serial_sequence('blog_post', 'id')) FROM generate_series(1, :count)"
+)
+
+def detect_format(file_name: str) -> str:
+    return "csv" if Path(file_name).suffix.lower() == ".csv" else "ndjson"
+
+def file_checksum(path: Path) -> str:
+    """
+    Returns the SHA-256 of a file, which identifies an import when it is resumed.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def read_records(file: TextIO, format: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yields the line number and the record of every record in an NDJSON or CSV
+    file, reading it line by line. Invalid JSON lines yield None as the record.
+    """
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None
+
+def _string(record: dict, key: str, max_length: Optional[int] = None) -> str:
+    value = record.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string")
+    if max_length and len(value.strip()) > max_length:
+        raise ValueError(f"{key} is longer than {max_length} characters")
+
+    return value.strip()
+
+def parse_record(record: Any) -> dict:
+    """
+    Validates an imported record and returns the fields of its blog post.
+
+    Records have a `title`, `content` and the `author` email, and optionally
+    `tags` (a list, or a comma separated string in CSV), an `image` URL and
+    `created_at` as an ISO date.
+
+    Raises:
+        ValueError: If the record is not a valid blog post, with the reason.
+
+    Returns:
+        dict: The post fields, `tags` maps the tag slugs to their names.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+
+    title = _string(record, "title", 255)
+    content = _string(record, "content")
+    author = _string(record, "author")
+    if not (title and content and author):
+        raise ValueError("title, content and author are required")
+
+    names = record.get("tags") or []
+    if isinstance(names, str):
+        names = names.split(",")
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise ValueError("tags must be a list of names")
+
+    tags = {}
+    for name in filter(None, (name.strip() for name in names)):
+        slug = slugify(name)
+        if not slug or len(name) > 50 or len(slug) > 60:
+            raise ValueError(f"invalid tag {name!r}")
+        tags.setdefault(slug, name)
+
+    created_at = _string(record, "created_at")
+    if created_at:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except ValueError:
+            raise ValueError("created_at is not an ISO date")
+        if created_at.tzinfo:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return {
+        "title": title,
+        "content": content,
+        "author": author,
+        "tags": tags,
+        "image": _string(record, "image", 255) or None,
+        "created_at": created_at or None,
+    }
+
+def sanitize_contents(contents: List[str]) -> List[str]:
+    return [sanitize_content(content) for content in contents]
+
+async def _prepare_batch(executor: Executor, workers: int, batch: List[Tuple[int, Any]]):
+    """
+    Validates a batch of records and sanitizes their content in the worker
+    processes, split in one chunk per worker.
+
+    Returns:
+        tuple: The number of records, the valid posts and the errors.
+    """
+    posts, errors = [], []
+    for line_number, record in batch:
+        try:
+            posts.append({**parse_record(record), "line": line_number})
+        except ValueError as e:
+            errors.append(f"Line {line_number}: {e}")
+
+    contents = [post["content"] for post in posts]
+    size = max(1, -(-len(contents) // workers))
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(executor, sanitize_contents, contents[start:start + size])
+        for start in range(0, len(contents), size)
+    ))
+    for post, content in zip(posts, chain.from_iterable(chunks)):
+        post["content"] = content
+
+    return len(batch), posts, errors
+
+async def _resolve_authors(session: AsyncSession, emails: Iterable[str], authors: Dict[str, Optional[int]]):
+    """
+    Adds the ids of the authors not looked up yet to `authors`, None for unknown emails.
+    """
+    missing = set(emails) - authors.keys()
+    if not missing:
+        return
+
+    authors.update(dict.fromkeys(missing))
+    authors.update((await session.execute(
+        select(EmailUser.email, EmailUser.id).where(EmailUser.email.in_(missing))
+    )).all())
+
+async def _resolve_tags(session: AsyncSession, names: Dict[str, str], tags: Dict[str, int]):
+    """
+    Adds the ids of the tags not looked up yet to `tags`, by slug, creating the
+    tags that don't exist.
+    """
+    missing = {slug: name for slug, name in names.items() if slug not in tags}
+    if not missing:
+        return
+
+    existing = (await session.execute(
+        select(Tag.id, Tag.name, Tag.slug).where(or_(Tag.slug.in_(missing), Tag.name.in_(missing.values())))
+    )).all()
+    by_slug = {tag.slug: tag.id for tag in existing}
+    by_name = {tag.name: tag.id for tag in existing}
+    for slug, name in missing.items():
+        if slug in by_slug or name in by_name:
+            tags[slug] = by_slug.get(slug) or by_name[name]
+
+    new_tags = [{"name": name, "slug": slug} for slug, name in missing.items() if slug not in tags]
+    if new_tags:
+        table = Tag.__table__
+        tags.update((await session.execute(insert(table).returning(table.c.slug, table.c.id), new_tags)).all())
+
+async def _insert_posts(session: AsyncSession, rows: List[dict], use_copy: bool) -> List[int]:
+    """
+    Inserts blog post rows and returns their ids in order. COPY can't return
+    the ids, so they are reserved from the sequence first, otherwise they come
+    back from a batched INSERT ... RETURNING.
+    """
+    table = BlogPost.__table__
+    conn = await session.connection()
+
+    if use_copy and conn.dialect.name == "postgresql":
+        ids = (await session.execute(RESERVE_POST_IDS_STMT, {"count": len(rows)})).scalars().all()
+        await bulk_insert(session, table, [{"id": id, **row} for id, row in zip(ids, rows)], use_copy)
+        return ids
+
+    result = await session.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows)
+    return result.scalars().all()
+
+async def _write_batch(
+    session: AsyncSession,
+    posts: List[dict],
+    authors: Dict[str, Optional[int]],
+    tags: Dict[str, int],
+    use_copy: bool,
+    errors: List[str],
+) -> int:
+    """
+    Writes the posts of a batch with their tag links and cards, skipping the
+    posts of unknown authors.
+
+    Returns:
+        int: The number of imported posts.
+    """
+    await _resolve_authors(session, (post["author"] for post in posts), authors)
+
+    known = []
+    for post in posts:
+        if authors[post["author"]] is None:
+            errors.append(f"Line {post['line']}: unknown author {post['author']}")
+        else:
+            known.append(post)
+    if not known:
+        return 0
+
+    await _resolve_tags(session, {slug: name for post in known for slug, name in post["tags"].items()}, tags)
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    post_ids = await _insert_posts(session, [
+        {
+            "title": post["title"],
+            "content": post["content"],
+            "image": post["image"],
+            "created_at": post["created_at"] or now,
+            "author_id": authors[post["author"]],
+        }
+        for post in known
+    ], use_copy)
+
+    await bulk_insert(session, BlogPostTag.__table__, [
+        {"blogpost_id": post_id, "tag_id": tags[slug]}
+        for post_id, post in zip(post_ids, known)
+        for slug in post["tags"]
+    ], use_copy)
+    # Bulk writes bypass the session flush that keeps the cards in sync
+    await session.run_sync(lambda sync_session: refresh_cards(sync_session.connection(), post_ids))
+
+    return len(post_ids)
+
+async def import_blog_posts(
+    session: AsyncSession,
+    path: Path,
+    file_name: Optional[str] = None,
+    format: Optional[str] = None,
+    batch_size: int = 1000,
+    workers: Optional[int] = None,
+    use_copy: bool = True,
+    report: Callable[[str], None] = print,
+):
+    """
+    Imports the blog posts of an NDJSON or CSV file in batches, committing
+    after every batch together with the progress of the import.
+
+    The file is streamed, authors and tags are resolved once per batch, and
+    the content of the next batch is sanitized in worker processes while the
+    current one is written. Importing a file that was interrupted continues
+    after its last committed batch, importing a finished file does nothing.
+
+    Args:
+        session (AsyncSession): The database session.
+        path (Path): The file to import.
+        file_name (str, optional): Name of the file, defaults to the name of the path.
+        format (str, optional): "ndjson" or "csv", detected from the file name by default.
+        batch_size (int, optional): Number of records written per batch.
+        workers (int, optional): Number of sanitizing processes, defaults to the CPU count.
+        use_copy (bool, optional): Whether to use COPY on PostgreSQL.
+        report (callable, optional): Receives a progress message after every batch.
+
+    Returns:
+        dict: The records read, posts imported and records skipped over all
+        runs of the import, the errors of this run and its posts per second.
+    """
+    path = Path(path)
+    file_name = file_name or path.name
+    format = format or detect_format(file_name)
+    workers = workers or os.cpu_count() or 1
+
+    # Hashing a large file takes seconds, which would stall the event loop
+    checksum = await asyncio.to_thread(file_checksum, path)
+    blog_import = (await session.execute(select(BlogImport).where(BlogImport.checksum == checksum))).scalar_one_or_none()
+    if blog_import is None:
+        blog_import = BlogImport(checksum=checksum, file_name=file_name[:255])
+        session.add(blog_import)
+        await session.commit()
+    elif blog_import.finished_at:
+        report(f"{file_name} was already imported at {blog_import.finished_at:%Y-%m-%d %H:%M}.")
+    elif blog_import.records:
+        report(f"Resuming the import of {file_name} after {blog_import.records} records.")
+
+    errors: List[str] = []
+    imported = 0
+    started = time.perf_counter()
+
+    if not blog_import.finished_at:
+        authors: Dict[str, Optional[int]] = {}
+        tags: Dict[str, int] = {}
+
+        with open(path, newline="", encoding="utf-8") as file:
+            records = islice(read_records(file, format), blog_import.records, None)
+            batches = iter(lambda: list(islice(records, batch_size)), [])
+
+            def prepare_next():
+                batch = next(batches, None)
+                return asyncio.ensure_future(_prepare_batch(executor, workers, batch)) if batch else None
+
+            executor = ProcessPoolExecutor(workers)
+            prepared = None
+            try:
+                prepared = prepare_next()
+                while prepared is not None:
+                    read, posts, batch_errors = await prepared
+                    prepared = prepare_next()
+
+                    written = await _write_batch(session, posts, authors, tags, use_copy, batch_errors)
+                    blog_import.records += read
+                    blog_import.imported += written
+                    blog_import.skipped += read - written
+                    await session.commit()
+
+                    imported += written
+                    errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+                    elapsed = time.perf_counter() - started
+                    report(
+                        f"Imported {blog_import.imported} blog posts, skipped {blog_import.skipped} records "
+                        f"({imported / elapsed:.0f} posts/s)."
+                    )
+            finally:
+                if prepared is not None:
+                    prepared.cancel()
+                # Waits for the workers to exit without stalling the event loop
+                await asyncio.to_thread(executor.shutdown, cancel_futures=True)
+
+        blog_import.finished_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        await session.commit()
+
+    return {
+        "records": blog_import.records,
+        "imported": blog_import.imported,
+        "skipped": blog_import.skipped,
+        "errors": errors,
+        "posts_per_second": imported / max(time.perf_counter() - started, 1e-9),
+    }
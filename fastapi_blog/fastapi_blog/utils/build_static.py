@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from fastapi_blog.config import settings
+from fastapi_blog.database import async_engine
+from fastapi_blog.main import app
+from fastapi_blog.utils.static_site import build_site
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+async def build_static(output_dir: str, base_url: str, workers: int, full: bool, chunk_size: int):
+    """
+    Renders the public pages to static HTML files, only the changed ones after the first build.
+    """
+    Session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    result = await build_site(
+        app,
+        Session,
+        Path(output_dir),
+        base_url,
+        settings.STATIC_DIR,
+        workers=workers,
+        full=full,
+        chunk_size=chunk_size,
+    )
+
+    print(f"Rendered {result['rendered']} of {result['pages']} pages and removed {result['removed']}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the public pages to a directory of static HTML files.")
+    parser.add_argument("output_dir", help="Directory of the site, served by nginx")
+    parser.add_argument("--base-url", default="http://localhost", help="URL the site is served at")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes rendering the pages")
+    parser.add_argument("--full", action="store_true", help="Render every page instead of only the changed ones")
+    parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE, help="Posts read per query")
+
+    asyncio.run(build_static(**vars(parser.parse_args())))
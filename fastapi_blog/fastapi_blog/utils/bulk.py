@@ -0,0 +1,56 @@
+from typing import Any, Dict, List, Sequence
+from sqlalchemy import Table, insert, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+async def bulk_insert(session: AsyncSession, table: Table, rows: Sequence[Dict[str, Any]], use_copy: bool = True):
+    """
+    Inserts many rows into a table with as few round trips as possible.
+
+    On PostgreSQL the rows are streamed with COPY through the asyncpg connection,
+    on other databases they are sent as a single batched executemany INSERT.
+
+    Args:
+        session (AsyncSession): The session whose connection/transaction is used.
+        table (Table): The table to insert into.
+        rows (list): The rows as dictionaries, all with the same keys.
+        use_copy (bool, optional): Whether COPY may be used on PostgreSQL. Defaults to True.
+
+    Returns:
+        int: The number of inserted rows.
+    """
+    if not rows:
+        return 0
+
+    conn = await session.connection()
+
+    if use_copy and conn.dialect.name == "postgresql":
+        columns: List[str] = list(rows[0].keys())
+        raw_conn = await conn.get_raw_connection()
+        await raw_conn.driver_connection.copy_records_to_table(
+            table.name,
+            records=[tuple(row[column] for column in columns) for row in rows],
+            columns=columns,
+        )
+    else:
+        await session.execute(insert(table), list(rows))
+
+    return len(rows)
+
+async def reset_sequences(session: AsyncSession, tables: Sequence[Table]):
+    """
+    Moves the PostgreSQL id sequences past rows inserted with explicit ids.
+
+    Args:
+        session (AsyncSession): The session to execute the statements with.
+        tables (list): The tables whose `id` sequence should be reset.
+    """
+    conn = await session.connection()
+    if conn.dialect.name != "postgresql":
+        return
+
+    for table in tables:
+        await session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+        ))
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from fastapi_blog.accounts.models import EmailUser
+from fastapi_blog.blogs.models import BlogPost, BlogPostTag, Tag, rebuild_cards
+from fastapi_blog.utils.bulk import bulk_insert, reset_sequences
+from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table, Text, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+APPS = ["fastapi", "flask", "django"]
+
+# Physical tables of every app and the column its users' password hashes are stored in
+SCHEMAS = {
+    "fastapi": {
+        "users": "email_user", "tags": "tag", "posts": "blog_post", "links": "blogpost_tag", "password": "password_hash",
+    },
+    "flask": {
+        "users": "email_user", "tags": "tag", "posts": "blog_post", "links": "blogpost_tags", "password": "password_hash",
+    },
+    "django": {
+        "users": "accounts_emailuser", "tags": "blogs_tag", "posts": "blogs_blogpost", "links": "blogs_blogpost_tags",
+        "password": "password",
+    },
+}
+
+# Copied in this order, so the rows a foreign key points to are always there
+KINDS = ["users", "tags", "posts", "links"]
+
+# Columns the rows of each table are ordered and paginated by
+KEYS = {"users": ["id"], "tags": ["id"], "posts": ["id"], "links": ["blogpost_id", "tag_id"]}
+
+# Cloudinary images are stored as their full URL, and in Django as the path after the cloud name
+CLOUDINARY_URL = re.compile(r"^https?://res\.cloudinary\.com/[^/]+/(?P<path>.+)$")
+CLOUDINARY_PATH = re.compile(r"^(image|video|raw)/(upload|private|authenticated)/")
+
+def schema_tables(app: str) -> Dict[str, Table]:
+    """
+    Describes the tables of an app with the column names all apps share, the
+    password hash column is read as `password` whatever it is called.
+    """
+    schema = SCHEMAS[app]
+    metadata = MetaData()
+
+    return {
+        "users": Table(
+            schema["users"], metadata,
+            Column("id", Integer, primary_key=True),
+            Column("email", String),
+            Column("username", String),
+            Column(schema["password"], String, key="password"),
+            Column("is_active", Boolean),
+            Column("is_staff", Boolean),
+            Column("created_at", DateTime),
+        ),
+        "tags": Table(
+            schema["tags"], metadata,
+            Column("id", Integer, primary_key=True),
+            Column("name", String),
+            Column("slug", String),
+        ),
+        "posts": Table(
+            schema["posts"], metadata,
+            Column("id", Integer, primary_key=True),
+            Column("title", String),
+            Column("content", Text),
+            Column("image", String),
+            Column("created_at", DateTime),
+            Column("author_id", Integer),
+        ),
+        "links": Table(
+            schema["links"], metadata,
+            Column("blogpost_id", Integer, primary_key=True),
+            Column("tag_id", Integer, primary_key=True),
+        ),
+    }
+
+def convert_password_hash(password_hash: str, target: str) -> str:
+    """
+    Converts a password hash to the format of the target app where that is
+    lossless. Django verifies bcrypt hashes with the `bcrypt$` prefix, the
+    other apps verify Django's PBKDF2 hashes and rehash them on login.
+    """
+    if target == "django":
+        return f"bcrypt${password_hash}" if password_hash.startswith("$2") else password_hash
+
+    return password_hash.removeprefix("bcrypt$")
+
+def remap_image(
+    image: Optional[str],
+    source: str,
+    target: str,
+    media_url: str = "/media/",
+    cloud_name: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Maps an image to the way the target app stores it. Django stores local
+    images relative to its media root and Cloudinary images without the host
+    and cloud name, the other apps store the URL the image is served from.
+    """
+    if not image or (source == "django") == (target == "django"):
+        return image
+
+    if target == "django":
+        if image.startswith(media_url):
+            return image[len(media_url):]
+        match = CLOUDINARY_URL.match(image)
+        return match["path"] if match else image
+
+    if CLOUDINARY_PATH.match(image) and cloud_name:
+        return f"https://res.cloudinary.com/{cloud_name}/{image}"
+    if image.startswith(("/", "http://", "https://")):
+        return image
+
+    return media_url + image
+
+def _utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def convert_row(
+    kind: str,
+    row: dict,
+    source: str,
+    target: str,
+    media_url: str = "/media/",
+    cloud_name: Optional[str] = None,
+) -> dict:
+    """
+    Converts a row read from the source app to the values the target app
+    stores, with the shared column names and dates as naive UTC.
+    """
+    row = {key: _utc(value) if isinstance(value, datetime) else value for key, value in row.items()}
+
+    if kind == "users":
+        row["password"] = convert_password_hash(row["password"], target)
+        row["is_active"] = bool(row["is_active"])
+        row["is_staff"] = bool(row["is_staff"])
+    elif kind == "posts":
+        row["image"] = remap_image(row["image"], source, target, media_url, cloud_name)
+
+    return row
+
+def _target_row(kind: str, row: dict) -> dict:
+    if kind == "users":
+        row = {**row, "password_hash": row["password"]}
+        del row["password"]
+
+    return row
+
+TARGET_TABLES = {
+    "users": EmailUser.__table__,
+    "tags": Tag.__table__,
+    "posts": BlogPost.__table__,
+    "links": BlogPostTag.__table__,
+}
+
+def _batch_stmt(table: Table, keys: List[str], after: Optional[Tuple], batch_size: int):
+    stmt = (
+        select(*(column.label(column.key) for column in table.c))
+        .order_by(*(table.c[key] for key in keys))
+        .limit(batch_size)
+    )
+    if after is None:
+        return stmt
+    if len(keys) == 1:
+        return stmt.where(table.c[keys[0]] > after[0])
+
+    first, second = keys
+    return stmt.where(or_(
+        table.c[first] > after[0],
+        and_(table.c[first] == after[0], table.c[second] > after[1]),
+    ))
+
+async def _last_key(session: AsyncSession, table: Table, keys: List[str]) -> Optional[Tuple]:
+    row = (await session.execute(
+        select(*(table.c[key] for key in keys)).order_by(*(table.c[key].desc() for key in keys)).limit(1)
+    )).first()
+
+    return tuple(row) if row else None
+
+Execute = Callable[[object], Awaitable[Sequence[dict]]]
+
+def _source_reader(engine: AsyncEngine) -> Execute:
+    # Every batch is read on a connection of its own, so no transaction stays open on the source
+    async def execute(stmt):
+        async with engine.connect() as conn:
+            return (await conn.execute(stmt)).mappings().all()
+
+    return execute
+
+async def _batches(execute: Execute, table: Table, keys: List[str], batch_size: int, after: Optional[Tuple] = None):
+    while rows := await execute(_batch_stmt(table, keys, after, batch_size)):
+        yield rows
+        after = tuple(rows[-1][key] for key in keys)
+
+async def copy_rows(
+    session: AsyncSession,
+    source_engine: AsyncEngine,
+    source: str,
+    kind: str,
+    convert: Callable[[str, dict], dict],
+    batch_size: int = 1000,
+    use_copy: bool = True,
+    report: Callable[[str], None] = print,
+) -> int:
+    """
+    Copies the rows of one table from the source database in batches ordered
+    by their key, committing every batch. The rows keep their ids, and a copy
+    that was interrupted continues after the last row already in the target.
+
+    Returns:
+        int: The number of copied rows.
+    """
+    keys = KEYS[kind]
+    after = await _last_key(session, schema_tables("fastapi")[kind], keys)
+
+    copied = 0
+    async for rows in _batches(_source_reader(source_engine), schema_tables(source)[kind], keys, batch_size, after):
+        await bulk_insert(session, TARGET_TABLES[kind], [_target_row(kind, convert(kind, row)) for row in rows], use_copy)
+        await session.commit()
+
+        copied += len(rows)
+        report(f"Copied {copied} {kind}.")
+
+    return copied
+
+def _checksum_update(digest, row: dict):
+    values = [_utc(value).isoformat() if isinstance(value, datetime) else value for value in row.values()]
+    digest.update(json.dumps(values).encode() + b"\n")
+
+async def _table_checksum(execute: Execute, table: Table, keys: List[str], batch_size: int, convert=None) -> Tuple[int, str]:
+    count, digest = 0, hashlib.sha256()
+    async for rows in _batches(execute, table, keys, batch_size):
+        for row in rows:
+            _checksum_update(digest, convert(row) if convert else dict(row))
+        count += len(rows)
+
+    return count, digest.hexdigest()
+
+async def verify_migration(
+    session: AsyncSession,
+    source_engine: AsyncEngine,
+    source: str,
+    convert: Callable[[str, dict], dict],
+    batch_size: int = 1000,
+) -> Dict[str, dict]:
+    """
+    Compares the row count and a checksum of every table in the source, with
+    its rows converted for the target, and the target database.
+
+    Returns:
+        dict: For every table the source and target count and checksum, and whether they match.
+    """
+    source_tables, target_tables = schema_tables(source), schema_tables("fastapi")
+
+    async def target_execute(stmt):
+        return (await session.execute(stmt)).mappings().all()
+
+    result = {}
+    for kind in KINDS:
+        source_count, source_checksum = await _table_checksum(
+            _source_reader(source_engine), source_tables[kind], KEYS[kind], batch_size, lambda row: convert(kind, row)
+        )
+        target_count, target_checksum = await _table_checksum(target_execute, target_tables[kind], KEYS[kind], batch_size)
+        result[kind] = {
+            "source": source_count,
+            "target": target_count,
+            "source_checksum": source_checksum,
+            "target_checksum": target_checksum,
+            "match": (source_count, source_checksum) == (target_count, target_checksum),
+        }
+
+    return result
+
+async def migrate_data(
+    session: AsyncSession,
+    source_url: str,
+    source: str,
+    batch_size: int = 1000,
+    use_copy: bool = True,
+    media_url: str = "/media/",
+    cloud_name: Optional[str] = None,
+    verify_only: bool = False,
+    report: Callable[[str], None] = print,
+) -> dict:
+    """
+    Copies the users, tags, blog posts and their tag links from the database of
+    one of the three apps into this app's database, then verifies the copy.
+
+    The tables are streamed in batches by key and every batch is committed, so
+    running the migration again after a failure continues where it stopped.
+    Ids are preserved, password hashes and image paths are converted to this
+    app's format, and the cards are rebuilt once all posts are copied.
+
+    Args:
+        session (AsyncSession): The session of this app's database.
+        source_url (str): Database URL of the source, with an async driver.
+        source (str): The app the source database belongs to, one of `APPS`.
+        batch_size (int, optional): Number of rows read and written per batch.
+        use_copy (bool, optional): Whether to use COPY on PostgreSQL.
+        media_url (str, optional): URL prefix of local images outside Django.
+        cloud_name (str, optional): Cloudinary cloud name, for the Cloudinary images of Django.
+        verify_only (bool, optional): Only compare the databases without copying.
+        report (callable, optional): Receives a progress message after every batch.
+
+    Returns:
+        dict: The rows copied per table and the verification of every table.
+    """
+    def convert(kind, row):
+        return convert_row(kind, row, source, "fastapi", media_url, cloud_name)
+
+    source_engine = create_async_engine(source_url)
+    copied = dict.fromkeys(KINDS, 0)
+    try:
+        if not verify_only:
+            for kind in KINDS:
+                copied[kind] = await copy_rows(session, source_engine, source, kind, convert, batch_size, use_copy, report)
+
+            await reset_sequences(session, [EmailUser.__table__, Tag.__table__, BlogPost.__table__])
+            # Bulk loading bypasses the session flush that keeps the cards in sync
+            await session.run_sync(lambda sync_session: rebuild_cards(sync_session.connection(), batch_size))
+            await session.commit()
+
+        verification = await verify_migration(session, source_engine, source, convert, batch_size)
+    finally:
+        await source_engine.dispose()
+
+    return {"copied": copied, "verification": verification}
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+import sys
+from contextlib import nullcontext
+from fastapi_blog.config import settings
+from fastapi_blog.database import async_engine
+from fastapi_blog.utils.blog_export import EXPORT_FORMATS, stream_export
+from fastapi_blog.utils.blog_import import detect_format
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+async def export_blogs(file: str, format: str, chunk_size: int):
+    """
+    Writes all blog posts to an NDJSON or CSV file, or to stdout with `-`.
+    """
+    Session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    format = format or detect_format(file)
+
+    with nullcontext(sys.stdout) if file == "-" else open(file, "w", newline="", encoding="utf-8") as output:
+        async for piece in stream_export(Session, format, chunk_size):
+            output.write(piece)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export all blog posts as NDJSON or CSV.")
+    parser.add_argument("file", help="File to write, - for stdout")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="File format, detected from the extension by default")
+    parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE, help="Posts read per query")
+
+    asyncio.run(export_blogs(**vars(parser.parse_args())))
@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+from fastapi_blog.database import async_engine
+from fastapi_blog.utils.dataset import DatasetGenerator
+from fastapi_blog.utils.seeds.dataset_seed import seed_dataset
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+async def generate_dataset(users: int, tags: int, posts: int, batch_size: int, seed: int, no_copy: bool):
+    """
+    Fills the database with a large deterministic dataset for load and scaling tests.
+    """
+    Session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as session:
+        created = await seed_dataset(
+            session,
+            DatasetGenerator(seed=seed),
+            users=users,
+            tags=tags,
+            posts=posts,
+            batch_size=batch_size,
+            use_copy=not no_copy,
+        )
+
+    print(f"Created {created['users']} users, {created['tags']} tags, {created['posts']} blog posts and {created['links']} tag links.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a high-volume synthetic dataset.")
+    parser.add_argument("--users", type=int, default=10_000, help="Number of users to create")
+    parser.add_argument("--tags", type=int, default=200, help="Total number of tags, existing tags included")
+    parser.add_argument("--posts", type=int, default=1_000_000, help="Number of blog posts to create")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows written per round trip")
+    parser.add_argument("--seed", type=int, default=42, help="Seed making the dataset reproducible")
+    parser.add_argument("--no-copy", action="store_true", help="Use batched INSERTs instead of COPY on PostgreSQL")
+
+    asyncio.run(generate_dataset(**vars(parser.parse_args())))
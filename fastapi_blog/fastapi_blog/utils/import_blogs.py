@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+from fastapi_blog.config import settings
+from fastapi_blog.database import async_engine
+from fastapi_blog.utils.blog_import import IMPORT_FORMATS, import_blog_posts
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+async def import_blogs(file: str, format: str, batch_size: int, workers: int, no_copy: bool):
+    """
+    Imports the blog posts of an NDJSON or CSV file, resuming an interrupted import of the same file.
+    """
+    Session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as session:
+        result = await import_blog_posts(
+            session,
+            file,
+            format=format,
+            batch_size=batch_size,
+            workers=workers,
+            use_copy=not no_copy,
+        )
+
+    for error in result["errors"]:
+        print(error)
+    print(f"Imported {result['imported']} blog posts and skipped {result['skipped']} of {result['records']} records.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import blog posts from an NDJSON or CSV file.")
+    parser.add_argument("file", help="File with one blog post per line or CSV row")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="File format, detected from the extension by default")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE, help="Records written per batch and commit")
+    parser.add_argument("--workers", type=int, default=settings.IMPORT_WORKERS, help="Processes sanitizing the content, defaults to the CPU count")
+    parser.add_argument("--no-copy", action="store_true", help="Use batched INSERTs instead of COPY on PostgreSQL")
+
+    asyncio.run(import_blogs(**vars(parser.parse_args())))
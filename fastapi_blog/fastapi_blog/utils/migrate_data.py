@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+import os
+import sys
+from fastapi_blog.database import async_engine
+from fastapi_blog.utils.data_migration import APPS, migrate_data
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+async def migrate(
+    source_app: str,
+    source_url: str,
+    batch_size: int,
+    no_copy: bool,
+    media_url: str,
+    cloud_name: str,
+    verify_only: bool,
+):
+    """
+    Copies the data of another app's database into this app's database and verifies it.
+    """
+    Session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as session:
+        result = await migrate_data(
+            session,
+            source_url,
+            source_app,
+            batch_size=batch_size,
+            use_copy=not no_copy,
+            media_url=media_url,
+            cloud_name=cloud_name,
+            verify_only=verify_only,
+        )
+
+    for kind, verification in result["verification"].items():
+        status = "OK" if verification["match"] else "MISMATCH"
+        print(f"{kind}: {verification['source']} in the source, {verification['target']} in the target, {status}")
+
+    if not all(verification["match"] for verification in result["verification"].values()):
+        sys.exit("The target database doesn't match the source.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the users, tags and blog posts of another app's database into this app's database.")
+    parser.add_argument("source_app", choices=APPS, help="The app the source database belongs to")
+    parser.add_argument("source_url", help="Database URL of the source, with an async driver, e.g. postgresql+asyncpg://...")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows read and written per batch and commit")
+    parser.add_argument("--no-copy", action="store_true", help="Use batched INSERTs instead of COPY on PostgreSQL")
+    parser.add_argument("--media-url", default="/media/", help="URL prefix of the locally stored images")
+    parser.add_argument("--cloud-name", default=os.getenv("CLOUDINARY_CLOUD_NAME"), help="Cloudinary cloud name of the Django images")
+    parser.add_argument("--verify-only", action="store_true", help="Only compare the row counts and checksums of the databases")
+
+    asyncio.run(migrate(**vars(parser.parse_args())))
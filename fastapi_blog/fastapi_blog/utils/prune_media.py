@@ -0,0 +1,20 @@
+import argparse
+import asyncio
+from fastapi_blog.blogs.media import prune_media
+from fastapi_blog.config import settings
+from fastapi_blog.database import SessionLocal
+
+async def prune(grace: float):
+    """
+    Removes the locally stored images no post has used for `grace` seconds.
+    """
+    async with SessionLocal() as session:
+        removed = await prune_media(session, grace)
+
+    print(f"Removed {removed} unused images.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove the stored images no blog post uses.")
+    parser.add_argument("--grace", type=float, default=settings.MEDIA_PRUNE_SECONDS, help="Seconds an unused image is kept")
+
+    asyncio.run(prune(**vars(parser.parse_args())))
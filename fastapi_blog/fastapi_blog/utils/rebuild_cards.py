@@ -0,0 +1,19 @@
+import argparse
+import asyncio
+from fastapi_blog.blogs.models import rebuild_cards
+from fastapi_blog.database import async_engine
+
+async def rebuild(batch_size: int):
+    """
+    Rebuilds the blog cards in one transaction, so the lists keep showing the old cards until it commits.
+    """
+    async with async_engine.begin() as conn:
+        rebuilt = await conn.run_sync(rebuild_cards, batch_size)
+
+    print(f"Rebuilt {rebuilt} blog cards.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the blog cards read model from the blog posts.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Posts refreshed per round trip")
+
+    asyncio.run(rebuild(**vars(parser.parse_args())))
@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+import signal
+import fastapi_blog.blogs.jobs  # noqa: F401, registers the handlers
+from fastapi_blog.config import settings
+from fastapi_blog.database import SessionLocal
+from fastapi_blog.jobs import JobRunner
+
+async def run_jobs(concurrency: int, once: bool):
+    """
+    Runs the background jobs until stopped, or with `once` the jobs due now.
+    Used when the app doesn't run them itself (`JOB_RUNNER` off), or to run
+    them on other machines than the app.
+    """
+    runner = JobRunner(concurrency=concurrency)
+    if once:
+        print(f"Ran {await runner.run_pending(SessionLocal)} jobs.")
+        return
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+
+    runner.start(SessionLocal)
+    await stopped.wait()
+    await runner.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the background jobs.")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_CONCURRENCY, help="Jobs run at once")
+    parser.add_argument("--once", action="store_true", help="Run the due jobs and exit")
+
+    asyncio.run(run_jobs(**vars(parser.parse_args())))
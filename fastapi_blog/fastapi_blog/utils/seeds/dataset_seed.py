@@ -0,0 +1,77 @@
+import time
+from fastapi_blog.accounts.models import EmailUser, pwd_context
+from fastapi_blog.blogs.models import BlogPost, BlogPostTag, Tag, refresh_cards
+from fastapi_blog.utils.bulk import bulk_insert, reset_sequences
+from fastapi_blog.utils.dataset import DatasetGenerator
+from sqlalchemy import func, select
+
+
+async def seed_dataset(
+    session,
+    generator: DatasetGenerator,
+    users: int = 10_000,
+    tags: int = 200,
+    posts: int = 1_000_000,
+    batch_size: int = 5000,
+    use_copy: bool = True,
+):
+    """
+    Bulk loads a generated dataset, committing after every batch of posts.
+
+    Args:
+        session: The database session.
+        generator (DatasetGenerator): The generator producing the rows.
+        users (int, optional): Number of users to create.
+        tags (int, optional): Total number of tags the posts are spread over, existing tags included.
+        posts (int, optional): Number of blog posts to create.
+        batch_size (int, optional): Number of rows written per round trip.
+        use_copy (bool, optional): Whether to use COPY on PostgreSQL.
+
+    Returns:
+        dict: Number of created users, tags, posts and post-tag links.
+    """
+    created = {"users": 0, "tags": 0, "posts": 0, "links": 0}
+    started = time.perf_counter()
+
+    next_user_id = ((await session.execute(select(func.max(EmailUser.id)))).scalar() or 0) + 1
+    next_tag_id = ((await session.execute(select(func.max(Tag.id)))).scalar() or 0) + 1
+    next_post_id = ((await session.execute(select(func.max(BlogPost.id)))).scalar() or 0) + 1
+
+    # Hashing is deliberately slow, so every generated user shares one hash
+    password_hash = pwd_context.hash("Password123")
+    user_rows = generator.users(users, next_user_id, password_hash)
+    for start in range(0, len(user_rows), batch_size):
+        created["users"] += await bulk_insert(session, EmailUser.__table__, user_rows[start:start + batch_size], use_copy)
+
+    existing_tags = (await session.execute(select(Tag.id, Tag.name))).all()
+    tag_rows = generator.tags(max(0, tags - len(existing_tags)), next_tag_id, [tag.name for tag in existing_tags])
+    created["tags"] = await bulk_insert(session, Tag.__table__, tag_rows, use_copy)
+    await session.commit()
+
+    author_ids = [row["id"] for row in user_rows] or (await session.execute(select(EmailUser.id))).scalars().all()
+    tag_ids = [tag.id for tag in existing_tags] + [row["id"] for row in tag_rows]
+
+    if not author_ids or not tag_ids:
+        print("You need users and tags first.")
+        return created
+
+    for post_rows, links in generator.posts(posts, next_post_id, author_ids, tag_ids, batch_size):
+        created["posts"] += await bulk_insert(session, BlogPost.__table__, post_rows, use_copy)
+        created["links"] += await bulk_insert(
+            session,
+            BlogPostTag.__table__,
+            [{"blogpost_id": post_id, "tag_id": tag_id} for post_id, tag_id in links],
+            use_copy,
+        )
+        # Bulk loading bypasses the session flush that keeps the cards in sync
+        post_ids = [row["id"] for row in post_rows]
+        await session.run_sync(lambda sync_session: refresh_cards(sync_session.connection(), post_ids))
+        await session.commit()
+
+        elapsed = time.perf_counter() - started
+        print(f"Created {created['posts']}/{posts} blog posts ({created['posts'] / elapsed:.0f} posts/s).")
+
+    await reset_sequences(session, [EmailUser.__table__, Tag.__table__, BlogPost.__table__])
+    await session.commit()
+
+    return created
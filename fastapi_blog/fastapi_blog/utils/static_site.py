@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from fastapi import FastAPI
+from fastapi_blog.blogs.models import Tag
+from fastapi_blog.blogs.view_counts import view_counter
+from fastapi_blog.utils.blog_export import export_chunks
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+# The build of the pages in the output directory, read by the next build to re-render only what changed
+MANIFEST_FILE = ".static-build.json"
+
+# The links to detail pages, the posts a rendered page shows
+DETAIL_LINK = re.compile(r'href="[^"]*/blogs/(\d+)"')
+
+PER_PAGE = 6
+INDEX_POSTS = 3
+LIST_PATH = "/blogs"
+
+class PlannedPage(NamedTuple):
+    """
+    A public page of the site. `key` is what the page shows besides the
+    posts it links to, a list page is rendered again when it changes.
+    """
+    file: str
+    key: Any
+    posts: List[str]
+
+def fingerprint(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def plan_pages(posts: Iterable[Tuple[str, int, List[str]]], tags: Iterable[Tuple[str, str]]) -> Dict[str, PlannedPage]:
+    """
+    Lists the pages of the site by their path: the index, the blog list and
+    the list of every tag page by page, and the detail page of every post.
+
+    Args:
+        posts (Iterable): The creation date, id and tag names of every post.
+        tags (Iterable): The name and slug of every tag.
+    """
+    tags = list(tags)
+    # Every list shows all the tags to filter by
+    tags_key = fingerprint(tags)
+    ordered = sorted(posts, key=lambda post: (post[0], post[1]), reverse=True)
+
+    pages = {"/": PlannedPage("index.html", tags_key, [str(blog_id) for _, blog_id, _ in ordered[:INDEX_POSTS]])}
+
+    lists = {None: [str(blog_id) for _, blog_id, _ in ordered]}
+    for name, slug in tags:
+        lists[slug] = [str(blog_id) for _, blog_id, names in ordered if name in names]
+
+    for slug, ids in lists.items():
+        total_pages = max(math.ceil(len(ids) / PER_PAGE), 1)
+        for page in range(1, total_pages + 1):
+            if slug is None:
+                path, file = f"{LIST_PATH}?page={page}", f"blogs/list/all/{page}.html"
+            else:
+                path, file = f"{LIST_PATH}?tag={slug}&page={page}", f"blogs/list/tag/{slug}/{page}.html"
+            pages[path] = PlannedPage(file, [tags_key, total_pages], ids[(page - 1) * PER_PAGE:page * PER_PAGE])
+
+    for _, blog_id, _ in ordered:
+        pages[f"/blogs/{blog_id}"] = PlannedPage(f"blogs/{blog_id}.html", None, [str(blog_id)])
+
+    return pages
+
+def pages_to_render(
+    pages: Dict[str, PlannedPage], fingerprints: Dict[str, str], manifest: Optional[Dict]
+) -> List[str]:
+    """
+    The paths of the pages to render: all without a previous build, else the
+    new pages, the list pages whose posts or layout changed, and the pages
+    linking to a post that was created, edited or deleted since.
+    """
+    if manifest is None:
+        return list(pages)
+
+    built_posts = manifest["posts"]
+    changed = {blog_id for blog_id in built_posts.keys() | fingerprints.keys() if built_posts.get(blog_id) != fingerprints.get(blog_id)}
+
+    paths = []
+    for path, page in pages.items():
+        built = manifest["pages"].get(path)
+        if built is None or built["key"] != page.key or built["posts"] != page.posts or not changed.isdisjoint(built["deps"]):
+            paths.append(path)
+
+    return paths
+
+def load_manifest(output_dir: Path, base_url: str) -> Optional[Dict]:
+    """
+    The manifest of the previous build, None when there is none or it was built for another URL.
+    """
+    try:
+        manifest = json.loads((output_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+    return manifest if manifest.get("base_url") == base_url else None
+
+def write_file(path: Path, content: bytes):
+    """
+    Writes a file through a temporary file, so nginx never serves a half written page.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.tmp")
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+
+def page_deps(page: PlannedPage, html: str) -> List[str]:
+    return sorted({*page.posts, *DETAIL_LINK.findall(html)})
+
+async def read_site(Session: sessionmaker, chunk_size: int = 1000) -> Tuple[Dict[str, str], Dict[str, PlannedPage]]:
+    """
+    Reads the fingerprint of every post and plans the pages, the posts read
+    in keyset chunks like the export.
+    """
+    fingerprints, posts = {}, []
+    async for rows in export_chunks(Session, chunk_size):
+        for row in rows:
+            fingerprints[str(row["id"])] = fingerprint(row)
+            posts.append((row["created_at"], row["id"], row["tags"]))
+
+    async with Session() as session:
+        session.info["read_only"] = True
+        tags = (await session.execute(select(Tag.name, Tag.slug).order_by(Tag.name))).all()
+
+    return fingerprints, plan_pages(posts, [tuple(tag) for tag in tags])
+
+async def render_pages(
+    app: FastAPI, pages: List[Tuple[str, PlannedPage]], output_dir: Path, base_url: str
+) -> Dict[str, List[str]]:
+    """
+    Renders the pages through the app and writes them to their files.
+
+    Returns:
+        dict: The posts every rendered page links to, by its path.
+    """
+    deps = {}
+    # Rendering a page is not a view of its post
+    with view_counter.pause():
+        async with AsyncClient(transport=ASGITransport(app=app), base_url=base_url) as client:
+            for path, page in pages:
+                response = await client.get(path)
+                response.raise_for_status()
+
+                write_file(output_dir / page.file, response.content)
+                deps[path] = page_deps(page, response.text)
+
+    return deps
+
+def _init_worker():
+    from fastapi_blog.database import async_engine, replica_engine
+
+    # A forked worker must not share the pooled connections of the parent
+    for engine in filter(None, [async_engine, replica_engine]):
+        engine.sync_engine.dispose(close=False)
+
+def _render_batch(pages: List[Tuple[str, PlannedPage]], output_dir: Path, base_url: str) -> Dict[str, List[str]]:
+    from fastapi_blog.main import app
+
+    return asyncio.run(render_pages(app, pages, output_dir, base_url))
+
+async def build_site(
+    app: FastAPI,
+    Session: sessionmaker,
+    output_dir: Path,
+    base_url: str,
+    static_dir: Path,
+    workers: int = 1,
+    full: bool = False,
+    chunk_size: int = 1000,
+) -> Dict[str, int]:
+    """
+    Renders the public pages to static HTML files nginx can serve, with the
+    static assets. A build after the first one renders only the pages
+    affected by the posts and tags changed since, and removes the pages that
+    no longer exist.
+
+    Args:
+        app (FastAPI): The app rendering the pages.
+        Session (sessionmaker): Creates the sessions reading the posts.
+        output_dir (Path): The directory of the site.
+        base_url (str): The URL the site is served at, used in the absolute links.
+        static_dir (Path): The static assets, copied to `static/`.
+        workers (int, optional): Processes rendering the pages, 1 renders them in this process.
+        full (bool, optional): Whether to render every page.
+        chunk_size (int, optional): Number of posts read per query.
+
+    Returns:
+        dict: The number of pages of the site, and of the pages rendered and removed.
+    """
+    output_dir = Path(output_dir)
+    manifest = None if full else load_manifest(output_dir, base_url)
+    fingerprints, pages = await read_site(Session, chunk_size)
+    to_render = [(path, pages[path]) for path in pages_to_render(pages, fingerprints, manifest)]
+
+    if workers > 1 and len(to_render) > 1:
+        # Small batches spread the pages evenly, whatever their rendering time
+        batch_size = math.ceil(len(to_render) / (workers * 4))
+        batches = [to_render[start:start + batch_size] for start in range(0, len(to_render), batch_size)]
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(executor, _render_batch, batch, output_dir, base_url) for batch in batches
+            ))
+        deps = {path: links for result in results for path, links in result.items()}
+    else:
+        deps = await render_pages(app, to_render, output_dir, base_url)
+
+    removed = 0
+    for path, built in (manifest or {}).get("pages", {}).items():
+        if path not in pages:
+            (output_dir / built["file"]).unlink(missing_ok=True)
+            removed += 1
+
+    shutil.copytree(static_dir, output_dir / "static", dirs_exist_ok=True)
+
+    built_pages = (manifest or {}).get("pages", {})
+    write_file(output_dir / MANIFEST_FILE, json.dumps({
+        "base_url": base_url,
+        "posts": fingerprints,
+        "pages": {
+            path: {"file": page.file, "key": page.key, "posts": page.posts, "deps": deps[path] if path in deps else built_pages[path]["deps"]}
+            for path, page in pages.items()
+        },
+    }).encode())
+
+    return {"pages": len(pages), "rendered": len(to_render), "removed": removed}
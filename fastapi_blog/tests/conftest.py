@@ -7,6 +7,10 @@ from fastapi_blog.repositories.email_user_repository import EmailUserRepository
 from httpx import ASGITransport, AsyncClient
 from fastapi_blog.database import get_session
 from fastapi_blog.auth import load_user, manager
+from fastapi_blog.blogs.rss import feed_cache
+from fastapi_blog.blogs.sitemap import sitemap_cache
+from fastapi_blog.blogs.suggest import title_index
+from fastapi_blog.blogs.view_counts import view_counter
 from fastapi_blog.main import app
 import pytest_asyncio
 from tests.test_data import TEST_USER, seed_test_data
@@ -28,6 +32,11 @@ async def setup_test_db():
     yield
 
     app.dependency_overrides = {}
+    # Every test starts from a new database, whose titles, feeds and sitemaps are read again
+    title_index.clear()
+    feed_cache.clear()
+    sitemap_cache.clear()
+    view_counter.counts.clear()
     await cleanup_test_db()
 
 @pytest_asyncio.fixture(scope="function")
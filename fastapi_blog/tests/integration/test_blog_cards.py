@@ -0,0 +1,98 @@
+import pytest
+from fastapi_blog.accounts.models import EmailUser
+from fastapi_blog.blogs.models import CARD_EXCERPT_LENGTH, BlogPost, BlogPostCard, Tag, rebuild_cards
+from fastapi_blog.blogs.schemas import BlogCard
+from fastapi_blog.repositories.blog_post_repository import BlogPostRepository
+from sqlmodel import delete, func, select
+from tests.test_utils import TestingSessionLocal, test_engine
+
+async def get_card(title: str):
+    async with TestingSessionLocal() as session:
+        return (await session.exec(select(BlogPostCard).where(BlogPostCard.title == title))).first()
+
+def test_card_excerpt_drops_cut_tag():
+    """Test an excerpt ending inside an HTML tag drops the partial tag"""
+    card = BlogCard(1, "Title", "<p>Some text</p><a hre", None, None, "author", [])
+
+    assert card.content == "<p>Some text</p>"
+
+@pytest.mark.asyncio
+async def test_paginated_blogs_are_cards(setup_test_db):
+    """Test the list pages load cards with their tags and no entities"""
+    async with TestingSessionLocal() as session:
+        repo = BlogPostRepository(session)
+        result = await repo.get_paginated(repo.get_all_query(["food", "tech"]), page=1, per_page=6)
+
+        assert [card.title for card in result.data] == ["Blog7"]
+        assert [tag.slug for tag in result.data[0].tags] == ["food", "tech"]
+        assert isinstance(result.data[0], BlogCard)
+        assert len(session.identity_map) == 0
+
+@pytest.mark.asyncio
+async def test_card_content_is_an_excerpt(setup_test_db):
+    """Test cards store only the start of long content"""
+    async with TestingSessionLocal() as session:
+        author = (await session.exec(select(EmailUser))).first()
+        session.add(BlogPost(title="Long", content="<p>" + "a" * CARD_EXCERPT_LENGTH * 2 + "</p>", author=author))
+        await session.commit()
+
+        cards = await BlogPostRepository(session).get_recent()
+
+    assert cards[0].title == "Long"
+    assert len(cards[0].content) == CARD_EXCERPT_LENGTH
+    assert cards[0].author_name == (author.username or author.email)
+
+@pytest.mark.asyncio
+async def test_cards_follow_blog_writes(auth_client):
+    """Test creating, editing and deleting a blog updates its card in the same request"""
+    await auth_client.post(
+        "/blogs/create",
+        data={"title": "New Blog", "content": "This is a test blog", "tags": [1, 2]},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    card = await get_card("New Blog")
+
+    assert [tag[2] for tag in card.tags] == ["food", "tech"]
+
+    await auth_client.post(
+        f"/blogs/{card.id}/edit",
+        data={"title": "Updated Blog", "content": "This is an updated test blog", "tags": [2]},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    updated = await get_card("Updated Blog")
+
+    assert updated.id == card.id
+    assert updated.excerpt == "This is an updated test blog"
+    assert [tag[2] for tag in updated.tags] == ["tech"]
+
+    await auth_client.post(f"/blogs/{card.id}/delete")
+
+    assert await get_card("Updated Blog") is None
+
+@pytest.mark.asyncio
+async def test_cards_follow_tag_rename(setup_test_db):
+    """Test renaming a tag, as the admin does, updates the cards of its posts"""
+    async with TestingSessionLocal() as session:
+        tag = (await session.exec(select(Tag).where(Tag.slug == "tech"))).one()
+        tag.name = "Technology"
+        await session.commit()
+
+    card = await get_card("Blog7")
+
+    assert [tag[1] for tag in card.tags] == ["Food", "Technology"]
+
+@pytest.mark.asyncio
+async def test_rebuild_cards(setup_test_db):
+    """Test the cards can be rebuilt from the blog posts"""
+    async with TestingSessionLocal() as session:
+        await session.exec(delete(BlogPostCard))
+        await session.commit()
+
+    async with test_engine.begin() as conn:
+        rebuilt = await conn.run_sync(rebuild_cards, 2)
+
+    async with TestingSessionLocal() as session:
+        cards = (await session.exec(select(func.count()).select_from(BlogPostCard))).one()
+
+    assert rebuilt == cards == 7
+    assert [tag[2] for tag in (await get_card("Blog7")).tags] == ["food", "tech"]
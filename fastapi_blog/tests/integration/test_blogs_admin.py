@@ -0,0 +1,111 @@
+import json
+import pytest
+import pytest_asyncio
+from unittest.mock import patch
+from fastapi_blog import database
+from fastapi_blog.accounts.models import EmailUser
+from fastapi_blog.blogs.models import BlogImport, BlogPost
+from fastapi_blog.config import settings
+from fastapi_blog.jobs import job_runner
+from sqlmodel import select
+from tests.test_data import TEST_USER
+from tests.test_utils import TestingSessionLocal
+
+@pytest.fixture(autouse=True)
+def admin_session(monkeypatch):
+    """Run the sessions of the admin pages on the test database."""
+    monkeypatch.setattr(database, "SessionLocal", TestingSessionLocal)
+
+@pytest_asyncio.fixture(scope="function")
+async def staff_client(auth_client):
+    """Create a client authenticated as a staff user."""
+    async with TestingSessionLocal() as session:
+        user = await session.get(EmailUser, TEST_USER["id"])
+        user.is_staff = True
+        await session.commit()
+
+    yield auth_client
+
+@pytest.mark.asyncio
+async def test_admin_imports_uploaded_posts(staff_client, tmp_path):
+    """Test staff users can import an uploaded NDJSON file of blog posts, which a job imports"""
+    lines = [
+        json.dumps({"title": "Uploaded", "content": "<p>Uploaded</p>", "author": TEST_USER["email"], "tags": ["Tech"]}),
+        json.dumps({"title": "No author", "content": "<p>Skipped</p>"}),
+    ]
+
+    with patch.object(settings, "IMPORT_FOLDER", tmp_path):
+        response = await staff_client.post(
+            "/admin/import-blogs",
+            files={"file": ("posts.ndjson", "\n".join(lines).encode(), "application/x-ndjson")},
+        )
+
+        assert response.status_code == 303
+        async with TestingSessionLocal() as session:
+            assert (await session.exec(select(BlogPost).where(BlogPost.title == "Uploaded"))).first() is None
+
+        response = await staff_client.get("/admin/import-blogs")
+        assert "posts.ndjson: queued" in response.text
+
+        assert await job_runner.run_pending(TestingSessionLocal) == 1
+
+    response = await staff_client.get("/admin/import-blogs")
+
+    assert "posts.ndjson: queued" not in response.text
+    assert "<td>posts.ndjson</td>" in response.text
+    assert list(tmp_path.iterdir()) == []
+    async with TestingSessionLocal() as session:
+        blog_import = (await session.exec(select(BlogImport))).one()
+        assert (await session.exec(select(BlogPost).where(BlogPost.title == "Uploaded"))).first() is not None
+    assert (blog_import.imported, blog_import.skipped, blog_import.records) == (1, 1, 2)
+    assert blog_import.finished_at is not None
+
+@pytest.mark.asyncio
+async def test_admin_import_requires_staff(auth_client):
+    """Test users who are not staff cannot open the import page"""
+    response = await auth_client.get("/admin/import-blogs")
+
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_admin_exports_posts(staff_client):
+    """Test staff users can download all blog posts as CSV"""
+    response = await staff_client.get("/admin/export-blogs?format=csv")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines()[0] == "id,title,content,author,tags,image,created_at"
+    assert len(response.text.splitlines()) == 1 + 7
+
+@pytest.mark.asyncio
+async def test_admin_export_requires_staff(auth_client):
+    """Test users who are not staff cannot export the blog posts"""
+    response = await auth_client.get("/admin/export-blogs")
+
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_admin_creates_and_edits_post(staff_client):
+    """Test staff users can create a blog post in the admin and edit it"""
+    no_image = {"upload_image": ("", b"", "application/octet-stream")}
+    response = await staff_client.post(
+        "/admin/blog-post/create",
+        data={"title": "Admin post", "content": "<p>Created</p>", "author": str(TEST_USER["id"]), "tags": ["1"]},
+        files=no_image,
+    )
+
+    assert response.status_code == 303
+    async with TestingSessionLocal() as session:
+        blog = (await session.exec(select(BlogPost).where(BlogPost.title == "Admin post"))).one()
+
+    response = await staff_client.post(
+        f"/admin/blog-post/edit/{blog.id}",
+        data={"title": "Admin post edited", "content": "<p>Edited</p>", "author": str(TEST_USER["id"]), "tags": ["2"]},
+        files=no_image,
+    )
+
+    assert response.status_code == 303
+    async with TestingSessionLocal() as session:
+        edited = await session.get(BlogPost, blog.id)
+        assert edited.title == "Admin post edited"
+        assert edited.content == "<p>Edited</p>"
@@ -1,8 +1,14 @@
+from fastapi_blog import database
 from fastapi_blog.accounts.models import EmailUser
-from fastapi_blog.blogs.models import BlogPost
+from fastapi_blog.blogs.models import BlogPost, Tag
+from fastapi_blog.config import settings
+from fastapi_blog.monitoring.queries import assert_max_queries, record_queries
 import pytest
+import re
+import xml.etree.ElementTree as ET
+from sqlalchemy import event
 from sqlmodel import func, select
-from tests.test_utils import TestingSessionLocal
+from tests.test_utils import TestingSessionLocal, test_engine
 
 @pytest.mark.asyncio
 async def test_index_contains_latest_three_blogs(test_client):
@@ -64,6 +70,18 @@ async def test_blogs_filter_by_tag(test_client):
     assert "Blog1" not in response.text
     assert "Blog3" not in response.text
 
+@pytest.mark.asyncio
+async def test_blogs_filter_by_multiple_tags(test_client):
+    """
+    Filtering blogs by several tags returns only the blogs having all of them.
+    """
+    response = await test_client.get("/blogs?tag=food,tech")
+
+    assert response.status_code == 200
+    assert "Blog7" in response.text
+    assert "Blog2" not in response.text
+    assert "Blog1" not in response.text
+
 @pytest.mark.asyncio
 async def test_blogs_search_function(test_client):
     """
@@ -77,6 +95,215 @@ async def test_blogs_search_function(test_client):
     assert "Blog2" not in response.text
     assert "Blog5" not in response.text
 
+@pytest.mark.asyncio
+async def test_blogs_fragment(test_client):
+    """
+    The fragment holds only the filtered blog list and its pagination, whose links keep the filters.
+    """
+    page = await test_client.get("/blogs?search=search")
+    response = await test_client.get("/blogs/fragment?search=search")
+
+    assert response.status_code == 200
+    assert "Blog1 search" in response.text
+    assert "Blog4 search" in response.text
+    assert "Blog2" not in response.text
+    assert "<html" not in response.text and "quill" not in response.text
+    assert len(response.content) * 2 < len(page.content)
+
+    response = await test_client.get("/blogs/fragment?tag=food&page=2&per_page=2")
+    assert 'href="?tag=food&page=1"' in response.text
+    assert 'href="?tag=food&page=3"' in response.text
+
+@pytest.mark.asyncio
+async def test_blogs_feed(test_client):
+    """
+    The feed is read batch by batch from cursors keeping the filters, without offsets or counts.
+    """
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    titles, url = [], "/blogs/feed?tag=food&per_page=2"
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        while url:
+            response = await test_client.get(url)
+            assert response.status_code == 200
+            assert "max-age" in response.headers["cache-control"]
+
+            data = response.json()
+            titles += re.findall(r">(Blog\d[^<]*)</h3>", data["html"])
+            url = data["cursor"] and f"/blogs/feed?cursor={data['cursor']}&per_page=2"
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+    assert titles == ["Blog7", "Blog6", "Blog5", "Blog4 search", "Blog3", "Blog1 search"]
+    assert len(statements) == 3
+    # SQLite renders an OFFSET with every LIMIT, which must stay zero
+    assert all(not statement.startswith("SELECT count(") for statement, _ in statements)
+    assert all(parameters[-1] == 0 for statement, parameters in statements if "OFFSET" in statement)
+
+    response = await test_client.get("/blogs/fragment?tag=food&per_page=2")
+    cursor = re.search(r'data-cursor="([^"]+)"', response.text)[1]
+    response = await test_client.get(f"/blogs/feed?cursor={cursor}&per_page=2")
+    assert re.findall(r">(Blog\d[^<]*)</h3>", response.json()["html"]) == ["Blog5", "Blog4 search"]
+
+    response = await test_client.get("/blogs/feed?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_blogs_suggest(test_client):
+    """
+    Suggestions return the blogs with a title word starting with each query word, newest first.
+    """
+    response = await test_client.get("/blogs/suggest?q=sea")
+
+    assert response.status_code == 200
+    suggestions = response.json()["suggestions"]
+    assert [suggestion["title"] for suggestion in suggestions] == ["Blog4 search", "Blog1 search"]
+    assert suggestions[0]["url"].endswith("/blogs/4")
+
+    response = await test_client.get("/blogs/suggest?q=blog1 se")
+    assert [suggestion["id"] for suggestion in response.json()["suggestions"]] == [1]
+
+    response = await test_client.get("/blogs/suggest?q=")
+    assert response.json()["suggestions"] == []
+
+@pytest.mark.asyncio
+async def test_blogs_suggest_follows_writes(test_client):
+    """
+    Suggestions reflect the blogs created, renamed and deleted after the index was loaded.
+    """
+    await test_client.get("/blogs/suggest?q=blog")
+
+    async with TestingSessionLocal() as session:
+        blog = await session.get(BlogPost, 2)
+        blog.title = "Searchable renamed"
+        await session.delete(await session.get(BlogPost, 4))
+        session.add(BlogPost(title="Search engines", content="Content", author_id=1))
+        await session.commit()
+
+    response = await test_client.get("/blogs/suggest?q=search")
+
+    assert [suggestion["title"] for suggestion in response.json()["suggestions"]] == [
+        "Search engines", "Blog1 search", "Searchable renamed"
+    ]
+
+def feed_titles(response):
+    return [item.findtext("title") for item in ET.fromstring(response.content).iter("item")]
+
+@pytest.mark.asyncio
+async def test_rss_feeds(test_client):
+    """
+    The feeds list the latest blogs of all or one tag, and polls with the validators get 304.
+    """
+    response = await test_client.get("/feed.xml")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/rss+xml"
+    assert feed_titles(response) == ["Blog7", "Blog6", "Blog5", "Blog4 search", "Blog3", "Blog2", "Blog1 search"]
+    item = ET.fromstring(response.content).find("channel/item")
+    assert item.findtext("link").endswith("/blogs/7")
+    assert [category.text for category in item.iter("category")] == ["Food", "Tech"]
+
+    not_modified = await test_client.get("/feed.xml", headers={"If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    not_modified = await test_client.get("/feed.xml", headers={"If-Modified-Since": response.headers["last-modified"]})
+    assert not_modified.status_code == 304
+
+    response = await test_client.get("/tags/tech/feed.xml")
+    assert feed_titles(response) == ["Blog7", "Blog2"]
+
+    response = await test_client.get("/tags/unknown/feed.xml")
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_rss_feeds_follow_writes(test_client):
+    """
+    A new blog rebuilds the feeds it is in, the other feeds are served from the cache.
+    """
+    feed = await test_client.get("/feed.xml")
+    tech_feed = await test_client.get("/tags/tech/feed.xml")
+
+    async with TestingSessionLocal() as session:
+        food = (await session.exec(select(Tag).where(Tag.slug == "food"))).one()
+        session.add(BlogPost(title="Fresh food", content="<p>Fresh</p>", author_id=1, tags=[food]))
+        await session.commit()
+
+    with assert_max_queries(0):
+        response = await test_client.get("/tags/tech/feed.xml", headers={"If-None-Match": tech_feed.headers["etag"]})
+    assert response.status_code == 304
+
+    response = await test_client.get("/feed.xml", headers={"If-None-Match": feed.headers["etag"]})
+    assert response.status_code == 200
+    assert feed_titles(response)[0] == "Fresh food"
+    assert response.headers["etag"] != feed.headers["etag"]
+
+    response = await test_client.get("/tags/food/feed.xml")
+    assert feed_titles(response)[0] == "Fresh food"
+
+@pytest.fixture
+def small_sitemaps(monkeypatch):
+    """Split the seven test blogs into sitemaps of three, read two at a time."""
+    monkeypatch.setattr(database, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(settings, "SITEMAP_SIZE", 3)
+    monkeypatch.setattr(settings, "SITEMAP_BATCH_SIZE", 2)
+
+def sitemap_locations(response):
+    return [location.text for location in ET.fromstring(response.content).iter("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")]
+
+@pytest.mark.asyncio
+async def test_sitemaps(test_client, small_sitemaps):
+    """
+    The index lists a sitemap per range of ids, each streaming the detail
+    URLs of its range and then served from the cache.
+    """
+    response = await test_client.get("/sitemap.xml")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/xml"
+    assert [location.rsplit("/", 1)[1] for location in sitemap_locations(response)] == ["0.xml", "1.xml", "2.xml"]
+
+    response = await test_client.get("/sitemaps/1.xml")
+    assert response.status_code == 200
+    assert [location.rsplit("/", 2)[1:] for location in sitemap_locations(response)] == [
+        ["blogs", "4"], ["blogs", "5"], ["blogs", "6"]
+    ]
+    assert "etag" not in response.headers
+
+    with assert_max_queries(0):
+        cached = await test_client.get("/sitemaps/1.xml")
+    assert cached.content == response.content
+    not_modified = await test_client.get("/sitemaps/1.xml", headers={"If-None-Match": cached.headers["etag"]})
+    assert not_modified.status_code == 304
+
+    response = await test_client.get("/sitemaps/3.xml")
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_sitemaps_follow_writes(test_client, small_sitemaps):
+    """
+    A write rebuilds the sitemap of the post's id range, creates and deletes also the index.
+    """
+    for path in ["/sitemap.xml", "/sitemaps/0.xml", "/sitemaps/1.xml", "/sitemaps/2.xml"]:
+        await test_client.get(path)
+
+    async with TestingSessionLocal() as session:
+        await session.delete(await session.get(BlogPost, 2))
+        session.add(BlogPost(title="Blog8", content="Content8", author_id=1))
+        await session.commit()
+
+    with assert_max_queries(0):
+        await test_client.get("/sitemaps/1.xml")
+
+    with record_queries() as queries:
+        response = await test_client.get("/sitemaps/0.xml")
+    assert queries.count
+    assert [location.rsplit("/", 1)[1] for location in sitemap_locations(response)] == ["1", "3"]
+
+    response = await test_client.get("/sitemaps/2.xml")
+    assert [location.rsplit("/", 1)[1] for location in sitemap_locations(response)] == ["7", "8"]
+
 @pytest.mark.asyncio
 async def test_blog_detail_valid(test_client):
     """
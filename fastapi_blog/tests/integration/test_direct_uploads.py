@@ -0,0 +1,163 @@
+import hashlib
+import os
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+import cloudinary.utils
+from fastapi_blog.blogs.direct_uploads import upload_policy, verify_upload
+from fastapi_blog.blogs.exceptions import InvalidUploadError
+from fastapi_blog.blogs.media import prune_media
+from fastapi_blog.blogs.models import BlogPost, MediaFile
+from fastapi_blog.config import settings
+from sqlmodel import select
+from tests.test_utils import TestingSessionLocal
+
+@pytest.fixture
+def direct_uploads(tmp_path):
+    with patch.object(settings, "DIRECT_UPLOADS", True), patch.object(settings, "UPLOAD_FOLDER", tmp_path):
+        yield tmp_path
+
+async def upload(client, filename="image.png", data=b"image data"):
+    response = await client.get("/blogs/upload-policy", params={"filename": filename})
+    assert response.status_code == 200
+    policy = response.json()
+
+    stored = await client.post(policy["url"], data=policy["fields"], files={"file": (filename, data, "image/png")})
+    return policy, stored
+
+@pytest.mark.asyncio
+async def test_create_blog_with_direct_upload(auth_client, direct_uploads):
+    """Test an image uploaded to the storage with a signed policy is attached by its key"""
+    response = await auth_client.get("/blogs/create")
+    assert "data-upload-url" in response.text
+
+    policy, stored = await upload(auth_client)
+    assert stored.status_code == 204
+    assert (direct_uploads / policy["key"]).read_bytes() == b"image data"
+
+    response = await auth_client.post(
+        "/blogs/create",
+        data={"title": "Blog with image", "content": "Content", "tags": [1], "image_key": policy["key"]},
+    )
+
+    assert response.status_code == 303
+    key = hashlib.sha256(b"image data").hexdigest() + ".png"
+    async with TestingSessionLocal() as session:
+        blog = (await session.exec(select(BlogPost).where(BlogPost.title == "Blog with image"))).one()
+        media = await session.get(MediaFile, key)
+    assert blog.image == f"/media/{key}"
+    assert (direct_uploads / key).read_bytes() == b"image data"
+    assert not (direct_uploads / policy["key"]).exists()
+    assert media.ref_count == 1
+
+@pytest.mark.asyncio
+async def test_prune_media_removes_abandoned_uploads(auth_client, direct_uploads):
+    """Test direct uploads never attached to a post are pruned, and those an older post links are kept"""
+    abandoned, _ = await upload(auth_client)
+    linked, _ = await upload(auth_client, data=b"linked image")
+    async with TestingSessionLocal() as session:
+        session.add(BlogPost(title="Linked upload", content="Content", author_id=1, image=f"/media/{linked['key']}"))
+        await session.commit()
+
+    for policy in [abandoned, linked]:
+        path = direct_uploads / policy["key"]
+        os.utime(path, (time.time() - 3600, time.time() - 3600))
+
+    async with TestingSessionLocal() as session:
+        assert await prune_media(session, grace=60) == 1
+
+    assert not (direct_uploads / abandoned["key"]).exists()
+    assert (direct_uploads / linked["key"]).exists()
+
+@pytest.mark.asyncio
+async def test_create_blog_rejects_forged_key(auth_client, direct_uploads):
+    """Test a key the app didn't sign is not attached, even when a file is stored under it"""
+    key = f"uploads/{'a' * 32}-{'0' * 16}.png"
+    (direct_uploads / "uploads").mkdir()
+    (direct_uploads / key).write_bytes(b"image data")
+
+    response = await auth_client.post(
+        "/blogs/create",
+        data={"title": "Blog with forged image", "content": "Content", "tags": [1], "image_key": key},
+    )
+
+    assert response.status_code == 400
+    assert "Invalid upload key." in response.text
+    async with TestingSessionLocal() as session:
+        assert (await session.exec(select(BlogPost).where(BlogPost.title == "Blog with forged image"))).first() is None
+
+@pytest.mark.asyncio
+async def test_create_blog_rejects_missing_upload(auth_client, direct_uploads):
+    """Test a signed key whose upload never reached the storage is rejected"""
+    response = await auth_client.get("/blogs/upload-policy", params={"filename": "image.png"})
+
+    response = await auth_client.post(
+        "/blogs/create",
+        data={"title": "Blog without upload", "content": "Content", "tags": [1], "image_key": response.json()["key"]},
+    )
+
+    assert response.status_code == 400
+    assert "The uploaded image was not found." in response.text
+
+@pytest.mark.asyncio
+async def test_upload_policy_rejects_file_type(auth_client, direct_uploads):
+    """Test no policy is signed for a file that is not an allowed image"""
+    response = await auth_client.get("/blogs/upload-policy", params={"filename": "script.js"})
+
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_upload_policy_requires_direct_uploads(auth_client):
+    """Test no policy is signed when direct uploads are disabled"""
+    response = await auth_client.get("/blogs/upload-policy", params={"filename": "image.png"})
+
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_store_upload_checks_policy(auth_client, direct_uploads):
+    """Test the local storage refuses tampered and expired policies, and files over the size limit"""
+    response = await auth_client.get("/blogs/upload-policy", params={"filename": "image.png"})
+    policy = response.json()
+    tampered = {**policy["fields"], "key": "uploads/other.png"}
+
+    response = await auth_client.post(policy["url"], data=tampered, files={"file": ("image.png", b"data", "image/png")})
+    assert response.status_code == 403
+
+    with patch.object(settings, "DIRECT_UPLOAD_EXPIRES", -1):
+        _, stored = await upload(auth_client)
+    assert stored.status_code == 403
+
+    with patch.object(settings, "MAX_UPLOAD_SIZE", 4):
+        _, stored = await upload(auth_client)
+    assert stored.status_code == 400
+
+    assert not (direct_uploads / "uploads").exists()
+
+def test_cloudinary_upload_is_signed_and_verified(direct_uploads):
+    """Test the Cloudinary policy is a signed upload, and an uploaded image over the limit is deleted"""
+    config = SimpleNamespace(cloud_name="blog", api_key="key", api_secret="secret")
+
+    with patch.object(settings, "USE_CLOUDINARY", True), patch("cloudinary.config", return_value=config):
+        policy = upload_policy("image.png", "/uploads")
+
+        fields = dict(policy["fields"])
+        signature = fields.pop("signature")
+        fields.pop("api_key")
+        assert policy["url"] == "https://api.cloudinary.com/v1_1/blog/image/upload"
+        assert fields["public_id"] == policy["key"]
+        assert signature == cloudinary.utils.api_sign_request(fields, "secret")
+
+        resource = {"bytes": 1000, "secure_url": "https://cdn.test/image.png"}
+        with patch("cloudinary.api.resource", return_value=resource) as get_resource:
+            assert verify_upload(policy["key"]) == "https://cdn.test/image.png"
+        get_resource.assert_called_once_with(policy["key"])
+
+        resource["bytes"] = settings.MAX_UPLOAD_SIZE + 1
+        with (
+            patch("cloudinary.api.resource", return_value=resource),
+            patch("cloudinary.uploader.destroy") as destroy,
+            pytest.raises(InvalidUploadError),
+        ):
+            verify_upload(policy["key"])
+        destroy.assert_called_once_with(policy["key"])
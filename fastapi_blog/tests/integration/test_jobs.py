@@ -0,0 +1,172 @@
+import asyncio
+import pytest
+from datetime import timedelta
+from unittest.mock import patch
+from fastapi_blog.blogs.models import BlogPost, Job
+from fastapi_blog.config import settings
+from fastapi_blog.jobs import JobRunner, claim_jobs, job, job_runner, utcnow
+from fastapi_blog.repositories.job_repository import JobRepository
+from sqlmodel import select
+from tests.test_utils import TestingSessionLocal
+
+calls = []
+
+@job("test_record")
+async def record(session, payload):
+    calls.append(payload["value"])
+
+@job("test_fail", max_attempts=2)
+async def fail(session, payload):
+    raise RuntimeError("Storage unavailable")
+
+running = {"now": 0, "max": 0}
+
+@job("test_one_at_a_time", concurrency=1)
+async def one_at_a_time(session, payload):
+    running["now"] += 1
+    running["max"] = max(running["max"], running["now"])
+    await asyncio.sleep(0.01)
+    running["now"] -= 1
+
+leases = []
+
+@job("test_long", lease_seconds=3600)
+async def long_running(session, payload):
+    leases.append((await session.exec(select(Job.locked_until))).one())
+
+async def enqueue(name, payload):
+    async with TestingSessionLocal() as session:
+        return await JobRepository(session).enqueue(name, payload)
+
+async def get_jobs():
+    async with TestingSessionLocal() as session:
+        return (await session.exec(select(Job).order_by(Job.id))).all()
+
+@pytest.mark.asyncio
+async def test_create_blog_uploads_image_in_job(auth_client, tmp_path):
+    """Test creating a blog with a Cloudinary image returns before the upload, which the job does"""
+    with (
+        patch.object(settings, "USE_CLOUDINARY", True),
+        patch.object(settings, "UPLOAD_STAGING_FOLDER", tmp_path),
+        patch("cloudinary.uploader.upload", return_value={"secure_url": "https://cdn.test/image.png"}) as upload,
+    ):
+        response = await auth_client.post(
+            "/blogs/create",
+            data={"title": "Blog with image", "content": "Content", "tags": [1]},
+            files={"image": ("image.png", b"image data", "image/png")},
+        )
+
+        assert response.status_code == 303
+        upload.assert_not_called()
+
+        async with TestingSessionLocal() as session:
+            blog = (await session.exec(select(BlogPost).where(BlogPost.title == "Blog with image"))).one()
+        assert blog.image is None
+
+        [queued] = await get_jobs()
+        assert queued.name == "upload_image" and queued.payload["blog_id"] == blog.id
+
+        assert await job_runner.run_pending(TestingSessionLocal) == 1
+
+    upload.assert_called_once_with(queued.payload["path"])
+    async with TestingSessionLocal() as session:
+        assert (await session.get(BlogPost, blog.id)).image == "https://cdn.test/image.png"
+    assert await get_jobs() == []
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_create_blog_commits_post_with_its_job(auth_client, tmp_path):
+    """Test a post whose upload job can't be queued isn't kept without it"""
+    with (
+        patch.object(settings, "USE_CLOUDINARY", True),
+        patch.object(settings, "UPLOAD_STAGING_FOLDER", tmp_path),
+        patch("fastapi_blog.repositories.job_repository.new_job", side_effect=RuntimeError("Queue unavailable")),
+    ):
+        response = await auth_client.post(
+            "/blogs/create",
+            data={"title": "Blog with image", "content": "Content", "tags": [1]},
+            files={"image": ("image.png", b"image data", "image/png")},
+        )
+
+    assert response.status_code == 500
+    async with TestingSessionLocal() as session:
+        assert (await session.exec(select(BlogPost).where(BlogPost.title == "Blog with image"))).first() is None
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_until_it_fails(setup_test_db):
+    """Test a failing job is queued again with a delay, and marked failed after its last attempt"""
+    await enqueue("test_fail", {})
+    runner = JobRunner(concurrency=1)
+
+    assert await runner.run_pending(TestingSessionLocal) == 1
+    [retried] = await get_jobs()
+    assert retried.status == "queued" and retried.attempts == 1
+    assert retried.run_after > utcnow() + timedelta(seconds=settings.JOB_RETRY_SECONDS / 2)
+
+    with patch.object(settings, "JOB_RETRY_SECONDS", 0):
+        async with TestingSessionLocal() as session:
+            (await session.get(Job, retried.id)).run_after = utcnow()
+            await session.commit()
+
+        assert await runner.run_pending(TestingSessionLocal) == 1
+
+    [failed] = await get_jobs()
+    assert failed.status == "failed" and failed.attempts == 2
+    assert "Storage unavailable" in failed.last_error
+    assert await runner.run_pending(TestingSessionLocal) == 0
+
+@pytest.mark.asyncio
+async def test_job_concurrency_limit(setup_test_db):
+    """Test a job limited to one run at a time is not run in parallel by the runner's workers"""
+    for value in range(3):
+        await enqueue("test_one_at_a_time", {"value": value})
+
+    assert await JobRunner(concurrency=3).run_pending(TestingSessionLocal) == 3
+    assert running["max"] == 1
+    assert await get_jobs() == []
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_claimed_again(setup_test_db):
+    """Test a running job is claimed once, and again after its lease expired"""
+    queued = await enqueue("test_record", {"value": 1})
+
+    [claimed] = await claim_jobs(TestingSessionLocal, 10)
+    assert claimed.id == queued.id and claimed.status == "running"
+    assert await claim_jobs(TestingSessionLocal, 10) == []
+
+    async with TestingSessionLocal() as session:
+        (await session.get(Job, queued.id)).locked_until = utcnow() - timedelta(seconds=1)
+        await session.commit()
+
+    [reclaimed] = await claim_jobs(TestingSessionLocal, 10)
+    assert reclaimed.attempts == 2
+
+@pytest.mark.asyncio
+async def test_long_job_runs_with_its_lease(setup_test_db):
+    """Test a job with its own lease holds it while it runs, instead of the default one"""
+    await enqueue("test_long", {})
+
+    assert await JobRunner(concurrency=1).run_pending(TestingSessionLocal) == 1
+    assert leases[-1] > utcnow() + timedelta(seconds=3000)
+
+@pytest.mark.asyncio
+async def test_started_runner_runs_committed_jobs(setup_test_db):
+    """Test the runner starts a job when its transaction commits, without waiting for a poll"""
+    calls.clear()
+    runner = JobRunner(concurrency=2, poll_interval=60)
+    runner.start(TestingSessionLocal)
+    # The first poll ran before the job existed
+    await asyncio.sleep(0.05)
+
+    with patch("fastapi_blog.jobs.job_runner", runner):
+        await enqueue("test_record", {"value": "committed"})
+
+    # The job is removed once it ran
+    for _ in range(100):
+        if not await get_jobs():
+            break
+        await asyncio.sleep(0.01)
+    await runner.stop()
+
+    assert calls == ["committed"]
+    assert await get_jobs() == []
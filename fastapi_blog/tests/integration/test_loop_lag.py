@@ -0,0 +1,62 @@
+import asyncio
+import time
+import pytest
+from fastapi_blog.monitoring.loop_lag import LoopLagMonitor, assert_max_loop_block
+from prometheus_client import REGISTRY
+
+# Generous enough for slow machines, far below a blocking bcrypt or upload call
+ROUTE_BUDGET = 0.5
+
+def blocking_call():
+    time.sleep(0.2)
+
+@pytest.mark.asyncio
+async def test_monitor_reports_blocking_stack(caplog):
+    """Test the stack of the coroutine blocking the loop is logged"""
+    blocks = REGISTRY.get_sample_value("event_loop_blocks_total") or 0
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+
+    await asyncio.sleep(0.02)
+    blocking_call()
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    assert monitor.max_lag >= 0.15
+    assert "blocking_call" in monitor.blocked_stack
+    assert "Event loop blocked for over" in caplog.text
+    assert REGISTRY.get_sample_value("event_loop_blocks_total") == blocks + 1
+
+@pytest.mark.asyncio
+async def test_monitor_exports_lag():
+    """Test every heartbeat is observed in the lag histogram"""
+    beats = REGISTRY.get_sample_value("event_loop_lag_seconds_count") or 0
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+
+    await asyncio.sleep(0.1)
+    await monitor.stop()
+
+    assert REGISTRY.get_sample_value("event_loop_lag_seconds_count") > beats
+    assert monitor.blocked_stack is None
+
+@pytest.mark.asyncio
+async def test_assert_max_loop_block_fails_when_exceeded():
+    """Test the assertion fails when the loop is blocked longer than the budget"""
+    with pytest.raises(AssertionError, match="Event loop blocked for .* ms, the budget is 50 ms"):
+        async with assert_max_loop_block(0.05):
+            blocking_call()
+
+@pytest.mark.asyncio
+async def test_assert_max_loop_block_allows_awaiting():
+    """Test awaiting does not count as blocking"""
+    async with assert_max_loop_block(0.05):
+        await asyncio.sleep(0.2)
+
+@pytest.mark.asyncio
+async def test_blog_routes_do_not_block_the_loop(test_client):
+    """Test the blog pages stay within the loop blocking budget"""
+    async with assert_max_loop_block(ROUTE_BUDGET):
+        assert (await test_client.get("/")).status_code == 200
+        assert (await test_client.get("/blogs")).status_code == 200
+        assert (await test_client.get("/blogs/1")).status_code == 200
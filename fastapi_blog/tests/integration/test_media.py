@@ -0,0 +1,126 @@
+import hashlib
+import io
+import os
+import time
+import pytest
+from unittest.mock import patch
+from fastapi_blog.blogs.media import MediaFiles, prune_media, store_media
+from fastapi_blog.blogs.models import BlogPost, MediaFile
+from fastapi_blog.config import settings
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.orm import defer
+from sqlmodel import select
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from tests.test_utils import TestingSessionLocal
+
+@pytest.fixture
+def upload_folder(tmp_path):
+    with patch.object(settings, "UPLOAD_FOLDER", tmp_path):
+        yield tmp_path
+
+def age(path, seconds=3600):
+    os.utime(path, (time.time() - seconds, time.time() - seconds))
+
+async def ref_counts():
+    async with TestingSessionLocal() as session:
+        return {media.key: media.ref_count for media in (await session.exec(select(MediaFile))).all()}
+
+def test_store_media_deduplicates(upload_folder):
+    """Test an image is stored under the hash of its content, once however often it is uploaded"""
+    key = store_media(io.BytesIO(b"image data"), ".PNG")
+    other = store_media(io.BytesIO(b"other data"), ".png")
+
+    assert key == hashlib.sha256(b"image data").hexdigest() + ".png"
+    assert store_media(io.BytesIO(b"image data"), ".png") == key
+    assert sorted(path.name for path in upload_folder.iterdir()) == sorted([key, other])
+
+@pytest.mark.asyncio
+async def test_create_blog_stores_image_by_content(auth_client, upload_folder):
+    """Test posts uploading the same image share its file and count it"""
+    for title in ["First", "Second"]:
+        response = await auth_client.post(
+            "/blogs/create",
+            data={"title": title, "content": "Content", "tags": [1]},
+            files={"image": ("photo.png", b"image data", "image/png")},
+        )
+        assert response.status_code == 303
+
+    key = hashlib.sha256(b"image data").hexdigest() + ".png"
+    async with TestingSessionLocal() as session:
+        images = (await session.exec(select(BlogPost.image).where(BlogPost.title.in_(["First", "Second"])))).all()
+
+    assert images == [f"/media/{key}"] * 2
+    assert [path.name for path in upload_folder.iterdir()] == [key]
+    assert await ref_counts() == {key: 2}
+
+@pytest.mark.asyncio
+async def test_reference_counts_follow_posts(setup_test_db):
+    """Test the count of an image follows the posts using it as they are created, changed and deleted"""
+    first, second = f"/media/{'a' * 64}.png", f"/media/{'b' * 64}.png"
+
+    async with TestingSessionLocal() as session:
+        blogs = [BlogPost(title=f"Blog {i}", content="Content", author_id=1, image=first) for i in range(2)]
+        session.add_all(blogs)
+        # Images stored elsewhere are not counted
+        session.add(BlogPost(title="Cloudinary", content="Content", author_id=1, image="https://cdn.test/image.png"))
+        await session.commit()
+    assert await ref_counts() == {"a" * 64 + ".png": 2}
+
+    async with TestingSessionLocal() as session:
+        blog = await session.get(BlogPost, blogs[0].id)
+        blog.image = second
+        await session.commit()
+    assert await ref_counts() == {"a" * 64 + ".png": 1, "b" * 64 + ".png": 1}
+
+    async with TestingSessionLocal() as session:
+        # Deleted without loading its image
+        await session.delete(await session.get(BlogPost, blogs[1].id, options=[defer(BlogPost.image)]))
+        await session.delete(await session.get(BlogPost, blogs[0].id))
+        await session.commit()
+    assert await ref_counts() == {"a" * 64 + ".png": 0, "b" * 64 + ".png": 0}
+
+@pytest.mark.asyncio
+async def test_prune_media_removes_unused_images(setup_test_db, upload_folder):
+    """Test pruning removes images no post used for the grace period, and unfinished uploads"""
+    used = store_media(io.BytesIO(b"used"), ".png")
+    unused = store_media(io.BytesIO(b"unused"), ".png")
+    uncounted = store_media(io.BytesIO(b"uncounted"), ".png")
+    recent = store_media(io.BytesIO(b"recent"), ".png")
+    (upload_folder / ".upload-stale").write_bytes(b"partial")
+    (upload_folder / "legacy_image.png").write_bytes(b"legacy")
+
+    async with TestingSessionLocal() as session:
+        session.add(BlogPost(title="Used", content="Content", author_id=1, image=f"/media/{used}"))
+        blog = BlogPost(title="Unused", content="Content", author_id=1, image=f"/media/{unused}")
+        session.add(blog)
+        await session.commit()
+        await session.delete(blog)
+        await session.commit()
+
+    for path in upload_folder.iterdir():
+        if path.name != recent:
+            age(path)
+
+    async with TestingSessionLocal() as session:
+        # The count of the unused image dropped just now, so it is kept for the grace period
+        assert await prune_media(session, grace=60) == 1
+    assert not (upload_folder / uncounted).exists()
+
+    async with TestingSessionLocal() as session:
+        assert await prune_media(session, grace=0) == 2
+
+    assert sorted(path.name for path in upload_folder.iterdir()) == sorted([used, "legacy_image.png"])
+    assert await ref_counts() == {used: 1}
+
+@pytest.mark.asyncio
+async def test_media_is_cached_as_immutable(tmp_path):
+    """Test the served images may be cached for good"""
+    (tmp_path / "image.png").write_bytes(b"image data")
+    app = Starlette(routes=[Mount("/media", MediaFiles(directory=tmp_path))])
+
+    async with AsyncClient(base_url="http://testserver", transport=ASGITransport(app=app)) as client:
+        response = await client.get("/media/image.png")
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == f"public, max-age={settings.MEDIA_CACHE_SECONDS}, immutable"
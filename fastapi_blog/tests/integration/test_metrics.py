@@ -0,0 +1,71 @@
+import pytest
+from fastapi_blog.monitoring.metrics import observe_upload, record_cache_lookup
+from prometheus_client import REGISTRY
+
+def sample(name, **labels):
+    """Returns the current value of a metric sample, 0 when it was not recorded yet"""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+@pytest.mark.asyncio
+async def test_requests_are_counted_by_route_template(test_client):
+    """Test requests are labeled with the route template, not the concrete path"""
+    before = sample("http_requests_total", method="GET", route="/blogs/{blog_id}", status="200")
+    duration_before = sample("http_request_duration_seconds_count", method="GET", route="/blogs/{blog_id}")
+
+    await test_client.get("/blogs/1")
+    await test_client.get("/blogs/2")
+
+    assert sample("http_requests_total", method="GET", route="/blogs/{blog_id}", status="200") == before + 2
+    assert sample("http_request_duration_seconds_count", method="GET", route="/blogs/{blog_id}") == duration_before + 2
+    assert sample("http_requests_in_progress", method="GET") == 0
+
+@pytest.mark.asyncio
+async def test_not_found_requests_are_counted(test_client):
+    """Test unknown paths share one label value"""
+    before = sample("http_requests_total", method="GET", route="<unmatched>", status="404")
+
+    await test_client.get("/does-not-exist")
+
+    assert sample("http_requests_total", method="GET", route="<unmatched>", status="404") == before + 1
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(test_client):
+    """Test the metrics endpoint exposes request, pool and template metrics"""
+    await test_client.get("/blogs")
+
+    response = await test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/blogs",status="200"}' in response.text
+    assert 'template_render_duration_seconds_count{template="blogs.html"}' in response.text
+    assert "db_pool_connections_in_use" in response.text
+
+def test_cache_and_upload_metrics():
+    """Test the cache and upload helpers record their samples"""
+    hits = sample("cache_requests_total", cache="test", result="hit")
+    misses = sample("cache_requests_total", cache="test", result="miss")
+    uploads = sample("upload_size_bytes_sum", storage="local")
+
+    record_cache_lookup("test", hit=True)
+    record_cache_lookup("test", hit=False)
+    with observe_upload("local", 2048):
+        pass
+
+    assert sample("cache_requests_total", cache="test", result="hit") == hits + 1
+    assert sample("cache_requests_total", cache="test", result="miss") == misses + 1
+    assert sample("upload_size_bytes_sum", storage="local") == uploads + 2048
+
+@pytest.mark.asyncio
+async def test_tag_filters_share_compiled_statement(test_client):
+    """Test filtering by a different number of tags reuses the compiled statements"""
+    for url in ["/blogs?tag=food", "/blogs?tag=food,tech"]:
+        await test_client.get(url)
+    hits = sample("cache_requests_total", cache="sql_compiled", result="hit")
+    misses = sample("cache_requests_total", cache="sql_compiled", result="miss")
+
+    for url in ["/blogs?tag=tech", "/blogs?tag=tech,food"]:
+        await test_client.get(url)
+
+    assert sample("cache_requests_total", cache="sql_compiled", result="miss") == misses
+    assert sample("cache_requests_total", cache="sql_compiled", result="hit") > hits
@@ -0,0 +1,104 @@
+import pytest
+import pytest_asyncio
+from fastapi_blog.accounts.models import EmailUser
+from fastapi_blog.config import settings
+from fastapi_blog.monitoring.profiling import ProfileFile, list_profiles
+from tests.test_data import TEST_USER
+from tests.test_utils import TestingSessionLocal
+
+@pytest.fixture(autouse=True)
+def profiles_dir(tmp_path, monkeypatch):
+    """Store the profiles in a temporary directory"""
+    monkeypatch.setattr(settings, "PROFILES_DIR", tmp_path / "profiles")
+
+    return settings.PROFILES_DIR
+
+@pytest_asyncio.fixture(scope="function")
+async def staff_client(auth_client):
+    """Create a client authenticated as a staff user."""
+    async with TestingSessionLocal() as session:
+        user = await session.get(EmailUser, TEST_USER["id"])
+        user.is_staff = True
+        await session.commit()
+
+    yield auth_client
+
+def test_profile_file_name_round_trip():
+    """Test the request is recovered from the profile file name"""
+    profile = ProfileFile.create("GET", "/blogs/1_a")
+
+    parsed = ProfileFile.from_name(profile.name)
+
+    assert parsed == profile
+    assert ProfileFile.from_name("notes.html") is None
+
+@pytest.mark.asyncio
+async def test_staff_request_is_profiled(staff_client):
+    """Test a staff user gets a profile of the request with the query parameter"""
+    response = await staff_client.get("/blogs?profile=1")
+
+    assert response.status_code == 200
+
+    profiles = list_profiles()
+    assert [profile.name for profile in profiles] == [response.headers["X-Profile"]]
+    assert profiles[0].method == "GET"
+    assert profiles[0].path == "/blogs"
+    assert "pyinstrument" in (settings.PROFILES_DIR / profiles[0].name).read_text(encoding="utf-8")
+
+@pytest.mark.asyncio
+async def test_staff_request_is_profiled_with_header(staff_client):
+    """Test the profile can be requested with a header"""
+    response = await staff_client.get("/blogs", headers={"X-Profile": "1"})
+
+    assert "X-Profile" in response.headers
+    assert len(list_profiles()) == 1
+
+@pytest.mark.asyncio
+async def test_non_staff_request_is_not_profiled(auth_client):
+    """Test regular users can not profile requests"""
+    response = await auth_client.get("/blogs?profile=1")
+
+    assert response.status_code == 200
+    assert "X-Profile" not in response.headers
+    assert list_profiles() == []
+
+@pytest.mark.asyncio
+async def test_only_newest_profiles_are_kept(staff_client, monkeypatch):
+    """Test old profiles are removed above the limit"""
+    monkeypatch.setattr(settings, "PROFILES_KEEP", 2)
+
+    for _ in range(3):
+        response = await staff_client.get("/blogs?profile=1")
+
+    profiles = list_profiles()
+    assert len(profiles) == 2
+    assert profiles[0].name == response.headers["X-Profile"]
+
+@pytest.mark.asyncio
+async def test_admin_lists_and_opens_profiles(staff_client):
+    """Test the admin lists the saved profiles and serves them"""
+    name = (await staff_client.get("/blogs?profile=1")).headers["X-Profile"]
+
+    response = await staff_client.get("/admin/profiles")
+
+    assert response.status_code == 200
+    assert "/blogs" in response.text
+
+    response = await staff_client.get("/admin/profiles", params={"name": name})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+
+@pytest.mark.asyncio
+async def test_admin_rejects_unknown_profiles(staff_client):
+    """Test only saved profiles can be opened"""
+    response = await staff_client.get("/admin/profiles", params={"name": "../main.py"})
+
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_admin_profiles_require_staff(auth_client):
+    """Test regular users can not see the profiles"""
+    response = await auth_client.get("/admin/profiles")
+
+    assert response.status_code == 403
@@ -0,0 +1,80 @@
+import logging
+import pytest
+from fastapi_blog.blogs.models import BlogPost
+from fastapi_blog.monitoring.queries import (
+    QueryMonitorMiddleware,
+    assert_max_queries,
+    fingerprint,
+    install_query_listeners,
+    record_queries
+)
+from sqlmodel import select
+from tests.test_utils import TestingSessionLocal
+
+install_query_listeners()
+
+def test_fingerprint_ignores_literals_and_list_lengths():
+    """Test statements differing only in values share a fingerprint"""
+    first = fingerprint("SELECT * FROM blogpost WHERE id IN (?, ?, ?) AND title = 'a'")
+    second = fingerprint("SELECT *  FROM blogpost\nWHERE id IN ($1, $2) AND title = 'it''s'")
+
+    assert first == second == "SELECT * FROM blogpost WHERE id IN (?) AND title = ?"
+
+@pytest.mark.asyncio
+async def test_blog_list_query_count(test_client):
+    """Test the blog list runs a constant number of queries"""
+    with assert_max_queries(4, repeat_threshold=1) as stats:
+        response = await test_client.get("/blogs")
+
+    assert response.status_code == 200
+    assert stats.count > 0
+    assert stats.duration > 0
+
+@pytest.mark.asyncio
+async def test_blog_detail_query_count(test_client):
+    """Test the blog detail runs a constant number of queries"""
+    with assert_max_queries(4, repeat_threshold=1):
+        response = await test_client.get("/blogs/1")
+
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_blog_edit_writes_only_changes(auth_client):
+    """Test editing a blog adds the new tag link without rewriting the kept one"""
+    with assert_max_queries(8) as stats:
+        response = await auth_client.post(
+            "/blogs/1/edit",
+            data={"title": "Updated Blog", "content": "This is an updated test blog", "tags": [1, 2]},
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+
+    assert response.status_code == 303
+    shapes = list(stats.fingerprints)
+    assert not [shape for shape in shapes if shape.startswith("DELETE FROM blogpost_tag")]
+    assert stats.fingerprints["INSERT INTO blogpost_tag (blogpost_id, tag_id) VALUES (?)"] == 1
+    assert not [shape for shape in shapes if shape.startswith("SELECT tag.id, tag.name, tag.slug FROM tag WHERE")]
+
+@pytest.mark.asyncio
+async def test_assert_max_queries_fails_when_exceeded(setup_test_db):
+    """Test the assertion lists the statements when the limit is exceeded"""
+    with pytest.raises(AssertionError, match="Expected at most 1 queries, got 2"):
+        with assert_max_queries(1):
+            async with TestingSessionLocal() as session:
+                await session.exec(select(BlogPost).where(BlogPost.id == 1))
+                await session.exec(select(BlogPost).where(BlogPost.id == 2))
+
+@pytest.mark.asyncio
+async def test_middleware_warns_about_repeated_statements(setup_test_db, caplog):
+    """Test the middleware logs statements repeated above the threshold"""
+    async def app(scope, receive, send):
+        async with TestingSessionLocal() as session:
+            for blog_id in range(1, 5):
+                await session.exec(select(BlogPost).where(BlogPost.id == blog_id))
+
+    middleware = QueryMonitorMiddleware(app, repeat_threshold=3)
+
+    with caplog.at_level(logging.WARNING), record_queries() as stats:
+        await middleware({"type": "http", "method": "GET", "path": "/blogs"}, None, None)
+
+    assert stats.count == 4
+    assert "Possible N+1 in GET /blogs: statement executed 4 times" in caplog.text
@@ -0,0 +1,119 @@
+import shutil
+import pytest
+import pytest_asyncio
+from fastapi_blog import database
+from fastapi_blog.blogs.models import BlogPost, BlogPostCard
+from fastapi_blog.config import settings
+from fastapi_blog.database import RoutingSession, get_session
+from fastapi_blog.main import app
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import create_engine, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from tests.test_data import TEST_USER
+from tests.test_utils import TestingSessionLocal, test_engine
+
+@pytest_asyncio.fixture(scope="function")
+async def replica(setup_test_db, tmp_path, monkeypatch):
+    """
+    Use a copy of the seeded test database as the replica, with the blog titles
+    changed to tell which database a page was read from.
+    """
+    replica_path = tmp_path / "replica.db"
+    shutil.copy("./test.db", replica_path)
+    replica_engine = AsyncEngine(create_engine(url=f"sqlite+aiosqlite:///{replica_path}"))
+
+    async with replica_engine.begin() as conn:
+        await conn.execute(update(BlogPost).values(title="Replica " + BlogPost.title))
+        await conn.execute(update(BlogPostCard).values(title="Replica " + BlogPostCard.title))
+
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(
+        bind=test_engine,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        replica=replica_engine.sync_engine,
+        expire_on_commit=False
+    ))
+    app.dependency_overrides.pop(get_session)
+
+    yield replica_engine
+
+    await replica_engine.dispose()
+
+@pytest.mark.asyncio
+async def test_read_only_pages_use_replica(replica, test_client):
+    """Test the index, blog list and blog detail are read from the replica"""
+    for url in ["/", "/blogs", "/blogs/1"]:
+        response = await test_client.get(url)
+
+        assert response.status_code == 200
+        assert "Replica Blog" in response.text
+
+@pytest.mark.asyncio
+async def test_reads_stick_to_primary_after_write(replica, auth_client):
+    """Test the user reads their own writes from the primary within the window"""
+    response = await auth_client.post(
+        "/blogs/create",
+        data={"title": "New Blog", "content": "This is a test blog", "tags": [1]},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == 303
+
+    response = await auth_client.get("/blogs")
+
+    assert "New Blog" in response.text
+    assert "Replica Blog" not in response.text
+
+@pytest.mark.asyncio
+async def test_reads_return_to_replica_after_window(replica, auth_client, monkeypatch):
+    """Test the reads go back to the replica once the window has passed"""
+    monkeypatch.setattr(settings, "REPLICA_STICKY_SECONDS", 0)
+
+    await auth_client.post(
+        "/blogs/create",
+        data={"title": "New Blog", "content": "This is a test blog", "tags": [1]},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    response = await auth_client.get("/blogs")
+
+    assert "Replica Blog" in response.text
+    assert "New Blog" not in response.text
+
+@pytest.mark.asyncio
+async def test_writes_go_to_primary(replica):
+    """Test writes and reads outside read-only methods use the primary"""
+    async with database.SessionLocal() as session:
+        session.info["read_only"] = True
+        blog = await session.get(BlogPost, 1)
+
+        assert blog.title.startswith("Replica ")
+
+        session.info["read_only"] = False
+        await session.exec(update(BlogPost).where(BlogPost.id == 1).values(title="Updated"))
+        await session.commit()
+
+        session.info["read_only"] = True
+        assert (await session.exec(
+            BlogPost.__table__.select().where(BlogPost.id == 1)
+        )).one().title == "Updated"
+
+@pytest.mark.asyncio
+async def test_changed_post_is_read_from_primary(replica, auth_client):
+    """Test a post is loaded from the primary to be changed, when the replica doesn't have it yet"""
+    async with TestingSessionLocal() as session:
+        blog = BlogPost(title="Not replicated", content="Content", author_id=TEST_USER["id"])
+        session.add(blog)
+        await session.commit()
+
+    response = await auth_client.post(
+        f"/blogs/{blog.id}/edit",
+        data={"title": "Edited", "content": "Content", "tags": [1]},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == 303
+
+    response = await auth_client.post(f"/blogs/{blog.id}/delete")
+    assert response.status_code == 303
+
+    async with TestingSessionLocal() as session:
+        assert await session.get(BlogPost, blog.id) is None
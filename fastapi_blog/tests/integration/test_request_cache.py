@@ -0,0 +1,51 @@
+import pytest
+from fastapi_blog.monitoring.queries import install_query_listeners, record_queries
+from fastapi_blog.repositories.blog_post_repository import BlogPostRepository
+from fastapi_blog.repositories.tag_repository import TagRepository
+from prometheus_client import REGISTRY
+from tests.test_utils import TestingSessionLocal
+
+install_query_listeners()
+
+def cache_sample(cache, result):
+    return REGISTRY.get_sample_value("cache_requests_total", {"cache": cache, "result": result}) or 0
+
+@pytest.mark.asyncio
+async def test_repeated_lookup_served_from_cache(setup_test_db):
+    """Test loading the same blog twice in a session runs one query"""
+    hits = cache_sample("request_blog_post", "hit")
+
+    async with TestingSessionLocal() as session:
+        repo = BlogPostRepository(session)
+        with record_queries() as stats:
+            first = await repo.get_by_id(1)
+            second = await repo.get_by_id(1)
+
+    assert first is second
+    assert stats.count == 1
+    assert cache_sample("request_blog_post", "hit") == hits + 1
+
+@pytest.mark.asyncio
+async def test_lookup_cache_cleared_after_write(setup_test_db):
+    """Test a lookup after a flush goes to the database again"""
+    async with TestingSessionLocal() as session:
+        repo = BlogPostRepository(session)
+        tags = await TagRepository(session).get_all()
+        blog = await repo.get_by_id(1)
+        blog.title = "Updated Blog"
+        await session.commit()
+
+        with record_queries() as stats:
+            assert (await repo.get_by_id(1)).title == "Updated Blog"
+            assert await TagRepository(session).get_all() == tags
+
+    assert stats.count == 2
+
+@pytest.mark.asyncio
+async def test_blog_delete_loads_blog_once(auth_client):
+    """Test the delete route and service share the loaded blog"""
+    with record_queries() as stats:
+        response = await auth_client.post("/blogs/1/delete")
+
+    assert response.status_code == 303
+    assert sum(count for shape, count in stats.fingerprints.items() if shape.startswith("SELECT blog_post.id")) == 1
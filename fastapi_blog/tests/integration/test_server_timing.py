@@ -0,0 +1,59 @@
+import pytest
+from fastapi_blog.monitoring.queries import QueryStats
+from fastapi_blog.monitoring.timing import ServerTiming
+from tests.test_data import TEST_USER
+
+def parse_server_timing(header: str):
+    """Returns the metric names of a Server-Timing header"""
+    return [metric.split(";")[0].strip() for metric in header.split(",")]
+
+def test_server_timing_header_format():
+    """Test repeated phases are summed and the db and total metrics are appended"""
+    timing = ServerTiming()
+    timing.add("auth", 0.002)
+    timing.add("TagRepository.get_all", 0.001)
+    timing.add("TagRepository.get_all", 0.0015)
+    queries = QueryStats()
+    queries.record("SELECT 1", 0.003)
+
+    header = timing.header(0.0201, queries)
+
+    assert header == (
+        'auth;dur=2.0, TagRepository.get_all;dur=2.5;desc="2 calls", '
+        'db;dur=3.0;desc="1 queries", total;dur=20.1'
+    )
+
+@pytest.mark.asyncio
+async def test_blog_list_server_timing(test_client):
+    """Test the blog list reports its repository calls, rendering and DB time"""
+    response = await test_client.get("/blogs")
+
+    assert response.status_code == 200
+
+    metrics = parse_server_timing(response.headers["Server-Timing"])
+    assert "BlogPostRepository.get_paginated" in metrics
+    assert "TagRepository.get_all" in metrics
+    assert "render" in metrics
+    assert metrics[-2:] == ["db", "total"]
+
+@pytest.mark.asyncio
+async def test_login_server_timing(test_client):
+    """Test the login reports the user lookup and password check"""
+    response = await test_client.post("accounts/login", data={
+        "email": TEST_USER["email"],
+        "password": TEST_USER["password"]
+    })
+
+    assert response.status_code == 303
+
+    metrics = parse_server_timing(response.headers["Server-Timing"])
+    assert "EmailUserRepository.get_by_email" in metrics
+    assert "password" in metrics
+
+@pytest.mark.asyncio
+async def test_static_files_have_server_timing(test_client):
+    """Test responses without timed phases still report the total"""
+    response = await test_client.get("/static/css/tailwind.css")
+
+    assert response.status_code == 200
+    assert "total;dur=" in response.headers["Server-Timing"]
@@ -0,0 +1,59 @@
+import json
+import pytest
+from fastapi_blog.blogs.models import BlogPost
+from fastapi_blog.config import settings
+from fastapi_blog.main import app
+from fastapi_blog.utils.static_site import MANIFEST_FILE, build_site
+from tests.test_utils import TestingSessionLocal
+
+async def build(output_dir, **kwargs):
+    return await build_site(app, TestingSessionLocal, output_dir, "http://blog.example", settings.STATIC_DIR, **kwargs)
+
+@pytest.mark.asyncio
+async def test_build_renders_public_pages(test_client, tmp_path):
+    """Test the first build renders the index, the list pages of all blogs and of every tag, the detail pages and the assets"""
+    result = await build(tmp_path)
+
+    # The index, two pages of all blogs, one per tag and seven detail pages
+    assert result == {"pages": 12, "rendered": 12, "removed": 0}
+    assert "Blog7" in (tmp_path / "index.html").read_text()
+    assert "Blog1 search" in (tmp_path / "blogs/list/all/2.html").read_text()
+    tech = (tmp_path / "blogs/list/tag/tech/1.html").read_text()
+    assert "Blog7" in tech and "Blog2" in tech and "Blog3" not in tech
+    assert "Content4" in (tmp_path / "blogs/4.html").read_text()
+    assert 'href="http://blog.example/blogs/4"' in (tmp_path / "blogs/list/all/1.html").read_text()
+    assert (tmp_path / "static/css/tailwind.css").exists()
+
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert manifest["pages"]["/blogs?page=2"]["deps"] == ["1"]
+
+@pytest.mark.asyncio
+async def test_build_renders_only_affected_pages(test_client, tmp_path):
+    """Test a build after the first renders only the pages showing changed posts, and removes the pages gone"""
+    await build(tmp_path)
+    assert (await build(tmp_path))["rendered"] == 0
+    second_page = (tmp_path / "blogs/list/all/2.html").stat().st_mtime_ns
+
+    async with TestingSessionLocal() as session:
+        blog = await session.get(BlogPost, 2)
+        blog.title = "Blog2 renamed"
+        await session.commit()
+
+    result = await build(tmp_path)
+
+    # The detail page, the pages of all and of the tech blogs listing it, and the detail pages linking to it
+    assert 3 <= result["rendered"] < 12
+    assert "Blog2 renamed" in (tmp_path / "blogs/2.html").read_text()
+    assert "Blog2 renamed" in (tmp_path / "blogs/list/all/1.html").read_text()
+    assert "Blog2 renamed" in (tmp_path / "blogs/list/tag/tech/1.html").read_text()
+    assert (tmp_path / "blogs/list/all/2.html").stat().st_mtime_ns == second_page
+
+    async with TestingSessionLocal() as session:
+        await session.delete(await session.get(BlogPost, 1))
+        await session.commit()
+
+    result = await build(tmp_path)
+
+    assert result["removed"] == 2
+    assert not (tmp_path / "blogs/1.html").exists()
+    assert not (tmp_path / "blogs/list/all/2.html").exists()
@@ -0,0 +1,77 @@
+import pytest
+from fastapi_blog.blogs.models import BlogPost
+from fastapi_blog.blogs.view_counts import ViewCounter, view_counter
+from sqlmodel import select
+from tests.test_utils import TestingSessionLocal
+
+async def get_views():
+    async with TestingSessionLocal() as session:
+        return dict((await session.exec(select(BlogPost.id, BlogPost.views))).all())
+
+@pytest.mark.asyncio
+async def test_detail_views_are_flushed_in_one_batch(test_client):
+    """Test the detail page counts its views in memory, and a flush adds them to the posts"""
+    for path in ["/blogs/2", "/blogs/2", "/blogs/5", "/blogs/2", "/blogs/999"]:
+        await test_client.get(path)
+
+    assert view_counter.counts == {2: 3, 5: 1}
+    assert (await get_views())[2] == 0
+
+    assert await view_counter.flush(TestingSessionLocal) == 4
+
+    views = await get_views()
+    assert views[2] == 3 and views[5] == 1 and views[1] == 0
+    assert not view_counter.counts
+
+    await test_client.get("/blogs/2")
+    await view_counter.flush(TestingSessionLocal)
+
+    assert (await get_views())[2] == 4
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_views(setup_test_db):
+    """Test the views of a failed flush are added by the next one"""
+    def failing_session():
+        raise ConnectionError("Database unavailable")
+
+    counter = ViewCounter()
+    counter.increment(3)
+
+    with pytest.raises(ConnectionError):
+        await counter.flush(failing_session)
+    counter.increment(3)
+
+    assert await counter.flush(TestingSessionLocal) == 2
+    assert (await get_views())[3] == 2
+
+@pytest.mark.asyncio
+async def test_stop_flushes_remaining_views(setup_test_db):
+    """Test stopping the counter flushes the views counted since the last flush"""
+    counter = ViewCounter(interval=60)
+    counter.start(TestingSessionLocal)
+    counter.increment(1)
+
+    await counter.stop(TestingSessionLocal)
+
+    assert (await get_views())[1] == 1
+
+@pytest.mark.asyncio
+async def test_paused_counter_ignores_views(test_client):
+    """Test views are not counted while the counter is paused"""
+    with view_counter.pause():
+        await test_client.get("/blogs/2")
+
+    assert not view_counter.counts
+
+@pytest.mark.asyncio
+async def test_popular_blogs_ordered_by_views(test_client):
+    """Test the popular page lists the viewed blogs, most viewed first"""
+    for path in ["/blogs/4", "/blogs/6", "/blogs/6"]:
+        await test_client.get(path)
+    await view_counter.flush(TestingSessionLocal)
+
+    response = await test_client.get("/blogs/popular")
+
+    assert response.status_code == 200
+    assert response.text.index("Blog6") < response.text.index("Blog4")
+    assert "Blog1" not in response.text
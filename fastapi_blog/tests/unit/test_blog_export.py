@@ -0,0 +1,26 @@
+import io
+import pytest
+from fastapi_blog.utils.blog_export import export_chunks, stream_export
+from fastapi_blog.utils.blog_import import parse_record, read_records
+from tests.test_utils import TestingSessionLocal
+
+@pytest.mark.asyncio
+async def test_export_reads_fixed_size_chunks(setup_test_db):
+    """Test the posts are exported in chunks ordered by id with their author and tags"""
+    chunks = [chunk async for chunk in export_chunks(TestingSessionLocal, chunk_size=3)]
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [row["id"] for chunk in chunks for row in chunk] == list(range(1, 8))
+    assert chunks[2][0]["tags"] == ["Food", "Tech"]
+    assert chunks[0][0]["author"] == "test@example.com"
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+async def test_export_can_be_imported(setup_test_db, format):
+    """Test the exported records are valid import records"""
+    text = "".join([piece async for piece in stream_export(TestingSessionLocal, format, chunk_size=4)])
+
+    records = [parse_record(record) for _, record in read_records(io.StringIO(text, newline=""), format)]
+
+    assert len(records) == 7
+    assert records[6]["tags"] == {"food": "Food", "tech": "Tech"}
@@ -0,0 +1,121 @@
+import json
+import pytest
+from datetime import datetime
+from fastapi_blog.blogs.models import BlogImport, BlogPost, BlogPostCard, Tag
+from fastapi_blog.utils import blog_import
+from fastapi_blog.utils.blog_import import import_blog_posts, parse_record
+from sqlalchemy.orm import selectinload
+from sqlmodel import func, select
+from tests.test_data import TEST_USER
+from tests.test_utils import TestingSessionLocal
+
+def write_ndjson(path, records):
+    path.write_text("\n".join(record if isinstance(record, str) else json.dumps(record) for record in records) + "\n")
+    return path
+
+def post(title, **fields):
+    return {"title": title, "content": f"<p>{title} content</p>", "author": TEST_USER["email"], **fields}
+
+async def count(model):
+    async with TestingSessionLocal() as session:
+        return (await session.exec(select(func.count()).select_from(model))).one()
+
+def test_parse_record():
+    """Test a record is validated and its tags and date normalized"""
+    fields = parse_record(post("Title", tags="Food, New Tag,food", created_at="2024-05-01T12:00:00+02:00"))
+
+    assert fields["tags"] == {"food": "Food", "new-tag": "New Tag"}
+    assert fields["created_at"] == datetime(2024, 5, 1, 10, 0)
+    assert fields["image"] is None
+
+@pytest.mark.parametrize("record", [
+    None,
+    {"title": "No content", "author": "test@example.com"},
+    post("x" * 256),
+    post("Bad tags", tags=[1, 2]),
+    post("Bad date", created_at="yesterday"),
+])
+def test_parse_record_rejects_invalid(record):
+    """Test invalid records raise ValueError"""
+    with pytest.raises(ValueError):
+        parse_record(record)
+
+@pytest.mark.asyncio
+async def test_import_ndjson(setup_test_db, tmp_path):
+    """Test posts are imported with their tags and cards, and invalid records skipped"""
+    path = write_ndjson(tmp_path / "posts.ndjson", [
+        post("Imported 1", tags=["Food", "New Tag"], content="<p>Safe</p><script>alert(1)</script>"),
+        "{not json",
+        post("Imported 2", author="nobody@example.com"),
+        post("Imported 3", tags=["new tag"]),
+        post("Imported 4"),
+    ])
+
+    async with TestingSessionLocal() as session:
+        result = await import_blog_posts(session, path, batch_size=2, workers=2, report=lambda message: None)
+
+    assert (result["records"], result["imported"], result["skipped"]) == (5, 3, 2)
+    assert result["errors"] == ["Line 2: not a JSON object", "Line 3: unknown author nobody@example.com"]
+
+    async with TestingSessionLocal() as session:
+        imported = (await session.exec(
+            select(BlogPost).where(BlogPost.title.startswith("Imported")).options(selectinload(BlogPost.tags))
+        )).all()
+        new_tag = (await session.exec(select(Tag).where(Tag.slug == "new-tag"))).one()
+
+    assert [post.title for post in imported] == ["Imported 1", "Imported 3", "Imported 4"]
+    assert imported[0].content == "<p>Safe</p>"
+    assert sorted(tag.slug for tag in imported[0].tags) == ["food", "new-tag"]
+    assert [tag.id for tag in imported[1].tags] == [new_tag.id]
+    assert await count(BlogPostCard) == await count(BlogPost) == 7 + 3
+
+@pytest.mark.asyncio
+async def test_import_csv(setup_test_db, tmp_path):
+    """Test a CSV file with comma separated tags is imported"""
+    path = tmp_path / "posts.csv"
+    path.write_text(
+        "title,content,author,tags\n"
+        f'CSV post,<p>From CSV</p>,{TEST_USER["email"]},"Tech, Food"\n'
+    )
+
+    async with TestingSessionLocal() as session:
+        result = await import_blog_posts(session, path, workers=1, report=lambda message: None)
+
+        post = (await session.exec(
+            select(BlogPost).where(BlogPost.title == "CSV post").options(selectinload(BlogPost.tags))
+        )).one()
+
+    assert result["imported"] == 1
+    assert sorted(tag.slug for tag in post.tags) == ["food", "tech"]
+
+@pytest.mark.asyncio
+async def test_import_resumes_after_last_batch(setup_test_db, tmp_path, monkeypatch):
+    """Test a failed import continues after its last committed batch and runs once"""
+    path = write_ndjson(tmp_path / "posts.ndjson", [post(f"Imported {i}") for i in range(5)])
+    write_batch = blog_import._write_batch
+    calls = []
+
+    async def failing_write_batch(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return await write_batch(*args)
+
+    monkeypatch.setattr(blog_import, "_write_batch", failing_write_batch)
+    async with TestingSessionLocal() as session:
+        with pytest.raises(RuntimeError):
+            await import_blog_posts(session, path, batch_size=2, workers=1, report=lambda message: None)
+
+    assert await count(BlogPost) == 7 + 2
+
+    monkeypatch.setattr(blog_import, "_write_batch", write_batch)
+    for _ in range(2):
+        async with TestingSessionLocal() as session:
+            result = await import_blog_posts(session, path, batch_size=2, workers=1, report=lambda message: None)
+
+    async with TestingSessionLocal() as session:
+        import_ = (await session.exec(select(BlogImport))).one()
+
+    assert result["imported"] == 5
+    assert await count(BlogPost) == 7 + 5
+    assert import_.records == 5 and import_.finished_at is not None
@@ -1,4 +1,5 @@
 import pytest
+import threading
 from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime
 
@@ -43,6 +44,7 @@ def mock_blog_repo():
     mock.get_all_query = MagicMock()
     mock.get_paginated = AsyncMock()
     mock.get_by_id = AsyncMock()
+    mock.get_by_id_for_update = AsyncMock()
     mock.get_related = AsyncMock()
     mock.get_by_author_query = MagicMock()
     mock.create = AsyncMock()
@@ -117,6 +119,19 @@ async def test_get_blog_by_id_success(blog_post_service, mock_blog_repo):
     assert result == mock_blog
     assert result.id == blog_id
 
+@pytest.mark.asyncio
+async def test_get_blog_by_id_for_update(blog_post_service, mock_blog_repo):
+    """Test get_blog_by_id reads a blog about to be changed from the primary"""
+    blog_id = 1
+    mock_blog = MockBlogPost(id=blog_id)
+    mock_blog_repo.get_by_id_for_update.return_value = mock_blog
+
+    result = await blog_post_service.get_blog_by_id(blog_id, for_update=True)
+
+    mock_blog_repo.get_by_id_for_update.assert_called_once_with(blog_id)
+    mock_blog_repo.get_by_id.assert_not_called()
+    assert result == mock_blog
+
 @pytest.mark.asyncio
 async def test_get_blog_by_id_not_found(blog_post_service, mock_blog_repo):
     """Test get_blog_by_id when blog does not exist"""
@@ -195,6 +210,27 @@ async def test_create_blog_post(blog_post_service, mock_blog_repo, mock_tag_repo
     assert result.author == author
     assert result.tags == tags
 
+@pytest.mark.asyncio
+async def test_create_blog_post_uploads_image_off_event_loop(blog_post_service, mock_tag_repo):
+    """Test create_blog_post stores the image in a worker thread"""
+    threads = []
+    blog_post_service.upload_image = MagicMock(side_effect=lambda image: threads.append(threading.current_thread()))
+    mock_tag_repo.get_by_ids.return_value = []
+
+    await blog_post_service.create_blog_post("New Blog", "Content", "test.jpg", 1, [])
+
+    assert threads and threads[0] is not threading.main_thread()
+
+@pytest.mark.asyncio
+async def test_update_blog_post_stages_image_off_event_loop(blog_post_service, mock_blog_repo):
+    """Test update_blog_post stages the image in a worker thread"""
+    threads = []
+    blog_post_service.stage_image = MagicMock(side_effect=lambda image: threads.append(threading.current_thread()))
+
+    await blog_post_service.update_blog_post(1, "Updated Blog", "Content", [], blog=MockBlogPost())
+
+    assert threads and threads[0] is not threading.main_thread()
+
 @pytest.mark.asyncio
 async def test_update_blog_post(blog_post_service, mock_blog_repo, mock_tag_repo, mock_user_repo):
     """Test update_blog_post method"""
@@ -209,13 +245,13 @@ async def test_update_blog_post(blog_post_service, mock_blog_repo, mock_tag_repo
     existing_blog = MockBlogPost(id=blog_id, author=author)
     updated_blog = MockBlogPost(id=blog_id, title=title, content=content, author=author, tags=tags)
 
-    mock_blog_repo.get_by_id.return_value = existing_blog
+    mock_blog_repo.get_by_id_for_update.return_value = existing_blog
     mock_tag_repo.get_by_ids.return_value = tags
     mock_blog_repo.update.return_value = updated_blog
 
     result = await blog_post_service.update_blog_post(blog_id=blog_id, title=title, content=content, tag_ids=tag_ids)
 
-    mock_blog_repo.get_by_id.assert_called_once_with(blog_id)
+    mock_blog_repo.get_by_id_for_update.assert_called_once_with(blog_id)
     mock_tag_repo.get_by_ids.assert_called_once_with(tag_ids)
     blog_post_service.clean_content.assert_called_once_with(content)
     mock_blog_repo.update.assert_called_once()
@@ -225,6 +261,21 @@ async def test_update_blog_post(blog_post_service, mock_blog_repo, mock_tag_repo
     assert result.content == content
     assert result.tags == tags
 
+@pytest.mark.asyncio
+async def test_update_blog_post_reuses_loaded_blog(blog_post_service, mock_blog_repo, mock_tag_repo):
+    """Test update_blog_post with an already loaded blog loads only the added tags"""
+    kept_tag = MockTag(id=1)
+    added_tag = MockTag(id=3)
+    blog = MockBlogPost(id=1, tags=[kept_tag, MockTag(id=2)])
+
+    mock_tag_repo.get_by_ids.return_value = [added_tag]
+
+    await blog_post_service.update_blog_post(blog_id=1, title="Updated Blog", content="Content", tag_ids=[1, 3], blog=blog)
+
+    mock_blog_repo.get_by_id_for_update.assert_not_called()
+    mock_tag_repo.get_by_ids.assert_called_once_with([3])
+    assert mock_blog_repo.update.call_args.args[4] == [kept_tag, added_tag]
+
 @pytest.mark.asyncio
 async def test_update_blog_post_not_found(blog_post_service, mock_blog_repo):
     """Test update_blog_post when blog does not exist"""
@@ -234,12 +285,12 @@ async def test_update_blog_post_not_found(blog_post_service, mock_blog_repo):
     image = "updated.jpg"
     tag_ids = [2, 3]
 
-    mock_blog_repo.get_by_id.return_value = None
+    mock_blog_repo.get_by_id_for_update.return_value = None
 
     with pytest.raises(BlogPostNotFoundError):
         await blog_post_service.update_blog_post(blog_id, title, content, image, tag_ids)
 
-    mock_blog_repo.get_by_id.assert_called_once_with(blog_id)
+    mock_blog_repo.get_by_id_for_update.assert_called_once_with(blog_id)
     mock_blog_repo.update.assert_not_called()
 
 @pytest.mark.asyncio
@@ -258,14 +309,14 @@ async def test_update_blog_post_with_different_author(blog_post_service, mock_bl
     existing_blog = MockBlogPost(id=blog_id, author=old_author)
     updated_blog = MockBlogPost(id=blog_id, title=title, content=content, author=new_author, tags=tags)
 
-    mock_blog_repo.get_by_id.return_value = existing_blog
+    mock_blog_repo.get_by_id_for_update.return_value = existing_blog
     mock_user_repo.get_by_id.return_value = new_author
     mock_tag_repo.get_by_ids.return_value = tags
     mock_blog_repo.update.return_value = updated_blog
 
     result = await blog_post_service.update_blog_post(blog_id=blog_id, title=title, content=content, tag_ids=tag_ids, author_id=new_author_id)
 
-    mock_blog_repo.get_by_id.assert_called_once_with(blog_id)
+    mock_blog_repo.get_by_id_for_update.assert_called_once_with(blog_id)
     mock_user_repo.get_by_id.assert_called_once_with(new_author_id)
     mock_tag_repo.get_by_ids.assert_called_once_with(tag_ids)
     blog_post_service.clean_content.assert_called_once_with(content)
@@ -287,13 +338,13 @@ async def test_update_blog_post_with_custom_date(blog_post_service, mock_blog_re
     existing_blog = MockBlogPost(id=blog_id, author=author)
     updated_blog = MockBlogPost(id=blog_id, title=title, content=content, author=author, tags=tags, created_at=custom_date)
 
-    mock_blog_repo.get_by_id.return_value = existing_blog
+    mock_blog_repo.get_by_id_for_update.return_value = existing_blog
     mock_tag_repo.get_by_ids.return_value = tags
     mock_blog_repo.update.return_value = updated_blog
 
     result = await blog_post_service.update_blog_post(blog_id=blog_id, title=title, content=content, tag_ids=tag_ids, created_at=custom_date)
 
-    mock_blog_repo.get_by_id.assert_called_once_with(blog_id)
+    mock_blog_repo.get_by_id_for_update.assert_called_once_with(blog_id)
     mock_tag_repo.get_by_ids.assert_called_once_with(tag_ids)
     blog_post_service.clean_content.assert_called_once_with(content)
     mock_blog_repo.update.assert_called_once()
@@ -305,12 +356,12 @@ async def test_delete_blog_post(blog_post_service, mock_blog_repo):
     """Test delete_blog_post method"""
     blog_id = 1
     blog = MockBlogPost(id=blog_id)
-    mock_blog_repo.get_by_id.return_value = blog
+    mock_blog_repo.get_by_id_for_update.return_value = blog
     mock_blog_repo.delete.return_value = None
 
     result = await blog_post_service.delete_blog_post(blog_id)
 
-    mock_blog_repo.get_by_id.assert_called_once_with(blog_id)
+    mock_blog_repo.get_by_id_for_update.assert_called_once_with(blog_id)
     mock_blog_repo.delete.assert_called_once_with(blog)
     assert result is None
 
@@ -318,12 +369,12 @@ async def test_delete_blog_post(blog_post_service, mock_blog_repo):
 async def test_delete_blog_post_not_found(blog_post_service, mock_blog_repo):
     """Test delete_blog_post when blog does not exist"""
     blog_id = 999
-    mock_blog_repo.get_by_id.return_value = None
+    mock_blog_repo.get_by_id_for_update.return_value = None
 
     with pytest.raises(BlogPostNotFoundError):
         await blog_post_service.delete_blog_post(blog_id)
 
-    mock_blog_repo.get_by_id.assert_called_once_with(blog_id)
+    mock_blog_repo.get_by_id_for_update.assert_called_once_with(blog_id)
     mock_blog_repo.delete.assert_not_called()
 
 def test_upload_image_none(blog_post_service):
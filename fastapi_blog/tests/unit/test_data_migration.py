@@ -0,0 +1,140 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timezone
+from fastapi_blog.accounts.models import EmailUser, pwd_context
+from fastapi_blog.blogs.models import BlogPost, BlogPostCard, BlogPostTag
+from fastapi_blog.utils import data_migration
+from fastapi_blog.utils.data_migration import convert_password_hash, migrate_data, remap_image, schema_tables
+from passlib.hash import django_pbkdf2_sha256
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+BCRYPT_HASH = pwd_context.hash("secret")
+DJANGO_HASH = django_pbkdf2_sha256.hash("secret")
+
+@pytest.mark.parametrize("image, source, target, expected", [
+    ("/media/food.jpg", "fastapi", "django", "food.jpg"),
+    ("https://res.cloudinary.com/demo/image/upload/v1/food.jpg", "flask", "django", "image/upload/v1/food.jpg"),
+    ("images/food.jpg", "django", "fastapi", "/media/images/food.jpg"),
+    ("image/upload/v1/food.jpg", "django", "flask", "https://res.cloudinary.com/demo/image/upload/v1/food.jpg"),
+    ("/media/food.jpg", "flask", "fastapi", "/media/food.jpg"),
+    (None, "django", "fastapi", None),
+])
+def test_remap_image(image, source, target, expected):
+    """Test image paths are mapped to the way the target app stores them"""
+    assert remap_image(image, source, target, cloud_name="demo") == expected
+
+def test_convert_password_hash():
+    """Test bcrypt hashes get Django's prefix and lose it again, other hashes are kept"""
+    assert convert_password_hash(BCRYPT_HASH, "django") == f"bcrypt${BCRYPT_HASH}"
+    assert convert_password_hash(f"bcrypt${BCRYPT_HASH}", "fastapi") == BCRYPT_HASH
+    assert convert_password_hash(DJANGO_HASH, "flask") == DJANGO_HASH
+
+def test_verify_migrated_django_password():
+    """Test Django's PBKDF2 hashes are verified and flagged for rehashing, unknown ones rejected"""
+    user = EmailUser(email="django@example.com", password_hash=DJANGO_HASH)
+
+    assert user.verify_password("secret") and not user.verify_password("wrong")
+    assert user.password_needs_rehash()
+    assert not EmailUser(email="bcrypt@example.com", password_hash=BCRYPT_HASH).password_needs_rehash()
+    assert not EmailUser(email="md5@example.com", password_hash="md5$salt$hash").verify_password("secret")
+
+@pytest_asyncio.fixture
+async def databases(tmp_path):
+    """A Django schema source database with data and an empty target database"""
+    source_url = f"sqlite+aiosqlite:///{tmp_path / 'source.db'}"
+    source_engine = create_async_engine(source_url)
+    tables = schema_tables("django")
+    created_at = datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc)
+
+    async with source_engine.begin() as conn:
+        await conn.run_sync(tables["users"].metadata.create_all)
+        await conn.execute(insert(tables["users"]), [
+            {"id": 3, "email": "bcrypt@example.com", "username": "bcrypt", "password": f"bcrypt${BCRYPT_HASH}",
+             "is_active": True, "is_staff": True, "created_at": created_at},
+            {"id": 5, "email": "django@example.com", "username": None, "password": DJANGO_HASH,
+             "is_active": True, "is_staff": False, "created_at": created_at},
+        ])
+        await conn.execute(insert(tables["tags"]), [
+            {"id": 2, "name": "Food", "slug": "food"},
+            {"id": 4, "name": "Tech", "slug": "tech"},
+        ])
+        await conn.execute(insert(tables["posts"]), [
+            {"id": id, "title": f"Post {id}", "content": f"<p>Post {id}</p>", "image": "images/food.jpg" if id == 10 else None,
+             "created_at": created_at, "author_id": 3 if id % 2 else 5}
+            for id in range(10, 15)
+        ])
+        await conn.execute(insert(tables["links"]), [
+            {"blogpost_id": 10, "tag_id": 2}, {"blogpost_id": 10, "tag_id": 4}, {"blogpost_id": 13, "tag_id": 4},
+        ])
+    await source_engine.dispose()
+
+    target_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'target.db'}")
+    async with target_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    yield source_url, sessionmaker(bind=target_engine, class_=AsyncSession, expire_on_commit=False)
+
+    await target_engine.dispose()
+
+@pytest.mark.asyncio
+async def test_migrate_from_django(databases):
+    """Test the data of a Django database is copied with its ids, converted and verified"""
+    source_url, Session = databases
+
+    async with Session() as session:
+        result = await migrate_data(session, source_url, "django", batch_size=2, report=lambda message: None)
+
+    assert result["copied"] == {"users": 2, "tags": 2, "posts": 5, "links": 3}
+    assert all(verification["match"] for verification in result["verification"].values())
+
+    async with Session() as session:
+        users = {user.id: user for user in (await session.exec(select(EmailUser))).all()}
+        post = await session.get(BlogPost, 10)
+        links = (await session.exec(select(BlogPostTag.blogpost_id, BlogPostTag.tag_id))).all()
+        cards = (await session.exec(select(func.count()).select_from(BlogPostCard))).one()
+
+    assert users[3].password_hash == BCRYPT_HASH and users[3].is_staff
+    assert users[5].verify_password("secret")
+    assert post.image == "/media/images/food.jpg" and post.author_id == 5
+    assert post.created_at == datetime(2024, 5, 1, 10, 0)
+    assert sorted(links) == [(10, 2), (10, 4), (13, 4)]
+    assert cards == 5
+
+@pytest.mark.asyncio
+async def test_migrate_resumes_and_detects_mismatch(databases, monkeypatch):
+    """Test a failed migration continues after its last committed batch, and verification catches changed rows"""
+    source_url, Session = databases
+    bulk_insert = data_migration.bulk_insert
+    calls = []
+
+    async def failing_bulk_insert(session, table, rows, use_copy=True):
+        calls.append(table.name)
+        if calls.count("blog_post") == 2:
+            raise RuntimeError("connection lost")
+        return await bulk_insert(session, table, rows, use_copy)
+
+    monkeypatch.setattr(data_migration, "bulk_insert", failing_bulk_insert)
+    async with Session() as session:
+        with pytest.raises(RuntimeError):
+            await migrate_data(session, source_url, "django", batch_size=2, report=lambda message: None)
+
+    monkeypatch.setattr(data_migration, "bulk_insert", bulk_insert)
+    async with Session() as session:
+        result = await migrate_data(session, source_url, "django", batch_size=2, report=lambda message: None)
+
+    assert result["copied"]["posts"] == 3
+    assert all(verification["match"] for verification in result["verification"].values())
+
+    async with Session() as session:
+        post = await session.get(BlogPost, 12)
+        post.title = "Changed"
+        await session.commit()
+
+        result = await migrate_data(session, source_url, "django", verify_only=True)
+
+    assert not result["verification"]["posts"]["match"]
+    assert result["verification"]["users"]["match"]
@@ -0,0 +1,58 @@
+import pytest
+from fastapi_blog.blogs.models import BlogPost, BlogPostCard, BlogPostTag, Tag
+from fastapi_blog.utils.dataset import DatasetGenerator
+from fastapi_blog.utils.seeds.dataset_seed import seed_dataset
+from sqlmodel import func, select
+from tests.test_utils import TestingSessionLocal
+
+def test_generator_is_deterministic():
+    """Test the same seed produces the same rows"""
+    first = DatasetGenerator(seed=7)
+    second = DatasetGenerator(seed=7)
+
+    first_posts = list(first.posts(50, 1, [1, 2, 3], [1, 2, 3, 4, 5, 6], batch_size=20))
+    second_posts = list(second.posts(50, 1, [1, 2, 3], [1, 2, 3, 4, 5, 6], batch_size=20))
+
+    assert first_posts == second_posts
+    assert [len(posts) for posts, _ in first_posts] == [20, 20, 10]
+
+def test_generator_tags_are_unique():
+    """Test generated tags skip existing names and have unique slugs"""
+    generator = DatasetGenerator(seed=1)
+
+    tags = generator.tags(100, 10, existing_names=["Python"])
+
+    assert len(tags) == 100
+    assert "Python" not in [tag["name"] for tag in tags]
+    assert len({tag["slug"] for tag in tags}) == 100
+    assert [tag["id"] for tag in tags] == list(range(10, 110))
+
+def test_generator_post_tags_are_distinct():
+    """Test every post gets between one and five distinct tags"""
+    generator = DatasetGenerator(seed=3)
+
+    for posts, links in generator.posts(200, 1, [1], list(range(1, 30))):
+        per_post = {}
+        for post_id, tag_id in links:
+            per_post.setdefault(post_id, []).append(tag_id)
+
+        assert set(per_post) == {post["id"] for post in posts}
+        assert all(1 <= len(tag_ids) <= 5 and len(set(tag_ids)) == len(tag_ids) for tag_ids in per_post.values())
+
+@pytest.mark.asyncio
+async def test_seed_dataset(setup_test_db):
+    """Test seed_dataset bulk loads posts and links after the existing rows"""
+    async with TestingSessionLocal() as session:
+        created = await seed_dataset(session, DatasetGenerator(seed=5), users=5, tags=6, posts=120, batch_size=50)
+
+        post_count = (await session.exec(select(func.count()).select_from(BlogPost))).one()
+        link_count = (await session.exec(select(func.count()).select_from(BlogPostTag))).one()
+        tag_count = (await session.exec(select(func.count()).select_from(Tag))).one()
+        card_count = (await session.exec(select(func.count()).select_from(BlogPostCard))).one()
+
+    assert created["users"] == 5
+    assert created["posts"] == 120
+    assert post_count == 7 + 120
+    assert tag_count == 6
+    assert link_count == 8 + created["links"]
+    assert card_count == post_count
@@ -0,0 +1,40 @@
+from fastapi_blog.blogs.suggest import TitleIndex
+
+TITLES = [(1, "Cooking pasta at home"), (2, "Pasta or pizza?"), (3, "Home office setup"), (4, "Cooking for one")]
+
+def test_search_matches_word_prefixes():
+    """Test every query word has to start a title word, the matches of a word newest first"""
+    index = TitleIndex()
+    index.add_many(TITLES)
+
+    assert index.search("pas") == [(2, "Pasta or pizza?"), (1, "Cooking pasta at home")]
+    assert index.search("Cook HO") == [(1, "Cooking pasta at home")]
+    assert index.search("ome") == []
+    assert index.search("  ") == []
+    assert index.search("co", limit=1) == [(4, "Cooking for one")]
+    assert index.last_id == 4
+
+def test_bulk_and_incremental_adds_agree():
+    """Test titles merged in bulk and added one by one are found the same way, edits and removals included"""
+    bulk, incremental = TitleIndex(), TitleIndex()
+    rows = [(id, f"Post {id} about {'pasta' if id % 2 else 'pizza'}") for id in range(1, 301)]
+    bulk.add_many(rows)
+    for id, title in rows:
+        incremental.add(id, title)
+
+    for index in (bulk, incremental):
+        index.add(7, "Renamed post")
+        index.remove(9)
+
+    for query in ["pasta", "pi", "post 1", "renamed", "about pas"]:
+        assert bulk.search(query, limit=20) == incremental.search(query, limit=20)
+    assert bulk.search("renamed") == [(7, "Renamed post")]
+    assert (9, "Post 9 about pasta") not in bulk.search("pasta", limit=200)
+
+def test_search_scans_at_most_the_limit():
+    """Test a query scans the posts of its rarest word, at most `scan_limit` of them"""
+    index = TitleIndex(scan_limit=10)
+    index.add_many([(id, "Common words") for id in range(1, 101)] + [(101, "Common rare words")])
+
+    assert index.search("common rare") == [(101, "Common rare words")]
+    assert len(index.search("common", limit=50)) == 10
@@ -5,12 +5,19 @@ from dotenv import load_dotenv
 from flask import Flask, send_from_directory
 from flask_admin import Admin
 from flask_blog.accounts.commands import register_commands
+from flask_blog.blogs.commands import register_commands as register_blog_commands
 from flask_blog.container import container
 from flask_blog.accounts.models import EmailUser
 from flask_blog.admin import AdminModelView, MyAdminIndexView
-from flask_blog.blogs.admin import BlogPostAdminView
+from flask_blog.blogs.admin import BlogPostAdminView, ExportBlogPostsAdminView, ImportBlogPostsAdminView
 from flask_blog.blogs.models import BlogPost, Tag
+from flask_blog.blogs.view_counts import view_counter
 from flask_blog.extensions import login_manager, db, migrate, bcrypt, csrf, seeder
+from flask_blog.monitoring.admin import ProfilesAdminView
+from flask_blog.monitoring.metrics import register_metrics
+from flask_blog.monitoring.profiling import register_profiling
+from flask_blog.monitoring.queries import register_query_monitoring
+from flask_blog.monitoring.timing import register_server_timing, timed
 from flask_blog.accounts.admin import EmailUserAdminView
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,7 +40,11 @@ def create_app(config_name = None):
 
         @app.route('/media/<path:filename>')
         def uploaded_file(filename):
-            return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+            # Images are never overwritten, and stored ones are named by their content
+            response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=app.config['MEDIA_CACHE_SECONDS'])
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
 
     app.static_folder = app.config["STATIC_FOLDER"]
 
@@ -45,6 +56,13 @@ def create_app(config_name = None):
     bcrypt.init_app(app)
     csrf.init_app(app)
     seeder.init_app(app, db)
+    view_counter.init_app(app)
+
+    # Monitoring
+    register_query_monitoring(app)
+    register_server_timing(app)
+    register_metrics(app)
+    register_profiling(app)
 
     # Blueprints
     from flask_blog.accounts.views import accounts_bp
@@ -57,14 +75,19 @@ def create_app(config_name = None):
     admin.add_view(EmailUserAdminView(EmailUser, db.session))
     admin.add_view(BlogPostAdminView(BlogPost, db.session, blog_service=container.blog_service))
     admin.add_view(AdminModelView(Tag, db.session))
+    admin.add_view(ImportBlogPostsAdminView(name="Import BlogPosts", endpoint="import_blogs"))
+    admin.add_view(ExportBlogPostsAdminView(name="Export BlogPosts", endpoint="export_blogs"))
+    admin.add_view(ProfilesAdminView(name="Profiles", endpoint="profiles"))
 
     login_manager.login_view = "accounts.login"
     login_manager.login_message_category = "danger"
 
     # CLI commands
     register_commands(app)
+    register_blog_commands(app)
 
     @login_manager.user_loader
+    @timed("auth")
     def load_user(user_id):
         return container.user_repo.get_by_id(user_id)
 
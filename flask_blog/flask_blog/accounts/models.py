@@ -1,11 +1,24 @@
+import base64
+import hashlib
+import hmac
 from datetime import datetime, timezone
 from typing import Optional
 from sqlalchemy import String, Boolean, DateTime
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 from flask_blog.extensions import bcrypt, db
+from flask_blog.monitoring.timing import timed
 from flask_login import UserMixin
 
+# Prefix of Django's PBKDF2 hashes, kept for users migrated from the Django app until they log in
+DJANGO_PBKDF2_PREFIX = "pbkdf2_sha256$"
+
+def check_django_password(password_hash: str, password: str) -> bool:
+    """Checks a password against a Django PBKDF2 hash"""
+    _, iterations, salt, expected = password_hash.split("$", 3)
+    derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), int(iterations))
+    return hmac.compare_digest(base64.b64encode(derived).decode("ascii"), expected)
+
 class EmailUser(UserMixin, db.Model):
     __tablename__ = 'email_user'
 
@@ -24,10 +37,20 @@ class EmailUser(UserMixin, db.Model):
     def __repr__(self):
         return self.email
 
+    @timed("password")
     def set_password(self, password: str):
         """Hashes and sets the password"""
         self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
 
+    @timed("password")
     def check_password(self, password: str):
         """Checks the password hash"""
-        return bcrypt.check_password_hash(self.password_hash, password)
\ No newline at end of file
+        if self.password_hash.startswith(DJANGO_PBKDF2_PREFIX):
+            return check_django_password(self.password_hash, password)
+        if not self.password_hash.startswith("$2"):
+            return False
+        return bcrypt.check_password_hash(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Whether the password hash is in a format that is only verified"""
+        return self.password_hash.startswith(DJANGO_PBKDF2_PREFIX)
\ No newline at end of file
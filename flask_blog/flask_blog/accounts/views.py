@@ -20,6 +20,9 @@ def login():
             user = user_service.get_user_by_email(form.email.data)
 
             if user and user.check_password(form.password.data):
+                if user.password_needs_rehash():
+                    user_service.rehash_password(user, form.password.data)
+
                 login_user(user)
                 
                 flash("Login successful.", "success")
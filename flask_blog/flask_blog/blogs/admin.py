@@ -1,9 +1,24 @@
+import os
+import uuid
+from pathlib import Path
 from typing import Any
+from flask import Response, abort, current_app, flash, redirect, request, stream_with_context, url_for
+from flask_admin import BaseView, expose
 from flask_blog.admin import AdminModelView
+from flask_blog.blogs.jobs import IMPORT_BLOGS
+from flask_blog.blogs.models import BlogImport, Job
+from flask_blog.extensions import db
+from flask_blog.repositories.job_repository import JobRepository
 from flask_blog.services.blog_post_service import BlogPostService
+from flask_blog.utils.blog_export import EXPORT_FORMATS, EXPORT_MIMETYPES, stream_export
+from flask_login import current_user
 from flask_wtf.file import FileField, FileAllowed
+from sqlalchemy import select
 from wtforms import Form
 
+# Imports listed on the import page, waiting and done
+RECENT_IMPORTS = 10
+
 class BlogPostAdminView(AdminModelView):
     column_list = ("title", "author", "tags", "created_at")
     
@@ -39,4 +54,63 @@ class BlogPostAdminView(AdminModelView):
         if file and hasattr(file, 'filename') and file.filename:
             model.image = self.blog_service.upload_image(file)
         
-        super(BlogPostAdminView, self).on_model_change(form, model, is_created)
\ No newline at end of file
+        super(BlogPostAdminView, self).on_model_change(form, model, is_created)
+
+class ImportBlogPostsAdminView(BaseView):
+    """
+    Imports an uploaded NDJSON or CSV file of blog posts like the
+    `import-blogs` command. The file is stored and imported by the
+    `import_blogs` job, the page shows the progress of the recent imports.
+    Uploading an interrupted file again resumes it.
+    """
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.is_staff
+
+    def inaccessible_callback(self, name: str, **kwargs):
+        flash("You must be logged in to access the admin panel.", "danger")
+        return redirect(url_for("accounts.login", next=request.url))
+
+    @expose("/", methods=["GET", "POST"])
+    def index(self):
+        upload = request.files.get("file")
+        if request.method == "POST":
+            if upload and upload.filename:
+                folder = Path(current_app.config["IMPORT_FOLDER"])
+                folder.mkdir(parents=True, exist_ok=True)
+                path = folder / f"{uuid.uuid4()}{os.path.splitext(upload.filename)[1]}"
+                upload.save(path)
+                JobRepository().enqueue(IMPORT_BLOGS, {"path": str(path), "file_name": upload.filename})
+                flash(f"{upload.filename} is imported in the background.", "success")
+
+            return redirect(url_for(".index"))
+
+        jobs = db.session.scalars(select(Job).filter_by(name=IMPORT_BLOGS).order_by(Job.id.desc()).limit(RECENT_IMPORTS)).all()
+        imports = db.session.scalars(select(BlogImport).order_by(BlogImport.started_at.desc()).limit(RECENT_IMPORTS)).all()
+
+        return self.render("admin/import_blogs.html", jobs=jobs, imports=imports)
+
+class ExportBlogPostsAdminView(BaseView):
+    """
+    Streams all blog posts as NDJSON or CSV (`?format=csv`), linked from the import page.
+    """
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.is_staff
+
+    def is_visible(self):
+        return False
+
+    def inaccessible_callback(self, name: str, **kwargs):
+        flash("You must be logged in to access the admin panel.", "danger")
+        return redirect(url_for("accounts.login", next=request.url))
+
+    @expose("/")
+    def index(self):
+        format = request.args.get("format", "ndjson")
+        if format not in EXPORT_FORMATS:
+            abort(400)
+
+        return Response(
+            stream_with_context(stream_export(format, current_app.config["EXPORT_CHUNK_SIZE"])),
+            mimetype=EXPORT_MIMETYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="blog_posts.{format}"'},
+        )
@@ -0,0 +1,227 @@
+import os
+import signal
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_blog.accounts.models import EmailUser
+from flask_blog.blogs.media import prune_media
+from flask_blog.blogs.models import BlogPost, Tag, blogpost_tags
+from flask_blog.extensions import bcrypt, db
+from flask_blog.jobs import JobRunner
+from flask_blog.utils.blog_export import EXPORT_FORMATS, stream_export
+from flask_blog.utils.blog_import import IMPORT_FORMATS, detect_format, import_blog_posts
+from flask_blog.utils.bulk import bulk_insert, reset_sequences
+from flask_blog.utils.data_migration import APPS, migrate_data
+from flask_blog.utils.dataset import DatasetGenerator
+from flask_blog.utils.static_site import build_site
+from sqlalchemy import func, select
+
+def seed_dataset(
+    generator: DatasetGenerator,
+    users: int = 10_000,
+    tags: int = 200,
+    posts: int = 1_000_000,
+    batch_size: int = 5000,
+    use_copy: bool = True,
+):
+    """
+    Bulk loads a generated dataset, committing after every batch of posts.
+
+    Args:
+        generator (DatasetGenerator): The generator producing the rows.
+        users (int, optional): Number of users to create.
+        tags (int, optional): Total number of tags the posts are spread over, existing tags included.
+        posts (int, optional): Number of blog posts to create.
+        batch_size (int, optional): Number of rows written per round trip.
+        use_copy (bool, optional): Whether to use COPY on PostgreSQL.
+
+    Returns:
+        dict: Number of created users, tags, posts and post-tag links.
+    """
+    created = {"users": 0, "tags": 0, "posts": 0, "links": 0}
+    started = time.perf_counter()
+
+    next_user_id = (db.session.execute(select(func.max(EmailUser.id))).scalar() or 0) + 1
+    next_tag_id = (db.session.execute(select(func.max(Tag.id))).scalar() or 0) + 1
+    next_post_id = (db.session.execute(select(func.max(BlogPost.id))).scalar() or 0) + 1
+
+    # Hashing is deliberately slow, so every generated user shares one hash
+    password_hash = bcrypt.generate_password_hash("Password123").decode("utf-8")
+    user_rows = generator.users(users, next_user_id, password_hash)
+    for start in range(0, len(user_rows), batch_size):
+        created["users"] += bulk_insert(EmailUser.__table__, user_rows[start:start + batch_size], use_copy)
+
+    existing_tags = db.session.execute(select(Tag.id, Tag.name)).all()
+    tag_rows = generator.tags(max(0, tags - len(existing_tags)), next_tag_id, [tag.name for tag in existing_tags])
+    created["tags"] = bulk_insert(Tag.__table__, tag_rows, use_copy)
+    db.session.commit()
+
+    author_ids = [row["id"] for row in user_rows] or db.session.execute(select(EmailUser.id)).scalars().all()
+    tag_ids = [tag.id for tag in existing_tags] + [row["id"] for row in tag_rows]
+
+    if not author_ids or not tag_ids:
+        click.echo("Error: Need users and tags before creating blog posts")
+        return created
+
+    for post_rows, links in generator.posts(posts, next_post_id, author_ids, tag_ids, batch_size):
+        created["posts"] += bulk_insert(BlogPost.__table__, post_rows, use_copy)
+        created["links"] += bulk_insert(
+            blogpost_tags,
+            [{"blogpost_id": post_id, "tag_id": tag_id} for post_id, tag_id in links],
+            use_copy,
+        )
+        db.session.commit()
+
+        elapsed = time.perf_counter() - started
+        click.echo(f"Created {created['posts']}/{posts} blog posts ({created['posts'] / elapsed:.0f} posts/s).")
+
+    reset_sequences([EmailUser.__table__, Tag.__table__, BlogPost.__table__])
+    db.session.commit()
+
+    return created
+
+@click.command("generate-dataset")
+@click.option("--users", default=10_000, help="Number of users to create")
+@click.option("--tags", default=200, help="Total number of tags, existing tags included")
+@click.option("--posts", default=1_000_000, help="Number of blog posts to create")
+@click.option("--batch-size", default=5000, help="Rows written per round trip")
+@click.option("--seed", default=42, help="Seed making the dataset reproducible")
+@click.option("--no-copy", is_flag=True, help="Use batched INSERTs instead of COPY on PostgreSQL")
+@with_appcontext
+def generate_dataset(users: int, tags: int, posts: int, batch_size: int, seed: int, no_copy: bool):
+    """Generates a high-volume synthetic dataset for load and scaling tests."""
+    created = seed_dataset(
+        DatasetGenerator(seed=seed),
+        users=users,
+        tags=tags,
+        posts=posts,
+        batch_size=batch_size,
+        use_copy=not no_copy,
+    )
+
+    click.echo(f"Created {created['users']} users, {created['tags']} tags, {created['posts']} blog posts and {created['links']} tag links.")
+
+@click.command("import-blogs")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", type=click.Choice(IMPORT_FORMATS), help="File format, detected from the extension by default")
+@click.option("--batch-size", type=int, help="Records written per batch and commit")
+@click.option("--workers", type=int, help="Processes sanitizing the content, defaults to the CPU count")
+@click.option("--no-copy", is_flag=True, help="Use batched INSERTs instead of COPY on PostgreSQL")
+@with_appcontext
+def import_blogs(file: str, format: str, batch_size: int, workers: int, no_copy: bool):
+    """Imports blog posts from an NDJSON or CSV file, resuming an interrupted import of the same file."""
+    result = import_blog_posts(
+        file,
+        format=format,
+        batch_size=batch_size or current_app.config["IMPORT_BATCH_SIZE"],
+        workers=workers or current_app.config["IMPORT_WORKERS"],
+        use_copy=not no_copy,
+        report=click.echo,
+    )
+
+    for error in result["errors"]:
+        click.echo(error)
+    click.echo(f"Imported {result['imported']} blog posts and skipped {result['skipped']} of {result['records']} records.")
+
+@click.command("export-blogs")
+@click.argument("file")
+@click.option("--format", type=click.Choice(EXPORT_FORMATS), help="File format, detected from the extension by default")
+@click.option("--chunk-size", type=int, help="Posts read per query")
+@with_appcontext
+def export_blogs(file: str, format: str, chunk_size: int):
+    """Exports all blog posts as NDJSON or CSV to a file, or to stdout with -."""
+    with click.open_file(file, "w", encoding="utf-8") as output:
+        for piece in stream_export(format or detect_format(file), chunk_size or current_app.config["EXPORT_CHUNK_SIZE"]):
+            output.write(piece)
+
+@click.command("migrate-data")
+@click.argument("source_app", type=click.Choice(APPS))
+@click.argument("source_url")
+@click.option("--batch-size", type=int, default=1000, help="Rows read and written per batch and commit")
+@click.option("--no-copy", is_flag=True, help="Use batched INSERTs instead of COPY on PostgreSQL")
+@click.option("--media-url", default="/media/", help="URL prefix of the locally stored images")
+@click.option("--cloud-name", default=lambda: os.getenv("CLOUDINARY_CLOUD_NAME"), help="Cloudinary cloud name of the Django images")
+@click.option("--verify-only", is_flag=True, help="Only compare the row counts and checksums of the databases")
+@with_appcontext
+def migrate_data_command(
+    source_app: str,
+    source_url: str,
+    batch_size: int,
+    no_copy: bool,
+    media_url: str,
+    cloud_name: str,
+    verify_only: bool,
+):
+    """Copies the users, tags and blog posts of another app's database into this app's database."""
+    result = migrate_data(
+        source_url,
+        source_app,
+        batch_size=batch_size,
+        use_copy=not no_copy,
+        media_url=media_url,
+        cloud_name=cloud_name,
+        verify_only=verify_only,
+        report=click.echo,
+    )
+
+    for kind, verification in result["verification"].items():
+        status = "OK" if verification["match"] else "MISMATCH"
+        click.echo(f"{kind}: {verification['source']} in the source, {verification['target']} in the target, {status}")
+
+    if not all(verification["match"] for verification in result["verification"].values()):
+        raise click.ClickException("The target database doesn't match the source.")
+
+@click.command("build-static")
+@click.argument("output_dir", type=click.Path(file_okay=False))
+@click.option("--base-url", default="http://localhost", help="URL the site is served at")
+@click.option("--workers", type=int, default=lambda: os.cpu_count(), help="Processes rendering the pages")
+@click.option("--full", is_flag=True, help="Render every page instead of only the changed ones")
+@click.option("--chunk-size", type=int, help="Posts read per query")
+@with_appcontext
+def build_static(output_dir: str, base_url: str, workers: int, full: bool, chunk_size: int):
+    """Renders the public pages to static HTML files, only the changed ones after the first build."""
+    result = build_site(
+        current_app._get_current_object(),
+        output_dir,
+        base_url,
+        current_app.config["STATIC_FOLDER"],
+        workers=workers,
+        full=full,
+        chunk_size=chunk_size or current_app.config["EXPORT_CHUNK_SIZE"],
+    )
+
+    click.echo(f"Rendered {result['rendered']} of {result['pages']} pages and removed {result['removed']}.")
+
+@click.command("run-jobs")
+@click.option("--concurrency", type=int, help="Jobs run at once, JOB_CONCURRENCY by default")
+@click.option("--once", is_flag=True, help="Run the due jobs and exit")
+@with_appcontext
+def run_jobs(concurrency: int, once: bool):
+    """Runs the background jobs until stopped, finishing the running ones on SIGTERM."""
+    runner = JobRunner(current_app._get_current_object(), concurrency=concurrency)
+    if once:
+        click.echo(f"Ran {runner.run_pending()} jobs.")
+        return
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: runner.stopped.set())
+
+    click.echo(f"Running jobs in {runner.concurrency} threads.")
+    runner.run_forever()
+
+@click.command("prune-media")
+@click.option("--grace", type=float, help="Seconds an unused image is kept, MEDIA_PRUNE_SECONDS by default")
+@with_appcontext
+def prune_media_command(grace: float):
+    """Removes the locally stored images no blog post uses."""
+    click.echo(f"Removed {prune_media(grace)} unused images.")
+
+def register_commands(app):
+    app.cli.add_command(generate_dataset)
+    app.cli.add_command(import_blogs)
+    app.cli.add_command(export_blogs)
+    app.cli.add_command(migrate_data_command)
+    app.cli.add_command(build_static)
+    app.cli.add_command(run_jobs)
+    app.cli.add_command(prune_media_command)
@@ -0,0 +1,150 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+import cloudinary
+import cloudinary.api
+import cloudinary.exceptions
+import cloudinary.uploader
+import cloudinary.utils
+from flask import current_app
+from flask_blog.blogs.exceptions import InvalidUploadError
+from flask_blog.blogs.media import store_media
+
+# A key issued by `upload_policy`, its nonce followed by the start of its signature
+KEY_PATTERN = re.compile(r"^uploads/(?P<nonce>[0-9a-f]{32})-(?P<signature>[0-9a-f]{16})(?P<extension>\.[a-z]+)?$")
+
+def sign(message: str) -> str:
+    return hmac.new(current_app.config["SECRET_KEY"].encode(), message.encode(), hashlib.sha256).hexdigest()
+
+def new_key(extension: str) -> str:
+    """
+    Returns a new key to store an image under. It carries its own signature,
+    so a form can't attach an image the app didn't issue the key of.
+    """
+    nonce = uuid.uuid4().hex
+    key = f"uploads/{nonce}-{sign(nonce)[:16]}"
+    # Cloudinary adds the format of the image to its public id itself
+    return key + extension if current_app.config["USE_LOCAL_STORAGE"] else key
+
+def upload_policy(filename: str, local_url: str) -> dict:
+    """
+    Signs the upload of an image from the browser straight to the storage,
+    so the bytes don't pass through the app. With Cloudinary, these are the
+    parameters of a signed upload, which Cloudinary accepts for an hour.
+    Stored locally, it is an S3 style POST policy for the `local_url` stand-in,
+    valid for `DIRECT_UPLOAD_EXPIRES` seconds and up to `MAX_UPLOAD_SIZE` bytes.
+
+    Args:
+        filename (str): The name of the file to upload, only its extension is used.
+        local_url (str): The URL of the local stand-in of the storage.
+
+    Raises:
+        InvalidUploadError: If the file is not an allowed image type.
+
+    Returns:
+        dict: The `url` to post the file to, with the form `fields` to post along, and the `key` of the image.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension[1:] not in current_app.config["ALLOWED_EXTENSIONS"]:
+        raise InvalidUploadError("Invalid file type. Only JPG, PNG, and JPEG allowed.")
+
+    key = new_key(extension)
+
+    if not current_app.config["USE_LOCAL_STORAGE"]:
+        config = cloudinary.config()
+        params = {"public_id": key, "timestamp": int(time.time()), "allowed_formats": "jpg,png"}
+        return {
+            "url": f"https://api.cloudinary.com/v1_1/{config.cloud_name}/image/upload",
+            "fields": {**params, "api_key": config.api_key, "signature": cloudinary.utils.api_sign_request(params, config.api_secret)},
+            "key": key,
+        }
+
+    policy = base64.b64encode(json.dumps({
+        "key": key,
+        "expires": int(time.time()) + current_app.config["DIRECT_UPLOAD_EXPIRES"],
+        "max_bytes": current_app.config["MAX_UPLOAD_SIZE"],
+    }).encode()).decode()
+
+    return {"url": local_url, "fields": {"key": key, "policy": policy, "signature": sign(policy)}, "key": key}
+
+def check_policy(key: str, policy: str, signature: str) -> int:
+    """
+    Checks an upload to the local stand-in was signed by `upload_policy`,
+    for this key and not long ago.
+
+    Raises:
+        InvalidUploadError: If the signature, the key or the expiry of the policy doesn't match.
+
+    Returns:
+        int: The most bytes the policy allows to store.
+    """
+    if not hmac.compare_digest(sign(policy), signature):
+        raise InvalidUploadError("Invalid upload signature.")
+
+    try:
+        conditions = json.loads(base64.b64decode(policy, validate=True))
+    except (binascii.Error, ValueError):
+        raise InvalidUploadError("Invalid upload policy.")
+
+    if conditions["key"] != key:
+        raise InvalidUploadError("The upload policy is for another key.")
+    if conditions["expires"] < time.time():
+        raise InvalidUploadError("The upload policy expired.")
+
+    return conditions["max_bytes"]
+
+def verify_upload(key: str) -> str:
+    """
+    Checks an image the browser uploaded with a policy of `upload_policy`
+    before it is attached to a post. The key must carry its signature, and
+    the stored image its size limit, read from the metadata of the storage
+    without fetching the image. An image over the limit is deleted. Stored
+    locally, the image is moved to its place by `store_media`, so it is
+    counted and pruned like the images posted with a form.
+
+    Raises:
+        InvalidUploadError: If the key wasn't issued by the app, or its image is missing or too large.
+
+    Returns:
+        str: The URL of the image.
+    """
+    match = KEY_PATTERN.match(key)
+    if not match or not hmac.compare_digest(sign(match["nonce"])[:16], match["signature"]):
+        raise InvalidUploadError("Invalid upload key.")
+
+    if not current_app.config["USE_LOCAL_STORAGE"]:
+        try:
+            resource = cloudinary.api.resource(key)
+        except cloudinary.exceptions.NotFound:
+            raise InvalidUploadError("The uploaded image was not found.")
+        size, url = resource["bytes"], resource["secure_url"]
+    else:
+        path = Path(current_app.config["UPLOAD_FOLDER"]) / key
+        if not path.is_file():
+            raise InvalidUploadError("The uploaded image was not found.")
+        size, url = path.stat().st_size, None
+
+    if size > current_app.config["MAX_UPLOAD_SIZE"]:
+        delete_upload(key)
+        raise InvalidUploadError("The image is too large.")
+
+    if current_app.config["USE_LOCAL_STORAGE"]:
+        # The key may be posted to again until its policy expires, the content addressed copy never changes
+        with open(path, "rb") as file:
+            url = f"/media/{store_media(file, path.suffix)}"
+        path.unlink()
+
+    return url
+
+def delete_upload(key: str):
+    if current_app.config["USE_LOCAL_STORAGE"]:
+        (Path(current_app.config["UPLOAD_FOLDER"]) / key).unlink(missing_ok=True)
+    else:
+        cloudinary.uploader.destroy(key)
@@ -0,0 +1,28 @@
+import base64
+import json
+from datetime import datetime
+from flask_blog.blogs.exceptions import InvalidFeedCursorError
+from typing import List, NamedTuple, Optional
+
+class FeedCursor(NamedTuple):
+    """
+    Position in the infinite-scroll feed: the last blog read and the filters
+    it was read with. It is handed out as an opaque token, so the URL of every
+    batch is fixed and can be cached.
+    """
+    created_at: datetime
+    id: int
+    tag_slugs: List[str]
+    search: Optional[str]
+
+    def encode(self) -> str:
+        data = json.dumps([self.created_at.isoformat(), self.id, self.tag_slugs, self.search], separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "FeedCursor":
+        try:
+            created_at, id, tag_slugs, search = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            return cls(datetime.fromisoformat(created_at), int(id), [str(slug) for slug in tag_slugs], search and str(search))
+        except (ValueError, TypeError) as e:
+            raise InvalidFeedCursorError() from e
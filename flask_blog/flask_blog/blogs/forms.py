@@ -1,6 +1,6 @@
 from flask_blog.services.tag_service import TagService
 from flask_wtf import FlaskForm
-from wtforms import Field, FileField, StringField, TextAreaField, SelectMultipleField, ValidationError
+from wtforms import Field, FileField, HiddenField, StringField, TextAreaField, SelectMultipleField, ValidationError
 from wtforms.widgets import ListWidget, CheckboxInput
 from wtforms.validators import DataRequired, Length
 from flask_wtf.file import FileAllowed
@@ -13,6 +13,8 @@ class BlogPostForm(FlaskForm):
     title = StringField("Title", validators=[DataRequired(), Length(max=255)])
     tags = MultiCheckboxField("Tags", coerce=int)
     image = FileField("Image", validators=[FileAllowed(["jpg", "png", "jpeg"], "Images only!")])
+    # The key of an image the browser uploaded straight to the storage, see `blogs/direct_uploads.py`
+    image_key = HiddenField()
     content = TextAreaField("Content")
 
     def __init__(self, tag_service: TagService, *args, **kwargs):
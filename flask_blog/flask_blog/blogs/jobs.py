@@ -0,0 +1,53 @@
+from pathlib import Path
+import cloudinary.uploader
+from flask import current_app
+from flask_blog.blogs.models import BlogPost
+from flask_blog.extensions import db
+from flask_blog.jobs import job
+from flask_blog.monitoring.metrics import observe_upload
+
+UPLOAD_IMAGE = "upload_image"
+IMPORT_BLOGS = "import_blogs"
+
+@job(UPLOAD_IMAGE)
+def upload_image(payload: dict):
+    """
+    Uploads an image staged by `BlogPostService.stage_image` to Cloudinary
+    and sets it as the image of its post. The staged file is removed once
+    the post is committed, a run that finds no file has nothing left to do.
+    """
+    path = Path(payload["path"])
+    if not path.exists():
+        return
+
+    blog = db.session.get(BlogPost, payload["blog_id"])
+    if blog is not None:
+        with observe_upload("cloudinary", path.stat().st_size):
+            upload_result = cloudinary.uploader.upload(str(path))
+        blog.image = upload_result["secure_url"]
+        db.session.commit()
+
+    path.unlink()
+
+@job(IMPORT_BLOGS)
+def import_blogs(payload: dict):
+    """
+    Imports a file of blog posts uploaded in the admin, its progress is kept
+    in its `BlogImport` row. A run after a failure resumes the import after
+    its last committed batch. The file is removed once it is imported.
+    """
+    # Imported here, the import sanitizes with the blog post service, which enqueues the jobs of this module
+    from flask_blog.utils.blog_import import import_blog_posts
+
+    path = Path(payload["path"])
+    if not path.exists():
+        return
+
+    import_blog_posts(
+        path,
+        file_name=payload["file_name"],
+        batch_size=current_app.config["IMPORT_BATCH_SIZE"],
+        workers=current_app.config["IMPORT_WORKERS"],
+        report=current_app.logger.info,
+    )
+    path.unlink()
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import BinaryIO, Optional
+from flask import current_app
+from flask_blog.blogs.models import MEDIA_KEY_PATTERN, BlogPost, MediaFile
+from flask_blog.extensions import db
+from sqlalchemy import delete, or_, select
+
+# Bytes read and hashed at a time while an image is stored
+CHUNK_SIZE = 64 * 1024
+
+# Prefix of the files an image is written to before it is named by its hash
+TEMP_PREFIX = ".upload-"
+
+def store_media(file: BinaryIO, extension: str) -> str:
+    """
+    Stores an image in the upload folder under the SHA-256 of its content,
+    hashed while it is copied, so it is read once. An image stored before
+    is kept instead of a second copy, and posts using the same image share
+    the file.
+
+    Args:
+        file (BinaryIO): The image, read from its current position.
+        extension (str): The extension of the stored file, like `.png`.
+
+    Returns:
+        str: The key of the image, its name in the upload folder.
+    """
+    folder = Path(current_app.config["UPLOAD_FOLDER"])
+    os.makedirs(folder, exist_ok=True)
+
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=folder, prefix=TEMP_PREFIX, delete=False) as temp:
+        try:
+            while chunk := file.read(CHUNK_SIZE):
+                digest.update(chunk)
+                temp.write(chunk)
+        except BaseException:
+            os.unlink(temp.name)
+            raise
+
+    extension = extension.lower() if re.fullmatch(r"\.[a-zA-Z0-9]+", extension) else ""
+    key = digest.hexdigest() + extension
+    path = folder / key
+
+    if path.exists():
+        os.unlink(temp.name)
+        # Touched, so a pending prune doesn't take an image that is being used again
+        os.utime(path)
+    else:
+        os.replace(temp.name, path)
+
+    return key
+
+def prune_media(grace: Optional[float] = None, batch_size: int = 1000) -> int:
+    """
+    Removes the stored images no post uses, once they are older than the
+    grace period, so an image being attached to a post isn't taken from it.
+    An image is kept while its reference count is positive, or when a post
+    written around the counts, e.g. by a bulk import, still links it. Also
+    removes the temporary files of uploads that never finished, and the
+    direct uploads never attached to a post.
+
+    Args:
+        grace (float, optional): Seconds an unused image is kept, `MEDIA_PRUNE_SECONDS` by default.
+        batch_size (int, optional): Images checked per query.
+
+    Returns:
+        int: The number of removed images.
+    """
+    grace = current_app.config["MEDIA_PRUNE_SECONDS"] if grace is None else grace
+    cutoff = time.time() - grace
+    folder = Path(current_app.config["UPLOAD_FOLDER"])
+    if not folder.is_dir():
+        return 0
+
+    unused = []
+    for entry in os.scandir(folder):
+        if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+            continue
+        if entry.name.startswith(TEMP_PREFIX):
+            os.unlink(entry.path)
+        elif MEDIA_KEY_PATTERN.match(entry.name):
+            unused.append(entry.name)
+
+    # Attached direct uploads are moved to their content addressed key, older posts may still link one by its upload key
+    uploads = folder / "uploads"
+    if uploads.is_dir():
+        unused.extend(
+            f"uploads/{entry.name}" for entry in os.scandir(uploads) if entry.is_file() and entry.stat().st_mtime < cutoff
+        )
+
+    counted_before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=grace)
+    pruned = []
+    for start in range(0, len(unused), batch_size):
+        keys = unused[start:start + batch_size]
+        used = set(db.session.execute(
+            select(MediaFile.key).where(
+                MediaFile.key.in_(keys), or_(MediaFile.ref_count > 0, MediaFile.updated_at >= counted_before)
+            )
+        ).scalars())
+        used.update(image.removeprefix("/media/") for image in db.session.execute(
+            select(BlogPost.image).where(BlogPost.image.in_([f"/media/{key}" for key in keys]))
+        ).scalars())
+        pruned.extend(key for key in keys if key not in used)
+
+    # The counts of the pruned images are among these
+    db.session.execute(delete(MediaFile).where(MediaFile.ref_count <= 0, MediaFile.updated_at < counted_before))
+    db.session.commit()
+
+    removed = 0
+    for key in pruned:
+        path = folder / key
+        # An image stored again since it was checked is about to be used
+        if path.exists() and path.stat().st_mtime < cutoff:
+            path.unlink()
+            removed += 1
+
+    return removed
@@ -1,8 +1,12 @@
+import re
+from collections import Counter
 from datetime import datetime, timezone
+from itertools import chain
 from typing import Optional, List
 from flask_blog.extensions import db
-from sqlalchemy import DateTime, ForeignKey, String, Text, event
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import JSON, Connection, DateTime, ForeignKey, Index, String, Text, event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 from slugify import slugify
 from flask_blog.accounts.models import EmailUser
 
@@ -29,16 +33,147 @@ def generate_slug(mapper, connection, target):
 
 class BlogPost(db.Model):
     __tablename__ = "blog_post"
+    # Order of the blog lists and the feed, whose batches are read by position in it
+    # and of the popular blogs, read from the end of the views index
+    __table_args__ = (
+        Index("ix_blog_post_created_at_id", "created_at", "id"),
+        Index("ix_blog_post_views_id", "views", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(255))
     content: Mapped[str] = mapped_column(Text)
     image: Mapped[Optional[str]] = mapped_column(String(255))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Only ever increased by the flushes of `blogs/view_counts.py`
+    views: Mapped[int] = mapped_column(default=0, server_default="0")
 
     tags: Mapped[List[Tag]] = relationship("Tag", secondary=blogpost_tags, backref="blog_posts")
     author_id: Mapped[int] = mapped_column(ForeignKey("email_user.id"))
     author: Mapped["EmailUser"] = relationship("EmailUser", backref="blog_posts")
 
     def __repr__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+class BlogImport(db.Model):
+    """
+    Progress of a bulk import of blog posts. It is updated in the transaction
+    of every imported batch, so an interrupted import resumes after the last
+    committed batch.
+    """
+    __tablename__ = "blog_import"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    checksum: Mapped[str] = mapped_column(String(64), unique=True)
+    file_name: Mapped[str] = mapped_column(String(255))
+    records: Mapped[int] = mapped_column(default=0)
+    imported: Mapped[int] = mapped_column(default=0)
+    skipped: Mapped[int] = mapped_column(default=0)
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+class Job(db.Model):
+    """
+    Work run after a write by the job runner, see `jobs.py`. A job is deleted
+    once it succeeds, one that ran out of attempts stays `failed` with its
+    last error. A `running` job is leased until `locked_until`, after which
+    another runner takes it over.
+    """
+    __tablename__ = "job"
+    # The due jobs, in the order they are claimed
+    __table_args__ = (Index("ix_job_status_run_after", "status", "run_after"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(100))
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
+    status: Mapped[str] = mapped_column(String(20), default="queued")
+    attempts: Mapped[int] = mapped_column(default=0)
+    max_attempts: Mapped[int] = mapped_column(default=5)
+    run_after: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class MediaFile(db.Model):
+    """
+    Reference count of a locally stored image, named by the hash of its
+    content, see `blogs/media.py`. The count is kept by the session as posts
+    are written, an image whose count dropped to zero is removed by
+    `flask prune-media` once it has been unused for a while.
+    """
+    __tablename__ = "media_file"
+
+    key: Mapped[str] = mapped_column(String(80), primary_key=True)
+    ref_count: Mapped[int] = mapped_column(default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+# The key of an image stored by `store_media`, the SHA-256 of its content and its extension
+MEDIA_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}(?:\.[a-z0-9]+)?$")
+
+def media_key(image: Optional[str]) -> Optional[str]:
+    """
+    Returns the key of a content-addressed image from its URL, or None for
+    no image, Cloudinary images and local ones stored under other names.
+    """
+    key = image.removeprefix("/media/") if image and image.startswith("/media/") else None
+    return key if key and MEDIA_KEY_PATTERN.match(key) else None
+
+def count_media_references(connection: Connection, deltas: Counter):
+    """
+    Adds the changes of the reference counts of images, creating the counts
+    of images not counted yet. An upsert, so concurrent writers of the same
+    image don't conflict.
+
+    Args:
+        connection (Connection): The connection of the writing transaction.
+        deltas (Counter): The change of the count by image key.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Sorted, so transactions counting the same images lock their rows in the same order
+    rows = [{"key": key, "ref_count": delta, "updated_at": now} for key, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+
+    table = MediaFile.__table__
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.key],
+        set_={"ref_count": table.c.ref_count + stmt.excluded.ref_count, "updated_at": stmt.excluded.updated_at},
+    )
+    connection.execute(stmt, rows)
+
+@event.listens_for(Session, "before_flush")
+def _count_media_references(session, flush_context, instances):
+    deltas = Counter()
+    # Posts whose stored image isn't loaded, it is read before the flush overwrites it
+    stored = []
+
+    for post in session.new:
+        if isinstance(post, BlogPost):
+            deltas[media_key(post.image)] += 1
+
+    for post in chain(session.dirty, session.deleted):
+        if not isinstance(post, BlogPost):
+            continue
+        history = inspect(post).attrs.image.history
+        if post in session.deleted:
+            if "image" in inspect(post).unloaded or history.added and not history.deleted:
+                stored.append(post.id)
+            else:
+                deltas[media_key((history.deleted or history.unchanged)[0])] -= 1
+        elif history.has_changes():
+            deltas[media_key(history.added[0])] += 1
+            if history.deleted:
+                deltas[media_key(history.deleted[0])] -= 1
+            else:
+                stored.append(post.id)
+
+    if stored:
+        for image in session.connection().execute(select(BlogPost.image).where(BlogPost.id.in_(stored))).scalars():
+            deltas[media_key(image)] -= 1
+
+    # The counts are written in the transaction of the change, so they commit or roll back with it
+    deltas.pop(None, None)
+    if deltas:
+        count_media_references(session.connection(), deltas)
@@ -0,0 +1,117 @@
+from typing import Iterable, Iterator
+from xml.sax.saxutils import escape
+from flask import current_app
+from flask_blog.blogs.models import BlogPost
+from flask_blog.blogs.rss import FeedCache
+from flask_blog.extensions import db
+from sqlalchemy import bindparam, event, func, select
+from sqlalchemy.orm import Session
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+SITEMAP_MEDIA_TYPE = "application/xml"
+
+# Cache scope of the sitemap index, a sitemap is cached under `sitemap_scope`
+INDEX_SCOPE = "index"
+
+# Session info key collecting the sitemap scopes written in a transaction until it commits
+SITEMAP_SCOPES_KEY = "sitemap_scopes"
+
+SITEMAP_POSTS_STMT = (
+    select(BlogPost.id, BlogPost.created_at)
+    .where(BlogPost.id > bindparam("last_id"), BlogPost.id <= bindparam("end_id"))
+    .order_by(BlogPost.id)
+    .limit(bindparam("batch_size"))
+)
+MAX_ID_STMT = select(func.max(BlogPost.id))
+
+def sitemap_scope(number: int) -> str:
+    return f"sitemap:{number}"
+
+def sitemap_number(blog_id: int, size: int) -> int:
+    """
+    The number of the sitemap listing a post. Sitemap `n` lists the ids
+    from `n * size + 1` to `(n + 1) * size`, so a write changes one sitemap.
+    """
+    return (blog_id - 1) // size
+
+def sitemap_count(size: int) -> int:
+    """
+    The number of sitemaps up to the highest post id, read from the primary key index.
+    """
+    with db.engine.connect() as connection:
+        max_id = connection.execute(MAX_ID_STMT).scalar()
+
+    return sitemap_number(max_id, size) + 1 if max_id else 0
+
+def render_sitemap_index(locations: Iterable[str]) -> bytes:
+    entries = "".join(f"<sitemap><loc>{escape(location)}</loc></sitemap>" for location in locations)
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NAMESPACE}">{entries}</sitemapindex>'
+    ).encode()
+
+def stream_sitemap(number: int, detail_url: str, size: int, batch_size: int = 5000) -> Iterator[bytes]:
+    """
+    Yields the sitemap of the posts in the id range of `number`, one piece per
+    batch. Each batch is read by keyset pagination on the primary key on a
+    connection that goes back to the pool right after, so only that range is
+    scanned and a slow crawler doesn't keep a database connection open.
+
+    Args:
+        number (int): The number of the sitemap.
+        detail_url (str): The URL of the detail page, the id is appended to it.
+        size (int): Number of ids in the range of a sitemap.
+        batch_size (int, optional): Number of posts read per batch.
+    """
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NAMESPACE}">'.encode()
+
+    last_id, end_id = number * size, (number + 1) * size
+    while True:
+        with db.engine.connect() as connection:
+            posts = connection.execute(
+                SITEMAP_POSTS_STMT, {"last_id": last_id, "end_id": end_id, "batch_size": batch_size}
+            ).all()
+        if not posts:
+            break
+
+        yield "".join(
+            f"<url><loc>{escape(detail_url)}{blog_id}</loc><lastmod>{created_at.date().isoformat()}</lastmod></url>"
+            for blog_id, created_at in posts
+        ).encode()
+        last_id = posts[-1].id
+
+    yield b"</urlset>"
+
+def cache_stream(cache: FeedCache, scope: str, version: int, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Yields the chunks and caches their bytes once all were sent, a response
+    cut off before the end is not cached.
+    """
+    body = bytearray()
+    for chunk in chunks:
+        body += chunk
+        yield chunk
+
+    cache.put(scope, bytes(body), version)
+
+# The sitemaps of this process, invalidated by the writes of its sessions
+sitemap_cache = FeedCache()
+
+@event.listens_for(Session, "after_flush")
+def _collect_sitemap_scopes(session, flush_context):
+    scopes = session.info.setdefault(SITEMAP_SCOPES_KEY, set())
+    for post in session.new | session.dirty | session.deleted:
+        if isinstance(post, BlogPost):
+            scopes.add(sitemap_scope(sitemap_number(post.id, current_app.config["SITEMAP_SIZE"])))
+            # Creates and deletes may change the number of sitemaps
+            if post not in session.dirty:
+                scopes.add(INDEX_SCOPE)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_sitemaps(session):
+    scopes = session.info.pop(SITEMAP_SCOPES_KEY, set())
+    if scopes:
+        sitemap_cache.invalidate(scopes)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_sitemap_scopes(session, previous_transaction):
+    session.info.pop(SITEMAP_SCOPES_KEY, None)
@@ -0,0 +1,230 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from flask_blog.blogs.models import BlogPost
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+WORD = re.compile(r"\w+")
+
+# Sorts after every word starting with a prefix, so it bounds the prefix's range
+PREFIX_END = "\U0010ffff"
+
+# Session info key collecting the titles written in a transaction until it commits
+TITLE_CHANGES_KEY = "title_changes"
+
+def title_words(text: str) -> List[str]:
+    """
+    Splits a title or query into its lowercased words.
+    """
+    return WORD.findall(text.casefold())
+
+class TitleIndex:
+    """
+    In-process index of the blog post titles for the search suggestions.
+
+    The distinct words of all titles are kept sorted, each with the negated
+    ids of the posts having it, so the words starting with a prefix are one
+    range found by binary search and each word's posts come newest first. A
+    query matches the titles having a word starting with each of its words.
+    Only the posts of the query word with the fewest are scanned, at most
+    `scan_limit` of them, so a lookup stays well under a millisecond however
+    many titles there are.
+    """
+    def __init__(self, scan_limit: int = 1000):
+        self.scan_limit = scan_limit
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """
+        Empties the index, it is loaded again on the next lookup.
+        """
+        self.words: List[str] = []
+        self.postings: Dict[str, array] = {}
+        self.titles: Dict[int, str] = {}
+        self.terms: Dict[int, str] = {}
+        # The newest post read from the database and when that was last checked
+        self.last_id = 0
+        self.refreshed_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.refreshed_at is not None
+
+    def needs_refresh(self, interval: float) -> bool:
+        """
+        Whether the posts added since the last check should be read, and
+        marks them as being read, so concurrent lookups don't read them too.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.refreshed_at is not None and now - self.refreshed_at < interval:
+                return False
+
+            self.refreshed_at = now
+            return True
+
+    def _set_title(self, blog_id: int, title: str) -> Set[str]:
+        words = set(title_words(title))
+        self.titles[blog_id] = title
+        self.terms[blog_id] = " " + " ".join(words)
+        return words
+
+    def _insert(self, blog_id: int, title: str):
+        for word in self._set_title(blog_id, title):
+            posting = self.postings.get(word)
+            if posting is None:
+                insort(self.words, word)
+                self.postings[word] = array("q", [-blog_id])
+            else:
+                posting.insert(bisect_left(posting, -blog_id), -blog_id)
+
+    def _delete(self, blog_id: int):
+        title = self.titles.pop(blog_id, None)
+        if title is None:
+            return
+
+        del self.terms[blog_id]
+        for word in set(title_words(title)):
+            posting = self.postings[word]
+            position = bisect_left(posting, -blog_id)
+            if position < len(posting) and posting[position] == -blog_id:
+                del posting[position]
+            if not posting:
+                del self.postings[word]
+                del self.words[bisect_left(self.words, word)]
+
+    def add(self, blog_id: int, title: str):
+        """
+        Adds a post's title, replacing the title it had.
+        """
+        with self.lock:
+            if self.titles.get(blog_id) != title:
+                self._delete(blog_id)
+                self._insert(blog_id, title)
+
+    def remove(self, blog_id: int):
+        """
+        Removes a post's title.
+        """
+        with self.lock:
+            self._delete(blog_id)
+
+    def add_many(self, rows: Iterable[Tuple[int, str]]):
+        """
+        Adds the titles of posts read from the database in the order of their
+        ids and remembers the last one. The titles are split into words before
+        the index is locked, and large batches are merged by sorting the words
+        once instead of inserting post by post.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+
+        if len(rows) < 100:
+            with self.lock:
+                self.last_id = max(self.last_id, rows[-1][0])
+                for blog_id, title in rows:
+                    if self.titles.get(blog_id) != title:
+                        self._delete(blog_id)
+                        self._insert(blog_id, title)
+            return
+
+        titles, terms, added = {}, {}, defaultdict(list)
+        for blog_id, title in rows:
+            words = set(title_words(title))
+            titles[blog_id] = title
+            terms[blog_id] = " " + " ".join(words)
+            for word in words:
+                added[word].append(-blog_id)
+
+        with self.lock:
+            self.last_id = max(self.last_id, rows[-1][0])
+            for blog_id in titles.keys() & self.titles.keys():
+                self._delete(blog_id)
+
+            for word, ids in added.items():
+                posting = self.postings.get(word)
+                self.postings[word] = array("q", sorted(ids if posting is None else [*posting, *ids]))
+            self.words = sorted(self.postings)
+            self.titles.update(titles)
+            self.terms.update(terms)
+
+    def _size(self, start: int, end: int) -> int:
+        size = 0
+        for position in range(start, end):
+            size += len(self.postings[self.words[position]])
+            if size > self.scan_limit:
+                break
+
+        return size
+
+    def search(self, query: str, limit: int = 8) -> List[Tuple[int, str]]:
+        """
+        Returns the id and title of up to `limit` posts matching the query,
+        ordered by the word they match, then newest first.
+        """
+        words = title_words(query)
+        if not words:
+            return []
+
+        with self.lock:
+            ranges = []
+            for word in words:
+                start = bisect_left(self.words, word)
+                end = bisect_left(self.words, word + PREFIX_END, start)
+                ranges.append((self._size(start, end), start, end))
+            _, start, end = min(ranges)
+
+            matches, seen, scanned = [], set(), 0
+            for position in range(start, end):
+                for blog_id in self.postings[self.words[position]]:
+                    scanned += 1
+                    if scanned > self.scan_limit:
+                        return matches
+                    if -blog_id in seen:
+                        continue
+
+                    seen.add(-blog_id)
+                    terms = self.terms[-blog_id]
+                    if all(" " + word in terms for word in words):
+                        matches.append((-blog_id, self.titles[-blog_id]))
+                        if len(matches) == limit:
+                            return matches
+
+            return matches
+
+# The index of this process, kept up to date by the writes of its sessions
+title_index = TitleIndex()
+
+@event.listens_for(Session, "after_flush")
+def _collect_titles(session, flush_context):
+    changes = session.info.setdefault(TITLE_CHANGES_KEY, {})
+    for post in session.new | session.dirty:
+        if isinstance(post, BlogPost):
+            changes[post.id] = post.title
+    for post in session.deleted:
+        if isinstance(post, BlogPost):
+            changes[post.id] = None
+
+@event.listens_for(Session, "after_commit")
+def _apply_titles(session):
+    changes = session.info.pop(TITLE_CHANGES_KEY, {})
+    # An index not loaded yet reads the titles from the database
+    if not title_index.loaded:
+        return
+
+    for blog_id, title in changes.items():
+        if title is None:
+            title_index.remove(blog_id)
+        else:
+            title_index.add(blog_id, title)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_titles(session, previous_transaction):
+    session.info.pop(TITLE_CHANGES_KEY, None)
@@ -0,0 +1,124 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+from flask import Flask
+from flask_blog.blogs.models import BlogPost
+from flask_blog.extensions import db
+from sqlalchemy import bindparam, update
+
+logger = logging.getLogger(__name__)
+
+blog_post_table = BlogPost.__table__
+
+# Executed with the rows of all the posts viewed since the last flush
+ADD_VIEWS_STMT = (
+    update(blog_post_table)
+    .where(blog_post_table.c.id == bindparam("blog_id"))
+    .values(views=blog_post_table.c.views + bindparam("added"))
+)
+
+class ViewCounter:
+    """
+    Counts the views of the blog posts in memory, so showing a post doesn't
+    write to the database. Every `VIEW_FLUSH_SECONDS` the counts are added to
+    the `views` column, one `views = views + n` row per viewed post, all sent
+    as one batch in one transaction. The rows only add to the column, so the
+    flushes of several workers never overwrite each other, and they are
+    ordered by id, so concurrent flushes lock the posts in the same order.
+
+    The flushing thread starts with the first view counted by the process,
+    so a gunicorn master preloading the app or a CLI command doesn't run one,
+    and the views left are flushed when the process exits.
+    """
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.lock = threading.Lock()
+        self.paused = False
+        self.app: Optional[Flask] = None
+        self.interval: Optional[float] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def init_app(self, app: Flask):
+        """
+        Flushes the views in the context of the app. Without an interval,
+        as in the tests, the views are only flushed by calling `flush`.
+        """
+        self.app = app
+        self.interval = app.config["VIEW_FLUSH_SECONDS"]
+
+    def increment(self, blog_id: int):
+        if self.paused:
+            return
+
+        with self.lock:
+            self.counts[blog_id] += 1
+            if self.interval and self._flusher is None:
+                self._start()
+
+    @contextmanager
+    def pause(self):
+        """
+        Doesn't count the views while the block runs, e.g. the pages rendered by a static build.
+        """
+        paused, self.paused = self.paused, True
+        try:
+            yield
+        finally:
+            self.paused = paused
+
+    def flush(self) -> int:
+        """
+        Adds the counted views to the posts, in an app context. The views of
+        a failed flush are counted again, so the next flush retries them.
+
+        Returns:
+            int: The number of views added.
+        """
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        if not counts:
+            return 0
+
+        rows = [{"blog_id": blog_id, "added": added} for blog_id, added in sorted(counts.items())]
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(ADD_VIEWS_STMT, rows)
+        except BaseException:
+            with self.lock:
+                self.counts.update(counts)
+            raise
+
+        return sum(counts.values())
+
+    def stop(self):
+        """
+        Stops the flushing thread and flushes the views counted since the last flush.
+        """
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+
+        with self.app.app_context():
+            self.flush()
+
+    def _start(self):
+        self._stopped.clear()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="view-counter", daemon=True)
+        self._flusher.start()
+        atexit.register(self.stop)
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Flushing %d blog post views failed, retrying in %s s", sum(self.counts.values()), self.interval)
+
+# The views counted by this process
+view_counter = ViewCounter()
@@ -1,8 +1,21 @@
+import os
+from pathlib import Path
 from flask_blog.container import container
-from flask import abort, flash, redirect, render_template, request, url_for
+from flask_blog.extensions import csrf
+from flask_blog.monitoring.metrics import observe_upload
+from flask import Response, abort, current_app, flash, jsonify, redirect, render_template, request, stream_with_context, url_for
 from flask import Blueprint
 from flask_login import current_user, login_required
-from .exceptions import BlogPostNotFoundError
+from . import direct_uploads
+from .exceptions import BlogPostNotFoundError, InvalidFeedCursorError, InvalidUploadError
+from .feed import FeedCursor
+from .rss import ALL_SCOPE, FeedItem, feed_cache, feed_response, render_rss, tag_scope
+from .sitemap import (
+    INDEX_SCOPE, SITEMAP_MEDIA_TYPE, cache_stream, render_sitemap_index, sitemap_cache, sitemap_count, sitemap_scope,
+    stream_sitemap,
+)
+from .view_counts import view_counter
+from markupsafe import Markup
 from .forms import BlogPostForm
 from werkzeug.exceptions import Forbidden
 
@@ -17,6 +30,85 @@ def index():
 
     return render_template("index.html", blogs=blogs, tags=tags)
 
+@blogs_bp.get("/feed.xml")
+def rss_feed():
+    feed = feed_cache.get(ALL_SCOPE, current_app.config["RSS_MAX_AGE"])
+    if feed is None:
+        version = feed_cache.version
+        blogs = blog_service.get_recent_blogs(current_app.config["RSS_ITEMS"])
+        body = render_rss(
+            "TriFrameBlog Flask",
+            url_for("blogs.blogs", _external=True),
+            url_for("blogs.rss_feed", _external=True),
+            "The latest blogs",
+            [_feed_item(blog) for blog in blogs],
+        )
+        feed = feed_cache.put(ALL_SCOPE, body, version)
+
+    return feed_response(feed)
+
+@blogs_bp.get("/tags/<slug>/feed.xml")
+def tag_rss_feed(slug: str):
+    feed = feed_cache.get(tag_scope(slug), current_app.config["RSS_MAX_AGE"])
+    if feed is None:
+        version = feed_cache.version
+        tag = tag_service.get_by_slug(slug)
+        if tag is None:
+            abort(404)
+
+        blogs = blog_service.get_recent_blogs_by_tags([slug], current_app.config["RSS_ITEMS"])
+        body = render_rss(
+            f"TriFrameBlog Flask: {tag.name}",
+            url_for("blogs.blogs", tag=slug, _external=True),
+            url_for("blogs.tag_rss_feed", slug=slug, _external=True),
+            f"The latest blogs tagged {tag.name}",
+            [_feed_item(blog) for blog in blogs],
+        )
+        feed = feed_cache.put(tag_scope(slug), body, version)
+
+    return feed_response(feed)
+
+def _feed_item(blog):
+    return FeedItem(
+        blog.title,
+        url_for("blogs.detail", blog_id=blog.id, _external=True),
+        Markup(blog.content[:500]).striptags(),
+        blog.created_at,
+        [tag.name for tag in blog.tags],
+    )
+
+@blogs_bp.get("/sitemap.xml")
+def sitemap_index():
+    index = sitemap_cache.get(INDEX_SCOPE, current_app.config["SITEMAP_MAX_AGE"])
+    if index is None:
+        version = sitemap_cache.version
+        count = sitemap_count(current_app.config["SITEMAP_SIZE"])
+        body = render_sitemap_index(url_for("blogs.sitemap", number=number, _external=True) for number in range(count))
+        index = sitemap_cache.put(INDEX_SCOPE, body, version)
+
+    return feed_response(index, SITEMAP_MEDIA_TYPE)
+
+@blogs_bp.get("/sitemaps/<int:number>.xml")
+def sitemap(number: int):
+    cached = sitemap_cache.get(sitemap_scope(number), current_app.config["SITEMAP_MAX_AGE"])
+    if cached is not None:
+        return feed_response(cached, SITEMAP_MEDIA_TYPE)
+
+    version = sitemap_cache.version
+    if number >= sitemap_count(current_app.config["SITEMAP_SIZE"]):
+        abort(404)
+
+    # The URL of every post is the detail URL of id 0 with its id instead
+    detail_url = url_for("blogs.detail", blog_id=0, _external=True).removesuffix("0")
+    chunks = stream_sitemap(
+        number, detail_url, current_app.config["SITEMAP_SIZE"], current_app.config["SITEMAP_BATCH_SIZE"]
+    )
+
+    return Response(
+        stream_with_context(cache_stream(sitemap_cache, sitemap_scope(number), version, chunks)),
+        mimetype=SITEMAP_MEDIA_TYPE,
+    )
+
 @blogs_bp.get("/blogs")
 def blogs():
     page = request.args.get("page", 1, type=int)
@@ -25,21 +117,74 @@ def blogs():
     tag_slugs_list = tag_slugs.split(',') if tag_slugs else []
 
     blogs = blog_service.get_paginated_blogs(tag_slugs_list, search, page)
+    feed_cursor = blog_service.feed_cursor(blogs.items[-1], tag_slugs_list, search) if blogs.has_next else None
 
     tags = tag_service.get_all()
 
-    return render_template("blogs.html", blogs=blogs, tags=tags, selected_tags=tag_slugs_list)
+    return render_template("blogs.html", blogs=blogs, feed_cursor=feed_cursor, tags=tags, selected_tags=tag_slugs_list)
+
+@blogs_bp.get("/blogs/fragment")
+def blogs_fragment():
+    page = request.args.get("page", 1, type=int)
+    search = request.args.get('search')
+    tag_slugs = request.args.get('tag')
+    tag_slugs_list = tag_slugs.split(',') if tag_slugs else []
+
+    blogs = blog_service.get_paginated_blogs(tag_slugs_list, search, page)
+    feed_cursor = blog_service.feed_cursor(blogs.items[-1], tag_slugs_list, search) if blogs.has_next else None
+
+    return render_template("components/blog_results.html", blogs=blogs, feed_cursor=feed_cursor)
+
+@blogs_bp.get("/blogs/feed")
+def blogs_feed():
+    search = request.args.get('search')
+    tag_slugs = request.args.get('tag')
+    tag_slugs_list = tag_slugs.split(',') if tag_slugs else []
+    per_page = max(request.args.get("per_page", 6, type=int), 1)
+
+    try:
+        cursor = FeedCursor.decode(request.args["cursor"]) if request.args.get("cursor") else None
+    except InvalidFeedCursorError as e:
+        return jsonify(error=str(e)), 400
+
+    blogs, next_cursor = blog_service.get_blog_feed(tag_slugs_list, search, cursor, per_page)
+
+    response = jsonify(html=render_template("components/blog_feed.html", blogs=blogs), cursor=next_cursor)
+    # A cursor always reads the same batch, so the response is cached by its URL
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["FEED_CACHE_SECONDS"]
+
+    return response
+
+@blogs_bp.get("/blogs/suggest")
+def suggest():
+    query = request.args.get("q", "")[:100]
+    limit = min(max(request.args.get("limit", 8, type=int), 1), 20)
+
+    suggestions = blog_service.suggest_titles(query, limit)
+
+    return jsonify(suggestions=[
+        {"id": blog_id, "title": title, "url": url_for("blogs.detail", blog_id=blog_id)}
+        for blog_id, title in suggestions
+    ])
 
 @blogs_bp.get("/blogs/<int:blog_id>")
 def detail(blog_id: int):
     try:
         blog = blog_service.get_blog_by_id(blog_id)
         related_blogs = blog_service.get_related_blogs(blog)
+        view_counter.increment(blog.id)
 
         return render_template("detail.html", blog=blog, related_blogs=related_blogs)
     except BlogPostNotFoundError as e:
         abort(404, description=str(e))
 
+@blogs_bp.get("/blogs/popular")
+def popular_blogs():
+    blogs = blog_service.get_popular_blogs(current_app.config["POPULAR_BLOGS"])
+
+    return render_template("popular.html", blogs=blogs)
+
 @blogs_bp.get("/blogs/my")
 @login_required
 def my_blogs():
@@ -48,6 +193,56 @@ def my_blogs():
 
     return render_template("my_blogs.html", blogs=blogs)
 
+@blogs_bp.get("/blogs/upload-policy")
+@login_required
+def upload_policy():
+    if not current_app.config["DIRECT_UPLOADS"]:
+        abort(404)
+
+    try:
+        policy = direct_uploads.upload_policy(request.args.get("filename", "")[:255], url_for("blogs.store_upload"))
+    except InvalidUploadError as e:
+        return jsonify(error=str(e)), 400
+
+    response = jsonify(policy)
+    response.cache_control.no_store = True
+
+    return response
+
+@blogs_bp.post("/uploads")
+@csrf.exempt
+def store_upload():
+    """
+    Local stand-in of an S3 style storage for direct uploads, storing the file
+    of a form signed by `upload_policy` under its key. Only used when images
+    are stored locally, with Cloudinary the browser uploads to Cloudinary.
+    """
+    if not current_app.config["DIRECT_UPLOADS"] or not current_app.config["USE_LOCAL_STORAGE"]:
+        abort(404)
+
+    key, file = request.form.get("key", ""), request.files.get("file")
+
+    try:
+        max_bytes = direct_uploads.check_policy(key, request.form.get("policy", ""), request.form.get("signature", ""))
+    except InvalidUploadError as e:
+        return jsonify(error=str(e)), 403
+
+    if not file:
+        return jsonify(error="No file uploaded"), 400
+
+    file.stream.seek(0, os.SEEK_END)
+    size = file.stream.tell()
+    file.stream.seek(0)
+    if size > max_bytes:
+        return jsonify(error="The file is too large"), 400
+
+    path = Path(current_app.config["UPLOAD_FOLDER"]) / key
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with observe_upload("local", size):
+        file.save(path)
+
+    return "", 204
+
 @blogs_bp.route("/blogs/create", methods=["GET", "POST"])
 @login_required
 def create():
@@ -63,11 +258,14 @@ def create():
                 content=form.content.data,
                 image=request.files.get("image"),
                 author=current_user,
-                tag_ids=form.tags.data
+                tag_ids=form.tags.data,
+                image_key=form.image_key.data if current_app.config["DIRECT_UPLOADS"] else None
             )
 
             flash("Blog created successfully!", "success")
             return redirect(url_for("blogs.detail", blog_id=blog.id))
+    except InvalidUploadError as e:
+        form.image.errors = [str(e)]
     except Exception as e:
         flash("Error occured. Please try again.", "error")
         return render_template("create.html", form=form), 500
@@ -97,11 +295,14 @@ def edit(blog_id: int):
                     title=form.title.data,
                     content=form.content.data,
                     image=request.files.get("image"),
-                    tag_ids=form.tags.data
+                    tag_ids=form.tags.data,
+                    image_key=form.image_key.data if current_app.config["DIRECT_UPLOADS"] else None
                 )
 
                 flash("Blog updated successfully!", "success")
                 return redirect(url_for("blogs.detail", blog_id=blog.id))
+        except InvalidUploadError as e:
+            form.image.errors = [str(e)]
         except Exception as e:
             form.image.data = blog.image
 
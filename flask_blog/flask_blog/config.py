@@ -15,8 +15,68 @@ class Config:
 
     UPLOAD_FOLDER = BASE_DIR / 'media'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+    MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10 MB
     USE_LOCAL_STORAGE = True
 
+    # Warn when one request runs the same statement shape more often than this
+    QUERY_REPEAT_THRESHOLD = 5
+
+    # Request profiles of staff users, see `monitoring/profiling.py`
+    PROFILES_DIR = BASE_DIR / 'profiles'
+    PROFILES_KEEP = 100
+    PROFILE_INTERVAL = 0.001
+
+    # Blog post imports, see `utils/blog_import.py`. No worker count means one per CPU. Files
+    # uploaded in the admin wait in IMPORT_FOLDER for the `import_blogs` job
+    IMPORT_BATCH_SIZE = 1000
+    IMPORT_WORKERS = None
+    IMPORT_FOLDER = BASE_DIR / 'media' / 'imports'
+    # Posts read per query of an export, see `utils/blog_export.py`
+    EXPORT_CHUNK_SIZE = 1000
+    # Title index of the search suggestions, see `blogs/suggest.py`. Posts added by
+    # other processes are read every few seconds, in batches of this many rows
+    SUGGEST_REFRESH_SECONDS = 5
+    SUGGEST_LOAD_BATCH_SIZE = 10000
+    # Seconds the batches of the infinite-scroll feed may be cached by browsers and proxies
+    FEED_CACHE_SECONDS = 60
+    # RSS feeds, see `blogs/rss.py`. A cached feed is built again when a post in it
+    # changes, and at the latest after this many seconds for the writes of other processes
+    RSS_ITEMS = 20
+    RSS_MAX_AGE = 300
+    # Sitemaps, see `blogs/sitemap.py`. Each lists the posts of a range of SITEMAP_SIZE ids
+    # and is cached like the RSS feeds, read in batches of SITEMAP_BATCH_SIZE posts
+    SITEMAP_SIZE = 50000
+    SITEMAP_BATCH_SIZE = 5000
+    SITEMAP_MAX_AGE = 3600
+    # Views of the blog posts, see `blogs/view_counts.py`. They are counted in memory and
+    # added to the posts every VIEW_FLUSH_SECONDS, and once more when the process exits
+    VIEW_FLUSH_SECONDS = 10
+    POPULAR_BLOGS = 12
+    # Background jobs, see `jobs.py`, run by `flask run-jobs` in JOB_CONCURRENCY threads, at most
+    # as many runs of a job at once as JOB_CONCURRENCY_LIMITS allows. A failed job is retried
+    # after JOB_RETRY_SECONDS, doubled on every attempt, and a job still running after its
+    # lease, e.g. of a killed runner, is taken over by another runner. The lease is
+    # JOB_LEASE_SECONDS, or what JOB_LEASES gives jobs running far longer, like large imports
+    JOB_CONCURRENCY = 4
+    JOB_CONCURRENCY_LIMITS = {"upload_image": 2, "import_blogs": 1}
+    JOB_POLL_SECONDS = 5
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_SECONDS = 10
+    JOB_LEASE_SECONDS = 300
+    JOB_LEASES = {"import_blogs": 6 * 3600}
+    # Images waiting for the job uploading them to Cloudinary
+    UPLOAD_STAGING_FOLDER = BASE_DIR / 'media' / 'pending'
+    # Direct uploads, see `blogs/direct_uploads.py`. The browser uploads images straight to
+    # Cloudinary, or stored locally to the stand-in at /uploads, with a policy signed for
+    # DIRECT_UPLOAD_EXPIRES seconds, and the form posts only the key of the uploaded image
+    DIRECT_UPLOADS = False
+    DIRECT_UPLOAD_EXPIRES = 600
+    # Locally stored images, see `blogs/media.py`. They are named by the hash of their content,
+    # so browsers and proxies cache them for MEDIA_CACHE_SECONDS without revalidating, and
+    # `flask prune-media` removes those no post used for MEDIA_PRUNE_SECONDS
+    MEDIA_CACHE_SECONDS = 365 * 24 * 60 * 60
+    MEDIA_PRUNE_SECONDS = 24 * 60 * 60
+
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_TRACK_MODIFICATIONS = True
@@ -27,12 +87,15 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     SQLALCHEMY_TRACK_MODIFICATIONS = False 
     WTF_CSRF_ENABLED = False
+    # The tests flush the views themselves
+    VIEW_FLUSH_SECONDS = None
     USE_LOCAL_STORAGE = True
 
 class ProductionConfig(Config):
     DEBUG = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     USE_LOCAL_STORAGE = False
+    DIRECT_UPLOADS = os.environ.get("DIRECT_UPLOADS", "True").lower() == "true"
 
     cloudinary.config(
         cloud_name=os.environ["CLOUDINARY_CLOUD_NAME"],
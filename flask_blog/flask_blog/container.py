@@ -1,5 +1,6 @@
 from flask_blog.repositories.blog_post_repository import BlogPostRepository
 from flask_blog.repositories.email_user_repository import EmailUserRepository
+from flask_blog.repositories.job_repository import JobRepository
 from flask_blog.repositories.tag_repository import TagRepository
 from flask_blog.services.blog_post_service import BlogPostService
 from flask_blog.services.email_user_service import EmailUserService
@@ -11,8 +12,9 @@ class Container:
         self.blog_post_repo = BlogPostRepository()
         self.tag_repo = TagRepository()
         self.user_repo = EmailUserRepository()
+        self.job_repo = JobRepository()
         
-        self.blog_service = BlogPostService(self.blog_post_repo, self.tag_repo)
+        self.blog_service = BlogPostService(self.blog_post_repo, self.tag_repo, self.job_repo)
         self.tag_service = TagService(self.tag_repo)
         self.user_service = EmailUserService(self.user_repo)
 
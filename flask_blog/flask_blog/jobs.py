@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from flask import Flask, current_app
+from flask_blog.blogs.models import Job
+from flask_blog.extensions import db
+from flask_blog.monitoring.metrics import JOB_DURATION, JOB_QUEUE_DELAY, JOBS, JOBS_IN_PROGRESS
+from sqlalchemy import Row, and_, bindparam, delete, or_, select, update
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, FAILED = "queued", "running", "failed"
+
+class JobHandler(NamedTuple):
+    func: Callable[[dict], None]
+    max_attempts: Optional[int]
+
+# The handlers of the jobs by name, registered by the `job` decorator
+handlers: Dict[str, JobHandler] = {}
+
+def job(name: str, max_attempts: Optional[int] = None):
+    """
+    Decorator registering a function as the handler of the named job. It is
+    called with the payload of the job in an app context, and what it writes
+    to `db.session` is committed with the removal of the succeeded job,
+    unless it commits itself. A job may run again after a crash, so a handler
+    must cope with finding its work done.
+
+    Args:
+        name (str): The name jobs are enqueued with.
+        max_attempts (int, optional): Runs before the job fails, `JOB_MAX_ATTEMPTS` by default.
+    """
+    def decorator(func: Callable[[dict], None]):
+        handlers[name] = JobHandler(func, max_attempts)
+        return func
+
+    return decorator
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def new_job(name: str, payload: dict, delay: float = 0) -> Job:
+    """
+    Builds the row of a job, to be added in the transaction of the write it follows.
+
+    Raises:
+        LookupError: If no handler is registered for the job.
+    """
+    if name not in handlers:
+        raise LookupError(f"No handler for job {name!r}")
+
+    return Job(
+        name=name,
+        payload=payload,
+        max_attempts=handlers[name].max_attempts or current_app.config["JOB_MAX_ATTEMPTS"],
+        run_after=utcnow() + timedelta(seconds=delay),
+    )
+
+def retry_delay(attempts: int) -> float:
+    """
+    Seconds until a job that failed its `attempts`th run is run again.
+    """
+    return current_app.config["JOB_RETRY_SECONDS"] * 2 ** (attempts - 1)
+
+# Queued jobs that are due, and running jobs whose runner didn't finish them in time
+CLAIMABLE = or_(
+    and_(Job.status == QUEUED, Job.run_after <= bindparam("now")),
+    and_(Job.status == RUNNING, Job.locked_until < bindparam("now")),
+)
+DUE_JOBS_STMT = select(Job.id).where(CLAIMABLE).order_by(Job.run_after, Job.id).limit(bindparam("limit"))
+# Checks the jobs are still claimable, so of runners racing for a job only one gets it
+CLAIM_STMT = (
+    update(Job)
+    .where(Job.id.in_(bindparam("job_ids", expanding=True)), CLAIMABLE)
+    .values(status=RUNNING, attempts=Job.attempts + 1, locked_until=bindparam("locked_until"))
+    .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts, Job.run_after)
+    .execution_options(synchronize_session=False)
+)
+DELETE_JOB_STMT = delete(Job).where(Job.id == bindparam("job_id"))
+
+def claim_jobs(limit: int, job_ids: Optional[Iterable[int]] = None) -> List[Row]:
+    """
+    Marks up to `limit` due jobs as running and leases them to the caller
+    for `JOB_LEASE_SECONDS`. The rows are selected with SKIP LOCKED, so
+    runners polling at once claim different jobs instead of waiting on
+    each other.
+
+    Args:
+        limit (int): The maximum number of jobs to claim.
+        job_ids (Iterable[int], optional): Claims only these jobs.
+
+    Returns:
+        list: The id, name, payload, attempts, max_attempts and run_after of the claimed jobs, oldest due first.
+    """
+    now = utcnow()
+    stmt = DUE_JOBS_STMT if job_ids is None else DUE_JOBS_STMT.where(Job.id.in_(list(job_ids)))
+
+    ids = db.session.execute(stmt.with_for_update(skip_locked=True), {"now": now, "limit": limit}).scalars().all()
+    if not ids:
+        db.session.rollback()
+        return []
+
+    jobs = db.session.execute(CLAIM_STMT, {
+        "job_ids": ids, "now": now, "locked_until": now + timedelta(seconds=current_app.config["JOB_LEASE_SECONDS"]),
+    }).all()
+    db.session.commit()
+
+    return sorted(jobs, key=lambda job: (job.run_after, job.id))
+
+class JobRunner:
+    """
+    Runs the background jobs in a pool of `concurrency` threads, each job in
+    its own app context. It claims as many due jobs as it has idle threads,
+    and polls every `poll_interval` seconds when none are due. Several
+    runners share the table, each job is claimed by one of them.
+    """
+    def __init__(self, app: Flask, concurrency: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.app = app
+        self.concurrency = concurrency or app.config["JOB_CONCURRENCY"]
+        self.poll_interval = poll_interval or app.config["JOB_POLL_SECONDS"]
+        self.stopped = threading.Event()
+        self._limits = {
+            name: threading.BoundedSemaphore(limit) for name, limit in app.config["JOB_CONCURRENCY_LIMITS"].items()
+        }
+
+    def run_forever(self):
+        """
+        Runs the jobs until `stopped` is set, then waits for the running ones.
+        """
+        running = set()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="job") as pool:
+            while not self.stopped.is_set():
+                running = {future for future in running if not future.done()}
+                idle = self.concurrency - len(running)
+                try:
+                    jobs = self._claim(idle) if idle else []
+                except Exception:
+                    logger.exception("Claiming jobs failed, retrying in %s s", self.poll_interval)
+                    jobs = []
+                running.update(pool.submit(self.run, job) for job in jobs)
+
+                if not idle:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                elif len(jobs) < idle:
+                    self.stopped.wait(self.poll_interval)
+
+    def run_pending(self) -> int:
+        """
+        Runs the due jobs one by one until there are none left.
+
+        Returns:
+            int: The number of job runs.
+        """
+        ran = 0
+        while jobs := self._claim(self.concurrency):
+            for claimed in jobs:
+                self.run(claimed)
+            ran += len(jobs)
+
+        return ran
+
+    def run(self, job: Row) -> str:
+        """
+        Runs a claimed job. A job that failed is queued again after
+        `retry_delay`, or marked as failed after its last attempt.
+
+        Returns:
+            str: The outcome of the run, `succeeded`, `retried` or `failed`.
+        """
+        handler = handlers.get(job.name)
+
+        with self.app.app_context(), self._limits.get(job.name) or nullcontext():
+            JOB_QUEUE_DELAY.labels(job.name).observe(max((utcnow() - job.run_after).total_seconds(), 0))
+            JOBS_IN_PROGRESS.labels(job.name).inc()
+            start = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job {job.name!r}")
+
+                lease = current_app.config["JOB_LEASES"].get(job.name)
+                if lease:
+                    # Claimed with the default lease, which a long job would outlast
+                    db.session.execute(update(Job).where(Job.id == job.id).values(locked_until=utcnow() + timedelta(seconds=lease)))
+                    db.session.commit()
+
+                handler.func(job.payload)
+                db.session.execute(DELETE_JOB_STMT, {"job_id": job.id})
+                db.session.commit()
+                status = "succeeded"
+            except Exception as error:
+                db.session.rollback()
+                status = self._fail(job, error, retry=handler is not None)
+            finally:
+                JOBS_IN_PROGRESS.labels(job.name).dec()
+
+        JOB_DURATION.labels(job.name).observe(time.perf_counter() - start)
+        JOBS.labels(job.name, status).inc()
+        return status
+
+    def _claim(self, limit: int) -> List[Row]:
+        with self.app.app_context():
+            return claim_jobs(limit)
+
+    def _fail(self, job: Row, error: Exception, retry: bool) -> str:
+        values = {"status": FAILED, "locked_until": None, "last_error": "".join(traceback.format_exception(error))}
+        if retry and job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            values.update(status=QUEUED, run_after=utcnow() + timedelta(seconds=delay))
+            logger.warning("Job %s %d failed on attempt %d of %d, retrying in %s s", job.name, job.id, job.attempts, job.max_attempts, delay, exc_info=error)
+        else:
+            logger.error("Job %s %d failed on attempt %d of %d", job.name, job.id, job.attempts, job.max_attempts, exc_info=error)
+
+        db.session.execute(update(Job).where(Job.id == job.id).values(**values))
+        db.session.commit()
+
+        return "retried" if values["status"] == QUEUED else "failed"
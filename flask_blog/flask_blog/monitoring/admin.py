@@ -0,0 +1,27 @@
+from flask import abort, flash, redirect, request, send_file, url_for
+from flask_admin import BaseView, expose
+from flask_blog.monitoring.profiling import get_profile_path, list_profiles
+from flask_login import current_user
+
+class ProfilesAdminView(BaseView):
+    """
+    Lists the saved request profiles and opens them.
+    """
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.is_staff
+
+    def inaccessible_callback(self, name: str, **kwargs):
+        flash("You must be logged in to access the admin panel.", "danger")
+        return redirect(url_for("accounts.login", next=request.url))
+
+    @expose("/")
+    def index(self):
+        return self.render("admin/profiles.html", profiles=list_profiles())
+
+    @expose("/<profile_name>")
+    def detail(self, profile_name: str):
+        path = get_profile_path(profile_name)
+        if path is None:
+            abort(404)
+
+        return send_file(path, mimetype="text/html")
@@ -0,0 +1,145 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+from flask import Response, before_render_template, g, request, template_rendered
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+# The metric names are shared with the FastAPI and Django apps, keep them in sync.
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Number of handled HTTP requests.", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests.", ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Number of HTTP requests being handled.", ["method"], multiprocess_mode="livesum"
+)
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Number of database connections checked out of the pool.", multiprocess_mode="livesum"
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Number of cache lookups.", ["cache", "result"]
+)
+UPLOAD_SIZE = Histogram(
+    "upload_size_bytes", "Size of uploaded images.", ["storage"],
+    buckets=[10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000]
+)
+UPLOAD_DURATION = Histogram(
+    "upload_duration_seconds", "Time spent storing uploaded images.", ["storage"]
+)
+TEMPLATE_RENDER_DURATION = Histogram(
+    "template_render_duration_seconds", "Time spent rendering templates.", ["template"]
+)
+JOBS = Counter(
+    "jobs_total", "Number of background job runs by outcome.", ["job", "status"]
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Time spent running background jobs.", ["job"]
+)
+JOBS_IN_PROGRESS = Gauge(
+    "jobs_in_progress", "Number of background jobs being run.", ["job"], multiprocess_mode="livesum"
+)
+JOB_QUEUE_DELAY = Histogram(
+    "job_queue_delay_seconds", "Time background jobs waited between being due and starting.", ["job"],
+    buckets=[0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900]
+)
+
+def record_cache_lookup(cache: str, hit: bool):
+    """
+    Counts a lookup of the named cache as a hit or a miss.
+    """
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+@contextmanager
+def observe_upload(storage: str, size: Optional[int]):
+    """
+    Records the size of an uploaded file and the time spent storing it.
+    """
+    if size is not None:
+        UPLOAD_SIZE.labels(storage).observe(size)
+
+    with UPLOAD_DURATION.labels(storage).time():
+        yield
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CONNECTIONS_IN_USE.inc()
+
+def _checkin(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS_IN_USE.dec()
+
+def install_pool_listeners():
+    """
+    Tracks the connections checked out of every SQLAlchemy connection pool.
+    """
+    if not event.contains(Pool, "checkout", _checkout):
+        event.listen(Pool, "checkout", _checkout)
+        event.listen(Pool, "checkin", _checkin)
+
+def get_registry():
+    """
+    Returns the registry to export. When gunicorn runs several workers,
+    `PROMETHEUS_MULTIPROC_DIR` is set and the values of all workers are aggregated.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+
+    return REGISTRY
+
+def metrics():
+    """
+    Exposes the metrics in the Prometheus text format.
+    """
+    return Response(generate_latest(get_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+def register_metrics(app):
+    """
+    Counts and times every request by method, route and status code, times
+    template rendering and exposes everything on `/metrics`.
+    """
+    install_pool_listeners()
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.labels(request.method).inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if "metrics_start" in g:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            HTTP_REQUESTS.labels(request.method, route, response.status_code).inc()
+            HTTP_REQUEST_DURATION.labels(request.method, route).observe(time.perf_counter() - g.metrics_start)
+
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exception=None):
+        if g.pop("metrics_start", None) is not None:
+            HTTP_REQUESTS_IN_PROGRESS.labels(request.method).dec()
+
+    def start_render(sender, template, context, **extra):
+        g.setdefault("metrics_render_starts", []).append(time.perf_counter())
+
+    def finish_render(sender, template, context, **extra):
+        starts = g.get("metrics_render_starts")
+        if starts:
+            TEMPLATE_RENDER_DURATION.labels(template.name).observe(time.perf_counter() - starts.pop())
+
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(finish_render, app, weak=False)
+
+    app.add_url_rule("/metrics", "metrics", metrics)
@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import quote, unquote
+from flask import current_app, g, request
+from flask_login import current_user
+from pyinstrument import Profiler
+
+PROFILE_HEADER = "X-Profile"
+
+@dataclass
+class ProfileFile:
+    """
+    A saved request profile. The request is encoded in the file name,
+    e.g. `20250101T120000000000_GET_%2Fblogs.html`.
+    """
+    name: str
+    created_at: datetime
+    method: str
+    path: str
+
+    @classmethod
+    def create(cls, method: str, path: str):
+        created_at = datetime.now()
+        name = f"{created_at:%Y%m%dT%H%M%S%f}_{method}_{quote(path, safe='')[:150]}.html"
+        return cls(name, created_at, method, path)
+
+    @classmethod
+    def from_name(cls, name: str):
+        try:
+            stamp, method, path = name.removesuffix(".html").split("_", 2)
+            return cls(name, datetime.strptime(stamp, "%Y%m%dT%H%M%S%f"), method, unquote(path))
+        except ValueError:
+            return None
+
+def profile_requested():
+    """
+    Checks if the request asks for a profile with `?profile=1` or an `X-Profile: 1` header.
+    """
+    return request.args.get("profile") == "1" or request.headers.get(PROFILE_HEADER) == "1"
+
+def get_profiles_dir() -> Path:
+    return Path(current_app.config["PROFILES_DIR"])
+
+def list_profiles() -> List[ProfileFile]:
+    """
+    Returns the saved profiles, newest first.
+    """
+    directory = get_profiles_dir()
+    if not directory.is_dir():
+        return []
+
+    profiles = (ProfileFile.from_name(file.name) for file in directory.glob("*.html"))
+    return sorted((profile for profile in profiles if profile), key=lambda profile: profile.name, reverse=True)
+
+def get_profile_path(name: str) -> Optional[Path]:
+    """
+    Returns the file of a saved profile, None for unknown names.
+    """
+    if Path(name).name != name or ProfileFile.from_name(name) is None:
+        return None
+
+    path = get_profiles_dir() / name
+    return path if path.is_file() else None
+
+def save_profile(profile: ProfileFile, profiler: Profiler):
+    """
+    Writes the profile as an HTML call tree and timeline, only the newest
+    `PROFILES_KEEP` profiles are kept.
+    """
+    directory = get_profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / profile.name).write_text(profiler.output_html(), encoding="utf-8")
+
+    for old in list_profiles()[current_app.config["PROFILES_KEEP"]:]:
+        (directory / old.name).unlink(missing_ok=True)
+
+def register_profiling(app):
+    """
+    Profiles the requests of staff users that ask for it with `?profile=1` or
+    an `X-Profile: 1` header. The profile is saved for the admin and its name
+    is returned in the `X-Profile` response header.
+    """
+    @app.before_request
+    def start_profiling():
+        # The cheap check first, so other requests do not load the user
+        if profile_requested() and current_user.is_authenticated and current_user.is_staff:
+            g.profile = ProfileFile.create(request.method, request.path)
+            g.profiler = Profiler(interval=app.config["PROFILE_INTERVAL"], async_mode="disabled")
+            g.profiler.start()
+
+    @app.after_request
+    def add_profile_header(response):
+        if "profile" in g:
+            response.headers[PROFILE_HEADER] = g.profile.name
+
+        return response
+
+    @app.teardown_request
+    def finish_profiling(exception=None):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            save_profile(g.pop("profile"), profiler)
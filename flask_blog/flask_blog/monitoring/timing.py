@@ -0,0 +1,125 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Union
+from flask import before_render_template, g, template_rendered
+from flask_blog.monitoring.queries import QueryStats
+
+class ServerTiming:
+    """
+    Named phases of one request, rendered as a `Server-Timing` header.
+    """
+    def __init__(self):
+        self.phases: Dict[str, List[float]] = {}
+
+    def add(self, name: str, duration: float):
+        """
+        Adds a duration to the phase, summing repeated calls of the same phase.
+        """
+        phase = self.phases.setdefault(name, [0.0, 0])
+        phase[0] += duration
+        phase[1] += 1
+
+    def header(self, total: float, queries: Optional[QueryStats] = None):
+        """
+        Builds the header value, durations are in milliseconds.
+
+        Args:
+            total (float): Time spent on the whole request in seconds.
+            queries (QueryStats, optional): The request's query statistics, reported as `db`.
+
+        Returns:
+            str: The `Server-Timing` header value.
+        """
+        metrics = []
+
+        for name, (duration, calls) in self.phases.items():
+            metric = f"{name};dur={duration * 1000:.1f}"
+            if calls > 1:
+                metric += f';desc="{calls} calls"'
+            metrics.append(metric)
+
+        if queries is not None:
+            metrics.append(f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"')
+
+        metrics.append(f"total;dur={total * 1000:.1f}")
+
+        return ", ".join(metrics)
+
+_current_timing: ContextVar[Optional[ServerTiming]] = ContextVar("server_timing", default=None)
+
+@contextmanager
+def phase(name: str):
+    """
+    Times the block as the named phase of the current request, if there is one.
+    """
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+def timed(name: Union[str, Callable, None] = None):
+    """
+    Decorator timing every call of a function as a request phase.
+    The phase is named after the function's qualified name unless `name` is given.
+    """
+    if callable(name):
+        return timed()(name)
+
+    def decorator(func: Callable):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+def register_server_timing(app):
+    """
+    Collects the phases timed during a request and attaches them to the
+    response as a `Server-Timing` header, together with the DB time and total.
+    Template rendering is timed through Flask's template signals.
+    """
+    @app.before_request
+    def start_server_timing():
+        g.server_timing_start = time.perf_counter()
+        g.server_timing = ServerTiming()
+        g.server_timing_token = _current_timing.set(g.server_timing)
+
+    @app.after_request
+    def add_server_timing_header(response):
+        if "server_timing" in g:
+            total = time.perf_counter() - g.server_timing_start
+            response.headers.add("Server-Timing", g.server_timing.header(total, g.get("query_stats")))
+
+        return response
+
+    @app.teardown_request
+    def finish_server_timing(exception=None):
+        token = g.pop("server_timing_token", None)
+        if token is not None:
+            _current_timing.reset(token)
+
+    def start_render(sender, template, context, **extra):
+        g.setdefault("render_starts", []).append(time.perf_counter())
+
+    def finish_render(sender, template, context, **extra):
+        timing = _current_timing.get()
+        starts = g.get("render_starts")
+
+        if timing is not None and starts:
+            timing.add("render", time.perf_counter() - starts.pop())
+
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(finish_render, app, weak=False)
@@ -1,8 +1,11 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
 from flask_blog.accounts.models import EmailUser
 from flask_blog.extensions import db
+from flask_blog.monitoring.timing import timed
 from flask_blog.blogs.models import BlogPost, Tag
-from sqlalchemy import func, select, update
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import selectinload
 
 class BlogPostRepository:
     def get_all_query(self, tag_slugs: Optional[List[str]] = None, search: Optional[str] = None):
@@ -16,7 +19,7 @@ class BlogPostRepository:
         Returns:
            The select statement to retrieve filtered blogs.
         """
-        stmt = select(BlogPost).join(BlogPost.tags)
+        stmt = select(BlogPost).join(BlogPost.tags).options(selectinload(BlogPost.tags))
 
         if tag_slugs:
             for tag_slug in tag_slugs:
@@ -25,9 +28,11 @@ class BlogPostRepository:
         if search:
             stmt = stmt.filter(BlogPost.title.ilike(f"%{search}%"))
 
-        stmt = stmt.order_by(BlogPost.created_at.desc()).distinct()
+        # The id breaks ties of the creation date, so pages and feed batches have one order
+        stmt = stmt.order_by(BlogPost.created_at.desc(), BlogPost.id.desc()).distinct()
         return stmt
     
+    @timed
     def get_all(self, tag_slugs: Optional[List[str]] = None, search: Optional[str] = None):
         """
         Executes the constructed query to retrieve all blog posts, optionally filtered by tags or search terms.
@@ -43,6 +48,7 @@ class BlogPostRepository:
 
         return db.session.execute(stmt).scalars()
 
+    @timed
     def get_paginated(self, stmt, page: Optional[int] = 1, per_page: Optional[int] = 6):
         """
         Paginates a given query statement.
@@ -57,6 +63,34 @@ class BlogPostRepository:
         """
         return db.paginate(stmt, page=page, per_page=per_page)
 
+    @timed
+    def get_feed(self, stmt, after: Optional[Tuple[datetime, int]] = None, limit: Optional[int] = 6):
+        """
+        Reads the next batch of a query by its position instead of an offset:
+        the blogs older than the given one, newest first. Nothing is counted or
+        skipped, so every batch costs one index range scan however deep the
+        reader has scrolled.
+
+        Args:
+            stmt: The SQLAlchemy select statement ordered by creation date and ID, newest first.
+            after (tuple, optional): The (created_at, id) of the last blog read. Defaults to None for the first batch.
+            limit (int, optional): The maximum number of blogs to return. Defaults to 6.
+
+        Returns:
+            list: A list of BlogPost objects.
+        """
+        if after:
+            created_at, blog_id = after
+            # The first condition alone bounds the scan of the (created_at, id) index
+            stmt = (
+                stmt
+                .where(BlogPost.created_at <= created_at)
+                .where(or_(BlogPost.created_at < created_at, BlogPost.id < blog_id))
+            )
+
+        return db.session.execute(stmt.limit(limit)).scalars().all()
+
+    @timed
     def get_by_id(self, blog_id: int):
         """
         Retrieves a blog post by its unique identifier (ID).
@@ -67,7 +101,7 @@ class BlogPostRepository:
         Returns:
             BlogPost or None: The BlogPost object if found, or None if no blog with the specified ID exists.
         """
-        stmt = select(BlogPost).where(BlogPost.id == blog_id)
+        stmt = select(BlogPost).options(selectinload(BlogPost.tags)).where(BlogPost.id == blog_id)
 
         return db.session.execute(stmt).scalar_one_or_none()
 
@@ -81,8 +115,14 @@ class BlogPostRepository:
         Returns:
             The select statement to retrieve blogs by the specified author.
         """
-        return select(BlogPost).filter(BlogPost.author_id == user.id).order_by(BlogPost.created_at.desc())
+        return (
+            select(BlogPost)
+            .options(selectinload(BlogPost.tags))
+            .filter(BlogPost.author_id == user.id)
+            .order_by(BlogPost.created_at.desc())
+        )
 
+    @timed
     def get_by_author(self, user: EmailUser):
         """
         Executes a query to retrieve all blog posts authored by a specific user.
@@ -97,20 +137,64 @@ class BlogPostRepository:
 
         return db.session.execute(stmt).scalars()
     
-    def get_recent(self, limit: Optional[int] = 3):
+    @timed
+    def get_titles_after(self, last_id: int, limit: Optional[int] = 10000):
+        """
+        Retrieves the IDs and titles of the blog posts after the given ID, ordered by ID.
+
+        Args:
+            last_id (int): The ID after which the blog posts are read.
+            limit (int, optional): The maximum number of blog posts to return. Defaults to 10000.
+
+        Returns:
+            list: A list of (id, title) tuples.
+        """
+        stmt = select(BlogPost.id, BlogPost.title).where(BlogPost.id > last_id).order_by(BlogPost.id).limit(limit)
+
+        return [tuple(row) for row in db.session.execute(stmt)]
+
+    @timed
+    def get_recent(self, limit: Optional[int] = 3, tag_slugs: Optional[List[str]] = None):
         """
         Retrieves the most recent blog posts, ordered by creation date.
 
         Args:
             limit (int, optional): The maximum number of recent blog posts to return. Defaults to 3.
+            tag_slugs (list, optional): A list of tag slugs the blog posts must have. Defaults to None.
 
         Returns:
             list: A list of the most recent BlogPost objects.
         """
-        stmt = select(BlogPost).order_by(BlogPost.created_at.desc()).limit(limit)
+        stmt = select(BlogPost).options(selectinload(BlogPost.tags))
+        for tag_slug in tag_slugs or []:
+            stmt = stmt.filter(BlogPost.tags.any(Tag.slug == tag_slug))
+        stmt = stmt.order_by(BlogPost.created_at.desc(), BlogPost.id.desc()).limit(limit)
 
         return db.session.execute(stmt).scalars().all()
 
+    @timed
+    def get_popular(self, limit: Optional[int] = 12):
+        """
+        Retrieves the most viewed blog posts, ordered by their views.
+
+        Args:
+            limit (int, optional): The maximum number of blog posts to return. Defaults to 12.
+
+        Returns:
+            list: A list of the most viewed BlogPost objects.
+        """
+        # Walks the (views, id) index from its end
+        stmt = (
+            select(BlogPost)
+            .options(selectinload(BlogPost.tags))
+            .where(BlogPost.views > 0)
+            .order_by(BlogPost.views.desc(), BlogPost.id.desc())
+            .limit(limit)
+        )
+
+        return db.session.execute(stmt).scalars().all()
+
+    @timed
     def get_related(self, blog: BlogPost, limit: Optional[int] = 3):
         """
         Retrieves related blog posts based on shared tags, excluding the current blog post.
@@ -125,6 +209,7 @@ class BlogPostRepository:
         stmt = (
             select(BlogPost)
             .join(BlogPost.tags)
+            .options(selectinload(BlogPost.tags))
             .filter(Tag.id.in_([tag.id for tag in blog.tags]))
             .filter(BlogPost.id != blog.id)
             .group_by(BlogPost.id)
@@ -134,7 +219,8 @@ class BlogPostRepository:
 
         return db.session.execute(stmt).scalars().all()
 
-    def create(self, title: str, content: str, image: str, author: EmailUser, tags: List[Tag]):
+    @timed
+    def create(self, title: str, content: str, image: str, author: EmailUser, tags: List[Tag], commit: bool = True):
         """
         Creates and persists a new blog post in the database.
 
@@ -144,6 +230,7 @@ class BlogPostRepository:
             image (str): The URL or file path to the image associated with the new blog post.
             author (EmailUser): The author of the new blog post.
             tags (list): A list of Tag objects to associate with the new blog post.
+            commit (bool, optional): Whether to commit, or leave the post in the session for the caller to commit.
 
         Returns:
             BlogPost: The created BlogPost object.
@@ -152,13 +239,16 @@ class BlogPostRepository:
         db.session.add(blog_post)
         db.session.flush()
         blog_post.tags.extend(tags)
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
         return blog_post
 
-    def update(self, blog: BlogPost, title: str, content: str, image: str, tags: List[Tag]):
+    @timed
+    def update(self, blog: BlogPost, title: str, content: str, image: str, tags: List[Tag], commit: bool = True):
         """
-        Updates an existing blog post with new data.
+        Updates an existing blog post with new data. The changes are set on the
+        post, so the session sees them, e.g. the reference counts of its image.
 
         Args:
             blog (BlogPost): The blog post to update.
@@ -166,21 +256,21 @@ class BlogPostRepository:
             content (str): The new content for the blog post.
             image (str): The new image URL or file path for the blog post.
             tags (list): A list of new Tag objects to associate with the blog post.
+            commit (bool, optional): Whether to commit, or leave the post in the session for the caller to commit.
 
         Returns:
             BlogPost: The updated BlogPost object.
         """
-        stmt = (
-            update(BlogPost)
-            .where(BlogPost.id == blog.id)
-            .values(title=title, content=content, image=image)
-        )
-        db.session.execute(stmt)
+        blog.title = title
+        blog.content = content
+        blog.image = image
         blog.tags = tags
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
         return blog
 
+    @timed
     def delete(self, blog: BlogPost):
         """
         Deletes a blog post from the database.
@@ -2,9 +2,11 @@ from datetime import datetime, timezone
 from typing import Optional
 from flask_blog.accounts.models import EmailUser
 from flask_blog.extensions import db
+from flask_blog.monitoring.timing import timed
 from sqlalchemy import select
 
 class EmailUserRepository:
+    @timed
     def get_by_email(self, email: str):
         """
         Retrieves an EmailUser by email.
@@ -20,6 +22,7 @@ class EmailUserRepository:
 
         return result
 
+    @timed
     def create(self,
             email: str,
             password: str,
@@ -53,6 +56,7 @@ class EmailUserRepository:
 
         return user
 
+    @timed
     def update(self, user: EmailUser):
         """
         Updates the EmailUser's data.
@@ -66,6 +70,7 @@ class EmailUserRepository:
         db.session.merge(user)
         db.session.commit()
 
+    @timed
     def get_by_id(self, user_id: int):
         """
         Retrieves an EmailUser by their ID.
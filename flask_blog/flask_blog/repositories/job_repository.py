@@ -0,0 +1,26 @@
+from flask_blog.blogs.models import Job
+from flask_blog.extensions import db
+from flask_blog.jobs import new_job
+from flask_blog.monitoring.timing import timed
+
+class JobRepository:
+    @timed
+    def enqueue(self, name: str, payload: dict, delay: float = 0) -> Job:
+        """
+        Adds a background job, run by `flask run-jobs` once it is committed.
+        It is committed with the writes pending in the session, like the post it
+        follows.
+
+        Args:
+            name (str): The name of the job's handler.
+            payload (dict): The JSON arguments of the handler.
+            delay (float, optional): Seconds before the job is due.
+
+        Returns:
+            Job: The queued job.
+        """
+        job = new_job(name, payload, delay)
+        db.session.add(job)
+        db.session.commit()
+
+        return job
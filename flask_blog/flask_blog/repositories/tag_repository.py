@@ -1,9 +1,11 @@
 from typing import List
 from flask_blog.blogs.models import Tag
 from flask_blog.extensions import db
+from flask_blog.monitoring.timing import timed
 from sqlalchemy import select
 
 class TagRepository:
+    @timed
     def get_all(self):
         """
         Retrieves all tag records from the database.
@@ -14,6 +16,21 @@ class TagRepository:
         stmt = select(Tag)
         return db.session.execute(stmt).scalars().all()
 
+    @timed
+    def get_by_slug(self, slug: str):
+        """
+        Retrieves a tag by its slug.
+
+        Args:
+            slug (str): The slug of the tag.
+
+        Returns:
+            Tag or None: The Tag object if found, or None if no tag has the slug.
+        """
+        stmt = select(Tag).where(Tag.slug == slug)
+        return db.session.execute(stmt).scalar_one_or_none()
+
+    @timed
     def get_by_ids(self, tag_ids: List[int]):
         """
         Retrieves multiple tags by their unique identifiers (IDs).
@@ -3,24 +3,56 @@ import uuid
 import cloudinary.uploader
 from flask import current_app
 from flask_blog.accounts.models import EmailUser
+from flask_blog.blogs.direct_uploads import verify_upload
 from flask_blog.blogs.exceptions import BlogPostNotFoundError
+from flask_blog.blogs.feed import FeedCursor
+from flask_blog.blogs.jobs import UPLOAD_IMAGE
+from flask_blog.blogs.media import store_media
 from flask_blog.blogs.models import BlogPost
+from flask_blog.blogs.suggest import title_index
+from flask_blog.monitoring.metrics import observe_upload
 from flask_blog.repositories.blog_post_repository import BlogPostRepository
+from flask_blog.repositories.job_repository import JobRepository
 from flask_blog.repositories.tag_repository import TagRepository
 from html_sanitizer import Sanitizer
+from functools import lru_cache
 from typing import List, Optional
 
+SANITIZER_SETTINGS = {
+    "tags": ["h1", "h2", "h3", "p", "b", "i", "u", "a", "ul", "ol", "li", "br", "strong", "em", "span"],
+    "attributes": {
+        "a": ["href", "target", "rel"],
+        "span": ["class", "contenteditable"],
+        "li": ["data-list"]
+    },
+    "empty": ["br", "p"],
+    "separate": ["li", "p", "br"],
+}
+
+@lru_cache(maxsize=None)
+def get_sanitizer() -> Sanitizer:
+    return Sanitizer(SANITIZER_SETTINGS)
+
+def sanitize_content(content: str) -> str:
+    """
+    Removes the disallowed HTML tags and attributes from blog content. A module
+    level function, so it can also run in the worker processes of an import.
+    """
+    return get_sanitizer().sanitize(content)
+
 class BlogPostService:
-    def __init__(self, blog_repo: BlogPostRepository, tag_repo: TagRepository):
+    def __init__(self, blog_repo: BlogPostRepository, tag_repo: TagRepository, job_repo: Optional[JobRepository] = None):
         """
         Initializes the BlogPostService with repositories for blog posts and tags.
 
         Args:
             blog_repo: An instance of the BlogPostRepository for blog operations.
             tag_repo: An instance of the TagRepository for tag-related operations.
+            job_repo: An instance of the JobRepository for the work done after a write.
         """
         self.blog_repo = blog_repo
         self.tag_repo = tag_repo
+        self.job_repo = job_repo
 
     def get_recent_blogs(self, limit: Optional[int] = 3):
         """
@@ -34,6 +66,56 @@ class BlogPostService:
         """
         return self.blog_repo.get_recent(limit=limit)
 
+    def get_recent_blogs_by_tags(self, tag_slugs: List[str], limit: Optional[int] = 3):
+        """
+        Retrieves the most recent blog posts having all the given tags.
+
+        Args:
+            tag_slugs (list): A list of tag slugs the blogs must have.
+            limit (int, optional): The maximum number of recent blog posts to retrieve. Defaults to 3.
+
+        Returns:
+            list: A list of BlogPost objects representing the most recent blogs.
+        """
+        return self.blog_repo.get_recent(limit=limit, tag_slugs=tag_slugs)
+
+    def get_popular_blogs(self, limit: Optional[int] = 12):
+        """
+        Retrieves the most viewed blog posts.
+
+        Args:
+            limit (int, optional): The maximum number of blog posts to retrieve. Defaults to 12.
+
+        Returns:
+            list: A list of BlogPost objects representing the most viewed blogs.
+        """
+        return self.blog_repo.get_popular(limit=limit)
+
+    def suggest_titles(self, query: str, limit: Optional[int] = 8):
+        """
+        Retrieves the blog posts whose title has a word starting with each word
+        of the query, from the title index of this process. The index is read
+        from the database on first use, and the posts added since are read
+        every `SUGGEST_REFRESH_SECONDS`, the writes of this process update it
+        right away.
+
+        Args:
+            query (str): The words typed into the search box so far.
+            limit (int, optional): The maximum number of suggestions. Defaults to 8.
+
+        Returns:
+            list: A list of (id, title) tuples.
+        """
+        if title_index.needs_refresh(current_app.config["SUGGEST_REFRESH_SECONDS"]):
+            rows, last_id = [], title_index.last_id
+            while batch := self.blog_repo.get_titles_after(last_id, current_app.config["SUGGEST_LOAD_BATCH_SIZE"]):
+                rows += batch
+                last_id = batch[-1][0]
+
+            title_index.add_many(rows)
+
+        return title_index.search(query, limit)
+
     def get_blog_by_id(self, blog_id: int):
         """
         Retrieves a single blog post by its unique identifier (ID).
@@ -82,6 +164,46 @@ class BlogPostService:
         stmt = self.blog_repo.get_all_query(tag_slugs, search)
         return self.blog_repo.get_paginated(stmt, page, per_page)
 
+    def get_blog_feed(self, tag_slugs: Optional[List[str]] = None, search: Optional[str] = None, cursor: Optional[FeedCursor] = None, per_page: Optional[int] = 6):
+        """
+        Retrieves the next batch of the infinite-scroll feed. A cursor continues
+        after its blog with the filters it was read with, without one the feed
+        starts at the newest blog matching the given filters.
+
+        Args:
+            tag_slugs (list, optional): A list of tag slugs to filter blogs by tags. Defaults to None.
+            search (str, optional): A search term to filter blogs by title. Defaults to None.
+            cursor (FeedCursor, optional): The position of the last batch read. Defaults to None.
+            per_page (int, optional): The number of blogs per batch. Defaults to 6.
+
+        Returns:
+            tuple: The BlogPost objects of the batch and the cursor of the next one, None after the last.
+        """
+        after = None
+        if cursor:
+            tag_slugs, search, after = cursor.tag_slugs, cursor.search, (cursor.created_at, cursor.id)
+
+        stmt = self.blog_repo.get_all_query(tag_slugs, search)
+        # One more than the batch tells whether there is a next one
+        blogs = self.blog_repo.get_feed(stmt, after, per_page + 1)
+        blogs, more = blogs[:per_page], len(blogs) > per_page
+
+        return blogs, self.feed_cursor(blogs[-1], tag_slugs, search) if more else None
+
+    def feed_cursor(self, last: BlogPost, tag_slugs: Optional[List[str]] = None, search: Optional[str] = None):
+        """
+        Builds the token continuing the feed after a batch or page of blogs.
+
+        Args:
+            last (BlogPost): The last blog shown.
+            tag_slugs (list, optional): The tag slugs the blogs were filtered by. Defaults to None.
+            search (str, optional): The search term the blogs were filtered by. Defaults to None.
+
+        Returns:
+            str: The opaque token of the position after the blog.
+        """
+        return FeedCursor(last.created_at, last.id, tag_slugs or [], search).encode()
+
     def get_user_blogs(self, user: EmailUser):
         """
         Retrieves all blog posts authored by a specific user.
@@ -122,9 +244,18 @@ class BlogPostService:
         """
         return self.blog_repo.get_related(blog, limit=limit)
 
-    def create_blog_post(self, title: str, content: str, image: str, author: EmailUser, tag_ids: List[int]):
+    def create_blog_post(
+        self,
+        title: str,
+        content: str,
+        image: str,
+        author: EmailUser,
+        tag_ids: List[int],
+        image_key: Optional[str] = None
+        ):
         """
-        Creates a new blog post with the provided details.
+        Creates a new blog post with the provided details. An image uploaded
+        to Cloudinary is set by a background job after the post is created.
 
         Args:
             title (str): The title of the new blog post.
@@ -132,19 +263,41 @@ class BlogPostService:
             image (str): The image associated with the new blog post.
             author (EmailUser): The author of the new blog post.
             tag_ids (list): A list of tag IDs to associate with the new blog post.
+            image_key (str, optional): The key of an image the browser uploaded straight to the storage, used instead of `image`.
+
+        Raises:
+            InvalidUploadError: If the image of `image_key` fails its checks.
 
         Returns:
             BlogPost: The newly created BlogPost object.
         """
         content = self.clean_content(content)
-        image_url = self.upload_image(image)
+        if image_key:
+            staged, image_url = None, verify_upload(image_key)
+        else:
+            staged = self.stage_image(image)
+            image_url = None if staged else self.upload_image(image)
         tags = self.tag_repo.get_by_ids(tag_ids)
 
-        return self.blog_repo.create(title, content, image_url, author, tags)
+        # The upload job is committed with the post, so neither is kept without the other
+        blog = self.blog_repo.create(title, content, image_url, author, tags, commit=not staged)
+        if staged:
+            self.job_repo.enqueue(UPLOAD_IMAGE, {"blog_id": blog.id, "path": staged})
+
+        return blog
 
-    def update_blog_post(self, blog_id: int, title: str, content: str, image: str, tag_ids: List[int]):
+    def update_blog_post(
+        self,
+        blog_id: int,
+        title: str,
+        content: str,
+        image: str,
+        tag_ids: List[int],
+        image_key: Optional[str] = None
+        ):
         """
-        Updates an existing blog post with new data.
+        Updates an existing blog post with new data. A new image uploaded to
+        Cloudinary replaces the current one once a background job uploaded it.
 
         Args:
             blog_id (int): The ID of the blog post to update.
@@ -152,9 +305,11 @@ class BlogPostService:
             content (str): The new content for the blog post.
             image (str): The new image for the blog post (if provided).
             tag_ids (list): A list of tag IDs to associate with the updated blog post.
+            image_key (str, optional): The key of an image the browser uploaded straight to the storage, used instead of `image`.
 
         Raises:
             abort(404): If the blog post with the provided ID does not exist.
+            InvalidUploadError: If the image of `image_key` fails its checks.
 
         Returns:
             BlogPost: The updated BlogPost object.
@@ -165,9 +320,17 @@ class BlogPostService:
 
         tags = self.tag_repo.get_by_ids(tag_ids)
         content = self.clean_content(content)
-        image_url = self.upload_image(image) if image else blog.image
+        if image_key:
+            staged, image_url = None, verify_upload(image_key)
+        else:
+            staged = self.stage_image(image)
+            image_url = self.upload_image(image) if image and not staged else blog.image
+
+        blog = self.blog_repo.update(blog, title, content, image_url, tags, commit=not staged)
+        if staged:
+            self.job_repo.enqueue(UPLOAD_IMAGE, {"blog_id": blog.id, "path": staged})
 
-        return self.blog_repo.update(blog, title, content, image_url, tags)
+        return blog
 
     def delete_blog_post(self, blog_id: int):
         """
@@ -198,23 +361,12 @@ class BlogPostService:
         Returns:
             str: The cleaned content, safe for rendering in the application.
         """
-        sanitizer = Sanitizer({
-            "tags": ["h1", "h2", "h3", "p", "b", "i", "u", "a", "ul", "ol", "li", "br", "strong", "em", "span"],
-            "attributes": {
-                "a": ["href", "target", "rel"],
-                "span": ["class", "contenteditable"],
-                "li": ["data-list"]
-            },
-            "empty": ["br", "p"],
-            "separate": ["li", "p", "br"],
-        })
-
-        return sanitizer.sanitize(content)
+        return sanitize_content(content)
 
     def upload_image(self, image_file):
         """
         Uploads an image file to Cloudinary and returns the secure URL of the uploaded image if cloudinary is enabled.
-        Otherwise uploads to local storage.
+        Otherwise uploads to local storage, named by the hash of its content, see `store_media`.
 
         Args:
             image_file (file): The image file to upload.
@@ -225,15 +377,39 @@ class BlogPostService:
         if not image_file:
             return None
 
+        image_file.stream.seek(0, os.SEEK_END)
+        size = image_file.stream.tell()
+        image_file.stream.seek(0)
+
         if current_app.config['USE_LOCAL_STORAGE']:
-            filename = f"{uuid.uuid4()}_{image_file.filename}"
+            with observe_upload("local", size):
+                key = store_media(image_file.stream, os.path.splitext(image_file.filename)[1])
 
-            upload_folder = current_app.config['UPLOAD_FOLDER']
+            return f"/media/{key}"
+        else:
+            with observe_upload("cloudinary", size):
+                upload_result = cloudinary.uploader.upload(image_file)
+            return upload_result["secure_url"]
 
-            file_path = os.path.join(upload_folder, filename)
-            image_file.save(file_path)
+    def stage_image(self, image_file):
+        """
+        Saves an image to be uploaded to Cloudinary to the staging folder, for
+        the `upload_image` job, so the request doesn't wait for the upload.
+        Stored locally, images are saved to their place right away.
 
-            return f"/media/{filename}"
-        else:
-            upload_result = cloudinary.uploader.upload(image_file)
-            return upload_result["secure_url"]
\ No newline at end of file
+        Args:
+            image_file (file): The image file to stage.
+
+        Returns:
+            str or None: The path of the staged file, or None if no image is provided or images are stored locally.
+        """
+        if not image_file or current_app.config['USE_LOCAL_STORAGE']:
+            return None
+
+        staging_folder = current_app.config['UPLOAD_STAGING_FOLDER']
+        os.makedirs(staging_folder, exist_ok=True)
+
+        file_path = os.path.join(staging_folder, f"{uuid.uuid4()}{os.path.splitext(image_file.filename)[1]}")
+        image_file.save(file_path)
+
+        return file_path
\ No newline at end of file
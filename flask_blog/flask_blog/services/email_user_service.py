@@ -62,6 +62,21 @@ class EmailUserService:
         user.username = new_username
         self.user_repo.update(user)
 
+    def rehash_password(self, user: EmailUser, password: str):
+        """
+        Rehashes the password of a user whose hash is in a format the app only
+        verifies, e.g. of users migrated from the Django app.
+
+        Args:
+            user (EmailUser): The user who just logged in with the password.
+            password (str): The verified plain-text password.
+
+        Returns:
+            None
+        """
+        user.set_password(password)
+        self.user_repo.update(user)
+
     def create_user(self, 
             email: str, 
             password: str, 
@@ -18,4 +18,16 @@ class TagService:
         Returns:
             list: A list of all Tag objects.
         """
-        return self.tag_repo.get_all()
\ No newline at end of file
+        return self.tag_repo.get_all()
+
+    def get_by_slug(self, slug: str):
+        """
+        Retrieves a tag by its slug.
+
+        Args:
+            slug (str): The slug of the tag.
+
+        Returns:
+            Tag or None: The Tag object, or None if no tag has the slug.
+        """
+        return self.tag_repo.get_by_slug(slug)
\ No newline at end of file
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from typing import Dict, Iterator, List
+from flask_blog.accounts.models import EmailUser
+from flask_blog.blogs.models import BlogPost, Tag, blogpost_tags
+from flask_blog.extensions import db
+from sqlalchemy import bindparam, select
+
+EXPORT_FORMATS = ["ndjson", "csv"]
+EXPORT_MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# The fields of an exported post, the same records the import reads
+EXPORT_FIELDS = ["id", "title", "content", "author", "tags", "image", "created_at"]
+
+EXPORT_POSTS_STMT = (
+    select(
+        BlogPost.id,
+        BlogPost.title,
+        BlogPost.content,
+        EmailUser.email.label("author"),
+        BlogPost.image,
+        BlogPost.created_at,
+    )
+    .join(EmailUser, EmailUser.id == BlogPost.author_id)
+    .where(BlogPost.id > bindparam("last_id"))
+    .order_by(BlogPost.id)
+    .limit(bindparam("chunk_size"))
+)
+EXPORT_TAGS_STMT = (
+    select(blogpost_tags.c.blogpost_id, Tag.name)
+    .join(Tag, Tag.id == blogpost_tags.c.tag_id)
+    .where(blogpost_tags.c.blogpost_id.in_(bindparam("blog_ids", expanding=True)))
+    .order_by(Tag.name)
+)
+
+def export_chunks(chunk_size: int = 1000) -> Iterator[List[Dict]]:
+    """
+    Yields every blog post with its author email and tag names, in chunks
+    ordered by id. Each chunk is read by keyset pagination on a connection
+    that goes back to the pool right after, so the memory stays constant and
+    a slow download doesn't keep a database connection or transaction open.
+
+    Args:
+        chunk_size (int, optional): Number of posts read per chunk.
+    """
+    last_id = 0
+    while True:
+        with db.engine.connect() as connection:
+            posts = connection.execute(EXPORT_POSTS_STMT, {"last_id": last_id, "chunk_size": chunk_size}).all()
+            if not posts:
+                return
+
+            tags = defaultdict(list)
+            for blog_id, name in connection.execute(EXPORT_TAGS_STMT, {"blog_ids": [post.id for post in posts]}):
+                tags[blog_id].append(name)
+
+        yield [{**post._mapping, "tags": tags[post.id], "created_at": post.created_at.isoformat()} for post in posts]
+        last_id = posts[-1].id
+
+def format_chunk(rows: List[Dict], format: str, header: bool = False) -> str:
+    """
+    Formats exported rows as NDJSON lines or CSV rows, the CSV tags comma separated.
+    """
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS)
+        if header:
+            writer.writeheader()
+        writer.writerows({**row, "tags": ", ".join(row["tags"])} for row in rows)
+        return buffer.getvalue()
+
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+def stream_export(format: str, chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Yields the export of all blog posts as NDJSON or CSV text, one piece per chunk.
+    """
+    if format == "csv":
+        yield format_chunk([], format, header=True)
+
+    for rows in export_chunks(chunk_size):
+        yield format_chunk(rows, format)
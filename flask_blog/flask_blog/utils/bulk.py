@@ -0,0 +1,59 @@
+import csv
+import io
+from typing import Any, Dict, List, Sequence
+from flask_blog.extensions import db
+from sqlalchemy import Table, insert, text
+
+
+def bulk_insert(table: Table, rows: Sequence[Dict[str, Any]], use_copy: bool = True):
+    """
+    Inserts many rows into a table with as few round trips as possible.
+
+    On PostgreSQL the rows are streamed with COPY through the psycopg2 connection,
+    on other databases they are sent as a batched executemany INSERT, which
+    psycopg2 turns into multi-row VALUES statements.
+
+    Args:
+        table (Table): The table to insert into.
+        rows (list): The rows as dictionaries, all with the same keys.
+        use_copy (bool, optional): Whether COPY may be used on PostgreSQL. Defaults to True.
+
+    Returns:
+        int: The number of inserted rows.
+    """
+    if not rows:
+        return 0
+
+    connection = db.session.connection()
+
+    if use_copy and connection.dialect.name == "postgresql":
+        columns: List[str] = list(rows[0].keys())
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+        buffer.seek(0)
+
+        with connection.connection.driver_connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        db.session.execute(insert(table), list(rows))
+
+    return len(rows)
+
+def reset_sequences(tables: Sequence[Table]):
+    """
+    Moves the PostgreSQL id sequences past rows inserted with explicit ids.
+
+    Args:
+        tables (list): The tables whose `id` sequence should be reset.
+    """
+    if db.session.connection().dialect.name != "postgresql":
+        return
+
+    for table in tables:
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+        ))
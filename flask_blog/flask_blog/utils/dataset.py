@@ -0,0 +1,203 @@
+import random
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterator, List, Sequence, Tuple
+from faker import Faker
+from slugify import slugify
+
+BASE_TAG_NAMES = [
+    'Technology', 'Programming', 'Python',
+    'Travel', 'Food', 'Health', 'Science', 'Education',
+    'Art', 'Music', 'Photography', 'Design', 'Books'
+]
+
+SAMPLE_IMAGES = ['/media/food.jpg', '/media/tech.png', None]
+SAMPLE_IMAGE_WEIGHTS = [3, 3, 4]
+
+TAGS_PER_POST = [1, 2, 3, 4, 5]
+TAGS_PER_POST_WEIGHTS = [25, 35, 22, 12, 6]
+
+DEFAULT_END_DATE = datetime(2025, 6, 1)
+
+
+class DatasetGenerator:
+    """
+    Deterministic generator of users, tags and blog posts for load and scaling tests.
+
+    The same seed always yields the same rows, so runs against different schemas
+    or databases can be compared. Tag popularity and authorship follow a Zipf-like
+    distribution and content length is log-normal, giving a long tail of large posts.
+    """
+
+    def __init__(
+        self,
+        seed: int = 42,
+        days: int = 3 * 365,
+        end_date: datetime = DEFAULT_END_DATE,
+        max_paragraphs: int = 120,
+    ):
+        """
+        Initializes the generator.
+
+        Args:
+            seed (int, optional): Seed for all random choices. Defaults to 42.
+            days (int, optional): The time span the posts' creation dates are spread over. Defaults to three years.
+            end_date (datetime, optional): Creation date of the newest generated post.
+            max_paragraphs (int, optional): Upper bound of paragraphs in a single post. Defaults to 120.
+        """
+        self.seed = seed
+        self.days = days
+        self.end_date = end_date
+        self.max_paragraphs = max_paragraphs
+
+        self.rng = random.Random(seed)
+        self.faker = Faker()
+        self.faker.seed_instance(seed)
+
+        # Pools are generated once, assembling posts from them is much cheaper than calling Faker per post
+        self.words = list(dict.fromkeys(self.faker.words(nb=3000)))
+        self.sentences = [self.faker.sentence(nb_words=self.rng.randint(6, 18)) for _ in range(4000)]
+
+    def users(self, count: int, start_id: int, password_hash: str) -> List[Dict]:
+        """
+        Generates user rows.
+
+        Args:
+            count (int): Number of users to generate.
+            start_id (int): The id of the first generated user.
+            password_hash (str): Precomputed password hash shared by all users.
+
+        Returns:
+            list: Dictionaries with `id`, `email`, `username`, `password_hash`, `is_active`, `is_staff` and `created_at`.
+        """
+        users = []
+        for user_id in range(start_id, start_id + count):
+            username = self.faker.user_name()
+            users.append({
+                "id": user_id,
+                "email": f"{username}.{user_id}@example.com",
+                "username": username,
+                "password_hash": password_hash,
+                "is_active": True,
+                "is_staff": False,
+                "created_at": self.end_date - timedelta(days=self.days, minutes=self.rng.randint(0, 60 * 24 * 30)),
+            })
+
+        return users
+
+    def tags(self, count: int, start_id: int, existing_names: Sequence[str] = ()) -> List[Dict]:
+        """
+        Generates tag rows with unique names and slugs.
+
+        Args:
+            count (int): Number of tags to generate.
+            start_id (int): The id of the first generated tag.
+            existing_names (list, optional): Tag names already present in the database.
+
+        Returns:
+            list: Dictionaries with `id`, `name` and `slug`.
+        """
+        taken = {name.lower() for name in existing_names}
+        candidates = BASE_TAG_NAMES + [word.capitalize() for word in self.words]
+
+        tags = []
+        for name in candidates:
+            if len(tags) == count:
+                break
+            if name.lower() in taken:
+                continue
+
+            taken.add(name.lower())
+            tags.append({"id": start_id + len(tags), "name": name, "slug": slugify(name)})
+
+        suffix = 1
+        while len(tags) < count:
+            name = f"{self.rng.choice(self.words).capitalize()} {suffix}"
+            suffix += 1
+            if name.lower() in taken:
+                continue
+
+            taken.add(name.lower())
+            tags.append({"id": start_id + len(tags), "name": name, "slug": slugify(name)})
+
+        return tags
+
+    def posts(
+        self,
+        count: int,
+        start_id: int,
+        author_ids: Sequence[int],
+        tag_ids: Sequence[int],
+        batch_size: int = 5000,
+    ) -> Iterator[Tuple[List[Dict], List[Tuple[int, int]]]]:
+        """
+        Generates blog post rows and their tag associations in batches.
+
+        Args:
+            count (int): Number of posts to generate.
+            start_id (int): The id of the first generated post.
+            author_ids (list): Ids of users the posts are attributed to.
+            tag_ids (list): Ids of tags the posts are associated with.
+            batch_size (int, optional): Number of posts per yielded batch. Defaults to 5000.
+
+        Yields:
+            tuple: A list of post dictionaries (`id`, `title`, `content`, `image`, `created_at`, `author_id`)
+                and a list of `(post_id, tag_id)` pairs.
+        """
+        author_weights = list(accumulate(1 / (rank ** 0.8) for rank in range(1, len(author_ids) + 1)))
+        tag_weights = list(accumulate(1 / (rank ** 1.1) for rank in range(1, len(tag_ids) + 1)))
+        max_tags = min(len(tag_ids), TAGS_PER_POST[-1])
+
+        span = timedelta(days=self.days)
+        start_date = self.end_date - span
+
+        posts, links = [], []
+        for index in range(count):
+            post_id = start_id + index
+            created_at = start_date + span * ((index + self.rng.random()) / count)
+
+            posts.append({
+                "id": post_id,
+                "title": self.title(),
+                "content": self.content(),
+                "image": self.rng.choices(SAMPLE_IMAGES, weights=SAMPLE_IMAGE_WEIGHTS)[0],
+                "created_at": created_at.replace(microsecond=0),
+                "author_id": author_ids[self.weighted_index(author_weights)],
+            })
+
+            tag_count = min(max_tags, self.rng.choices(TAGS_PER_POST, weights=TAGS_PER_POST_WEIGHTS)[0])
+            post_tags = set()
+            while len(post_tags) < tag_count:
+                post_tags.add(tag_ids[self.weighted_index(tag_weights)])
+            links.extend((post_id, tag_id) for tag_id in sorted(post_tags))
+
+            if len(posts) == batch_size:
+                yield posts, links
+                posts, links = [], []
+
+        if posts:
+            yield posts, links
+
+    def title(self) -> str:
+        """
+        Returns a random title of 3 to 10 words.
+        """
+        return " ".join(self.rng.sample(self.words, self.rng.randint(3, 10))).capitalize()[:255]
+
+    def content(self) -> str:
+        """
+        Returns random HTML content with a log-normally distributed number of paragraphs.
+        """
+        paragraph_count = min(self.max_paragraphs, max(1, int(self.rng.lognormvariate(0.8, 0.9))))
+
+        return "".join(
+            f"<p>{' '.join(self.rng.choices(self.sentences, k=self.rng.randint(2, 7)))}</p>"
+            for _ in range(paragraph_count)
+        )
+
+    def weighted_index(self, cumulative_weights: List[float]) -> int:
+        """
+        Picks an index according to the given cumulative weights.
+        """
+        return bisect(cumulative_weights, self.rng.random() * cumulative_weights[-1])
@@ -0,0 +1,9 @@
+import os
+from prometheus_client import multiprocess
+
+def child_exit(server, worker):
+    """
+    Drops the live gauges of a worker that exited, so `/metrics` only sums the running workers.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
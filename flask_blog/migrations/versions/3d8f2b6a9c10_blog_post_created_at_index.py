@@ -0,0 +1,25 @@
+"""Blog post created_at index
+
+Revision ID: 3d8f2b6a9c10
+Revises: 5a9c1e7d3b42
+Create Date: 2026-10-19 18:12:40.527318
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8f2b6a9c10'
+down_revision = '5a9c1e7d3b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blog_post', schema=None) as batch_op:
+        batch_op.create_index('ix_blog_post_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('blog_post', schema=None) as batch_op:
+        batch_op.drop_index('ix_blog_post_created_at_id')
@@ -0,0 +1,29 @@
+"""Media file
+
+Revision ID: 4a8e2d6c1f73
+Revises: 9c2e5a7f4b18
+Create Date: 2026-10-20 00:52:08.194630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a8e2d6c1f73'
+down_revision = '9c2e5a7f4b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_file',
+    sa.Column('key', sa.String(length=80), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('media_file')
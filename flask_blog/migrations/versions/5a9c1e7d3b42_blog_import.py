@@ -0,0 +1,35 @@
+"""Blog import
+
+Revision ID: 5a9c1e7d3b42
+Revises: cc7e6008e23f
+Create Date: 2026-10-19 14:41:08.316052
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9c1e7d3b42'
+down_revision = 'cc7e6008e23f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blog_import',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('checksum', sa.String(length=64), nullable=False),
+    sa.Column('file_name', sa.String(length=255), nullable=False),
+    sa.Column('records', sa.Integer(), nullable=False),
+    sa.Column('imported', sa.Integer(), nullable=False),
+    sa.Column('skipped', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('checksum')
+    )
+
+
+def downgrade():
+    op.drop_table('blog_import')
@@ -0,0 +1,28 @@
+"""Blog post views
+
+Revision ID: 7b4d1f9e2a63
+Revises: 3d8f2b6a9c10
+Create Date: 2026-10-19 21:48:13.602941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4d1f9e2a63'
+down_revision = '3d8f2b6a9c10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blog_post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('views', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_blog_post_views_id', ['views', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('blog_post', schema=None) as batch_op:
+        batch_op.drop_index('ix_blog_post_views_id')
+        batch_op.drop_column('views')
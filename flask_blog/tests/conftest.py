@@ -2,6 +2,10 @@ from datetime import datetime, timedelta, timezone
 from flask_blog import create_app
 from flask_blog.accounts.models import EmailUser
 from flask_blog.blogs.models import BlogPost, Tag
+from flask_blog.blogs.rss import feed_cache
+from flask_blog.blogs.sitemap import sitemap_cache
+from flask_blog.blogs.suggest import title_index
+from flask_blog.blogs.view_counts import view_counter
 from flask_blog.extensions import db
 import pytest
 
@@ -15,6 +19,11 @@ def app():
         yield app
         db.session.remove()
         db.drop_all()
+        # Every test starts from a new database, whose titles, feeds and sitemaps are read again
+        title_index.clear()
+        feed_cache.clear()
+        sitemap_cache.clear()
+        view_counter.counts.clear()
 
 @pytest.fixture(scope="function")
 def client(app):
@@ -27,6 +27,22 @@ def test_login_view(client, registered_user):
     assert "Login successful.".encode() in response.data
     assert current_user.is_authenticated
 
+def test_login_rehashes_migrated_django_password(client, registered_user):
+    """
+    A user migrated from the Django app logs in with their PBKDF2 hash, which is replaced with bcrypt.
+    """
+    registered_user.password_hash = "pbkdf2_sha256$1000$fixedsalt123$Q7rDFqNfnf/bOPsjjQE7aMIJtqWx8ULXMkJbaAvmFgE="
+    db.session.commit()
+
+    response = client.post(url_for("accounts.login"), data={
+        "email": registered_user.email,
+        "password": "password"
+    }, follow_redirects=True)
+
+    assert response.status_code == 200
+    assert current_user.is_authenticated
+    assert db.session.get(EmailUser, registered_user.id).password_hash.startswith("$2")
+
 def test_login_invalid_credentials(client):
     """
     Login with invalid credentials should fail and show an error message.
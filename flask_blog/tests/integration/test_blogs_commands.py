@@ -0,0 +1,299 @@
+import io
+import json
+from datetime import datetime
+from flask_blog.accounts.models import EmailUser
+from flask_blog.blogs.models import BlogImport, BlogPost, Tag, blogpost_tags
+from flask_blog.extensions import db
+from flask_blog.jobs import JobRunner
+from flask_blog.utils import blog_import, data_migration, static_site
+from flask_blog.utils.blog_export import export_chunks
+from flask_blog.utils.data_migration import remap_image, schema_tables
+from flask_blog.utils.dataset import DatasetGenerator
+from sqlalchemy import create_engine, func, insert, select
+import pytest
+
+def post(title, **fields):
+    return {"title": title, "content": f"<p>{title} content</p>", "author": "test@example.com", **fields}
+
+def write_ndjson(path, records):
+    path.write_text("\n".join(record if isinstance(record, str) else json.dumps(record) for record in records) + "\n")
+    return path
+
+def count(model):
+    return db.session.execute(select(func.count()).select_from(model)).scalar()
+
+def test_generate_dataset(app, test_data):
+    """The generate-dataset command bulk loads posts after the existing rows."""
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["generate-dataset", "--users", "4", "--tags", "6", "--posts", "90", "--batch-size", "40"])
+
+    assert result.exit_code == 0
+    assert "Created 4 users, 4 tags, 90 blog posts" in result.output
+    assert db.session.execute(select(func.count()).select_from(BlogPost)).scalar() == 7 + 90
+    assert db.session.execute(select(func.count()).select_from(Tag)).scalar() == 6
+    assert db.session.execute(select(func.count()).select_from(blogpost_tags)).scalar() >= 8 + 90
+
+def test_dataset_generator_is_deterministic():
+    """The same seed generates the same posts."""
+    first = list(DatasetGenerator(seed=9).posts(30, 1, [1, 2], [1, 2, 3], batch_size=10))
+    second = list(DatasetGenerator(seed=9).posts(30, 1, [1, 2], [1, 2, 3], batch_size=10))
+
+    assert first == second
+    assert len(first) == 3
+
+def test_import_blogs(app, test_data, tmp_path):
+    """The import-blogs command imports valid posts with their tags and skips the rest."""
+    path = write_ndjson(tmp_path / "posts.ndjson", [
+        post("Imported 1", tags=["Food", "New Tag"], content="<p>Safe</p><script>alert(1)</script>"),
+        "{not json",
+        post("Imported 2", author="nobody@example.com"),
+        post("Imported 3", tags=["new tag"]),
+    ])
+
+    result = app.test_cli_runner().invoke(args=["import-blogs", str(path), "--batch-size", "2", "--workers", "2"])
+
+    assert result.exit_code == 0
+    assert "Line 2: not a JSON object" in result.output
+    assert "Line 3: unknown author nobody@example.com" in result.output
+    assert "Imported 2 blog posts and skipped 2 of 4 records." in result.output
+
+    imported = db.session.execute(select(BlogPost).where(BlogPost.title.startswith("Imported"))).scalars().all()
+    new_tag = db.session.execute(select(Tag).filter_by(slug="new-tag")).scalar_one()
+
+    assert [blog.title for blog in imported] == ["Imported 1", "Imported 3"]
+    assert imported[0].content == "<p>Safe</p>"
+    assert sorted(tag.slug for tag in imported[0].tags) == ["food", "new-tag"]
+    assert imported[1].tags == [new_tag]
+
+def test_import_blogs_csv(app, test_data, tmp_path):
+    """A CSV file with comma separated tags is imported."""
+    path = tmp_path / "posts.csv"
+    path.write_text('title,content,author,tags\nCSV post,<p>From CSV</p>,test@example.com,"Tech, Food"\n')
+
+    result = blog_import.import_blog_posts(path, workers=1, report=lambda message: None)
+
+    blog = db.session.execute(select(BlogPost).filter_by(title="CSV post")).scalar_one()
+    assert result["imported"] == 1
+    assert sorted(tag.slug for tag in blog.tags) == ["food", "tech"]
+
+def test_import_blogs_resumes_after_last_batch(app, test_data, tmp_path, monkeypatch):
+    """A failed import continues after its last committed batch and runs once."""
+    path = write_ndjson(tmp_path / "posts.ndjson", [post(f"Imported {i}") for i in range(5)])
+    write_batch = blog_import._write_batch
+    calls = []
+
+    def failing_write_batch(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return write_batch(*args)
+
+    monkeypatch.setattr(blog_import, "_write_batch", failing_write_batch)
+    with pytest.raises(RuntimeError):
+        blog_import.import_blog_posts(path, batch_size=2, workers=1, report=lambda message: None)
+
+    assert count(BlogPost) == 7 + 2
+
+    monkeypatch.setattr(blog_import, "_write_batch", write_batch)
+    for _ in range(2):
+        result = blog_import.import_blog_posts(path, batch_size=2, workers=1, report=lambda message: None)
+
+    import_ = db.session.execute(select(BlogImport)).scalar_one()
+    assert result["imported"] == 5
+    assert count(BlogPost) == 7 + 5
+    assert import_.records == 5 and import_.finished_at is not None
+
+def test_admin_imports_uploaded_posts(app, logged_in_client, test_data, tmp_path):
+    """Staff users can upload an NDJSON file from the admin, imported by a job."""
+    test_data.is_staff = True
+    db.session.commit()
+    app.config["IMPORT_FOLDER"] = tmp_path
+    data = json.dumps(post("Uploaded", tags=["Tech"])).encode()
+
+    response = logged_in_client.post(
+        "/admin/import_blogs/",
+        data={"file": (io.BytesIO(data), "posts.ndjson")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 302
+    assert db.session.execute(select(BlogPost).filter_by(title="Uploaded")).scalar_one_or_none() is None
+    assert b"posts.ndjson: queued" in logged_in_client.get("/admin/import_blogs/").data
+
+    assert JobRunner(app).run_pending() == 1
+
+    blog_import = db.session.execute(select(BlogImport)).scalar_one()
+    assert db.session.execute(select(BlogPost).filter_by(title="Uploaded")).scalar_one_or_none() is not None
+    assert (blog_import.imported, blog_import.skipped, blog_import.records) == (1, 0, 1)
+    assert blog_import.finished_at is not None
+    assert list(tmp_path.iterdir()) == []
+    assert b"<td>posts.ndjson</td>" in logged_in_client.get("/admin/import_blogs/").data
+
+def test_export_reads_fixed_size_chunks(app, test_data):
+    """The posts are exported in chunks ordered by id with their author and tags."""
+    chunks = list(export_chunks(chunk_size=3))
+
+    rows = {row["title"]: row for chunk in chunks for row in chunk}
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [row["id"] for chunk in chunks for row in chunk] == sorted(row["id"] for row in rows.values())
+    assert rows["Blog7"]["tags"] == ["Food", "Tech"]
+    assert rows["Blog1 search"]["author"] == "test@example.com"
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_export_blogs_can_be_imported(app, test_data, tmp_path, format):
+    """The export-blogs command writes records the import reads."""
+    path = tmp_path / f"posts.{format}"
+
+    result = app.test_cli_runner().invoke(args=["export-blogs", str(path), "--chunk-size", "4"])
+
+    with open(path, newline="", encoding="utf-8") as file:
+        records = [blog_import.parse_record(record) for _, record in blog_import.read_records(file, format)]
+
+    assert result.exit_code == 0
+    assert len(records) == 7
+    assert {"food": "Food", "tech": "Tech"} in [record["tags"] for record in records]
+
+def test_admin_exports_posts(logged_in_client, test_data):
+    """Staff users can download all blog posts from the admin."""
+    test_data.is_staff = True
+    db.session.commit()
+
+    response = logged_in_client.get("/admin/export_blogs/?format=csv")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.get_data(as_text=True).splitlines()[0] == "id,title,content,author,tags,image,created_at"
+    assert len(response.get_data(as_text=True).splitlines()) == 1 + 7
+
+DJANGO_HASH = "pbkdf2_sha256$1000$fixedsalt123$Q7rDFqNfnf/bOPsjjQE7aMIJtqWx8ULXMkJbaAvmFgE="
+
+@pytest.fixture
+def django_database(tmp_path):
+    """A database with the tables of the Django app and some data."""
+    url = f"sqlite:///{tmp_path / 'django.db'}"
+    engine = create_engine(url)
+    tables = schema_tables("django")
+    created_at = datetime(2024, 5, 1, 10, 0)
+
+    with engine.begin() as conn:
+        tables["users"].metadata.create_all(conn)
+        conn.execute(insert(tables["users"]), [
+            {"id": 4, "email": "author@example.com", "username": "author", "password": DJANGO_HASH,
+             "is_active": True, "is_staff": True, "created_at": created_at},
+        ])
+        conn.execute(insert(tables["tags"]), [{"id": 6, "name": "Food", "slug": "food"}])
+        conn.execute(insert(tables["posts"]), [
+            {"id": id, "title": f"Post {id}", "content": "<p>Content</p>", "image": "images/food.jpg",
+             "created_at": created_at, "author_id": 4}
+            for id in range(20, 25)
+        ])
+        conn.execute(insert(tables["links"]), [{"blogpost_id": 21, "tag_id": 6}, {"blogpost_id": 23, "tag_id": 6}])
+    engine.dispose()
+
+    return url
+
+def test_remap_image():
+    """Image paths get or lose Django's missing /media prefix and Cloudinary host."""
+    assert remap_image("/media/food.jpg", "flask", "django") == "food.jpg"
+    assert remap_image("images/food.jpg", "django", "flask") == "/media/images/food.jpg"
+    assert remap_image("image/upload/v1/food.jpg", "django", "flask", cloud_name="demo") == (
+        "https://res.cloudinary.com/demo/image/upload/v1/food.jpg"
+    )
+
+def test_migrate_data(app, django_database):
+    """The migrate-data command copies a Django database with its ids and verifies it."""
+    result = app.test_cli_runner().invoke(args=["migrate-data", "django", django_database, "--batch-size", "2"])
+
+    assert result.exit_code == 0
+    assert "posts: 5 in the source, 5 in the target, OK" in result.output
+    assert "links: 2 in the source, 2 in the target, OK" in result.output
+
+    user = db.session.get(EmailUser, 4)
+    post = db.session.get(BlogPost, 21)
+
+    assert user.check_password("password") and user.is_staff
+    assert post.image == "/media/images/food.jpg"
+    assert [tag.id for tag in post.tags] == [6]
+
+def test_migrate_data_resumes_and_detects_mismatch(app, django_database, monkeypatch):
+    """A failed migration continues after its last committed batch, and changed rows fail the verification."""
+    bulk_insert = data_migration.bulk_insert
+    calls = []
+
+    def failing_bulk_insert(table, rows, use_copy=True):
+        calls.append(table.name)
+        if calls.count("blog_post") == 2:
+            raise RuntimeError("connection lost")
+        return bulk_insert(table, rows, use_copy)
+
+    monkeypatch.setattr(data_migration, "bulk_insert", failing_bulk_insert)
+    with pytest.raises(RuntimeError):
+        data_migration.migrate_data(django_database, "django", batch_size=2, report=lambda message: None)
+
+    monkeypatch.setattr(data_migration, "bulk_insert", bulk_insert)
+    result = data_migration.migrate_data(django_database, "django", batch_size=2, report=lambda message: None)
+
+    assert result["copied"]["posts"] == 3
+    assert count(BlogPost) == 5
+
+    db.session.get(BlogPost, 22).title = "Changed"
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["migrate-data", "django", django_database, "--verify-only"])
+
+    assert result.exit_code == 1
+    assert "posts: 5 in the source, 5 in the target, MISMATCH" in result.output
+
+def blog_id(title):
+    return db.session.execute(select(BlogPost.id).where(BlogPost.title == title)).scalar_one()
+
+def test_build_static_renders_public_pages(app, test_data, tmp_path):
+    """The build-static command renders the index, the list pages of all blogs and of every tag, the detail pages and the assets."""
+    result = app.test_cli_runner().invoke(args=["build-static", str(tmp_path), "--workers", "1"])
+
+    assert result.exit_code == 0
+    # The index, two pages of all blogs, one per tag and seven detail pages
+    assert "Rendered 12 of 12 pages" in result.output
+    assert "Blog7" in (tmp_path / "index.html").read_text()
+    assert "Blog1 search" in (tmp_path / "blogs/list/all/2.html").read_text()
+    tech = (tmp_path / "blogs/list/tag/tech/1.html").read_text()
+    assert "Blog7" in tech and "Blog2" in tech and "Blog3" not in tech
+    assert "Content4" in (tmp_path / f"blogs/{blog_id('Blog4 search')}.html").read_text()
+    assert (tmp_path / "static/css/tailwind.css").exists()
+
+    manifest = json.loads((tmp_path / static_site.MANIFEST_FILE).read_text())
+    assert manifest["pages"]["/blogs?page=2"]["deps"] == [str(blog_id("Blog1 search"))]
+
+def test_build_static_renders_only_affected_pages(app, test_data, tmp_path):
+    """A build after the first renders only the pages showing changed posts, and removes the pages gone."""
+    def build():
+        return static_site.build_site(app, tmp_path, "http://localhost", app.config["STATIC_FOLDER"])
+
+    build()
+    assert build()["rendered"] == 0
+    second_page = (tmp_path / "blogs/list/all/2.html").stat().st_mtime_ns
+
+    blog = db.session.get(BlogPost, blog_id("Blog2"))
+    blog.title = "Blog2 renamed"
+    db.session.commit()
+
+    result = build()
+
+    # The detail page, the pages of all and of the tech blogs listing it, and the detail pages linking to it
+    assert 3 <= result["rendered"] < 12
+    assert "Blog2 renamed" in (tmp_path / f"blogs/{blog.id}.html").read_text()
+    assert "Blog2 renamed" in (tmp_path / "blogs/list/all/1.html").read_text()
+    assert "Blog2 renamed" in (tmp_path / "blogs/list/tag/tech/1.html").read_text()
+    assert (tmp_path / "blogs/list/all/2.html").stat().st_mtime_ns == second_page
+
+    deleted_id = blog_id("Blog1 search")
+    db.session.delete(db.session.get(BlogPost, deleted_id))
+    db.session.commit()
+
+    result = build()
+
+    assert result["removed"] == 2
+    assert not (tmp_path / f"blogs/{deleted_id}.html").exists()
+    assert not (tmp_path / "blogs/list/all/2.html").exists()
@@ -1,7 +1,17 @@
+import pytest
+import re
+from datetime import datetime, timedelta, timezone
+import xml.etree.ElementTree as ET
 from flask import url_for
 from flask_blog.accounts.models import EmailUser
-from flask_blog.blogs.models import BlogPost
+from flask_blog.blogs.models import BlogPost, Tag
+from flask_blog.blogs.view_counts import ViewCounter, view_counter
 from flask_blog.extensions import db
+from flask_blog.monitoring.queries import assert_max_queries, record_queries
+from sqlalchemy import event
+
+def blog_views():
+    return dict(db.session.execute(db.select(BlogPost.title, BlogPost.views)).all())
 
 def test_index_page(client, test_data):
     """Test that the index page loads successfully."""
@@ -77,6 +87,205 @@ def test_blogs_search_function(client, test_data):
     assert "Blog2".encode() not in response.data
     assert "Blog5".encode() not in response.data
 
+def test_blogs_fragment(client, test_data):
+    """
+    The fragment holds only the filtered blog list and its pagination, whose links keep the filters.
+    """
+    page = client.get(url_for("blogs.blogs", search="search"))
+    response = client.get(url_for("blogs.blogs_fragment", search="search"))
+
+    assert response.status_code == 200
+    assert "Blog1 search".encode() in response.data
+    assert "Blog4 search".encode() in response.data
+    assert "Blog2".encode() not in response.data
+    assert b"<html" not in response.data and b"quill" not in response.data
+    assert len(response.data) * 2 < len(page.data)
+
+    response = client.get(url_for("blogs.blogs_fragment", search="blog", page=2))
+    assert b'href="?search=blog&page=1"' in response.data
+
+def test_blogs_feed(client, test_data):
+    """
+    The feed is read batch by batch from cursors keeping the filters, without offsets or counts.
+    """
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    titles, url = [], url_for("blogs.blogs_feed", tag="food", per_page=2)
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response.cache_control.max_age > 0
+
+            titles += re.findall(r">(Blog\d[^<]*)</h3>", response.json["html"])
+            url = response.json["cursor"] and url_for("blogs.blogs_feed", cursor=response.json["cursor"], per_page=2)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert titles == ["Blog7", "Blog6", "Blog5", "Blog4 search", "Blog3", "Blog1 search"]
+    # SQLite renders an OFFSET with every LIMIT, which must stay zero
+    assert all("count(" not in statement for statement, _ in statements)
+    assert all(parameters[-1] == 0 for statement, parameters in statements if "OFFSET" in statement)
+
+    response = client.get(url_for("blogs.blogs_fragment", search="blog"))
+    cursor = re.search(r'data-cursor="([^"]+)"', response.text)[1]
+    response = client.get(url_for("blogs.blogs_feed", cursor=cursor))
+    assert re.findall(r">(Blog\d[^<]*)</h3>", response.json["html"]) == ["Blog1 search"]
+    assert response.json["cursor"] is None
+
+    response = client.get(url_for("blogs.blogs_feed", cursor="not-a-cursor"))
+    assert response.status_code == 400
+
+def test_blogs_suggest(client, test_data):
+    """
+    Suggestions return the blogs with a title word starting with each query word, newest first.
+    """
+    response = client.get(url_for("blogs.suggest", q="sea"))
+
+    assert response.status_code == 200
+    suggestions = response.json["suggestions"]
+    assert [suggestion["title"] for suggestion in suggestions] == ["Blog4 search", "Blog1 search"]
+    assert suggestions[0]["url"] == url_for("blogs.detail", blog_id=suggestions[0]["id"])
+
+    response = client.get(url_for("blogs.suggest", q="blog1 se"))
+    assert [suggestion["title"] for suggestion in response.json["suggestions"]] == ["Blog1 search"]
+
+    response = client.get(url_for("blogs.suggest", q=""))
+    assert response.json["suggestions"] == []
+
+def test_blogs_suggest_follows_writes(client, test_data):
+    """
+    Suggestions reflect the blogs created, renamed and deleted after the index was loaded.
+    """
+    client.get(url_for("blogs.suggest", q="blog"))
+
+    blogs = {blog.title: blog for blog in db.session.scalars(db.select(BlogPost))}
+    blogs["Blog2"].title = "Searchable renamed"
+    db.session.delete(blogs["Blog4 search"])
+    db.session.add(BlogPost(title="Search engines", content="Content", author_id=test_data.id))
+    db.session.commit()
+
+    response = client.get(url_for("blogs.suggest", q="search"))
+
+    assert [suggestion["title"] for suggestion in response.json["suggestions"]] == [
+        "Search engines", "Blog1 search", "Searchable renamed"
+    ]
+
+def feed_titles(response):
+    return [item.findtext("title") for item in ET.fromstring(response.data).iter("item")]
+
+def test_rss_feeds(client, test_data):
+    """
+    The feeds list the latest blogs of all or one tag, and polls with the validators get 304.
+    """
+    response = client.get(url_for("blogs.rss_feed"))
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/rss+xml"
+    assert feed_titles(response) == ["Blog7", "Blog6", "Blog5", "Blog4 search", "Blog3", "Blog2", "Blog1 search"]
+    item = ET.fromstring(response.data).find("channel/item")
+    assert item.findtext("link").startswith("http://") and "/blogs/" in item.findtext("link")
+    assert sorted(category.text for category in item.iter("category")) == ["Food", "Tech"]
+
+    not_modified = client.get(url_for("blogs.rss_feed"), headers={"If-None-Match": response.headers["ETag"]})
+    assert not_modified.status_code == 304 and not_modified.data == b""
+    not_modified = client.get(url_for("blogs.rss_feed"), headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert not_modified.status_code == 304
+
+    response = client.get(url_for("blogs.tag_rss_feed", slug="tech"))
+    assert feed_titles(response) == ["Blog7", "Blog2"]
+
+    response = client.get(url_for("blogs.tag_rss_feed", slug="unknown"))
+    assert response.status_code == 404
+
+def test_rss_feeds_follow_writes(client, test_data):
+    """
+    A new blog rebuilds the feeds it is in, the other feeds are served from the cache.
+    """
+    feed = client.get(url_for("blogs.rss_feed"))
+    tech_feed = client.get(url_for("blogs.tag_rss_feed", slug="tech"))
+
+    food = db.session.scalars(db.select(Tag).where(Tag.slug == "food")).one()
+    db.session.add(BlogPost(
+        title="Fresh food", content="<p>Fresh</p>", author_id=test_data.id, tags=[food],
+        created_at=datetime.now(timezone.utc) + timedelta(minutes=1)
+    ))
+    db.session.commit()
+
+    with assert_max_queries(0):
+        response = client.get(url_for("blogs.tag_rss_feed", slug="tech"), headers={"If-None-Match": tech_feed.headers["ETag"]})
+    assert response.status_code == 304
+
+    response = client.get(url_for("blogs.rss_feed"), headers={"If-None-Match": feed.headers["ETag"]})
+    assert response.status_code == 200
+    assert feed_titles(response)[0] == "Fresh food"
+    assert response.headers["ETag"] != feed.headers["ETag"]
+
+    response = client.get(url_for("blogs.tag_rss_feed", slug="food"))
+    assert feed_titles(response)[0] == "Fresh food"
+
+@pytest.fixture
+def small_sitemaps(app):
+    """Split the seven test blogs into sitemaps of three, read two at a time."""
+    app.config["SITEMAP_SIZE"] = 3
+    app.config["SITEMAP_BATCH_SIZE"] = 2
+
+def sitemap_locations(response):
+    return [location.text for location in ET.fromstring(response.data).iter("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")]
+
+def test_sitemaps(client, test_data, small_sitemaps):
+    """
+    The index lists a sitemap per range of ids, each streaming the detail
+    URLs of its range and then served from the cache.
+    """
+    response = client.get(url_for("blogs.sitemap_index"))
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/xml"
+    assert [location.rsplit("/", 1)[1] for location in sitemap_locations(response)] == ["0.xml", "1.xml", "2.xml"]
+
+    response = client.get(url_for("blogs.sitemap", number=1))
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert [location.rsplit("/", 2)[1:] for location in sitemap_locations(response)] == [
+        ["blogs", "4"], ["blogs", "5"], ["blogs", "6"]
+    ]
+
+    with assert_max_queries(0):
+        cached = client.get(url_for("blogs.sitemap", number=1))
+    assert cached.data == response.data
+    not_modified = client.get(url_for("blogs.sitemap", number=1), headers={"If-None-Match": cached.headers["ETag"]})
+    assert not_modified.status_code == 304
+
+    response = client.get(url_for("blogs.sitemap", number=3))
+    assert response.status_code == 404
+
+def test_sitemaps_follow_writes(client, test_data, small_sitemaps):
+    """
+    A write rebuilds the sitemap of the post's id range, creates and deletes also the index.
+    """
+    # A streamed sitemap is cached once its body was read
+    for number in range(3):
+        client.get(url_for("blogs.sitemap", number=number)).get_data()
+
+    db.session.delete(db.session.get(BlogPost, 2))
+    db.session.add(BlogPost(title="Blog8", content="Content8", author_id=test_data.id))
+    db.session.commit()
+
+    with assert_max_queries(0):
+        client.get(url_for("blogs.sitemap", number=1))
+
+    with record_queries() as queries:
+        response = client.get(url_for("blogs.sitemap", number=0))
+    assert queries.count
+    assert [location.rsplit("/", 1)[1] for location in sitemap_locations(response)] == ["1", "3"]
+
+    response = client.get(url_for("blogs.sitemap", number=2))
+    assert [location.rsplit("/", 1)[1] for location in sitemap_locations(response)] == ["7", "8"]
+
 def test_blog_detail_valid(client, test_data):
     """
     Detail page returns 200 status code for a valid blog.
@@ -214,4 +423,89 @@ def test_delete_blog(logged_in_client):
 
     assert response.status_code == 302
     assert db.session.get(BlogPost, blog.id) is None
-    assert url_for("blogs.my_blogs") in response.headers["Location"]
\ No newline at end of file
+    assert url_for("blogs.my_blogs") in response.headers["Location"]
+
+def test_detail_views_are_flushed_in_one_batch(client, test_data):
+    """
+    The detail page counts its views in memory, and a flush adds them to the blogs.
+    """
+    blog2 = db.session.scalars(db.select(BlogPost).where(BlogPost.title == "Blog2")).one()
+    blog5 = db.session.scalars(db.select(BlogPost).where(BlogPost.title == "Blog5")).one()
+    for blog_id in [blog2.id, blog2.id, blog5.id, blog2.id, 999]:
+        client.get(url_for("blogs.detail", blog_id=blog_id))
+
+    assert view_counter.counts == {blog2.id: 3, blog5.id: 1}
+    assert blog_views()["Blog2"] == 0
+
+    assert view_counter.flush() == 4
+
+    views = blog_views()
+    assert views["Blog2"] == 3 and views["Blog5"] == 1 and views["Blog1 search"] == 0
+    assert not view_counter.counts
+
+    client.get(url_for("blogs.detail", blog_id=blog2.id))
+    view_counter.flush()
+
+    assert blog_views()["Blog2"] == 4
+
+def test_failed_flush_keeps_views(app, test_data, monkeypatch):
+    """
+    The views of a failed flush are added by the next one.
+    """
+    blog = db.session.scalars(db.select(BlogPost).where(BlogPost.title == "Blog3")).one()
+    counter = ViewCounter()
+    counter.increment(blog.id)
+
+    def unavailable():
+        raise ConnectionError("Database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db.engine, "begin", unavailable)
+        with pytest.raises(ConnectionError):
+            counter.flush()
+    counter.increment(blog.id)
+
+    assert counter.flush() == 2
+    assert blog_views()["Blog3"] == 2
+
+def test_stop_flushes_remaining_views(app, test_data):
+    """
+    Stopping the counter flushes the views counted since the last flush.
+    """
+    blog = db.session.scalars(db.select(BlogPost).where(BlogPost.title == "Blog1 search")).one()
+    counter = ViewCounter()
+    counter.init_app(app)
+    counter.interval = 60
+    counter.increment(blog.id)
+
+    assert counter._flusher.is_alive()
+
+    counter.stop()
+
+    assert counter._flusher is None
+    assert blog_views()["Blog1 search"] == 1
+
+def test_paused_counter_ignores_views(client, test_data):
+    """
+    Views are not counted while the counter is paused.
+    """
+    with view_counter.pause():
+        client.get(url_for("blogs.detail", blog_id=1))
+
+    assert not view_counter.counts
+
+def test_popular_blogs_ordered_by_views(client, test_data):
+    """
+    The popular page lists the viewed blogs, most viewed first.
+    """
+    for title in ["Blog4 search", "Blog6", "Blog6"]:
+        blog = db.session.scalars(db.select(BlogPost).where(BlogPost.title == title)).one()
+        client.get(url_for("blogs.detail", blog_id=blog.id))
+    view_counter.flush()
+
+    response = client.get(url_for("blogs.popular_blogs"))
+    html = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert html.index("Blog6") < html.index("Blog4")
+    assert "Blog1" not in html
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+import cloudinary.utils
+import pytest
+from flask import url_for
+from flask_blog.blogs.direct_uploads import upload_policy, verify_upload
+from flask_blog.blogs.exceptions import InvalidUploadError
+from flask_blog.blogs.models import BlogPost, MediaFile
+from flask_blog.extensions import db
+from sqlalchemy import select
+
+@pytest.fixture
+def direct_uploads(app, tmp_path):
+    app.config.update(DIRECT_UPLOADS=True, UPLOAD_FOLDER=tmp_path)
+    return tmp_path
+
+def upload(client, filename="image.png", data=b"image data"):
+    response = client.get(url_for("blogs.upload_policy", filename=filename))
+    assert response.status_code == 200
+    policy = response.json
+
+    stored = client.post(policy["url"], data={**policy["fields"], "file": (io.BytesIO(data), filename)}, content_type="multipart/form-data")
+    return policy, stored
+
+def test_create_blog_with_direct_upload(logged_in_client, direct_uploads):
+    """An image uploaded to the storage with a signed policy is attached by its key."""
+    response = logged_in_client.get(url_for("blogs.create"))
+    assert b"data-upload-url" in response.data
+
+    policy, stored = upload(logged_in_client)
+    assert stored.status_code == 204
+    assert (direct_uploads / policy["key"]).read_bytes() == b"image data"
+
+    response = logged_in_client.post(url_for("blogs.create"), data={
+        "title": "Blog with image", "content": "Content", "tags": [1], "image_key": policy["key"],
+    })
+
+    assert response.status_code == 302
+    key = hashlib.sha256(b"image data").hexdigest() + ".png"
+    blog = db.session.scalars(select(BlogPost).where(BlogPost.title == "Blog with image")).one()
+    assert blog.image == f"/media/{key}"
+    assert (direct_uploads / key).read_bytes() == b"image data"
+    assert not (direct_uploads / policy["key"]).exists()
+    assert db.session.get(MediaFile, key).ref_count == 1
+
+def test_prune_media_removes_abandoned_uploads(app, logged_in_client, direct_uploads, test_data):
+    """Direct uploads never attached to a post are pruned, and those an older post links are kept."""
+    abandoned, _ = upload(logged_in_client)
+    linked, _ = upload(logged_in_client, data=b"linked image")
+    db.session.add(BlogPost(title="Linked upload", content="Content", author_id=test_data.id, image=f"/media/{linked['key']}"))
+    db.session.commit()
+
+    for policy in [abandoned, linked]:
+        os.utime(direct_uploads / policy["key"], (time.time() - 3600, time.time() - 3600))
+
+    result = app.test_cli_runner().invoke(args=["prune-media", "--grace", "60"])
+
+    assert "Removed 1 unused images." in result.output
+    assert not (direct_uploads / abandoned["key"]).exists()
+    assert (direct_uploads / linked["key"]).exists()
+
+def test_create_blog_rejects_forged_key(logged_in_client, direct_uploads):
+    """A key the app didn't sign is not attached, even when a file is stored under it."""
+    key = f"uploads/{'a' * 32}-{'0' * 16}.png"
+    (direct_uploads / "uploads").mkdir()
+    (direct_uploads / key).write_bytes(b"image data")
+
+    response = logged_in_client.post(url_for("blogs.create"), data={
+        "title": "Blog with forged image", "content": "Content", "tags": [1], "image_key": key,
+    })
+
+    assert response.status_code == 400
+    assert b"Invalid upload key." in response.data
+    assert db.session.scalars(select(BlogPost).where(BlogPost.title == "Blog with forged image")).first() is None
+
+def test_create_blog_rejects_missing_upload(logged_in_client, direct_uploads):
+    """A signed key whose upload never reached the storage is rejected."""
+    key = logged_in_client.get(url_for("blogs.upload_policy", filename="image.png")).json["key"]
+
+    response = logged_in_client.post(url_for("blogs.create"), data={
+        "title": "Blog without upload", "content": "Content", "tags": [1], "image_key": key,
+    })
+
+    assert response.status_code == 400
+    assert b"The uploaded image was not found." in response.data
+
+def test_upload_policy_rejects_file_type(logged_in_client, direct_uploads):
+    """No policy is signed for a file that is not an allowed image."""
+    response = logged_in_client.get(url_for("blogs.upload_policy", filename="script.js"))
+
+    assert response.status_code == 400
+
+def test_upload_policy_requires_direct_uploads(logged_in_client):
+    """No policy is signed when direct uploads are disabled."""
+    response = logged_in_client.get(url_for("blogs.upload_policy", filename="image.png"))
+
+    assert response.status_code == 404
+
+def test_store_upload_checks_policy(app, logged_in_client, direct_uploads):
+    """The local storage refuses tampered and expired policies, and files over the size limit."""
+    policy = logged_in_client.get(url_for("blogs.upload_policy", filename="image.png")).json
+    tampered = {**policy["fields"], "key": "uploads/other.png", "file": (io.BytesIO(b"data"), "image.png")}
+
+    response = logged_in_client.post(policy["url"], data=tampered, content_type="multipart/form-data")
+    assert response.status_code == 403
+
+    app.config["DIRECT_UPLOAD_EXPIRES"] = -1
+    _, stored = upload(logged_in_client)
+    assert stored.status_code == 403
+
+    app.config.update(DIRECT_UPLOAD_EXPIRES=600, MAX_UPLOAD_SIZE=4)
+    _, stored = upload(logged_in_client)
+    assert stored.status_code == 400
+
+    assert not (direct_uploads / "uploads").exists()
+
+def test_cloudinary_upload_is_signed_and_verified(app):
+    """The Cloudinary policy is a signed upload, and an uploaded image over the limit is deleted."""
+    app.config["USE_LOCAL_STORAGE"] = False
+    config = SimpleNamespace(cloud_name="blog", api_key="key", api_secret="secret")
+
+    with patch("cloudinary.config", return_value=config):
+        policy = upload_policy("image.png", "/uploads")
+
+    fields = dict(policy["fields"])
+    signature = fields.pop("signature")
+    fields.pop("api_key")
+    assert policy["url"] == "https://api.cloudinary.com/v1_1/blog/image/upload"
+    assert fields["public_id"] == policy["key"]
+    assert signature == cloudinary.utils.api_sign_request(fields, "secret")
+
+    resource = {"bytes": 1000, "secure_url": "https://cdn.test/image.png"}
+    with patch("cloudinary.api.resource", return_value=resource) as get_resource:
+        assert verify_upload(policy["key"]) == "https://cdn.test/image.png"
+    get_resource.assert_called_once_with(policy["key"])
+
+    resource["bytes"] = app.config["MAX_UPLOAD_SIZE"] + 1
+    with (
+        patch("cloudinary.api.resource", return_value=resource),
+        patch("cloudinary.uploader.destroy") as destroy,
+        pytest.raises(InvalidUploadError),
+    ):
+        verify_upload(policy["key"])
+    destroy.assert_called_once_with(policy["key"])
@@ -0,0 +1,131 @@
+import io
+from datetime import timedelta
+from unittest.mock import patch
+from flask import url_for
+from flask_blog.blogs.models import BlogPost, Job
+from flask_blog.extensions import db
+from flask_blog.jobs import JobRunner, claim_jobs, job, utcnow
+from flask_blog.repositories.job_repository import JobRepository
+from sqlalchemy import select
+
+calls = []
+
+@job("test_record")
+def record(payload):
+    calls.append(payload["value"])
+
+@job("test_fail", max_attempts=2)
+def fail(payload):
+    raise RuntimeError("Storage unavailable")
+
+leases = []
+
+@job("test_long")
+def long_running(payload):
+    leases.append(db.session.scalars(select(Job.locked_until)).one())
+
+def get_jobs():
+    db.session.expire_all()
+    return db.session.scalars(select(Job).order_by(Job.id)).all()
+
+def test_create_blog_uploads_image_in_job(app, logged_in_client, tmp_path):
+    """Creating a blog with a Cloudinary image returns before the upload, which the job does."""
+    app.config.update(USE_LOCAL_STORAGE=False, UPLOAD_STAGING_FOLDER=tmp_path)
+
+    with patch("cloudinary.uploader.upload", return_value={"secure_url": "https://cdn.test/image.png"}) as upload:
+        response = logged_in_client.post(url_for("blogs.create"), data={
+            "title": "Blog with image",
+            "content": "Content",
+            "tags": [1],
+            "image": (io.BytesIO(b"image data"), "image.png"),
+        }, content_type="multipart/form-data")
+
+        assert response.status_code == 302
+        upload.assert_not_called()
+
+        blog = db.session.scalars(select(BlogPost).where(BlogPost.title == "Blog with image")).one()
+        assert blog.image is None
+
+        [queued] = get_jobs()
+        assert queued.name == "upload_image" and queued.payload["blog_id"] == blog.id
+        path = queued.payload["path"]
+
+        assert JobRunner(app).run_pending() == 1
+
+    upload.assert_called_once_with(path)
+    db.session.expire_all()
+    assert db.session.get(BlogPost, blog.id).image == "https://cdn.test/image.png"
+    assert get_jobs() == []
+    assert list(tmp_path.iterdir()) == []
+
+def test_create_blog_commits_post_with_its_job(app, logged_in_client, tmp_path):
+    """A post whose upload job can't be queued isn't kept without it."""
+    app.config.update(USE_LOCAL_STORAGE=False, UPLOAD_STAGING_FOLDER=tmp_path)
+
+    with patch("flask_blog.repositories.job_repository.new_job", side_effect=RuntimeError("Queue unavailable")):
+        response = logged_in_client.post(url_for("blogs.create"), data={
+            "title": "Blog with image",
+            "content": "Content",
+            "tags": [1],
+            "image": (io.BytesIO(b"image data"), "image.png"),
+        }, content_type="multipart/form-data")
+
+    assert response.status_code == 500
+    # The request ran in the session of the test, which would be discarded with its context
+    db.session.rollback()
+    assert db.session.scalars(select(BlogPost).where(BlogPost.title == "Blog with image")).first() is None
+
+def test_failed_job_is_retried_until_it_fails(app):
+    """A failing job is queued again with a delay, and marked failed after its last attempt."""
+    JobRepository().enqueue("test_fail", {})
+    runner = JobRunner(app)
+
+    assert runner.run_pending() == 1
+    [retried] = get_jobs()
+    assert retried.status == "queued" and retried.attempts == 1
+    assert retried.run_after > utcnow() + timedelta(seconds=app.config["JOB_RETRY_SECONDS"] / 2)
+
+    retried.run_after = utcnow()
+    db.session.commit()
+    assert runner.run_pending() == 1
+
+    [failed] = get_jobs()
+    assert failed.status == "failed" and failed.attempts == 2
+    assert "Storage unavailable" in failed.last_error
+    assert runner.run_pending() == 0
+
+def test_expired_lease_is_claimed_again(app):
+    """A running job is claimed once, and again after its lease expired."""
+    queued = JobRepository().enqueue("test_record", {"value": 1})
+
+    [claimed] = claim_jobs(10)
+    assert claimed.id == queued.id
+    assert claim_jobs(10) == []
+
+    [running] = get_jobs()
+    running.locked_until = utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    [reclaimed] = claim_jobs(10)
+    assert reclaimed.attempts == 2
+
+def test_long_job_runs_with_its_lease(app):
+    """A job given a lease in JOB_LEASES holds it while it runs, instead of the default one."""
+    app.config["JOB_LEASES"] = {"test_long": 3600}
+    JobRepository().enqueue("test_long", {})
+
+    assert JobRunner(app).run_pending() == 1
+    assert leases[-1] > utcnow() + timedelta(seconds=3000)
+
+def test_run_jobs_command(app):
+    """The run-jobs command with --once runs the due jobs and removes them."""
+    calls.clear()
+    for value in range(3):
+        JobRepository().enqueue("test_record", {"value": value})
+
+    result = app.test_cli_runner().invoke(args=["run-jobs", "--once"])
+
+    assert result.exit_code == 0
+    assert "Ran 3 jobs." in result.output
+    assert calls == [0, 1, 2]
+    assert get_jobs() == []
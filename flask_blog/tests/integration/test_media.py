@@ -0,0 +1,133 @@
+import hashlib
+import io
+import os
+import time
+import pytest
+from flask import url_for
+from flask_blog.blogs.media import store_media
+from flask_blog.blogs.models import BlogPost, MediaFile
+from flask_blog.extensions import db
+from sqlalchemy import select
+from sqlalchemy.orm import defer
+
+@pytest.fixture
+def upload_folder(app, tmp_path):
+    app.config["UPLOAD_FOLDER"] = tmp_path
+    return tmp_path
+
+def age(path, seconds=3600):
+    os.utime(path, (time.time() - seconds, time.time() - seconds))
+
+def ref_counts():
+    return {media.key: media.ref_count for media in db.session.scalars(select(MediaFile))}
+
+def test_store_media_deduplicates(upload_folder):
+    """An image is stored under the hash of its content, once however often it is uploaded."""
+    key = store_media(io.BytesIO(b"image data"), ".PNG")
+    other = store_media(io.BytesIO(b"other data"), ".png")
+
+    assert key == hashlib.sha256(b"image data").hexdigest() + ".png"
+    assert store_media(io.BytesIO(b"image data"), ".png") == key
+    assert sorted(path.name for path in upload_folder.iterdir()) == sorted([key, other])
+
+def test_create_blog_stores_image_by_content(logged_in_client, upload_folder):
+    """Posts uploading the same image share its file and count it."""
+    for title in ["First", "Second"]:
+        response = logged_in_client.post(url_for("blogs.create"), data={
+            "title": title, "content": "Content", "tags": [1], "image": (io.BytesIO(b"image data"), "photo.png"),
+        }, content_type="multipart/form-data")
+        assert response.status_code == 302
+
+    key = hashlib.sha256(b"image data").hexdigest() + ".png"
+    images = db.session.scalars(select(BlogPost.image).where(BlogPost.title.in_(["First", "Second"]))).all()
+
+    assert images == [f"/media/{key}"] * 2
+    assert [path.name for path in upload_folder.iterdir()] == [key]
+    assert ref_counts() == {key: 2}
+
+def test_edit_blog_moves_reference_count(logged_in_client, upload_folder):
+    """Replacing the image of a post releases the old image and counts the new one."""
+    old, new = hashlib.sha256(b"old image").hexdigest() + ".png", hashlib.sha256(b"new image").hexdigest() + ".png"
+
+    logged_in_client.post(url_for("blogs.create"), data={
+        "title": "Edited", "content": "Content", "tags": [1], "image": (io.BytesIO(b"old image"), "photo.png"),
+    }, content_type="multipart/form-data")
+    blog = db.session.scalars(select(BlogPost).where(BlogPost.title == "Edited")).one()
+    assert ref_counts() == {old: 1}
+
+    response = logged_in_client.post(url_for("blogs.edit", blog_id=blog.id), data={
+        "title": "Edited", "content": "Content", "tags": [1], "image": (io.BytesIO(b"new image"), "photo.png"),
+    }, content_type="multipart/form-data")
+
+    assert response.status_code == 302
+    assert db.session.scalars(select(BlogPost.image).where(BlogPost.id == blog.id)).one() == f"/media/{new}"
+    assert ref_counts() == {old: 0, new: 1}
+
+def test_reference_counts_follow_posts(app, test_data):
+    """The count of an image follows the posts using it as they are created, changed and deleted."""
+    first, second = f"/media/{'a' * 64}.png", f"/media/{'b' * 64}.png"
+
+    blogs = [BlogPost(title=f"Blog {i}", content="Content", author_id=test_data.id, image=first) for i in range(2)]
+    db.session.add_all(blogs)
+    # Images stored elsewhere are not counted
+    db.session.add(BlogPost(title="Cloudinary", content="Content", author_id=test_data.id, image="https://cdn.test/image.png"))
+    db.session.commit()
+    assert ref_counts() == {"a" * 64 + ".png": 2}
+
+    blog_ids = [blog.id for blog in blogs]
+    db.session.expunge_all()
+
+    db.session.get(BlogPost, blog_ids[0]).image = second
+    db.session.commit()
+    assert ref_counts() == {"a" * 64 + ".png": 1, "b" * 64 + ".png": 1}
+
+    db.session.expunge_all()
+    # Deleted without loading its image
+    db.session.delete(db.session.get(BlogPost, blog_ids[1], options=[defer(BlogPost.image)]))
+    db.session.delete(db.session.get(BlogPost, blog_ids[0]))
+    db.session.commit()
+    assert ref_counts() == {"a" * 64 + ".png": 0, "b" * 64 + ".png": 0}
+
+def test_prune_media_removes_unused_images(app, test_data, upload_folder):
+    """Pruning removes images no post used for the grace period, and unfinished uploads."""
+    used = store_media(io.BytesIO(b"used"), ".png")
+    unused = store_media(io.BytesIO(b"unused"), ".png")
+    uncounted = store_media(io.BytesIO(b"uncounted"), ".png")
+    recent = store_media(io.BytesIO(b"recent"), ".png")
+    (upload_folder / ".upload-stale").write_bytes(b"partial")
+    (upload_folder / "legacy_image.png").write_bytes(b"legacy")
+
+    db.session.add(BlogPost(title="Used", content="Content", author_id=test_data.id, image=f"/media/{used}"))
+    blog = BlogPost(title="Unused", content="Content", author_id=test_data.id, image=f"/media/{unused}")
+    db.session.add(blog)
+    db.session.commit()
+    db.session.delete(blog)
+    db.session.commit()
+
+    for path in upload_folder.iterdir():
+        if path.name != recent:
+            age(path)
+
+    runner = app.test_cli_runner()
+    # The count of the unused image dropped just now, so it is kept for the grace period
+    result = runner.invoke(args=["prune-media", "--grace", "60"])
+    assert result.exit_code == 0, result.output
+    assert "Removed 1 unused images." in result.output
+    assert not (upload_folder / uncounted).exists()
+
+    result = runner.invoke(args=["prune-media", "--grace", "0"])
+    assert "Removed 2 unused images." in result.output
+
+    assert sorted(path.name for path in upload_folder.iterdir()) == sorted([used, "legacy_image.png"])
+    assert ref_counts() == {used: 1}
+
+def test_media_is_cached_as_immutable(client, upload_folder):
+    """The served images may be cached for good."""
+    (upload_folder / "image.png").write_bytes(b"image data")
+
+    response = client.get("/media/image.png")
+
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.public
+    assert response.cache_control.max_age == client.application.config["MEDIA_CACHE_SECONDS"]
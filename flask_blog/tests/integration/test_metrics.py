@@ -0,0 +1,53 @@
+from flask_blog.monitoring.metrics import observe_upload, record_cache_lookup
+from prometheus_client import REGISTRY
+
+def sample(name, **labels):
+    """Returns the current value of a metric sample, 0 when it was not recorded yet."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_requests_are_counted_by_route_template(client, test_data):
+    """Requests are labeled with the route template, not the concrete path."""
+    before = sample("http_requests_total", method="GET", route="/blogs/<int:blog_id>", status="200")
+    duration_before = sample("http_request_duration_seconds_count", method="GET", route="/blogs/<int:blog_id>")
+
+    client.get("/blogs/1")
+    client.get("/blogs/2")
+
+    assert sample("http_requests_total", method="GET", route="/blogs/<int:blog_id>", status="200") == before + 2
+    assert sample("http_request_duration_seconds_count", method="GET", route="/blogs/<int:blog_id>") == duration_before + 2
+    assert sample("http_requests_in_progress", method="GET") == 0
+
+def test_not_found_requests_are_counted(client):
+    """Unknown paths share one label value."""
+    before = sample("http_requests_total", method="GET", route="<unmatched>", status="404")
+
+    client.get("/does-not-exist")
+
+    assert sample("http_requests_total", method="GET", route="<unmatched>", status="404") == before + 1
+
+def test_metrics_endpoint(client, test_data):
+    """The metrics endpoint exposes request, pool and template metrics."""
+    client.get("/blogs")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert b'http_requests_total{method="GET",route="/blogs",status="200"}' in response.data
+    assert b'template_render_duration_seconds_count{template="blogs.html"}' in response.data
+    assert b"db_pool_connections_in_use" in response.data
+
+def test_cache_and_upload_metrics():
+    """The cache and upload helpers record their samples."""
+    hits = sample("cache_requests_total", cache="test", result="hit")
+    misses = sample("cache_requests_total", cache="test", result="miss")
+    uploads = sample("upload_size_bytes_sum", storage="local")
+
+    record_cache_lookup("test", hit=True)
+    record_cache_lookup("test", hit=False)
+    with observe_upload("local", 2048):
+        pass
+
+    assert sample("cache_requests_total", cache="test", result="hit") == hits + 1
+    assert sample("cache_requests_total", cache="test", result="miss") == misses + 1
+    assert sample("upload_size_bytes_sum", storage="local") == uploads + 2048
@@ -0,0 +1,90 @@
+from flask import url_for
+from flask_blog.extensions import db
+from flask_blog.monitoring.profiling import ProfileFile, list_profiles
+import pytest
+
+@pytest.fixture(autouse=True)
+def profiles_dir(app, tmp_path):
+    """Store the profiles in a temporary directory."""
+    app.config["PROFILES_DIR"] = tmp_path / "profiles"
+
+    return app.config["PROFILES_DIR"]
+
+@pytest.fixture
+def staff_client(logged_in_client, test_data):
+    """Log in a staff user."""
+    test_data.is_staff = True
+    db.session.commit()
+
+    return logged_in_client
+
+def test_profile_file_name_round_trip():
+    """The request is recovered from the profile file name."""
+    profile = ProfileFile.create("GET", "/blogs/1_a")
+
+    assert ProfileFile.from_name(profile.name) == profile
+    assert ProfileFile.from_name("notes.html") is None
+
+def test_staff_request_is_profiled(staff_client, profiles_dir):
+    """A staff user gets a profile of the request with the query parameter."""
+    response = staff_client.get(url_for("blogs.blogs", profile=1))
+
+    assert response.status_code == 200
+
+    profiles = list_profiles()
+    assert [profile.name for profile in profiles] == [response.headers["X-Profile"]]
+    assert profiles[0].method == "GET"
+    assert profiles[0].path == "/blogs"
+    assert "pyinstrument" in (profiles_dir / profiles[0].name).read_text(encoding="utf-8")
+
+def test_staff_request_is_profiled_with_header(staff_client):
+    """The profile can be requested with a header."""
+    response = staff_client.get(url_for("blogs.blogs"), headers={"X-Profile": "1"})
+
+    assert "X-Profile" in response.headers
+    assert len(list_profiles()) == 1
+
+def test_non_staff_request_is_not_profiled(logged_in_client):
+    """Regular users can not profile requests."""
+    response = logged_in_client.get(url_for("blogs.blogs", profile=1))
+
+    assert response.status_code == 200
+    assert "X-Profile" not in response.headers
+    assert list_profiles() == []
+
+def test_only_newest_profiles_are_kept(app, staff_client):
+    """Old profiles are removed above the limit."""
+    app.config["PROFILES_KEEP"] = 2
+
+    for _ in range(3):
+        response = staff_client.get(url_for("blogs.blogs", profile=1))
+
+    profiles = list_profiles()
+    assert len(profiles) == 2
+    assert profiles[0].name == response.headers["X-Profile"]
+
+def test_admin_lists_and_opens_profiles(staff_client):
+    """The admin lists the saved profiles and serves them."""
+    name = staff_client.get(url_for("blogs.blogs", profile=1)).headers["X-Profile"]
+
+    response = staff_client.get(url_for("profiles.index"))
+
+    assert response.status_code == 200
+    assert b"/blogs" in response.data
+
+    response = staff_client.get(url_for("profiles.detail", profile_name=name))
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/html"
+
+def test_admin_rejects_unknown_profiles(staff_client):
+    """Only saved profiles can be opened."""
+    response = staff_client.get(url_for("profiles.detail", profile_name="config.html"))
+
+    assert response.status_code == 404
+
+def test_admin_profiles_require_staff(logged_in_client):
+    """Regular users are redirected to the login."""
+    response = logged_in_client.get(url_for("profiles.index"))
+
+    assert response.status_code == 302
@@ -0,0 +1,51 @@
+import logging
+import pytest
+from flask import url_for
+from flask_blog.blogs.models import BlogPost
+from flask_blog.extensions import db
+from flask_blog.monitoring.queries import assert_max_queries, fingerprint
+
+def test_fingerprint_ignores_literals_and_list_lengths():
+    """Statements differing only in values share a fingerprint."""
+    first = fingerprint("SELECT * FROM blog_post WHERE id IN (?, ?, ?) AND title = 'a'")
+    second = fingerprint("SELECT *  FROM blog_post\nWHERE id IN (%(id_1)s, %(id_2)s) AND title = 'it''s'")
+
+    assert first == second == "SELECT * FROM blog_post WHERE id IN (?) AND title = ?"
+
+def test_blog_list_query_count(client, test_data):
+    """The blog list runs a constant number of queries."""
+    with assert_max_queries(4, repeat_threshold=1) as stats:
+        response = client.get(url_for("blogs.blogs"))
+
+    assert response.status_code == 200
+    assert stats.count > 0
+
+def test_blog_detail_query_count(logged_in_client):
+    """The blog detail runs a constant number of queries, the user loader included."""
+    blog = db.session.execute(db.select(BlogPost)).scalars().first()
+
+    with assert_max_queries(5, repeat_threshold=2):
+        response = logged_in_client.get(url_for("blogs.detail", blog_id=blog.id))
+
+    assert response.status_code == 200
+
+def test_assert_max_queries_fails_when_exceeded(app, test_data):
+    """The assertion fails when the limit is exceeded."""
+    with pytest.raises(AssertionError, match="Expected at most 1 queries, got 2"):
+        with assert_max_queries(1):
+            db.session.execute(db.select(BlogPost).where(BlogPost.id == 1)).all()
+            db.session.execute(db.select(BlogPost).where(BlogPost.id == 2)).all()
+
+def test_repeated_statements_are_logged(app, client, test_data, caplog):
+    """A statement repeated above the threshold in one request logs a warning."""
+    def n_plus_one():
+        for blog_id in range(1, 7):
+            db.session.execute(db.select(BlogPost).where(BlogPost.id == blog_id)).all()
+        return "ok"
+
+    app.add_url_rule("/n-plus-one", view_func=n_plus_one)
+
+    with caplog.at_level(logging.WARNING):
+        client.get("/n-plus-one")
+
+    assert "Possible N+1 in GET /n-plus-one: statement executed 6 times" in caplog.text
@@ -0,0 +1,52 @@
+from flask import url_for
+from flask_blog.monitoring.queries import QueryStats
+from flask_blog.monitoring.timing import ServerTiming
+
+def parse_server_timing(header: str):
+    """Returns the metric names of a Server-Timing header."""
+    return [metric.split(";")[0].strip() for metric in header.split(",")]
+
+def test_server_timing_header_format():
+    """Repeated phases are summed and the db and total metrics are appended."""
+    timing = ServerTiming()
+    timing.add("auth", 0.002)
+    timing.add("TagRepository.get_all", 0.001)
+    timing.add("TagRepository.get_all", 0.0015)
+    queries = QueryStats()
+    queries.record("SELECT 1", 0.003)
+
+    header = timing.header(0.0201, queries)
+
+    assert header == (
+        'auth;dur=2.0, TagRepository.get_all;dur=2.5;desc="2 calls", '
+        'db;dur=3.0;desc="1 queries", total;dur=20.1'
+    )
+
+def test_blog_list_server_timing(client, test_data):
+    """The blog list reports its repository calls, rendering and DB time."""
+    response = client.get(url_for("blogs.blogs"))
+
+    assert response.status_code == 200
+
+    metrics = parse_server_timing(response.headers["Server-Timing"])
+    assert "BlogPostRepository.get_paginated" in metrics
+    assert "TagRepository.get_all" in metrics
+    assert "render" in metrics
+    assert metrics[-2:] == ["db", "total"]
+
+def test_authenticated_request_server_timing(logged_in_client):
+    """Requests of a logged in user report the user lookup."""
+    response = logged_in_client.get(url_for("blogs.my_blogs"))
+
+    assert response.status_code == 200
+
+    metrics = parse_server_timing(response.headers["Server-Timing"])
+    assert "auth" in metrics
+    assert "EmailUserRepository.get_by_id" in metrics
+
+def test_login_server_timing(client, test_data):
+    """The login reports the password check."""
+    response = client.post(url_for("accounts.login"), data={"email": "test@example.com", "password": "password"})
+
+    assert response.status_code == 302
+    assert "password" in parse_server_timing(response.headers["Server-Timing"])
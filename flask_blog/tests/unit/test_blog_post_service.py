@@ -51,6 +51,7 @@ def blog_post_service(mock_blog_repo, mock_tag_repo):
     service = BlogPostService(mock_blog_repo, mock_tag_repo)
     service.clean_content = MagicMock(side_effect=lambda x: x)
     service.upload_image = MagicMock(side_effect=lambda x: x if x else None)
+    service.stage_image = MagicMock(return_value=None)
     return service
 
 def test_get_recent_blogs(blog_post_service, mock_blog_repo):
@@ -185,7 +186,7 @@ def test_create_blog_post(blog_post_service, mock_blog_repo, mock_tag_repo):
     blog_post_service.clean_content.assert_called_once_with(content)
     blog_post_service.upload_image.assert_called_once_with(image)
     mock_tag_repo.get_by_ids.assert_called_once_with(tag_ids)
-    mock_blog_repo.create.assert_called_once_with(title, content, image, author, tags)
+    mock_blog_repo.create.assert_called_once_with(title, content, image, author, tags, commit=True)
     assert result == new_blog
     assert result.title == title
     assert result.content == content
@@ -298,20 +299,16 @@ def test_upload_image(app, blog_post_service):
     
     mock_image = MagicMock()
     mock_image.filename = "test_image.jpg"
+    mock_image.stream.tell.return_value = 2048
     
     with app.app_context():
-        with patch.object(current_app.config, 'get', return_value=True) as mock_config:
-            with patch('os.path.join', return_value='/path/to/upload/123_test_image.jpg') as mock_join:
-                with patch('uuid.uuid4', return_value='123'):
-                    
-                    current_app.config['USE_LOCAL_STORAGE'] = True
-                    current_app.config['UPLOAD_FOLDER'] = '/path/to/upload'
-                    
-                    result = blog_post_service.upload_image(mock_image)
-                    
-                    mock_image.save.assert_called_once()
-                    assert result.startswith('/media/')
-                    assert 'test_image.jpg' in result
+        with patch('flask_blog.services.blog_post_service.store_media', return_value='123.jpg') as mock_store:
+            current_app.config['USE_LOCAL_STORAGE'] = True
+
+            result = blog_post_service.upload_image(mock_image)
+
+            mock_store.assert_called_once_with(mock_image.stream, '.jpg')
+            assert result == '/media/123.jpg'
         
         with patch('cloudinary.uploader.upload') as mock_upload:
             current_app.config['USE_LOCAL_STORAGE'] = False
@@ -1,14 +1,101 @@
 let debounceTimer;
+let suggestController;
+let resultsController;
+let feedController;
+let activeSuggestion = -1;
 
-document.getElementById('search').addEventListener('input', function () {
+const searchInput = document.getElementById('search');
+const suggestionList = document.getElementById('search-suggestions');
+const blogResults = document.getElementById('blog-results');
+const feedToggle = document.getElementById('feed-toggle');
+
+const SELECTED_TAG_CLASSES = ['bg-primary', 'text-primary-foreground'];
+const TAG_CLASSES = ['bg-secondary', 'text-secondary-foreground', 'hover:bg-secondary/80'];
+
+searchInput.addEventListener('input', function () {
   clearTimeout(debounceTimer);
   debounceTimer = setTimeout(() => {
-    updateSearchURL();
-  }, 500);
+    fetchSuggestions();
+  }, 150);
 });
 
+searchInput.addEventListener('keydown', function (event) {
+  const items = suggestionList.querySelectorAll('a');
+
+  if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+    if (!items.length) return;
+    event.preventDefault();
+    const step = event.key === 'ArrowDown' ? 1 : -1;
+    setActiveSuggestion((activeSuggestion + step + items.length) % items.length);
+  } else if (event.key === 'Enter') {
+    event.preventDefault();
+    if (activeSuggestion >= 0 && items[activeSuggestion]) {
+      window.location.href = items[activeSuggestion].href;
+    } else {
+      updateSearchURL();
+    }
+  } else if (event.key === 'Escape') {
+    hideSuggestions();
+  }
+});
+
+searchInput.addEventListener('blur', function () {
+  // Let a click on a suggestion follow its link first
+  setTimeout(hideSuggestions, 200);
+});
+
+function fetchSuggestions() {
+  const query = searchInput.value.trim();
+
+  if (suggestController) suggestController.abort();
+  if (!query) {
+    hideSuggestions();
+    return;
+  }
+
+  suggestController = new AbortController();
+  const url = `${searchInput.dataset.suggestUrl}?${new URLSearchParams({ q: query })}`;
+
+  fetch(url, { signal: suggestController.signal })
+    .then((response) => (response.ok ? response.json() : { suggestions: [] }))
+    .then((data) => showSuggestions(data.suggestions))
+    .catch((error) => {
+      if (error.name !== 'AbortError') hideSuggestions();
+    });
+}
+
+function showSuggestions(suggestions) {
+  suggestionList.replaceChildren(
+    ...suggestions.map((suggestion) => {
+      const link = document.createElement('a');
+      link.href = suggestion.url;
+      link.textContent = suggestion.title;
+      link.className = 'block px-3 py-2 hover:bg-secondary/80';
+
+      const item = document.createElement('li');
+      item.appendChild(link);
+      return item;
+    })
+  );
+
+  activeSuggestion = -1;
+  suggestionList.classList.toggle('hidden', suggestions.length === 0);
+}
+
+function setActiveSuggestion(index) {
+  suggestionList.querySelectorAll('a').forEach((link, i) => {
+    link.classList.toggle('bg-secondary', i === index);
+  });
+  activeSuggestion = index;
+}
+
+function hideSuggestions() {
+  suggestionList.classList.add('hidden');
+  activeSuggestion = -1;
+}
+
 function updateSearchURL() {
-  const search = document.getElementById('search').value;
+  const search = searchInput.value;
   const urlParams = new URLSearchParams(window.location.search);
 
   if (search) {
@@ -17,7 +104,9 @@ function updateSearchURL() {
     urlParams.delete('search');
   }
 
-  window.location.search = urlParams.toString();
+  urlParams.delete('page');
+
+  loadResults(urlParams);
 }
 
 function toggleTag(tag) {
@@ -38,5 +127,120 @@ function toggleTag(tag) {
 
   urlParams.delete('page');
 
-  window.location.search = urlParams.toString();
+  loadResults(urlParams);
 }
+
+// Swaps in the blog list and pagination for the query instead of loading the
+// whole page, and falls back to loading it when that fails
+function loadResults(urlParams, pushState = true) {
+  const query = urlParams.toString();
+
+  if (resultsController) resultsController.abort();
+  if (feedController) feedController.abort();
+  resultsController = new AbortController();
+
+  fetch(`${blogResults.dataset.fragmentUrl}?${query}`, { signal: resultsController.signal })
+    .then((response) => {
+      if (!response.ok) throw new Error(response.statusText);
+      return response.text();
+    })
+    .then((html) => {
+      blogResults.innerHTML = html;
+      setupFeed();
+      if (pushState) {
+        history.pushState(null, '', query ? `?${query}` : window.location.pathname);
+      }
+      syncFilters(urlParams);
+    })
+    .catch((error) => {
+      if (error.name !== 'AbortError') window.location.search = query;
+    });
+}
+
+function syncFilters(urlParams) {
+  const tags = urlParams.get('tag') ? urlParams.get('tag').split(',') : [];
+
+  document.querySelectorAll('[data-tag]').forEach((button) => {
+    const selected = tags.includes(button.dataset.tag);
+    button.classList.remove(...SELECTED_TAG_CLASSES, ...TAG_CLASSES);
+    button.classList.add(...(selected ? SELECTED_TAG_CLASSES : TAG_CLASSES));
+  });
+
+  searchInput.value = urlParams.get('search') || '';
+}
+
+blogResults.addEventListener('click', function (event) {
+  const link = event.target.closest('a[href^="?"]');
+  if (!link || event.button !== 0 || event.ctrlKey || event.metaKey || event.shiftKey) return;
+
+  event.preventDefault();
+  loadResults(new URLSearchParams(link.search));
+  blogResults.scrollIntoView({ block: 'nearest' });
+});
+
+window.addEventListener('popstate', function () {
+  loadResults(new URLSearchParams(window.location.search), false);
+});
+
+// Infinite scroll appends the next batches of the feed below the list instead
+// of paging, each continuing from the cursor of the one before
+const feedObserver = new IntersectionObserver(
+  (entries) => {
+    if (entries.some((entry) => entry.isIntersecting)) loadMore();
+  },
+  { rootMargin: '400px' }
+);
+
+function infiniteScroll() {
+  return localStorage.getItem('infiniteScroll') === 'on';
+}
+
+function setupFeed() {
+  const enabled = infiniteScroll();
+  const sentinel = document.getElementById('blog-feed');
+
+  feedToggle.textContent = `Infinite scroll: ${enabled ? 'on' : 'off'}`;
+  document.getElementById('blog-pagination').classList.toggle('hidden', enabled);
+
+  feedObserver.disconnect();
+  if (enabled && sentinel) feedObserver.observe(sentinel);
+}
+
+function loadMore() {
+  const sentinel = document.getElementById('blog-feed');
+  if (!sentinel || feedController) return;
+
+  feedController = new AbortController();
+  const url = `${blogResults.dataset.feedUrl}?${new URLSearchParams({ cursor: sentinel.dataset.cursor })}`;
+
+  fetch(url, { signal: feedController.signal })
+    .then((response) => {
+      if (!response.ok) throw new Error(response.statusText);
+      return response.json();
+    })
+    .then((data) => {
+      feedController = null;
+      blogResults.querySelector('.grid').insertAdjacentHTML('beforeend', data.html);
+      if (data.cursor) {
+        sentinel.dataset.cursor = data.cursor;
+      } else {
+        sentinel.remove();
+      }
+      // Observing again loads the next batch while the end is still in view
+      setupFeed();
+    })
+    .catch((error) => {
+      feedController = null;
+      if (error.name !== 'AbortError') {
+        feedObserver.disconnect();
+        document.getElementById('blog-pagination').classList.remove('hidden');
+      }
+    });
+}
+
+feedToggle.addEventListener('click', function () {
+  localStorage.setItem('infiniteScroll', infiniteScroll() ? 'off' : 'on');
+  setupFeed();
+});
+
+setupFeed();
@@ -26,3 +26,50 @@ function previewImage(event) {
     reader.readAsDataURL(input.files[0]);
   }
 }
+
+// With direct uploads the image goes from the browser straight to the storage, and the form posts only its key
+const imageKeyInput = document.querySelector('input[data-upload-url]');
+let pendingUpload = null;
+
+if (imageKeyInput) {
+  const imageInput = imageKeyInput.form.querySelector('input[type="file"]');
+
+  imageInput.addEventListener('change', function () {
+    pendingUpload = uploadImage(imageInput, imageKeyInput);
+  });
+
+  imageKeyInput.form.addEventListener('submit', function (event) {
+    if (!pendingUpload) return;
+    // Submits the form again once the image is stored
+    event.preventDefault();
+    pendingUpload.then(() => {
+      pendingUpload = null;
+      updateContent();
+      imageKeyInput.form.submit();
+    });
+  });
+}
+
+async function uploadImage(imageInput, imageKeyInput) {
+  const file = imageInput.files[0];
+  imageKeyInput.value = '';
+  if (!file) return;
+
+  try {
+    const url = `${imageKeyInput.dataset.uploadUrl}?${new URLSearchParams({ filename: file.name })}`;
+    const response = await fetch(url);
+    if (!response.ok) return;
+    const upload = await response.json();
+
+    const body = new FormData();
+    Object.entries(upload.fields).forEach(([name, value]) => body.append(name, value));
+    body.append('file', file);
+    const stored = await fetch(upload.url, { method: 'POST', body });
+    if (!stored.ok) return;
+
+    imageKeyInput.value = upload.key;
+    imageInput.value = '';
+  } catch (error) {
+    // The image is posted with the form instead
+  }
+}